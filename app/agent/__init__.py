@@ -1,9 +1,21 @@
-from .memory import ConversationMemory
-from .planner import Planner
+from .memory import (
+    ConversationMemory,
+    MemoryBackend,
+    InMemoryBackend,
+    SQLiteMemoryBackend,
+    build_memory_backend,
+)
+from .planner import Planner, RuleBasedPlanner, build_planner
 from .executor import Executor
 
 __all__ = [
     "ConversationMemory",
+    "MemoryBackend",
+    "InMemoryBackend",
+    "SQLiteMemoryBackend",
+    "build_memory_backend",
     "Planner",
+    "RuleBasedPlanner",
+    "build_planner",
     "Executor",
 ]
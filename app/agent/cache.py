@@ -0,0 +1,253 @@
+# app/agent/cache.py
+from __future__ import annotations
+
+import hashlib
+import math
+import os
+import re
+import threading
+import time
+from collections import Counter, OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from app.agent.tools.search_index import tokenize
+
+_WHITESPACE = re.compile(r"\s+")
+_TRAILING_PUNCT = re.compile(r"[\s?？!！.。~]+$")
+
+
+def normalize_query(query: str) -> str:
+    """
+    캐시 키용 질의 정규화: 소문자화, 공백 정리, 끝의 물음표/마침표 제거.
+    """
+    text = _WHITESPACE.sub(" ", query.strip().lower())
+    return _TRAILING_PUNCT.sub("", text)
+
+
+def _term_vector(text: str) -> Tuple[Dict[str, float], float]:
+    counts = Counter(tokenize(text))
+    norm = math.sqrt(sum(v * v for v in counts.values()))
+    return dict(counts), norm
+
+
+def _cosine(a: Tuple[Dict[str, float], float], b: Tuple[Dict[str, float], float]) -> float:
+    (va, na), (vb, nb) = a, b
+    if not na or not nb:
+        return 0.0
+    if len(va) > len(vb):
+        va, vb = vb, va
+    dot = sum(w * vb.get(term, 0.0) for term, w in va.items())
+    return dot / (na * nb)
+
+
+def _file_signature(path: str) -> Optional[Tuple[int, int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+@dataclass
+class _Entry:
+    value: Any
+    context_key: str
+    vector: Tuple[Dict[str, float], float]
+    created_at: float
+    compute_seconds: float
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    similar_hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+    saved_seconds: float = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "similar_hits": self.similar_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "invalidations": self.invalidations,
+            "saved_seconds": round(self.saved_seconds, 3),
+        }
+
+
+class ResponseCache:
+    """
+    Agent 최종 응답 캐시.
+
+    - 키: 정규화된 질의 + 메모리 컨텍스트
+    - similarity_threshold를 주면, 같은 컨텍스트 안에서 질의 term 벡터의
+      코사인 유사도가 threshold 이상인 기존 응답도 재사용 (near-duplicate 질의)
+    - max_entries 초과 시 LRU 제거, ttl_seconds 경과 시 만료
+    - watch_paths 파일(규정 데이터 등)이 바뀌거나 version_fn() 값(corpus 버전 등)이 바뀌면 캐시 전체 무효화
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1024,
+        ttl_seconds: Optional[float] = 600.0,
+        similarity_threshold: Optional[float] = None,
+        watch_paths: Iterable[str] = (),
+        check_interval: float = 1.0,
+        version_fn: Optional[Callable[[], Any]] = None,
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.watch_paths: List[str] = list(watch_paths)
+        self.check_interval = check_interval
+        self.version_fn = version_fn
+        self.stats = CacheStats()
+
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # context_key → 해당 컨텍스트에 속한 entry 키 (유사도 검색 범위 제한용)
+        self._by_context: Dict[str, Set[str]] = {}
+        self._signatures = self._current_signatures()
+        self._version = version_fn() if version_fn is not None else None
+        self._last_check = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _hash(*parts: str) -> str:
+        h = hashlib.sha256()
+        for part in parts:
+            h.update(part.encode("utf-8"))
+            h.update(b"\x00")
+        return h.hexdigest()
+
+    def make_key(self, query: str, memory_context: str = "") -> str:
+        return self._hash(normalize_query(query), memory_context)
+
+    def get(self, query: str, memory_context: str = "") -> Optional[Any]:
+        with self._lock:
+            now = time.monotonic()
+            self._check_invalidation(now)
+
+            key = self.make_key(query, memory_context)
+            entry = self._live_entry(key, now)
+            if entry is not None:
+                self._record_hit(key, entry, similar=False)
+                return entry.value
+
+            if self.similarity_threshold is not None:
+                similar_key = self._find_similar(query, self._hash(memory_context), now)
+                if similar_key is not None:
+                    entry = self._entries[similar_key]
+                    self._record_hit(similar_key, entry, similar=True)
+                    return entry.value
+
+            self.stats.misses += 1
+            return None
+
+    def set(self, query: str, memory_context: str, value: Any, compute_seconds: float = 0.0) -> None:
+        with self._lock:
+            key = self.make_key(query, memory_context)
+            context_key = self._hash(memory_context)
+            if key in self._entries:
+                self._remove(key)
+
+            self._entries[key] = _Entry(
+                value=value,
+                context_key=context_key,
+                vector=_term_vector(normalize_query(query)),
+                created_at=time.monotonic(),
+                compute_seconds=compute_seconds,
+            )
+            self._by_context.setdefault(context_key, set()).add(key)
+
+            while len(self._entries) > self.max_entries:
+                oldest = next(iter(self._entries))
+                self._remove(oldest)
+                self.stats.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_context.clear()
+
+    def stats_dict(self) -> Dict[str, Any]:
+        data = self.stats.as_dict()
+        data["size"] = len(self._entries)
+        data["max_entries"] = self.max_entries
+        return data
+
+    # 내부 헬퍼
+
+    def _record_hit(self, key: str, entry: _Entry, *, similar: bool) -> None:
+        self._entries.move_to_end(key)
+        self.stats.hits += 1
+        if similar:
+            self.stats.similar_hits += 1
+        self.stats.saved_seconds += entry.compute_seconds
+
+    def _live_entry(self, key: str, now: float) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self.ttl_seconds is not None and now - entry.created_at > self.ttl_seconds:
+            self._remove(key)
+            self.stats.expirations += 1
+            return None
+        return entry
+
+    def _find_similar(self, query: str, context_key: str, now: float) -> Optional[str]:
+        candidates = self._by_context.get(context_key)
+        if not candidates:
+            return None
+
+        vector = _term_vector(normalize_query(query))
+        best_key, best_score = None, self.similarity_threshold or 0.0
+        for key in list(candidates):
+            entry = self._live_entry(key, now)
+            if entry is None:
+                continue
+            score = _cosine(vector, entry.vector)
+            if score >= best_score:
+                best_key, best_score = key, score
+        return best_key
+
+    def _remove(self, key: str) -> None:
+        entry = self._entries.pop(key)
+        keys = self._by_context.get(entry.context_key)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._by_context[entry.context_key]
+
+    def _current_signatures(self) -> List[Optional[Tuple[int, int, int]]]:
+        return [_file_signature(path) for path in self.watch_paths]
+
+    def _check_invalidation(self, now: float) -> None:
+        if self.version_fn is not None:
+            version = self.version_fn()
+            if version != self._version:
+                self._version = version
+                self._invalidate()
+
+        if not self.watch_paths or now - self._last_check < self.check_interval:
+            return
+        self._last_check = now
+
+        signatures = self._current_signatures()
+        if signatures != self._signatures:
+            self._signatures = signatures
+            self._invalidate()
+
+    def _invalidate(self) -> None:
+        self._entries.clear()
+        self._by_context.clear()
+        self.stats.invalidations += 1
@@ -0,0 +1,172 @@
+# app/agent/context.py
+from __future__ import annotations
+
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional, Set, Tuple
+
+from app.agent.tools.search_index import tokenize
+
+# 모델별 프롬프트 컨텍스트(규정 원문 / 대화 기록)에 쓸 토큰 예산
+MODEL_CONTEXT_BUDGETS: Dict[str, int] = {
+    "gpt-5-mini": 6000,
+    "gpt-4o-mini": 6000,
+    "gpt-4o": 8000,
+}
+DEFAULT_CONTEXT_BUDGET = 4000
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[.!?。])\s+|\n+")
+_HANGUL = re.compile(r"[가-힣]")
+
+
+def estimate_tokens(text: str) -> int:
+    """
+    tokenizer 없이 쓰는 보수적인 토큰 수 추정.
+    한글은 음절당 약 1토큰, 그 외 문자는 약 4글자당 1토큰으로 계산한다.
+    """
+    if not text:
+        return 0
+    hangul = len(_HANGUL.findall(text))
+    return hangul + (len(text) - hangul + 3) // 4
+
+
+def context_budget_for(model: str) -> int:
+    return MODEL_CONTEXT_BUDGETS.get(model, DEFAULT_CONTEXT_BUDGET)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s.strip() for s in _SENTENCE_SPLIT.split(text) if s and s.strip()]
+
+
+@dataclass
+class ContextStats:
+    input_tokens: int = 0
+    output_tokens: int = 0
+    dropped_passages: int = 0
+    trimmed_passages: int = 0
+    duplicate_passages: int = 0
+
+    @property
+    def tokens_saved(self) -> int:
+        return max(0, self.input_tokens - self.output_tokens)
+
+
+class ContextBuilder:
+    """
+    summarize / extract_clause 프롬프트에 넣을 규정 텍스트를 토큰 예산 안으로 맞추는 빌더.
+
+    1) 중복/포함 관계인 텍스트 제거
+    2) 질의와의 term 겹침으로 passage 순위 결정
+    3) max_passage_tokens보다 긴 규정은 질의와 가장 잘 맞는 문장들만 남김 (원래 문장 순서 유지)
+    4) 예산을 넘는 하위 passage는 제외
+    """
+
+    def __init__(self, budget_tokens: int, max_passage_tokens: Optional[int] = None) -> None:
+        self.budget_tokens = budget_tokens
+        self.max_passage_tokens = max_passage_tokens or max(1, budget_tokens // 2)
+
+    def build(self, query: str, texts: List[str]) -> Tuple[List[str], ContextStats]:
+        stats = ContextStats(input_tokens=sum(estimate_tokens(t) for t in texts))
+        query_terms = set(tokenize(query))
+
+        unique = self._dedupe(texts)
+        stats.duplicate_passages = len(texts) - len(unique)
+
+        # 점수 높은 순으로 예산을 채우되, 출력은 원래 순서대로
+        ranked = sorted(
+            range(len(unique)),
+            key=lambda i: (-self._overlap(query_terms, unique[i]), i),
+        )
+        selected: Dict[int, str] = {}
+        used = 0
+        for i in ranked:
+            passage = unique[i]
+            remaining = self.budget_tokens - used
+            limit = min(self.max_passage_tokens, remaining)
+            if limit <= 0:
+                stats.dropped_passages += 1
+                continue
+
+            if estimate_tokens(passage) > limit:
+                passage = self._trim(query_terms, passage, limit)
+                if not passage:
+                    stats.dropped_passages += 1
+                    continue
+                stats.trimmed_passages += 1
+
+            selected[i] = passage
+            used += estimate_tokens(passage)
+
+        result = [selected[i] for i in sorted(selected)]
+        stats.output_tokens = used
+        return result, stats
+
+    def build_memory(self, memory_context: str) -> Tuple[str, ContextStats]:
+        """
+        대화 기록 컨텍스트는 최신 턴이 뒤에 있으므로, 뒤에서부터 예산만큼 줄 단위로 남긴다.
+        """
+        stats = ContextStats(input_tokens=estimate_tokens(memory_context))
+        if stats.input_tokens <= self.budget_tokens:
+            stats.output_tokens = stats.input_tokens
+            return memory_context, stats
+
+        kept: List[str] = []
+        used = 0
+        for line in reversed(memory_context.split("\n")):
+            cost = estimate_tokens(line) + 1
+            if used + cost > self.budget_tokens:
+                break
+            kept.append(line)
+            used += cost
+        # 잘린 경우 사용자/에이전트 한 쌍이 깨지지 않도록 "사용자:" 줄부터 시작
+        while kept and not kept[-1].startswith("사용자:"):
+            kept.pop()
+
+        result = "\n".join(reversed(kept))
+        stats.output_tokens = estimate_tokens(result)
+        stats.dropped_passages = 1 if result != memory_context else 0
+        return result, stats
+
+    @staticmethod
+    def _overlap(query_terms: Set[str], text: str) -> float:
+        if not query_terms:
+            return 0.0
+        terms = set(tokenize(text))
+        return len(query_terms & terms) / len(query_terms)
+
+    @staticmethod
+    def _dedupe(texts: List[str]) -> List[str]:
+        """
+        공백 정규화 기준으로 같은 텍스트, 또는 다른 텍스트에 통째로 포함된 텍스트 제거.
+        """
+        normalized = [" ".join(t.split()) for t in texts]
+        keep: List[int] = []
+        seen: Set[str] = set()
+        for i, text in enumerate(normalized):
+            if not text or text in seen:
+                continue
+            seen.add(text)
+            keep.append(i)
+
+        result = []
+        for i in keep:
+            if any(i != j and normalized[i] in normalized[j] for j in keep):
+                continue
+            result.append(texts[i])
+        return result
+
+    def _trim(self, query_terms: Set[str], text: str, limit: int) -> str:
+        sentences = split_sentences(text)
+        ranked = sorted(
+            range(len(sentences)),
+            key=lambda i: (-self._overlap(query_terms, sentences[i]), i),
+        )
+        chosen: List[int] = []
+        used = 0
+        for i in ranked:
+            cost = estimate_tokens(sentences[i])
+            if used + cost > limit:
+                continue
+            chosen.append(i)
+            used += cost
+        return " ".join(sentences[i] for i in sorted(chosen))
@@ -1,37 +1,302 @@
 # app/agent/executor.py
 from __future__ import annotations
 
-from typing import Dict, Any
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set
 
+from app.agent.metrics import span, step_scope
 from app.agent.tools.base import Tool
 
+# 스트리밍 Tool이 토큰을 생성할 때마다 호출되는 콜백
+TokenCallback = Callable[[str], Awaitable[None]]
+# 병렬 플랜의 각 호출을 실행하기 직전에 플랜을 보정하는 훅 (텍스트 주입 / 토큰 예산 등)
+PreparePlan = Callable[[Dict[str, Any]], Dict[str, Any]]
+
+# 선행 호출의 검색 결과를 texts로 받아 쓰는 Tool
+TEXT_TOOLS = ("summarize", "extract_clause")
+
+
+def normalize_calls(raw_calls: Any) -> List[Dict[str, Any]]:
+    """
+    플랜의 "calls"(병렬 실행할 Tool 호출 목록)를 정규화.
+
+    - id가 없거나 중복이면 c1, c2, ... 로 채운다. (플랜의 다른 id와 겹치지 않는 이름만 사용)
+    - depends_on은 자기보다 앞에 나온 호출 id만 남긴다. (순환 의존 방지)
+    - dict가 아니거나 tool이 없는 항목은 버린다.
+    """
+    calls: List[Dict[str, Any]] = []
+    if not isinstance(raw_calls, list):
+        return calls
+
+    explicit = {str(raw["id"]) for raw in raw_calls if isinstance(raw, dict) and raw.get("id")}
+    seen: List[str] = []
+    for i, raw in enumerate(raw_calls, start=1):
+        if not isinstance(raw, dict) or not raw.get("tool"):
+            continue
+        call_id = str(raw.get("id") or "")
+        if not call_id or call_id in seen:
+            call_id = _unused_call_id(i, seen, explicit)
+        depends_on = raw.get("depends_on") or []
+        if isinstance(depends_on, str):
+            depends_on = [depends_on]
+        tool_input = raw.get("tool_input")
+        calls.append(
+            {
+                "id": call_id,
+                "tool": str(raw["tool"]),
+                "tool_input": dict(tool_input) if isinstance(tool_input, dict) else {},
+                "depends_on": [str(d) for d in depends_on if str(d) in seen],
+            }
+        )
+        seen.append(call_id)
+    return calls
+
+
+def _unused_call_id(position: int, seen: List[str], explicit: Set[str]) -> str:
+    call_id, n = f"c{position}", 1
+    while call_id in seen or call_id in explicit:
+        n += 1
+        call_id = f"c{position}_{n}"
+    return call_id
+
+
+def merge_outputs(results: List[Dict[str, Any]]) -> Any:
+    """
+    병렬 호출 결과를 다음 단계에 넘길 값 하나로 합친다.
+
+    - final 결과가 있으면 그 output
+    - 다른 호출이 의존하지 않는 말단 호출들의 output 중
+      문자열(summarize / extract_clause 답변)이 있으면 이어 붙인 문자열,
+      아니면 검색 결과 리스트를 중복 없이 합친 리스트
+    - 말단 호출이 모두 실패했으면 첫 번째 에러 dict
+    """
+    for result in results:
+        if result["is_final"]:
+            return result["output"]
+
+    dependencies = {dep for result in results for dep in result.get("depends_on") or []}
+    sinks = [r["output"] for r in results if r.get("call_id") not in dependencies]
+
+    texts = [output.strip() for output in sinks if isinstance(output, str) and output.strip()]
+    if texts:
+        return "\n\n".join(texts)
+
+    lists = [output for output in sinks if isinstance(output, list)]
+    if lists:
+        merged: List[Any] = []
+        seen = set()
+        for items in lists:
+            for item in items:
+                key = _item_key(item)
+                if key in seen:
+                    continue
+                seen.add(key)
+                merged.append(item)
+        return merged
+
+    return sinks[0] if sinks else None
+
+
+def _item_key(item: Any) -> Any:
+    if isinstance(item, dict):
+        if item.get("id") is not None:
+            return ("id", item["id"])
+        return ("text", item.get("title"), item.get("content"))
+    return ("repr", repr(item))
+
+
+def _call_plan(plan: Dict[str, Any], call: Dict[str, Any], dependencies: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    병렬 플랜의 호출 하나를 단일 액션 플랜 형태로 변환.
+    summarize / extract_clause가 texts 없이 선행 호출에 의존하면 선행 호출 결과를 texts로 넣는다.
+    """
+    call_plan = {
+        "tool": call["tool"],
+        "tool_input": dict(call["tool_input"]),
+        "reason": plan.get("reason", ""),
+        "planner": plan.get("planner"),
+    }
+    if call["tool"] in TEXT_TOOLS and dependencies and not call_plan["tool_input"].get("texts"):
+        call_plan["tool_input"]["texts"] = _dependency_texts([d["output"] for d in dependencies])
+    return call_plan
+
+
+def _dependency_texts(outputs: List[Any]) -> List[str]:
+    texts: List[str] = []
+    for output in outputs:
+        if isinstance(output, list):
+            texts.extend(item.get("content", "") for item in output if isinstance(item, dict))
+        elif isinstance(output, str) and output.strip():
+            texts.append(output)
+    return texts
+
 
 class Executor:
     def __init__(self, tool_registry: Dict[str, Tool]):
         self.tool_registry = tool_registry
 
-    def execute(self, plan: Dict[str, Any], user_query: str) -> Dict[str, Any]:        
+    def execute(self, plan: Dict[str, Any], user_query: str) -> Dict[str, Any]:
+        tool_name: str = plan.get("tool", "")
+        tool_input: Dict[str, Any] = plan.get("tool_input", {}) or {}
+
+        if tool_name == "final_answer":
+            return self._final_answer_result(plan, tool_input)
+
+        tool = self.tool_registry.get(tool_name)
+        if tool is None:
+            return self._unknown_tool_result(plan, tool_name, tool_input)
+
+        try:
+            with span("tool", name=tool_name):
+                result = tool.run(user_query=user_query, tool_input=tool_input)
+        except Exception as e:
+            result = {"error": f"'{tool_name}' 실행 중 오류 발생: {e}"}
+        return self._build_result(plan, tool_name, tool_input, result, is_final=False)
+
+    async def aexecute(
+        self,
+        plan: Dict[str, Any],
+        user_query: str,
+        on_token: Optional[TokenCallback] = None,
+    ) -> Dict[str, Any]:
+        """
+        execute()의 비동기 버전. Tool.arun()을 await 하므로
+        LLM 호출 대기 중에도 다른 요청이 같은 이벤트 루프에서 진행될 수 있다.
+
+        on_token을 주면 스트리밍을 지원하는 Tool은 astream()으로 실행되어
+        생성되는 토큰마다 on_token이 호출된다. (최종 output은 토큰을 이어 붙인 문자열)
+        """
         tool_name: str = plan.get("tool", "")
         tool_input: Dict[str, Any] = plan.get("tool_input", {}) or {}
-        
+
         if tool_name == "final_answer":
-            result = tool_input.get("answer", "별도의 최종 답변이 제공되지 않았습니다.")
-            is_final = True
-
-        else:
-            tool = self.tool_registry.get(tool_name)
-            if tool is None:
-                result = f"알 수 없는 tool: {tool_name}"
-                is_final = True  # 더 진행해봐야 의미 없으니 종료
+            return self._final_answer_result(plan, tool_input)
+
+        tool = self.tool_registry.get(tool_name)
+        if tool is None:
+            return self._unknown_tool_result(plan, tool_name, tool_input)
+
+        try:
+            with span("tool", name=tool_name):
+                if on_token is not None and tool.supports_streaming:
+                    result = await self._astream_tool(tool, user_query, tool_input, on_token)
+                else:
+                    result = await tool.arun(user_query=user_query, tool_input=tool_input)
+        except Exception as e:
+            result = {"error": f"'{tool_name}' 실행 중 오류 발생: {e}"}
+        return self._build_result(plan, tool_name, tool_input, result, is_final=False)
+
+    async def aexecute_calls(
+        self,
+        plan: Dict[str, Any],
+        user_query: str,
+        prepare_plan: Optional[PreparePlan] = None,
+    ) -> Dict[str, Any]:
+        """
+        plan["calls"]의 Tool 호출들을 의존 관계(DAG)에 맞춰 실행.
+        서로 의존하지 않는 호출(예: 검색 두 번, 같은 텍스트에 대한 summarize와 extract_clause)은 동시에 실행하고,
+        의존하는 호출은 선행 호출이 끝나면 그 결과(검색 결과의 content / 답변 문자열)를 texts로 받아 실행한다.
+
+        반환: {"results": 호출별 실행 결과(call_id / depends_on / metrics 포함), "output": 합친 결과, "is_final": bool}
+        (여러 호출의 토큰이 섞이지 않도록 병렬 실행 시에는 스트리밍을 쓰지 않는다.)
+        """
+        calls = normalize_calls(plan.get("calls"))
+        tasks: Dict[str, "asyncio.Task[Dict[str, Any]]"] = {}
+
+        async def run_call(call: Dict[str, Any]) -> Dict[str, Any]:
+            dependencies = [await tasks[dep] for dep in call["depends_on"]]
+            call_plan = _call_plan(plan, call, dependencies)
+            if prepare_plan is not None:
+                call_plan = prepare_plan(call_plan)
+
+            with step_scope() as metrics:
+                if self._is_unknown_call(call_plan):
+                    result = self._unknown_call_result(call_plan)
+                else:
+                    result = await self.aexecute(call_plan, user_query)
+            result["call_id"] = call["id"]
+            result["depends_on"] = call["depends_on"]
+            result["metrics"] = metrics
+            return result
+
+        # 호출 순서대로 task를 만들기 때문에 depends_on이 가리키는 task는 항상 먼저 존재한다.
+        for call in calls:
+            tasks[call["id"]] = asyncio.create_task(run_call(call))
+        results = list(await asyncio.gather(*tasks.values()))
+
+        return {
+            "results": results,
+            "output": merge_outputs(results),
+            "is_final": any(r["is_final"] for r in results),
+        }
+
+    def execute_calls(self, plan: Dict[str, Any], user_query: str) -> Dict[str, Any]:
+        """
+        aexecute_calls()의 동기 버전. 호출들을 의존 순서(= 목록 순서)대로 하나씩 실행한다.
+        """
+        results: List[Dict[str, Any]] = []
+        by_id: Dict[str, Dict[str, Any]] = {}
+        for call in normalize_calls(plan.get("calls")):
+            call_plan = _call_plan(plan, call, [by_id[dep] for dep in call["depends_on"]])
+            if self._is_unknown_call(call_plan):
+                result = self._unknown_call_result(call_plan)
             else:
-                try:
-                    result = tool.run(user_query=user_query, tool_input=tool_input)
-                except Exception as e:
-                    result = {"error": f"'{tool_name}' 실행 중 오류 발생: {e}"}
+                result = self.execute(call_plan, user_query)
+            result["call_id"] = call["id"]
+            result["depends_on"] = call["depends_on"]
+            by_id[call["id"]] = result
+            results.append(result)
+
+        return {
+            "results": results,
+            "output": merge_outputs(results),
+            "is_final": any(r["is_final"] for r in results),
+        }
+
+    @staticmethod
+    async def _astream_tool(
+        tool: Tool, user_query: str, tool_input: Dict[str, Any], on_token: TokenCallback
+    ) -> str:
+        chunks: List[str] = []
+        async for chunk in tool.astream(user_query=user_query, tool_input=tool_input):
+            chunks.append(chunk)
+            await on_token(chunk)
+        return "".join(chunks).strip()
+
+    def _final_answer_result(self, plan: Dict[str, Any], tool_input: Dict[str, Any]) -> Dict[str, Any]:
+        result = tool_input.get("answer", "별도의 최종 답변이 제공되지 않았습니다.")
+        return self._build_result(plan, "final_answer", tool_input, result, is_final=True)
+
+    def _unknown_tool_result(
+        self, plan: Dict[str, Any], tool_name: str, tool_input: Dict[str, Any]
+    ) -> Dict[str, Any]:
+        result = f"알 수 없는 tool: {tool_name}"
+        # 더 진행해봐야 의미 없으니 종료
+        return self._build_result(plan, tool_name, tool_input, result, is_final=True)
+
+    def _is_unknown_call(self, plan: Dict[str, Any]) -> bool:
+        return plan["tool"] != "final_answer" and plan["tool"] not in self.tool_registry
+
+    def _unknown_call_result(self, plan: Dict[str, Any]) -> Dict[str, Any]:
+        # 병렬 플랜의 호출 하나가 잘못된 경우: 실패한 호출로만 남기고, 루프를 끝내지 않아 다시 계획할 수 있게 한다
+        tool_name = plan["tool"]
+        result = {"error": f"알 수 없는 tool: {tool_name}"}
+        return self._build_result(plan, tool_name, plan["tool_input"], result, is_final=False)
+
+    @staticmethod
+    def _build_result(
+        plan: Dict[str, Any],
+        tool_name: str,
+        tool_input: Dict[str, Any],
+        result: Any,
+        *,
+        is_final: bool,
+    ) -> Dict[str, Any]:
         return {
             "tool": tool_name,
             "tool_input": tool_input,
             "output": result,
             "reason": plan.get("reason", ""),
             "is_final": is_final,
+            "planner": plan.get("planner"),
         }
@@ -0,0 +1,359 @@
+# app/agent/llm.py
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from app.agent.llm_gateway import LLMGateway
+from app.agent.metrics import LLM_REQUESTS, record_llm_usage, span
+from app.agent.trace import record as record_trace
+from app.config import (
+    LLM_CACHE_DB_PATH,
+    LLM_CACHE_ENABLED,
+    LLM_CACHE_SIZE,
+    LLM_HEDGE_AFTER_MS,
+    LLM_MAX_CONCURRENCY,
+    LLM_MAX_RETRIES,
+    LLM_REQUESTS_PER_MINUTE,
+    LLM_RETRY_BASE_SECONDS,
+    LLM_RETRY_MAX_SECONDS,
+    LLM_TOKENS_PER_MINUTE,
+    MODEL_NAME,
+    get_async_client,
+    get_client,
+)
+
+"""
+Chat Completions 호출 공통 모듈.
+Planner / Tool은 OpenAI 클라이언트를 직접 부르지 않고 이 모듈의 함수를 사용한다.
+(model, messages, params)가 같으면 LLM을 다시 부르지 않고 캐시된 답변을 돌려준다.
+실제 API 호출은 모두 llm_gateway를 거친다 (동시 실행 / 분당 한도, 재시도, hedged request).
+"""
+
+
+def completion_key(model: str, messages: List[Dict[str, str]], params: Dict[str, Any]) -> str:
+    """
+    model + messages + 호출 파라미터를 정규화한 JSON의 sha256 해시.
+    """
+    payload = json.dumps(
+        {"model": model, "messages": messages, "params": params},
+        ensure_ascii=False,
+        sort_keys=True,
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    LLM completion 결과 캐시.
+
+    - 메모리: max_entries 크기의 LRU
+    - db_path를 주면 SQLite 파일에도 저장해서 재시작 후에도 재사용 (메모리 miss 시 조회)
+    - 비동기 호출 경로는 aget / aset을 사용: SQLite 조회 / 저장만 스레드에서 실행
+    """
+
+    def __init__(self, max_entries: int = 2048, db_path: Optional[str] = None) -> None:
+        self.max_entries = max_entries
+        self.db_path = db_path
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+        if db_path:
+            db_dir = os.path.dirname(os.path.abspath(db_path))
+            os.makedirs(db_dir, exist_ok=True)
+            self._conn().execute(
+                "CREATE TABLE IF NOT EXISTS completions (key TEXT PRIMARY KEY, content TEXT NOT NULL)"
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _conn(self) -> sqlite3.Connection:
+        # fork된 worker에서는 부모의 커넥션을 쓰지 않고 새로 연다.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key: str) -> Optional[str]:
+        content = self._get_memory(key)
+        if content is None and self.db_path:
+            content = self._get_disk(key)
+        if content is None:
+            self._record_miss()
+        return content
+
+    async def aget(self, key: str) -> Optional[str]:
+        """
+        get()의 비동기 버전. 메모리 LRU는 바로 조회하고, SQLite 조회만 이벤트 루프를 막지 않도록 스레드에서 실행.
+        """
+        content = self._get_memory(key)
+        if content is None and self.db_path:
+            content = await asyncio.to_thread(self._get_disk, key)
+        if content is None:
+            self._record_miss()
+        return content
+
+    def set(self, key: str, content: str) -> None:
+        self._put_memory(key, content)
+        if self.db_path:
+            self._put_disk(key, content)
+
+    async def aset(self, key: str, content: str) -> None:
+        self._put_memory(key, content)
+        if self.db_path:
+            await asyncio.to_thread(self._put_disk, key, content)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+        if self.db_path:
+            self._conn().execute("DELETE FROM completions")
+
+    def stats_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "size": len(self._entries),
+            "max_entries": self.max_entries,
+        }
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        with self._lock:
+            content = self._entries.get(key)
+            if content is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+            return content
+
+    def _get_disk(self, key: str) -> Optional[str]:
+        row = self._conn().execute("SELECT content FROM completions WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        self._put_memory(key, row[0])
+        with self._lock:
+            self.hits += 1
+            self.disk_hits += 1
+        return row[0]
+
+    def _put_disk(self, key: str, content: str) -> None:
+        self._conn().execute("INSERT OR REPLACE INTO completions (key, content) VALUES (?, ?)", (key, content))
+
+    def _record_miss(self) -> None:
+        with self._lock:
+            self.misses += 1
+
+    def _put_memory(self, key: str, content: str) -> None:
+        with self._lock:
+            self._entries[key] = content
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+
+completion_cache: Optional[CompletionCache] = (
+    CompletionCache(max_entries=LLM_CACHE_SIZE, db_path=LLM_CACHE_DB_PATH or None)
+    if LLM_CACHE_ENABLED
+    else None
+)
+
+
+# 모든 Chat Completions 호출이 거치는 게이트웨이
+llm_gateway = LLMGateway(
+    max_concurrency=LLM_MAX_CONCURRENCY,
+    requests_per_minute=LLM_REQUESTS_PER_MINUTE,
+    tokens_per_minute=LLM_TOKENS_PER_MINUTE,
+    max_retries=LLM_MAX_RETRIES,
+    retry_base_seconds=LLM_RETRY_BASE_SECONDS,
+    retry_max_seconds=LLM_RETRY_MAX_SECONDS,
+    hedge_after=LLM_HEDGE_AFTER_MS / 1000.0 if LLM_HEDGE_AFTER_MS else None,
+)
+
+
+def _estimate_prompt_tokens(messages: List[Dict[str, str]]) -> int:
+    # 분당 토큰 한도용 추정치 (응답 usage를 받으면 실제 값으로 정산)
+    from app.agent.context import estimate_tokens
+
+    return sum(estimate_tokens(message.get("content") or "") for message in messages)
+
+
+def _total_tokens(usage: Any) -> Optional[int]:
+    if usage is None:
+        return None
+    return int(getattr(usage, "prompt_tokens", 0) or 0) + int(getattr(usage, "completion_tokens", 0) or 0)
+
+
+def _trace_completion(key: str, model: str, content: str, started_at: Optional[float], stream: bool = False) -> None:
+    # record / replay용 trace (started_at이 None이면 캐시 hit)
+    seconds = round(time.perf_counter() - started_at, 6) if started_at is not None else 0.0
+    record_trace("llm", key=key, model=model, content=content, seconds=seconds, cached=started_at is None, stream=stream)
+
+
+def chat_completion(messages: List[Dict[str, str]], *, model: str = MODEL_NAME, **params: Any) -> str:
+    """
+    동기 Chat Completions 호출 (캐시 적용). 응답 텍스트를 strip 해서 반환.
+    """
+    key = completion_key(model, messages, params)
+    if completion_cache is not None:
+        cached = completion_cache.get(key)
+        if cached is not None:
+            LLM_REQUESTS.inc(model=model, cache="hit")
+            _trace_completion(key, model, cached, None)
+            return cached
+
+    LLM_REQUESTS.inc(model=model, cache="miss")
+    tokens = _estimate_prompt_tokens(messages)
+    started_at = time.perf_counter()
+    with span("llm", name=model):
+        response = llm_gateway.call(
+            lambda: get_client().chat.completions.create(model=model, messages=messages, **params),
+            model=model,
+            tokens=tokens,
+        )
+    record_llm_usage(model, getattr(response, "usage", None))
+    llm_gateway.settle(tokens, _total_tokens(getattr(response, "usage", None)))
+    content = response.choices[0].message.content.strip()
+    _trace_completion(key, model, content, started_at)
+
+    if completion_cache is not None:
+        completion_cache.set(key, content)
+    return content
+
+
+async def achat_completion(messages: List[Dict[str, str]], *, model: str = MODEL_NAME, **params: Any) -> str:
+    """
+    chat_completion()의 비동기 버전.
+    """
+    key = completion_key(model, messages, params)
+    if completion_cache is not None:
+        cached = await completion_cache.aget(key)
+        if cached is not None:
+            LLM_REQUESTS.inc(model=model, cache="hit")
+            _trace_completion(key, model, cached, None)
+            return cached
+
+    LLM_REQUESTS.inc(model=model, cache="miss")
+    tokens = _estimate_prompt_tokens(messages)
+    started_at = time.perf_counter()
+    with span("llm", name=model):
+        response = await llm_gateway.acall(
+            lambda: get_async_client().chat.completions.create(model=model, messages=messages, **params),
+            model=model,
+            tokens=tokens,
+        )
+    record_llm_usage(model, getattr(response, "usage", None))
+    llm_gateway.settle(tokens, _total_tokens(getattr(response, "usage", None)))
+    content = response.choices[0].message.content.strip()
+    _trace_completion(key, model, content, started_at)
+
+    if completion_cache is not None:
+        await completion_cache.aset(key, content)
+    return content
+
+
+async def astream_chat_completion(
+    messages: List[Dict[str, str]], *, model: str = MODEL_NAME, **params: Any
+) -> AsyncIterator[str]:
+    """
+    OpenAI streaming API로 completion을 토큰(delta) 단위로 흘려보낸다.
+    캐시 키는 non-streaming 호출과 동일하므로, 캐시 hit이면 전체 답변을 한 번에 내보내고
+    스트리밍으로 받은 답변도 끝나면 캐시에 저장된다.
+    """
+    key = completion_key(model, messages, params)
+    if completion_cache is not None:
+        cached = await completion_cache.aget(key)
+        if cached is not None:
+            LLM_REQUESTS.inc(model=model, cache="hit")
+            _trace_completion(key, model, cached, None, stream=True)
+            yield cached
+            return
+
+    LLM_REQUESTS.inc(model=model, cache="miss")
+    chunks: List[str] = []
+    tokens = _estimate_prompt_tokens(messages)
+    started_at = time.perf_counter()
+    used_tokens: Optional[int] = None
+    with span("llm_stream", name=model):
+        # include_usage: 마지막 chunk에 토큰 사용량(usage)이 실려 온다.
+        opened = llm_gateway.astream(
+            lambda: get_async_client().chat.completions.create(
+                model=model,
+                messages=messages,
+                stream=True,
+                stream_options={"include_usage": True},
+                **params,
+            ),
+            model=model,
+            tokens=tokens,
+        )
+        async with opened as stream:
+            async for chunk in stream:
+                usage = getattr(chunk, "usage", None)
+                if usage is not None:
+                    record_llm_usage(model, usage)
+                    used_tokens = _total_tokens(usage)
+                if not chunk.choices:
+                    continue
+                delta = chunk.choices[0].delta.content
+                if delta:
+                    chunks.append(delta)
+                    yield delta
+    llm_gateway.settle(tokens, used_tokens)
+    content = "".join(chunks).strip()
+    _trace_completion(key, model, content, started_at, stream=True)
+
+    if completion_cache is not None:
+        await completion_cache.aset(key, content)
+
+
+def is_bad_request(exc: BaseException) -> bool:
+    """
+    OpenAI API가 요청 파라미터를 거부한 오류(400)인지. openai 패키지는 클라이언트를 만들 때 import 된다.
+    """
+    from openai import BadRequestError
+
+    return isinstance(exc, BadRequestError)
+
+
+def is_response_format_unsupported(exc: BaseException) -> bool:
+    """
+    400 오류가 response_format(JSON Schema structured output) 자체를 거부한 것인지.
+    (컨텍스트 길이 초과 등 다른 400과 구분해, 이 경우에만 structured output을 끈다)
+    """
+    if not is_bad_request(exc):
+        return False
+    param = getattr(exc, "param", None) or ""
+    message = str(getattr(exc, "message", None) or exc).lower()
+    return "response_format" in param or "response_format" in message or "json_schema" in message
+
+
+__all__ = [
+    "llm_gateway",
+    "CompletionCache",
+    "is_bad_request",
+    "is_response_format_unsupported",
+    "completion_cache",
+    "completion_key",
+    "chat_completion",
+    "achat_completion",
+    "astream_chat_completion",
+]
@@ -0,0 +1,279 @@
+# app/agent/llm_gateway.py
+from __future__ import annotations
+
+import asyncio
+import random
+import threading
+import time
+import weakref
+from contextlib import asynccontextmanager, contextmanager
+from typing import AsyncIterator, Awaitable, Callable, Iterator, Optional, TypeVar
+
+from app.agent.metrics import LLM_HEDGES, LLM_QUEUE_SECONDS, LLM_RETRIES
+
+"""
+LLM 호출 게이트웨이.
+Chat Completions 호출마다 동시 실행 수 / 분당 요청·토큰 수를 제한하고, 429 / 5xx / 연결 오류는 jitter가 들어간
+지수 backoff로 재시도한다. hedge_after를 주면 응답이 늦은 요청에 같은 요청을 하나 더 보내 먼저 온 응답을 쓴다.
+대기(queue) 시간은 rulebase_llm_queue_seconds histogram으로 남긴다.
+"""
+
+T = TypeVar("T")
+
+# 재시도할 HTTP 상태 코드 (5xx는 모두 재시도)
+_RETRY_STATUS = {408, 409, 429}
+
+
+def retry_reason(exc: BaseException) -> Optional[str]:
+    """
+    재시도할 오류면 사유(상태 코드 / "timeout" / "connection"), 아니면 None.
+    """
+    from openai import APIConnectionError, APIStatusError, APITimeoutError
+
+    if isinstance(exc, APITimeoutError):
+        return "timeout"
+    if isinstance(exc, APIConnectionError):
+        return "connection"
+    if isinstance(exc, APIStatusError):
+        status = exc.status_code
+        if status in _RETRY_STATUS or status >= 500:
+            return str(status)
+    return None
+
+
+def _retry_after(exc: BaseException) -> Optional[float]:
+    headers = getattr(getattr(exc, "response", None), "headers", None)
+    if not headers:
+        return None
+    value = headers.get("retry-after")
+    try:
+        return max(0.0, float(value)) if value is not None else None
+    except ValueError:
+        return None
+
+
+class TokenBucket:
+    """
+    초당 rate만큼 채워지는 토큰 버킷 (스레드 안전).
+    reserve()는 바로 차감하고(음수 허용) 그만큼 기다려야 하는 시간을 돌려주므로,
+    동기 호출은 time.sleep, 비동기 호출은 asyncio.sleep으로 같은 버킷을 함께 쓸 수 있다.
+    """
+
+    def __init__(self, rate_per_second: float, capacity: Optional[float] = None) -> None:
+        self.rate = rate_per_second
+        self.capacity = capacity if capacity is not None else rate_per_second
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = threading.Lock()
+
+    def reserve(self, amount: float) -> float:
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+            self._updated_at = now
+            self._tokens -= amount
+            return -self._tokens / self.rate if self._tokens < 0 else 0.0
+
+    def refund(self, amount: float) -> None:
+        """
+        예상보다 적게 쓴 만큼 돌려준다 (amount가 음수면 더 쓴 만큼 차감).
+        """
+        with self._lock:
+            self._tokens = min(self.capacity, self._tokens + amount)
+
+
+class LLMGateway:
+    """
+    - max_concurrency: 동시에 진행 중인 LLM 요청 수 상한 (0이면 무제한, 동기/비동기 호출 각각 적용)
+    - requests_per_minute / tokens_per_minute: 분당 요청 수 / (추정) 토큰 수 상한 (0이면 무제한)
+    - max_retries: 재시도 횟수, backoff는 retry_base_seconds * 2^n (최대 retry_max_seconds)에 jitter,
+      응답에 Retry-After가 있으면 그 값을 따른다
+    - hedge_after: 초 단위. 비동기 non-streaming 호출이 이 시간 안에 끝나지 않으면 같은 요청을 한 번 더 보낸다
+    """
+
+    def __init__(
+        self,
+        *,
+        max_concurrency: int = 0,
+        requests_per_minute: float = 0,
+        tokens_per_minute: float = 0,
+        max_retries: int = 3,
+        retry_base_seconds: float = 0.5,
+        retry_max_seconds: float = 8.0,
+        hedge_after: Optional[float] = None,
+    ) -> None:
+        self.max_concurrency = max_concurrency
+        self.max_retries = max_retries
+        self.retry_base_seconds = retry_base_seconds
+        self.retry_max_seconds = retry_max_seconds
+        self.hedge_after = hedge_after
+
+        # 분당 한도만큼은 한꺼번에 쓸 수 있게 (burst) 버킷 크기를 분당 한도로 둔다.
+        self._requests = TokenBucket(requests_per_minute / 60.0, requests_per_minute) if requests_per_minute else None
+        self._tokens = TokenBucket(tokens_per_minute / 60.0, tokens_per_minute) if tokens_per_minute else None
+        self._sync_slots = threading.BoundedSemaphore(max_concurrency) if max_concurrency else None
+        # asyncio.Semaphore는 이벤트 루프에 묶이므로 루프마다 하나씩 둔다.
+        self._async_slots: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, asyncio.Semaphore]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    # 제한 / backoff
+
+    def _rate_wait(self, tokens: int) -> float:
+        wait = 0.0
+        if self._requests is not None:
+            wait = max(wait, self._requests.reserve(1))
+        if self._tokens is not None:
+            wait = max(wait, self._tokens.reserve(tokens))
+        return wait
+
+    def settle(self, estimated_tokens: int, used_tokens: Optional[int]) -> None:
+        """
+        응답 usage로 확인된 실제 토큰 수와 예상치의 차이를 토큰 버킷에 반영.
+        """
+        if self._tokens is not None and used_tokens is not None:
+            self._tokens.refund(estimated_tokens - used_tokens)
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        retry_after = _retry_after(exc)
+        if retry_after is not None:
+            return min(retry_after, self.retry_max_seconds)
+        cap = min(self.retry_max_seconds, self.retry_base_seconds * (2 ** attempt))
+        return cap / 2 + random.uniform(0, cap / 2)
+
+    def _async_semaphore(self) -> Optional[asyncio.Semaphore]:
+        if not self.max_concurrency:
+            return None
+        loop = asyncio.get_running_loop()
+        semaphore = self._async_slots.get(loop)
+        if semaphore is None:
+            semaphore = self._async_slots[loop] = asyncio.Semaphore(self.max_concurrency)
+        return semaphore
+
+    @asynccontextmanager
+    async def _aslot(self, model: str, tokens: int) -> AsyncIterator[None]:
+        queued_at = time.perf_counter()
+        wait = self._rate_wait(tokens)
+        if wait:
+            await asyncio.sleep(wait)
+        semaphore = self._async_semaphore()
+        if semaphore is None:
+            LLM_QUEUE_SECONDS.observe(time.perf_counter() - queued_at, model=model)
+            yield
+            return
+        async with semaphore:
+            LLM_QUEUE_SECONDS.observe(time.perf_counter() - queued_at, model=model)
+            yield
+
+    @contextmanager
+    def _slot(self, model: str, tokens: int) -> Iterator[None]:
+        queued_at = time.perf_counter()
+        wait = self._rate_wait(tokens)
+        if wait:
+            time.sleep(wait)
+        if self._sync_slots is None:
+            LLM_QUEUE_SECONDS.observe(time.perf_counter() - queued_at, model=model)
+            yield
+            return
+        with self._sync_slots:
+            LLM_QUEUE_SECONDS.observe(time.perf_counter() - queued_at, model=model)
+            yield
+
+    # 호출
+
+    def call(self, create: Callable[[], T], *, model: str, tokens: int = 0) -> T:
+        """
+        동기 호출: 제한을 통과한 뒤 create()를 실행하고, 재시도할 오류면 backoff 후 다시 시도.
+        """
+        attempt = 0
+        while True:
+            try:
+                with self._slot(model, tokens):
+                    return create()
+            except Exception as exc:
+                reason = retry_reason(exc)
+                if reason is None or attempt >= self.max_retries:
+                    raise
+                LLM_RETRIES.inc(model=model, reason=reason)
+                time.sleep(self._backoff(attempt, exc))
+                attempt += 1
+
+    async def acall(self, create: Callable[[], Awaitable[T]], *, model: str, tokens: int = 0) -> T:
+        """
+        call()의 비동기 버전 (hedge_after가 있으면 hedged request).
+        """
+        attempt = 0
+        while True:
+            try:
+                if self.hedge_after:
+                    return await self._hedged(create, model, tokens)
+                return await self._attempt(create, model, tokens)
+            except Exception as exc:
+                reason = retry_reason(exc)
+                if reason is None or attempt >= self.max_retries:
+                    raise
+                LLM_RETRIES.inc(model=model, reason=reason)
+                await asyncio.sleep(self._backoff(attempt, exc))
+                attempt += 1
+
+    @asynccontextmanager
+    async def astream(self, create: Callable[[], Awaitable[T]], *, model: str, tokens: int = 0) -> AsyncIterator[T]:
+        """
+        스트리밍 호출: 스트림을 여는 데까지만 재시도하고, 스트림을 다 읽을 때까지 동시 실행 슬롯을 잡고 있는다.
+        """
+        async with self._aslot(model, tokens):
+            attempt = 0
+            while True:
+                try:
+                    stream = await create()
+                    break
+                except Exception as exc:
+                    reason = retry_reason(exc)
+                    if reason is None or attempt >= self.max_retries:
+                        raise
+                    LLM_RETRIES.inc(model=model, reason=reason)
+                    await asyncio.sleep(self._backoff(attempt, exc))
+                    attempt += 1
+            # 스트림을 넘겨준 뒤의 오류는 재시도하지 않는다 (이미 일부 토큰을 내보냈을 수 있음)
+            yield stream
+
+    async def _attempt(self, create: Callable[[], Awaitable[T]], model: str, tokens: int) -> T:
+        async with self._aslot(model, tokens):
+            return await create()
+
+    async def _hedged(self, create: Callable[[], Awaitable[T]], model: str, tokens: int) -> T:
+        primary = asyncio.create_task(self._attempt(create, model, tokens))
+        hedge: Optional[asyncio.Task] = None
+        error: Optional[BaseException] = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.hedge_after)
+            if not done:
+                LLM_HEDGES.inc(model=model, result="sent")
+                hedge = asyncio.create_task(self._attempt(create, model, tokens))
+            pending = {primary} if hedge is None else {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    # 취소된 시도는 실패로 보지 않는다 (task.exception()은 취소된 task에서 CancelledError를 던짐)
+                    if task.cancelled():
+                        continue
+                    if task.exception() is None:
+                        if task is hedge:
+                            LLM_HEDGES.inc(model=model, result="won")
+                        return task.result()
+                    error = task.exception()
+            if error is None:
+                raise asyncio.CancelledError()
+            raise error
+        finally:
+            # 호출 쪽이 취소돼도 (첫 대기 중 포함) 남은 시도를 정리한다
+            for task in (primary, hedge):
+                if task is not None and not task.done():
+                    task.cancel()
+
+
+__all__ = [
+    "LLMGateway",
+    "TokenBucket",
+    "retry_reason",
+]
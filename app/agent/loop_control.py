@@ -0,0 +1,159 @@
+# app/agent/loop_control.py
+from __future__ import annotations
+
+import json
+import time
+from typing import Any, Dict, List, Optional, Set
+
+from app.agent.executor import TEXT_TOOLS
+from app.agent.tools.clause_tool import NO_TEXT_MESSAGE as NO_CLAUSE_TEXT
+from app.agent.tools.search_index import tokenize
+from app.agent.tools.summarize_tool import NO_TEXT_MESSAGE as NO_SUMMARIZE_TEXT
+
+"""
+Agent 루프의 종료 시점을 정하는 controller.
+max_steps를 다 쓰기 전에도 아래 경우 루프를 끝내고, 끝난 이유(stop_reason)를 남긴다.
+
+- final: 플랜이 is_final이거나 final_answer
+- answered: summarize / extract_clause가 답변 텍스트를 만들었음 (다음 플래너 호출은 final_answer뿐이므로 생략).
+  입력 규정 텍스트가 없다는 안내 문구는 답변으로 보지 않는다
+- confident_match: 검색 1위 규정이 검색어를 거의 모두 포함 → 플래너를 다시 부르지 않고 바로 요약
+- repeated_plan: 이전 step과 같은 tool + tool_input 플랜 (실행하지 않음)
+- no_progress: 검색 결과가 직전 검색과 같은 규정들
+- deadline: 요청별 wall-clock 마감 시간 초과
+- max_steps: step 한도 소진
+"""
+
+STOP_REASONS = (
+    "final",
+    "answered",
+    "confident_match",
+    "repeated_plan",
+    "no_progress",
+    "deadline",
+    "max_steps",
+)
+
+# 시간 / step 예산이 모자라 끝까지 진행하지 못한 종료 이유. 이 답변은 응답 캐시에 저장하지 않는다
+DEGRADED_STOP_REASONS = frozenset({"deadline", "max_steps"})
+
+# 텍스트 Tool이 입력 texts 없이 불렸을 때의 출력 (답변이 아님)
+_NO_INPUT_OUTPUTS = {NO_SUMMARIZE_TEXT, NO_CLAUSE_TEXT}
+
+
+def _plan_signature(plan: Dict[str, Any]) -> str:
+    # 이전 step 결과에서 채워 넣는 texts는 비교에서 뺀다.
+    tool_input = {k: v for k, v in (plan.get("tool_input") or {}).items() if k != "texts"}
+    return json.dumps([plan.get("tool"), tool_input], ensure_ascii=False, sort_keys=True, default=str)
+
+
+def _result_ids(items: List[Any]) -> List[Any]:
+    return [item.get("id", item.get("content")) if isinstance(item, dict) else item for item in items]
+
+
+def search_coverage(query: str, item: Any) -> float:
+    """
+    검색어 term 중 규정(제목 + 본문)에 등장하는 비율 (0~1).
+    """
+    terms = set(tokenize(query))
+    if not terms or not isinstance(item, dict):
+        return 0.0
+    text = f"{item.get('title', '')} {item.get('content', '')}"
+    return len(terms & set(tokenize(text))) / len(terms)
+
+
+class LoopController:
+    """
+    요청 하나의 Agent 루프 상태를 추적하면서 계속할지 / 끝낼지를 판단한다.
+
+    :param deadline_seconds: 요청 시작부터의 wall-clock 마감 (None이면 무제한)
+    :param early_stop: False면 final / deadline / max_steps로만 끝낸다 (기존 동작)
+    :param search_confidence: 검색 1위 결과의 검색어 포함 비율이 이 값 이상이면 confident_match (0이면 끔)
+    """
+
+    def __init__(
+        self,
+        max_steps: int,
+        deadline_seconds: Optional[float] = None,
+        early_stop: bool = True,
+        search_confidence: float = 0.8,
+    ) -> None:
+        self.max_steps = max_steps
+        self.early_stop = early_stop
+        self.search_confidence = search_confidence
+        self.deadline = time.monotonic() + deadline_seconds if deadline_seconds else None
+        self.steps = 0
+        self.stop_reason: Optional[str] = None
+        self._signatures: Set[str] = set()
+        self._last_search_ids: Optional[List[Any]] = None
+
+    def remaining_seconds(self) -> Optional[float]:
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+    def stop(self, reason: str) -> bool:
+        self.stop_reason = reason
+        return True
+
+    def should_continue(self) -> bool:
+        """
+        다음 step(플래너 호출)을 시작해도 되는지.
+        """
+        if self.stop_reason is not None:
+            return False
+        if self.steps >= self.max_steps:
+            return not self.stop("max_steps")
+        if self.remaining_seconds() == 0.0:
+            return not self.stop("deadline")
+        return True
+
+    def check_plan(self, plan: Dict[str, Any]) -> bool:
+        """
+        실행 전에 플랜을 확인. 이미 실행한 것과 같은 플랜이면 False (실행하지 않고 종료).
+        """
+        self.steps += 1
+        if plan.get("calls"):
+            signature = json.dumps([_plan_signature(call) for call in plan["calls"]], ensure_ascii=False)
+        else:
+            signature = _plan_signature(plan)
+        if self.early_stop and signature in self._signatures:
+            self.stop("repeated_plan")
+            return False
+        self._signatures.add(signature)
+        return True
+
+    def check_result(self, plan: Dict[str, Any], tool: str, output: Any, is_final: bool, query: str) -> bool:
+        """
+        step 실행 결과를 보고 루프를 끝내야 하면 True.
+        """
+        if is_final or tool == "final_answer":
+            return self.stop("final")
+        if not self.early_stop:
+            return False
+
+        if tool in TEXT_TOOLS or (plan.get("calls") and isinstance(output, str)):
+            if isinstance(output, str) and output.strip() and output.strip() not in _NO_INPUT_OUTPUTS:
+                return self.stop("answered")
+            return False
+
+        if isinstance(output, list):
+            ids = _result_ids(output)
+            if self._last_search_ids is not None and ids == self._last_search_ids:
+                return self.stop("no_progress")
+            self._last_search_ids = ids
+
+            # 규칙 기반 플래너는 다음 step도 LLM 없이 정하므로, LLM 플래너 호출을 아낄 수 있을 때만 적용
+            if self.search_confidence and output and plan.get("planner") == "llm":
+                search_query = (plan.get("tool_input") or {}).get("query") or query
+                if search_coverage(search_query, output[0]) >= self.search_confidence:
+                    return self.stop("confident_match")
+        return False
+
+
+__all__ = [
+    "DEGRADED_STOP_REASONS",
+    "LoopController",
+    "STOP_REASONS",
+    "search_coverage",
+]
@@ -1,20 +1,30 @@
-from typing import List, Dict
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Deque, Dict, Iterable, List, Optional, Tuple
 
 
 class ConversationMemory:
     """
     간단한 in-memory 대화 메모리.
-    실제 서비스에서는 Redis/DB 등으로 교체 가능.
+    최근 max_turns 턴만 유지하는 ring buffer (deque(maxlen)) 로 구현되어
+    턴 추가 시 기존 히스토리를 재할당하지 않는다.
     """
 
-    def __init__(self, max_turns: int = 5):
+    def __init__(self, max_turns: int = 5, turns: Optional[Iterable[Dict[str, str]]] = None):
         self.max_turns = max_turns
-        self._history: List[Dict[str, str]] = []
+        self._history: Deque[Dict[str, str]] = deque(turns or (), maxlen=max_turns)
 
     def add_turn(self, user: str, agent: str) -> None:
         self._history.append({"user": user, "agent": agent})
-        if len(self._history) > self.max_turns:
-            self._history = self._history[-self.max_turns :]
+
+    def turns(self) -> List[Dict[str, str]]:
+        return list(self._history)
 
     def get_context_str(self) -> str:
         """
@@ -27,3 +37,235 @@ class ConversationMemory:
             lines.append(f"사용자: {turn['user']}")
             lines.append(f"에이전트: {turn['agent']}")
         return "\n".join(lines)
+
+
+class MemoryBackend(ABC):
+    """
+    세션별 대화 메모리 저장소 인터페이스.
+
+    - load(): session_id의 최근 대화 메모리를 반환 (없으면 빈 메모리)
+    - add_turn(): session_id에 한 턴을 추가
+    - delete(): 세션 삭제
+    - aload() / aadd_turn(): 비동기 핸들러용. 기본 구현은 저장소 I/O가 이벤트 루프를 막지 않도록 스레드에서 실행
+    """
+
+    def __init__(self, max_turns: int = 5):
+        self.max_turns = max_turns
+
+    @abstractmethod
+    def load(self, session_id: str) -> ConversationMemory:
+        raise NotImplementedError
+
+    @abstractmethod
+    def add_turn(self, session_id: str, user: str, agent: str) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    def delete(self, session_id: str) -> None:
+        raise NotImplementedError
+
+    async def aload(self, session_id: str) -> ConversationMemory:
+        return await asyncio.to_thread(self.load, session_id)
+
+    async def aadd_turn(self, session_id: str, user: str, agent: str) -> None:
+        await asyncio.to_thread(self.add_turn, session_id, user, agent)
+
+
+class InMemoryBackend(MemoryBackend):
+    """
+    프로세스 내부 세션 메모리 저장소.
+
+    - 세션 수는 max_sessions로 제한되며, 초과 시 가장 오래 사용되지 않은 세션부터 제거 (LRU)
+    - ttl_seconds 동안 접근이 없던 세션은 만료되어 제거
+    """
+
+    def __init__(self, max_turns: int = 5, max_sessions: int = 10_000, ttl_seconds: Optional[float] = 3600.0):
+        super().__init__(max_turns=max_turns)
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        # session_id → (memory, last_access)
+        self._sessions: "OrderedDict[str, Tuple[ConversationMemory, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def load(self, session_id: str) -> ConversationMemory:
+        with self._lock:
+            now = time.monotonic()
+            self._evict_expired(now)
+
+            entry = self._sessions.get(session_id)
+            if entry is None:
+                memory = ConversationMemory(max_turns=self.max_turns)
+                self._sessions[session_id] = (memory, now)
+                self._evict_overflow()
+            else:
+                memory = entry[0]
+                self._sessions[session_id] = (memory, now)
+                self._sessions.move_to_end(session_id)
+            return memory
+
+    def add_turn(self, session_id: str, user: str, agent: str) -> None:
+        self.load(session_id).add_turn(user=user, agent=agent)
+
+    def delete(self, session_id: str) -> None:
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+    # 메모리 안의 dict 조작뿐이라 스레드로 넘기는 비용이 더 크다
+    async def aload(self, session_id: str) -> ConversationMemory:
+        return self.load(session_id)
+
+    async def aadd_turn(self, session_id: str, user: str, agent: str) -> None:
+        self.add_turn(session_id, user=user, agent=agent)
+
+    def _evict_expired(self, now: float) -> None:
+        if self.ttl_seconds is None:
+            return
+        # OrderedDict는 접근 순서로 정렬되어 있으므로 앞쪽부터 만료 여부만 확인하면 된다.
+        while self._sessions:
+            session_id, (_, last_access) = next(iter(self._sessions.items()))
+            if now - last_access <= self.ttl_seconds:
+                break
+            del self._sessions[session_id]
+
+    def _evict_overflow(self) -> None:
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+
+class SQLiteMemoryBackend(MemoryBackend):
+    """
+    SQLite 파일 기반 세션 메모리 저장소.
+    같은 파일을 바라보는 여러 uvicorn worker가 별도 네트워크 서비스 없이 세션 상태를 공유할 수 있다.
+
+    - 세션별로 최근 max_turns 턴만 보관
+    - max_sessions 초과 / ttl_seconds 만료 세션은 주기적으로 정리
+    """
+
+    _SCHEMA = """
+        CREATE TABLE IF NOT EXISTS memory_sessions (
+            session_id TEXT PRIMARY KEY,
+            turns TEXT NOT NULL,
+            updated_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_memory_sessions_updated_at
+            ON memory_sessions (updated_at);
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        max_turns: int = 5,
+        max_sessions: int = 1_000_000,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600.0,
+        cleanup_interval: int = 1000,
+    ):
+        super().__init__(max_turns=max_turns)
+        self.db_path = db_path
+        self.max_sessions = max_sessions
+        self.ttl_seconds = ttl_seconds
+        self.cleanup_interval = cleanup_interval
+        self._writes = 0
+        self._local = threading.local()
+
+        db_dir = os.path.dirname(os.path.abspath(db_path))
+        os.makedirs(db_dir, exist_ok=True)
+        self._conn().executescript(self._SCHEMA)
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 커넥션은 스레드 간 공유하지 않는다.
+        # prefork worker는 부모가 연 커넥션을 물려받으므로, 프로세스가 바뀌었으면 새로 연다.
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=5.0, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def __len__(self) -> int:
+        row = self._conn().execute("SELECT COUNT(*) FROM memory_sessions").fetchone()
+        return int(row[0])
+
+    def load(self, session_id: str) -> ConversationMemory:
+        row = self._conn().execute(
+            "SELECT turns, updated_at FROM memory_sessions WHERE session_id = ?",
+            (session_id,),
+        ).fetchone()
+
+        if row is None or self._is_expired(row[1]):
+            return ConversationMemory(max_turns=self.max_turns)
+        return ConversationMemory(max_turns=self.max_turns, turns=json.loads(row[0]))
+
+    def add_turn(self, session_id: str, user: str, agent: str) -> None:
+        conn = self._conn()
+        # read-modify-write를 하나의 트랜잭션으로 묶어 worker 간 경합 시 턴 유실을 막는다.
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            memory = self.load(session_id)
+            memory.add_turn(user=user, agent=agent)
+            conn.execute(
+                "INSERT OR REPLACE INTO memory_sessions (session_id, turns, updated_at) VALUES (?, ?, ?)",
+                (session_id, json.dumps(memory.turns(), ensure_ascii=False), time.time()),
+            )
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+        self._writes += 1
+        if self._writes % self.cleanup_interval == 0:
+            self.cleanup()
+
+    def delete(self, session_id: str) -> None:
+        self._conn().execute("DELETE FROM memory_sessions WHERE session_id = ?", (session_id,))
+
+    def cleanup(self) -> None:
+        """
+        만료 세션 삭제 + max_sessions 초과분을 오래된 순으로 삭제.
+        """
+        conn = self._conn()
+        if self.ttl_seconds is not None:
+            conn.execute(
+                "DELETE FROM memory_sessions WHERE updated_at < ?",
+                (time.time() - self.ttl_seconds,),
+            )
+        conn.execute(
+            """
+            DELETE FROM memory_sessions WHERE session_id IN (
+                SELECT session_id FROM memory_sessions
+                ORDER BY updated_at DESC LIMIT -1 OFFSET ?
+            )
+            """,
+            (self.max_sessions,),
+        )
+
+    def _is_expired(self, updated_at: float) -> bool:
+        return self.ttl_seconds is not None and time.time() - updated_at > self.ttl_seconds
+
+
+def build_memory_backend(
+    kind: str,
+    *,
+    max_turns: int = 5,
+    max_sessions: int = 10_000,
+    ttl_seconds: Optional[float] = 3600.0,
+    db_path: Optional[str] = None,
+) -> MemoryBackend:
+    """
+    설정 값(kind)에 맞는 메모리 백엔드를 생성.
+      - "memory": 프로세스 내부 LRU/TTL 저장소
+      - "sqlite": 여러 worker가 공유하는 SQLite 파일 저장소 (db_path 필요)
+    """
+    if kind == "memory":
+        return InMemoryBackend(max_turns=max_turns, max_sessions=max_sessions, ttl_seconds=ttl_seconds)
+    if kind == "sqlite":
+        if not db_path:
+            raise ValueError("sqlite 메모리 백엔드에는 db_path가 필요합니다.")
+        return SQLiteMemoryBackend(
+            db_path, max_turns=max_turns, max_sessions=max_sessions, ttl_seconds=ttl_seconds
+        )
+    raise ValueError(f"알 수 없는 메모리 백엔드: {kind}")
@@ -0,0 +1,293 @@
+# app/agent/metrics.py
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+"""
+의존성 없는 최소한의 Prometheus 스타일 메트릭 모듈.
+
+- Counter / Histogram: label 조합별로 값을 누적하고 text exposition format으로 출력
+- span(): 구간 실행 시간을 stage별 histogram에 기록
+- step_scope(): Agent step 하나 동안의 소요 시간 / LLM 토큰 사용량을 모음 (PlanStep에 표시)
+"""
+
+DEFAULT_BUCKETS: Tuple[float, ...] = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra is not None:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{n}="{_escape(str(v))}"' for n, v in pairs) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = ""
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()) -> None:
+        self.name = name
+        self.help = help
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelValues:
+        return tuple(str(labels.get(name, "")) for name in self.label_names)
+
+    def render(self) -> List[str]:
+        raise NotImplementedError
+
+
+class Counter(_Metric):
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, label_names: Sequence[str] = ()) -> None:
+        super().__init__(name, help, label_names)
+        self._values: Dict[LabelValues, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def value(self, **labels: Any) -> float:
+        return self._values.get(self._key(labels), 0.0)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = list(self._values.items())
+        return [f"{self.name}{_format_labels(self.label_names, key)} {_format_value(v)}" for key, v in items]
+
+
+class Histogram(_Metric):
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS,
+    ) -> None:
+        super().__init__(name, help, label_names)
+        self.buckets = tuple(sorted(buckets))
+        # label 조합 → (bucket별 개수, 합계, 전체 개수)
+        self._series: Dict[LabelValues, Tuple[List[int], float, int]] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total, count = self._series.get(key) or ([0] * len(self.buckets), 0.0, 0)
+            if index < len(counts):
+                counts[index] += 1
+            self._series[key] = (counts, total + value, count + 1)
+
+    def snapshot(self, **labels: Any) -> Tuple[int, float]:
+        """
+        (관측 횟수, 합계)
+        """
+        _, total, count = self._series.get(self._key(labels), (None, 0.0, 0))
+        return count, total
+
+    def series(self) -> Dict[LabelValues, Tuple[int, float]]:
+        """
+        label 조합별 (관측 횟수, 합계)
+        """
+        with self._lock:
+            return {key: (count, total) for key, (_, total, count) in self._series.items()}
+
+    def render(self) -> List[str]:
+        with self._lock:
+            items = [(key, list(counts), total, count) for key, (counts, total, count) in self._series.items()]
+
+        lines: List[str] = []
+        for key, counts, total, count in items:
+            cumulative = 0
+            for bound, n in zip(self.buckets, counts):
+                cumulative += n
+                labels = _format_labels(self.label_names, key, ("le", _format_value(bound)))
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.label_names, key, ("le", "+Inf"))
+            lines.append(f"{self.name}_bucket{labels} {count}")
+            lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {_format_value(total)}")
+            lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {count}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self) -> None:
+        self._metrics: Dict[str, _Metric] = {}
+
+    def counter(self, name: str, help: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, help, label_names))
+
+    def histogram(
+        self, name: str, help: str, label_names: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, help, label_names, buckets))
+
+    def _register(self, metric: Any) -> Any:
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for metric in self._metrics.values():
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+STAGE_DURATION = registry.histogram(
+    "rulebase_stage_duration_seconds",
+    "Agent 구간별 실행 시간 (request / planner / tool / llm / post_summarize)",
+    ("stage", "name"),
+)
+STAGE_ERRORS = registry.counter(
+    "rulebase_stage_errors_total",
+    "Agent 구간별 예외 발생 횟수",
+    ("stage", "name"),
+)
+LLM_TOKENS = registry.counter(
+    "rulebase_llm_tokens_total",
+    "OpenAI 응답 usage 기준 LLM 토큰 사용량",
+    ("model", "kind"),
+)
+LLM_REQUESTS = registry.counter(
+    "rulebase_llm_requests_total",
+    "LLM completion 요청 수 (cache=hit이면 실제 호출 없음)",
+    ("model", "cache"),
+)
+LLM_QUEUE_SECONDS = registry.histogram(
+    "rulebase_llm_queue_seconds",
+    "LLM 요청이 동시 실행 / 분당 요청·토큰 제한을 기다린 시간",
+    ("model",),
+)
+LLM_RETRIES = registry.counter(
+    "rulebase_llm_retries_total",
+    "LLM 요청 재시도 횟수 (reason: HTTP 상태 코드 / timeout / connection)",
+    ("model", "reason"),
+)
+LLM_HEDGES = registry.counter(
+    "rulebase_llm_hedges_total",
+    "hedged request 수 (sent: 추가 요청을 보냄 / won: 추가 요청이 먼저 응답)",
+    ("model", "result"),
+)
+PLANNER_PARSE = registry.counter(
+    "rulebase_planner_parse_total",
+    "LLM 플래너 출력 파싱 결과 (ok / repaired: 로컬 복구 후 성공 / fallback: 기본 search로 대체)",
+    ("result",),
+)
+AGENT_REQUESTS = registry.counter(
+    "rulebase_agent_requests_total",
+    "Agent 요청 수 (result: computed / cached / error)",
+    ("result",),
+)
+AGENT_LOOP_STOPS = registry.counter(
+    "rulebase_agent_loop_stops_total",
+    "Agent 루프 종료 이유별 횟수 (final / answered / confident_match / repeated_plan / no_progress / deadline / max_steps)",
+    ("reason",),
+)
+AGENT_STEPS_SKIPPED = registry.counter(
+    "rulebase_agent_steps_skipped_total",
+    "조기 종료로 실행하지 않은 step 수 (max_steps 대비, step마다 플래너 호출 1회 이상 절약)",
+)
+
+
+@dataclass
+class StepMetrics:
+    """
+    Agent step 하나 동안 모인 측정값.
+    """
+
+    started_at: float
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    llm_calls: int = 0
+
+    @property
+    def duration_ms(self) -> float:
+        return round((time.perf_counter() - self.started_at) * 1000.0, 3)
+
+
+_current_step: ContextVar[Optional[StepMetrics]] = ContextVar("rulebase_current_step", default=None)
+
+
+@contextmanager
+def step_scope() -> Iterator[StepMetrics]:
+    """
+    with 블록 안에서 발생한 LLM 호출의 토큰 사용량을 모은다.
+    (asyncio task / asyncio.to_thread로 넘어간 호출도 같은 context를 따라간다)
+    """
+    metrics = StepMetrics(started_at=time.perf_counter())
+    token = _current_step.set(metrics)
+    try:
+        yield metrics
+    finally:
+        _current_step.reset(token)
+
+
+@contextmanager
+def span(stage: str, name: str = "") -> Iterator[None]:
+    """
+    구간 실행 시간을 STAGE_DURATION histogram에 기록. 예외가 나면 STAGE_ERRORS도 증가.
+    """
+    started_at = time.perf_counter()
+    try:
+        yield
+    except BaseException:
+        STAGE_ERRORS.inc(stage=stage, name=name)
+        raise
+    finally:
+        STAGE_DURATION.observe(time.perf_counter() - started_at, stage=stage, name=name)
+
+
+def record_llm_usage(model: str, usage: Any) -> None:
+    """
+    OpenAI 응답의 usage(prompt_tokens / completion_tokens)를 전역 카운터와 현재 step에 반영.
+    """
+    if usage is None:
+        return
+    prompt_tokens = int(getattr(usage, "prompt_tokens", 0) or 0)
+    completion_tokens = int(getattr(usage, "completion_tokens", 0) or 0)
+
+    LLM_TOKENS.inc(prompt_tokens, model=model, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, model=model, kind="completion")
+
+    step = _current_step.get()
+    if step is not None:
+        step.prompt_tokens += prompt_tokens
+        step.completion_tokens += completion_tokens
+        step.llm_calls += 1
+
+
+def render_metrics() -> str:
+    return registry.render()
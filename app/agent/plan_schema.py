@@ -0,0 +1,174 @@
+# app/agent/plan_schema.py
+from __future__ import annotations
+
+import json
+import re
+from typing import Any, Dict, List, Optional, Tuple
+
+"""
+플래너 출력(JSON 플랜)의 스키마 / 검증 / 로컬 복구.
+
+- build_plan_schema(): tool registry 기준 JSON Schema (structured output의 response_format에 사용)
+- repair_json(): 코드 블록, 앞뒤 설명 문장, trailing comma, 작은따옴표, Python 리터럴 같은
+  흔한 깨짐을 LLM 재호출 없이 고쳐서 파싱
+- validate_plan(): 스키마에 맞지 않는 필드를 보정하고 남은 문제 목록을 반환
+"""
+
+_CODE_FENCE = re.compile(r"```(?:json|JSON)?\s*(.*?)```", re.DOTALL)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+_PY_LITERALS = {"True": "true", "False": "false", "None": "null"}
+_SMART_QUOTES = str.maketrans({"“": '"', "”": '"', "‘": "'", "’": "'"})
+
+
+def build_plan_schema(tool_names: List[str]) -> Dict[str, Any]:
+    """
+    사용 가능한 tool 이름으로 만든 플랜 JSON Schema.
+    tool_input은 tool마다 형태가 달라 자유 object로 두므로 strict 모드는 쓰지 않는다.
+    """
+    call_tools = [name for name in tool_names if name != "final_answer"]
+    return {
+        "type": "object",
+        "properties": {
+            "tool": {"type": "string", "enum": list(tool_names)},
+            "tool_input": {"type": "object"},
+            "reason": {"type": "string"},
+            "is_final": {"type": "boolean"},
+            "calls": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "id": {"type": "string"},
+                        "tool": {"type": "string", "enum": call_tools},
+                        "tool_input": {"type": "object"},
+                        "depends_on": {"type": "array", "items": {"type": "string"}},
+                    },
+                    "required": ["id", "tool", "tool_input"],
+                },
+            },
+        },
+        "required": ["reason", "is_final"],
+    }
+
+
+def response_format_for(tool_names: List[str]) -> Dict[str, Any]:
+    """
+    Chat Completions의 response_format 파라미터 (JSON Schema 구조화 출력).
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": "agent_plan", "schema": build_plan_schema(tool_names), "strict": False},
+    }
+
+
+def _extract_json_span(text: str) -> str:
+    """
+    앞뒤 설명 문장을 버리고 첫 '{' 또는 '['부터 짝이 맞는 마지막 닫는 괄호까지 잘라낸다.
+    """
+    starts = [i for i in (text.find("{"), text.find("[")) if i >= 0]
+    if not starts:
+        return text
+    start = min(starts)
+    end = max(text.rfind("}"), text.rfind("]"))
+    return text[start : end + 1] if end > start else text[start:]
+
+
+def _replace_outside_strings(text: str) -> str:
+    """
+    문자열 밖의 작은따옴표 문자열을 큰따옴표로, Python 리터럴(True/False/None)을 JSON 리터럴로 바꾼다.
+    """
+    out: List[str] = []
+    i = 0
+    n = len(text)
+    while i < n:
+        ch = text[i]
+        if ch in "\"'":
+            quote = ch
+            j = i + 1
+            buf: List[str] = []
+            while j < n and text[j] != quote:
+                if text[j] == "\\" and j + 1 < n:
+                    buf.append(text[j : j + 2])
+                    j += 2
+                    continue
+                # 작은따옴표 문자열 안의 큰따옴표는 escape
+                buf.append('\\"' if quote == "'" and text[j] == '"' else text[j])
+                j += 1
+            out.append('"' + "".join(buf) + '"')
+            i = j + 1
+            continue
+        if ch.isalpha():
+            j = i
+            while j < n and (text[j].isalnum() or text[j] == "_"):
+                j += 1
+            word = text[i:j]
+            out.append(_PY_LITERALS.get(word, word))
+            i = j
+            continue
+        out.append(ch)
+        i += 1
+    return "".join(out)
+
+
+def repair_json(raw: str) -> Tuple[Optional[Any], bool]:
+    """
+    LLM 출력 문자열을 JSON으로 파싱. 바로 파싱되지 않으면 단계별 로컬 복구를 시도한다.
+
+    반환: (파싱 결과 또는 None, 복구를 거쳤는지 여부)
+    """
+    try:
+        return json.loads(raw), False
+    except (json.JSONDecodeError, TypeError):
+        pass
+    if not isinstance(raw, str):
+        return None, False
+
+    text = raw.strip().translate(_SMART_QUOTES)
+    fenced = _CODE_FENCE.search(text)
+    if fenced:
+        text = fenced.group(1).strip()
+    text = _extract_json_span(text)
+
+    candidates = [text]
+    text = _TRAILING_COMMA.sub(r"\1", text)
+    candidates.append(text)
+    candidates.append(_TRAILING_COMMA.sub(r"\1", _replace_outside_strings(text)))
+
+    for candidate in candidates:
+        try:
+            return json.loads(candidate), True
+        except json.JSONDecodeError:
+            continue
+    return None, True
+
+
+def validate_plan(plan: Dict[str, Any], tool_names: List[str]) -> List[str]:
+    """
+    플랜 dict를 스키마에 맞게 보정하고, 보정할 수 없는 문제 목록을 반환 (비어 있으면 유효).
+    """
+    problems: List[str] = []
+
+    if not isinstance(plan.get("tool_input"), dict):
+        plan["tool_input"] = {}
+    if not isinstance(plan.get("reason"), str):
+        plan["reason"] = str(plan.get("reason") or "")
+    is_final = plan.get("is_final")
+    if not isinstance(is_final, bool):
+        plan["is_final"] = str(is_final).strip().lower() == "true"
+
+    if plan.get("calls"):
+        unknown = [c["tool"] for c in plan["calls"] if c.get("tool") not in tool_names]
+        if unknown:
+            problems.append(f"알 수 없는 tool: {', '.join(unknown)}")
+    elif plan.get("tool") not in tool_names:
+        problems.append(f"알 수 없는 tool: {plan.get('tool')}")
+
+    return problems
+
+
+__all__ = [
+    "build_plan_schema",
+    "response_format_for",
+    "repair_json",
+    "validate_plan",
+]
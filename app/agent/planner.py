@@ -1,8 +1,11 @@
 # app/agent/planner.py
-import json
-from typing import List, Dict, Any
+import re
+from typing import List, Dict, Any, Optional, Union
 
-from app.config import client, MODEL_NAME
+from app.agent.executor import normalize_calls
+from app.agent.llm import achat_completion, chat_completion, is_bad_request, is_response_format_unsupported
+from app.agent.metrics import PLANNER_PARSE
+from app.agent.plan_schema import repair_json, response_format_for, validate_plan
 
 
 class Planner:
@@ -11,16 +14,23 @@ class Planner:
     어떤 Tool을 어떤 입력으로 호출할지 계획을 세우는 모듈.
     """
 
-    def __init__(self, tool_names: List[str]):
+    def __init__(self, tool_names: List[str], structured_output: bool = True):
         """
         :param tool_names: 사용할 수 있는 tool 이름 리스트
                            예: ["search", "summarize", "extract_clause", "final_answer"]
+        :param structured_output: tool 목록으로 만든 JSON Schema를 response_format으로 넘겨
+                                  모델이 스키마에 맞는 JSON만 생성하도록 한다.
+                                  (400 오류면 그 호출만 response_format 없이 다시 보내고,
+                                   오류가 response_format 미지원일 때만 이후 호출에서도 끈다)
         """
         self.tool_names = tool_names
+        self.structured_output = structured_output
+        self._response_format = response_format_for(tool_names)
 
-    def plan(self, user_query: str, memory_context: str) -> Dict[str, Any]:
+    def plan(self, user_query: str, memory_context: str, last_result: Any = None) -> Dict[str, Any]:
         """
         LLM에게 JSON 형태의 플랜을 생성하도록 요청.
+        (last_result는 RuleBasedPlanner와 인터페이스를 맞추기 위한 인자로, LLM 플래너는 사용하지 않는다.)
 
         기대하는 JSON 구조:
         {
@@ -29,12 +39,56 @@ class Planner:
           "reason": "왜 이 액션을 선택했는지",
           "is_final": bool
         }
+
+        서로 독립적인 Tool 호출을 한 번에 계획한 경우에는 "tool" 대신 "calls"를 사용:
+        {
+          "calls": [{"id": "s1", "tool": "search", "tool_input": {...}, "depends_on": []}, ...],
+          "reason": "...",
+          "is_final": false
+        }
+        """
+        messages = self._build_messages(user_query, memory_context)
+        if self.structured_output:
+            try:
+                raw = chat_completion(messages, response_format=self._response_format)
+            except Exception as exc:
+                if not is_bad_request(exc):
+                    raise
+                if is_response_format_unsupported(exc):
+                    self.structured_output = False
+                raw = chat_completion(messages)
+        else:
+            raw = chat_completion(messages)
+        plan = self._parse_plan(raw, user_query)
+        plan["planner"] = "llm"
+        return plan
+
+    async def aplan(self, user_query: str, memory_context: str, last_result: Any = None) -> Dict[str, Any]:
+        """
+        plan()의 비동기 버전. LLM 응답을 기다리는 동안 이벤트 루프를 양보한다.
         """
+        messages = self._build_messages(user_query, memory_context)
+        if self.structured_output:
+            try:
+                raw = await achat_completion(messages, response_format=self._response_format)
+            except Exception as exc:
+                if not is_bad_request(exc):
+                    raise
+                if is_response_format_unsupported(exc):
+                    self.structured_output = False
+                raw = await achat_completion(messages)
+        else:
+            raw = await achat_completion(messages)
+        plan = self._parse_plan(raw, user_query)
+        plan["planner"] = "llm"
+        return plan
+
+    def _build_messages(self, user_query: str, memory_context: str) -> List[Dict[str, str]]:
         tools_str = ", ".join(self.tool_names)
 
         prompt = f"""
                     당신은 Tool-Using Agent의 플래너입니다.
-                    아래 정보를 보고, 다음에 실행할 '단 한 번의' 액션을 JSON으로만 반환하세요.
+                    아래 정보를 보고, 다음에 실행할 액션을 JSON으로만 반환하세요.
 
                     [사용 가능한 Tool 목록]
                     {tools_str}
@@ -52,6 +106,11 @@ class Planner:
                     - 즉, final_answer를 선택했다면, 이미 답변 작성을 마친 상태여야 합니다.
                     2. "tool" 값이 "search" | "summarize" | "extract_clause"인 경우에는
                     다음 스텝에서 사용할 수 있도록 "tool_input"에 필요한 파라미터들만 넣으세요.
+                    3. 서로 독립적인 Tool 호출이 여러 개 필요하면 (예: 두 규정을 비교하기 위한 검색 두 번)
+                    "tool" 대신 "calls" 리스트로 한 번에 반환하세요. 각 호출에는 "id"를 붙이고,
+                    다른 호출의 결과가 필요한 호출은 "depends_on"에 그 id를 넣으세요.
+                    의존하지 않는 호출들은 동시에 실행되고, 의존하는 summarize / extract_clause는 선행 검색 결과를 받아 실행됩니다.
+                    final_answer는 "calls"에 넣지 마세요.
 
                     [사용자 질문]
                     {user_query}
@@ -81,30 +140,58 @@ class Planner:
                     "reason": "검색된 규정 목록과 기존 컨텍스트를 바탕으로 사용자의 질문에 직접 답변할 수 있기 때문에 최종 답변을 생성한다.",
                     "is_final": true
                     }}
+
+                    예시 3) 독립적인 호출 여러 개를 한 번에 실행하는 경우 (형식만 참고):
+                    {{
+                    "calls": [
+                        {{"id": "s1", "tool": "search", "tool_input": {{"query": "연차 규정"}}, "depends_on": []}},
+                        {{"id": "s2", "tool": "search", "tool_input": {{"query": "재택근무 규정"}}, "depends_on": []}},
+                        {{"id": "sum", "tool": "summarize", "tool_input": {{}}, "depends_on": ["s1", "s2"]}}
+                    ],
+                    "reason": "두 규정을 비교해야 하므로 각각 검색한 뒤 함께 요약한다.",
+                    "is_final": false
+                    }}
                 """.strip()
 
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "너는 Tool-Using Agent의 플래너로서, 항상 유효한 JSON만 생성해야 한다."
-                },
-                {"role": "user", "content": prompt},
-            ],
-        )
-        raw = response.choices[0].message.content.strip()
-
-        try:
-            plan = json.loads(raw)
-        except json.JSONDecodeError:
-            # 실패 시 기본 플랜 (search 한 번)
-            plan = {
-                "tool": "search",
-                "tool_input": {"query": user_query},
-                "reason": "JSON 파싱 실패로 기본 search를 수행",
-                "is_final": False,
-            }
+        return [
+            {
+                "role": "system",
+                "content": "너는 Tool-Using Agent의 플래너로서, 항상 유효한 JSON만 생성해야 한다."
+            },
+            {"role": "user", "content": prompt},
+        ]
+
+    @staticmethod
+    def _fallback_plan(user_query: str, reason: str) -> Dict[str, Any]:
+        return {
+            "tool": "search",
+            "tool_input": {"query": user_query},
+            "reason": reason,
+            "is_final": False,
+        }
+
+    def _parse_plan(self, raw: str, user_query: str) -> Dict[str, Any]:
+        """
+        LLM 응답 문자열을 플랜 dict로 변환하고 필수 필드를 보정.
+        """
+        plan, repaired = repair_json(raw)
+        if isinstance(plan, list):
+            # 호출 목록만 반환한 경우
+            plan = {"calls": plan}
+        if not isinstance(plan, dict):
+            PLANNER_PARSE.inc(result="fallback")
+            return self._fallback_plan(user_query, "JSON 파싱 실패로 기본 search를 수행")
+
+        if "calls" in plan:
+            calls = normalize_calls(plan.pop("calls"))
+            if len(calls) == 1 and not calls[0]["depends_on"]:
+                # 호출이 하나뿐이면 단일 액션 플랜으로 취급 (스트리밍 등 기존 경로 사용)
+                plan["tool"] = calls[0]["tool"]
+                plan["tool_input"] = calls[0]["tool_input"]
+            elif calls:
+                plan["tool"] = "parallel"
+                plan["tool_input"] = {}
+                plan["calls"] = calls
 
         # 필수 필드 기본값 보정
         plan.setdefault("tool", "search")
@@ -112,6 +199,12 @@ class Planner:
         plan.setdefault("reason", "")
         plan.setdefault("is_final", False)
 
+        problems = validate_plan(plan, self.tool_names)
+        if problems:
+            PLANNER_PARSE.inc(result="fallback")
+            return self._fallback_plan(user_query, f"플랜 검증 실패({'; '.join(problems)})로 기본 search를 수행")
+        PLANNER_PARSE.inc(result="repaired" if repaired else "ok")
+
         # final_answer용 추가 보정:
         # LLM이 규칙을 어기고 answer를 안 넣었거나 비어있을 때 안전하게 기본 답변 채우기
         if plan["tool"] == "final_answer":
@@ -128,3 +221,149 @@ class Planner:
                 plan["tool_input"] = tool_input
 
         return plan
+
+
+class RuleBasedPlanner:
+    """
+    키워드/의도 규칙 + 직전 step 결과(last_result)만으로 다음 액션을 정하는 결정적 플래너.
+    규칙으로 판단하기 애매한 경우에만 fallback(LLM Planner)을 호출한다.
+
+    기본 흐름:
+      1) 첫 step → search(user_query)
+      2) search 결과가 있으면 → summarize (조항/조건/예외를 묻는 질문이면 extract_clause)
+      3) summarize / extract_clause 결과가 있으면 → final_answer
+    """
+
+    # 전체 규정 목록처럼 검색어를 특정하기 어려운 질문 → LLM에게 맡긴다.
+    _OVERVIEW_PATTERN = re.compile(r"(어떤|무슨|무엇|전체|모든)\s*규정|규정\s*(목록|종류|리스트)")
+    # 조항 단위 구조화가 필요한 질문
+    _CLAUSE_PATTERN = re.compile(r"조항|조건|예외|요건|제\s*\d+\s*(조|항)")
+    # 두 대상을 비교하는 질문 (예: "연차 규정과 재택근무 규정 비교해줘") → 두 검색을 병렬로 실행
+    _COMPARE_PATTERN = re.compile(r"^\s*(?P<targets>\S.*?)(?:\s*(?:의|을|를)\s*|\s+)(?:비교|차이)")
+    # 비교 대상을 나누는 위치: 단어 끝에 붙은 접속 조사 + 공백, 또는 공백으로 둘러싼 vs
+    _COMPARE_SPLIT = re.compile(r"(?<=\S)(?:과|와|이랑|랑|하고)\s+|\s+vs\.?\s+")
+    # 비교 대상 한쪽의 최소 길이 ("성과 평가 기준 비교"의 "성"처럼 단어 중간에서 잘린 조각 방지)
+    _COMPARE_MIN_LENGTH = 2
+
+    def __init__(self, tool_names: List[str], fallback: Optional[Planner] = None):
+        self.tool_names = tool_names
+        self.fallback = fallback
+
+    def decide(self, user_query: str, last_result: Any) -> Optional[Dict[str, Any]]:
+        """
+        규칙으로 결정할 수 있으면 플랜을, 애매하면 None을 반환.
+        """
+        if last_result is None:
+            if self._OVERVIEW_PATTERN.search(user_query):
+                return None
+            if self._COMPARE_PATTERN.search(user_query):
+                # 비교 질문인데 두 대상을 확실히 나눌 수 없으면 LLM에게 맡긴다
+                return self._compare_plan(user_query)
+            return self._rule_plan(
+                "search",
+                {"query": user_query},
+                "첫 단계이므로 사용자 질문으로 관련 규정을 검색한다.",
+            )
+
+        if isinstance(last_result, list):
+            if not last_result:
+                # 검색 결과가 없으면 검색어를 바꿀지 판단이 필요하므로 LLM에게 맡긴다.
+                return None
+            if self._CLAUSE_PATTERN.search(user_query) and "extract_clause" in self.tool_names:
+                return self._rule_plan(
+                    "extract_clause",
+                    {},
+                    "검색된 규정에서 질문한 조항/조건을 구조적으로 정리한다.",
+                )
+            return self._rule_plan(
+                "summarize",
+                {},
+                "검색 결과가 있으므로 사용자 질문에 맞게 요약한다.",
+            )
+
+        if isinstance(last_result, str) and last_result.strip():
+            return self._rule_plan(
+                "final_answer",
+                {"answer": last_result},
+                "직전 단계에서 사용자에게 보여줄 답변이 만들어졌으므로 종료한다.",
+                is_final=True,
+            )
+
+        return None
+
+    def plan(self, user_query: str, memory_context: str, last_result: Any = None) -> Dict[str, Any]:
+        plan = self.decide(user_query, last_result)
+        if plan is not None:
+            return plan
+        if self.fallback is None:
+            return self._default_plan(user_query)
+        return self.fallback.plan(user_query, memory_context, last_result=last_result)
+
+    async def aplan(self, user_query: str, memory_context: str, last_result: Any = None) -> Dict[str, Any]:
+        plan = self.decide(user_query, last_result)
+        if plan is not None:
+            return plan
+        if self.fallback is None:
+            return self._default_plan(user_query)
+        return await self.fallback.aplan(user_query, memory_context, last_result=last_result)
+
+    def _rule_plan(
+        self, tool: str, tool_input: Dict[str, Any], reason: str, is_final: bool = False
+    ) -> Dict[str, Any]:
+        return {
+            "tool": tool,
+            "tool_input": tool_input,
+            "reason": reason,
+            "is_final": is_final,
+            "planner": "rule",
+        }
+
+    def _compare_plan(self, user_query: str) -> Optional[Dict[str, Any]]:
+        """
+        비교 질문이면 두 대상을 각각 검색하고, 두 결과를 함께 요약(또는 조항 정리)하는 병렬 플랜.
+        양쪽 모두 _COMPARE_MIN_LENGTH자 이상이 되는 첫 분리 위치를 쓰고, 그런 위치가 없으면 None.
+        """
+        match = self._COMPARE_PATTERN.search(user_query)
+        if match is None:
+            return None
+        targets = match.group("targets")
+        for split in self._COMPARE_SPLIT.finditer(targets):
+            first, second = targets[: split.start()].strip(), targets[split.end() :].strip()
+            if len(first) >= self._COMPARE_MIN_LENGTH and len(second) >= self._COMPARE_MIN_LENGTH:
+                break
+        else:
+            return None
+
+        if self._CLAUSE_PATTERN.search(user_query) and "extract_clause" in self.tool_names:
+            answer_tool = "extract_clause"
+        else:
+            answer_tool = "summarize"
+
+        plan = self._rule_plan("parallel", {}, "두 대상을 비교하는 질문이므로 각각 검색한 뒤 함께 정리한다.")
+        plan["calls"] = normalize_calls(
+            [
+                {"id": "search_a", "tool": "search", "tool_input": {"query": first}},
+                {"id": "search_b", "tool": "search", "tool_input": {"query": second}},
+                {"id": "answer", "tool": answer_tool, "tool_input": {}, "depends_on": ["search_a", "search_b"]},
+            ]
+        )
+        return plan
+
+    def _default_plan(self, user_query: str) -> Dict[str, Any]:
+        return self._rule_plan("search", {"query": user_query}, "규칙으로 판단할 수 없어 기본 search를 수행한다.")
+
+
+def build_planner(
+    mode: str, tool_names: List[str], structured_output: bool = True
+) -> Union[Planner, RuleBasedPlanner]:
+    """
+    설정 값(mode)에 맞는 플래너를 생성.
+      - "llm": 매 step LLM 플래너 호출 (기존 동작)
+      - "rule": 규칙 기반 플래너, 애매한 경우에만 LLM 플래너로 fallback
+    """
+    llm_planner = Planner(tool_names=tool_names, structured_output=structured_output)
+    if mode == "llm":
+        return llm_planner
+    if mode == "rule":
+        return RuleBasedPlanner(tool_names=tool_names, fallback=llm_planner)
+    raise ValueError(f"알 수 없는 플래너 모드: {mode}")
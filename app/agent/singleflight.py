@@ -0,0 +1,59 @@
+# app/agent/singleflight.py
+from __future__ import annotations
+
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Generic, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """
+    같은 키로 동시에 들어온 비동기 작업을 하나로 합치는(coalescing) 헬퍼.
+
+    먼저 들어온 호출(leader)만 실제로 fn()을 실행하고,
+    실행 중에 같은 키로 들어온 호출들은 leader의 결과(또는 예외)를 함께 기다린다.
+    fn()은 별도 task로 돌기 때문에 leader / follower 중 누가 취소되어도 나머지는 계속 결과를 기다린다.
+    작업이 끝나면 키는 바로 제거되므로 결과를 오래 보관하는 캐시는 아니다.
+    """
+
+    def __init__(self) -> None:
+        self._inflight: Dict[str, "asyncio.Task[T]"] = {}
+        self.executions = 0
+        self.shared = 0
+
+    def __len__(self) -> int:
+        return len(self._inflight)
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is not None:
+            self.shared += 1
+            # follower가 취소되어도 공유 작업은 계속 진행되도록 shield
+            return await asyncio.shield(task)
+
+        # fn()은 leader와 분리된 task로 실행한다. leader가 취소되어도 (클라이언트 연결 종료 등)
+        # 같은 작업을 기다리는 follower들은 취소되지 않고 결과를 받는다.
+        task = asyncio.ensure_future(fn())
+        # 기다리는 호출이 하나도 남지 않았을 때 "exception was never retrieved" 경고 방지
+        task.add_done_callback(_consume_exception)
+        task.add_done_callback(lambda done: self._forget(key, done))
+        self._inflight[key] = task
+        self.executions += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: "asyncio.Future[Any]") -> None:
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    def stats_dict(self) -> Dict[str, Any]:
+        return {
+            "executions": self.executions,
+            "shared": self.shared,
+            "in_flight": len(self._inflight),
+        }
+
+
+def _consume_exception(future: "asyncio.Future[Any]") -> None:
+    if not future.cancelled():
+        future.exception()
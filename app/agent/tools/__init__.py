@@ -1,22 +1,75 @@
 # app/agent/tools/__init__.py
-from typing import Dict
+from typing import Dict, Optional
 
 from .base import Tool
-from .search_tool import SearchTool
+from .search_tool import SEARCH_MODES, SearchTool
+from .search_index import InvertedIndex, OverlayIndex, tokenize
+from .search_cache import SearchResultCache
+from .rule_loader import Rule, iter_rules
+from .rule_store import RuleStore, RuleSnapshot
+from .shared_snapshot import SharedIndex, SharedRuleMap, write_snapshot
+from .clause_index import ClauseIndex, parse_rule
+from .vector_index import HashingEmbedder, VectorIndex, load_embedder
 from .summarize_tool import SummarizeTool
 from .clause_tool import ClauseTool
 
 
-def build_tool_registry(*, data_path: str) -> Dict[str, Tool]:
+def build_tool_registry(
+    *,
+    data_path: str,
+    rules_poll_interval: Optional[float] = None,
+    rules_snapshot_path: Optional[str] = None,
+    rules_snapshot_verify: bool = True,
+    search_mode: str = "keyword",
+    embedder: str = "hashing",
+    embedding_dim: int = 256,
+    vector_path: Optional[str] = None,
+    hybrid_alpha: float = 0.5,
+    ivf_lists: int = 0,
+    ivf_probe: int = 8,
+    search_cache_size: int = 0,
+    search_cache_max_bytes: int = 16 * 1024 * 1024,
+    search_precomputed_path: Optional[str] = None,
+    search_query_log_path: Optional[str] = None,
+    clause_index: bool = True,
+    clause_index_path: Optional[str] = None,
+    clause_use_llm: bool = True,
+) -> Dict[str, Tool]:
     """
     프로젝트에서 사용할 Tool 인스턴스를 생성하고
     `{tool_name: tool_instance}` 형태의 레지스트리를 만들어 반환.
 
     새 Tool을 추가하고 싶으면 여기에서만 인스턴스를 추가해도 됨.
+    rules_poll_interval을 주면 SearchTool이 그 주기로 규정 파일 변경을 확인해 자동 reload 한다.
+    rules_snapshot_path를 주면 규정 corpus / 역색인을 여러 worker가 mmap으로 공유하는 snapshot 파일에서 읽는다.
+    search_mode가 "vector" / "hybrid"면 embedder 설정("hashing" 또는 "module:attr")으로 임베딩 인덱스를 만든다.
+    search_cache_size가 0보다 크면 검색 결과를 (정규화한 검색어, top_k, corpus 버전) 기준으로 캐시한다.
+    clause_index가 True면 extract_clause가 SearchTool과 같은 규정 snapshot으로 만든 조문 구조 인덱스를 사용한다.
     """
-    search_tool = SearchTool(data_path=data_path)
+    search_tool = SearchTool(
+        data_path=data_path,
+        poll_interval=rules_poll_interval,
+        snapshot_path=rules_snapshot_path,
+        snapshot_verify=rules_snapshot_verify,
+        mode=search_mode,
+        embedder=load_embedder(embedder, embedding_dim) if search_mode != "keyword" else None,
+        vector_path=vector_path,
+        hybrid_alpha=hybrid_alpha,
+        ivf_lists=ivf_lists,
+        ivf_probe=ivf_probe,
+        cache=(
+            SearchResultCache(search_cache_size, search_cache_max_bytes, by_terms=search_mode == "keyword")
+            if search_cache_size > 0
+            else None
+        ),
+        precomputed_path=search_precomputed_path,
+        query_log_path=search_query_log_path,
+    )
     summarize_tool = SummarizeTool()
-    clause_tool = ClauseTool()
+    clause_tool = ClauseTool(
+        clause_index=ClauseIndex(search_tool.store, path=clause_index_path) if clause_index else None,
+        use_llm=clause_use_llm,
+    )
 
     tools = [search_tool, summarize_tool, clause_tool]
     return {tool.name: tool for tool in tools}
@@ -25,6 +78,23 @@ def build_tool_registry(*, data_path: str) -> Dict[str, Tool]:
 __all__ = [
     "Tool",
     "SearchTool",
+    "SEARCH_MODES",
+    "InvertedIndex",
+    "OverlayIndex",
+    "SearchResultCache",
+    "tokenize",
+    "Rule",
+    "iter_rules",
+    "RuleStore",
+    "RuleSnapshot",
+    "SharedIndex",
+    "SharedRuleMap",
+    "write_snapshot",
+    "ClauseIndex",
+    "parse_rule",
+    "HashingEmbedder",
+    "VectorIndex",
+    "load_embedder",
     "SummarizeTool",
     "ClauseTool",
     "build_tool_registry",
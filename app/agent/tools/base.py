@@ -1,7 +1,8 @@
 from __future__ import annotations
 
+import asyncio
 from abc import ABC, abstractmethod
-from typing import Any, Dict
+from typing import Any, AsyncIterator, Dict
 
 
 class Tool(ABC):
@@ -11,10 +12,14 @@ class Tool(ABC):
     - name: planner가 선택할 때 사용할 문자열 이름
     - description: 프롬프트/문서화용 설명
     - run(): 실제 실행 로직 (user_query + tool_input 기반)
+    - arun(): run()의 비동기 버전 (기본 구현은 스레드 풀에서 run() 실행)
+    - astream(): 텍스트 결과를 토큰 단위로 흘려보내는 버전 (supports_streaming = True인 Tool만)
     """
 
     name: str
     description: str = ""
+    # astream()으로 결과 텍스트를 토큰 단위로 내보낼 수 있는 Tool인지 여부
+    supports_streaming: bool = False
 
     @abstractmethod
     def run(self, *, user_query: str, tool_input: Dict[str, Any]) -> Any:
@@ -25,3 +30,18 @@ class Tool(ABC):
         - return: Tool 실행 결과
         """
         raise NotImplementedError
+
+    async def arun(self, *, user_query: str, tool_input: Dict[str, Any]) -> Any:
+        """
+        Tool 비동기 실행 메서드.
+        LLM 호출처럼 I/O 대기가 긴 Tool은 이 메서드를 async 클라이언트로 override 한다.
+        기본 구현은 run()을 워커 스레드에서 실행해 이벤트 루프를 막지 않는다.
+        """
+        return await asyncio.to_thread(self.run, user_query=user_query, tool_input=tool_input)
+
+    async def astream(self, *, user_query: str, tool_input: Dict[str, Any]) -> AsyncIterator[str]:
+        """
+        Tool 결과 텍스트를 생성되는 대로 조각(chunk) 단위로 반환.
+        기본 구현은 arun() 결과 전체를 한 번에 내보낸다.
+        """
+        yield str(await self.arun(user_query=user_query, tool_input=tool_input))
@@ -0,0 +1,414 @@
+# app/agent/tools/clause_index.py
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, List, Optional, Tuple
+
+from .rule_loader import Rule
+from .rule_store import RuleSnapshot, RuleStore
+from .search_index import tokenize
+
+"""
+규정 조문 구조 인덱스.
+
+규정 원문을 조(article) / 항(clause) / 호(item) 노드로 나누고, 노드마다 조건 / 예외 문장과
+수치 기준(예: "15일", "주 2회까지")을 미리 뽑아 둔다. 구조는 규정마다 고정이므로
+로드 시(또는 오프라인으로) 한 번만 계산하고 JSON으로 저장해 재사용한다.
+
+오프라인 생성:
+    python -m app.agent.tools.clause_index --data app/data/rules_sample.json --output clauses.json
+"""
+
+logger = logging.getLogger(__name__)
+
+_INDEX_VERSION = "clause-v1"
+
+_ARTICLE = re.compile(r"제\s*(\d+)\s*조(?:\s*\(([^)]*)\))?")
+_CIRCLED = "①②③④⑤⑥⑦⑧⑨⑩⑪⑫⑬⑭⑮⑯⑰⑱⑲⑳"
+_CLAUSE = re.compile(rf"([{_CIRCLED}])|제\s*(\d+)\s*항")
+_ITEM = re.compile(r"(?:(?<=\s)|^)(\d{1,2}|[가나다라마바사아자차카타파하])[.)]\s")
+_SENTENCE = re.compile(r"(?<=[.!?。])\s+|\n+")
+
+_CONDITION = re.compile(r"경우|때에?는?|하에|조건|한하여|한해|이상|이하|이내|초과|미만|까지|만\s")
+_EXCEPTION = re.compile(r"다만|단,|예외|제외|불구하고|아니한다|않는다|할 수 없다|불가")
+_THRESHOLD = re.compile(
+    r"(?:(주|월|연간?|일)\s*)?(\d+(?:\.\d+)?)\s*(일|회|시간|개월|년|%|퍼센트|만\s*원|원|명|주|단계)"
+    r"\s*(이상|이하|이내|초과|미만|까지)?"
+)
+
+
+class ClauseNode:
+    """
+    조문 노드 하나. kind: "article"(조) | "clause"(항) | "item"(호) | "sentence"(번호 없는 문장)
+    """
+
+    __slots__ = ("kind", "number", "label", "text", "conditions", "exceptions", "thresholds")
+
+    def __init__(
+        self,
+        kind: str,
+        number: Optional[str],
+        label: str,
+        text: str,
+        conditions: Optional[List[str]] = None,
+        exceptions: Optional[List[str]] = None,
+        thresholds: Optional[List[str]] = None,
+    ) -> None:
+        self.kind = kind
+        self.number = number
+        self.label = label
+        self.text = text
+        self.conditions = conditions or []
+        self.exceptions = exceptions or []
+        self.thresholds = thresholds or []
+
+    def to_dict(self) -> Dict[str, Any]:
+        data: Dict[str, Any] = {"kind": self.kind, "label": self.label, "text": self.text}
+        if self.number is not None:
+            data["number"] = self.number
+        for field in ("conditions", "exceptions", "thresholds"):
+            if getattr(self, field):
+                data[field] = getattr(self, field)
+        return data
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "ClauseNode":
+        return cls(
+            kind=data["kind"],
+            number=data.get("number"),
+            label=data.get("label", ""),
+            text=data.get("text", ""),
+            conditions=data.get("conditions"),
+            exceptions=data.get("exceptions"),
+            thresholds=data.get("thresholds"),
+        )
+
+    def __repr__(self) -> str:
+        return f"ClauseNode(kind={self.kind!r}, label={self.label!r})"
+
+
+class RuleStructure:
+    """
+    규정 하나의 조문 구조 (노드는 원문 순서).
+    """
+
+    __slots__ = ("title", "nodes")
+
+    def __init__(self, title: str, nodes: List[ClauseNode]) -> None:
+        self.title = title
+        self.nodes = nodes
+
+    def articles(self, number: str) -> List[ClauseNode]:
+        """
+        제{number}조 노드와 그 아래 항/호 노드들.
+        """
+        result: List[ClauseNode] = []
+        inside = False
+        for node in self.nodes:
+            if node.kind == "article":
+                inside = node.number == number
+            if inside:
+                result.append(node)
+        return result
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {"title": self.title, "nodes": [node.to_dict() for node in self.nodes]}
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "RuleStructure":
+        return cls(data.get("title", ""), [ClauseNode.from_dict(n) for n in data.get("nodes", [])])
+
+
+def _analyze(kind: str, number: Optional[str], label: str, text: str) -> ClauseNode:
+    sentences = [s.strip() for s in _SENTENCE.split(text) if s and s.strip()] or [text.strip()]
+    exceptions = [s for s in sentences if _EXCEPTION.search(s)]
+    conditions = [s for s in sentences if _CONDITION.search(s) and s not in exceptions]
+    thresholds = [" ".join(m.group(0).split()) for m in _THRESHOLD.finditer(text)]
+    return ClauseNode(kind, number, label, text.strip(), conditions, exceptions, thresholds)
+
+
+def _split_marked(text: str, pattern: "re.Pattern[str]") -> List[Tuple[Optional["re.Match[str]"], str]]:
+    """
+    pattern이 나오는 위치마다 잘라 (표시 match, 그 뒤 본문) 목록으로. 첫 표시 앞부분은 (None, 본문).
+    """
+    parts: List[Tuple[Optional[re.Match[str]], str]] = []
+    matches = list(pattern.finditer(text))
+    if not matches:
+        return [(None, text)]
+    if text[: matches[0].start()].strip():
+        parts.append((None, text[: matches[0].start()]))
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        parts.append((match, text[match.end() : end]))
+    return parts
+
+
+def _parse_body(
+    text: str, nodes: List[ClauseNode], label: str, kind: Optional[str] = None, number: Optional[str] = None
+) -> None:
+    """
+    호(1. / 가.) 표시 앞부분은 kind 노드(없으면 문장 단위 노드)로, 각 호는 item 노드로 추가.
+    """
+    for match, body in _split_marked(text, _ITEM):
+        if not body.strip():
+            continue
+        if match is not None:
+            item = match.group(1)
+            nodes.append(_analyze("item", item, f"{label} {item}호".strip(), body))
+        elif kind is not None:
+            nodes.append(_analyze(kind, number, label, body))
+        else:
+            for sentence in _SENTENCE.split(body):
+                if sentence and sentence.strip():
+                    nodes.append(_analyze("sentence", None, label, sentence))
+
+
+def parse_rule(rule: Rule) -> RuleStructure:
+    """
+    규정 원문을 조 / 항 / 호 노드로 분해. 번호 체계가 없는 부분은 문장 단위 노드로 나눈다.
+    """
+    nodes: List[ClauseNode] = []
+    for article, article_body in _split_marked(rule.content, _ARTICLE):
+        article_label = ""
+        if article is not None:
+            number, heading = article.group(1), (article.group(2) or "").strip()
+            article_label = f"제{number}조"
+            nodes.append(
+                _analyze("article", number, article_label + (f"({heading})" if heading else ""), heading or article_body)
+            )
+
+        for clause, clause_body in _split_marked(article_body, _CLAUSE):
+            if clause is None:
+                _parse_body(clause_body, nodes, article_label)
+                continue
+            circled, numbered = clause.group(1), clause.group(2)
+            number = str(_CIRCLED.index(circled) + 1) if circled else numbered
+            _parse_body(clause_body, nodes, f"{article_label} 제{number}항".strip(), kind="clause", number=number)
+    return RuleStructure(rule.title, nodes)
+
+
+class ClauseIndex:
+    """
+    RuleStore의 snapshot과 동기화되는 조문 구조 인덱스.
+
+    - 규정 키 → RuleStructure, 규정 원문 → 규정 키 (extract_clause에 넘어온 texts로 구조를 찾는 용도),
+      조 번호 → (규정 구조, 조문 노드, 제목 term) 목록 ("제N조" 직접 조회용)
+    - path를 주면 JSON으로 저장하고, 다음 시작 때 corpus fingerprint가 같으면 파싱 없이 불러온다
+      (저장에 실패하면 경고만 남기고 메모리의 구조를 그대로 사용)
+    - reload 이후에는 RuleStore.changes_since()의 추가/수정/삭제분만 다시 파싱하고 저장 파일은 다시 쓰지 않는다
+      (다음 시작 때 fingerprint가 달라 한 번 다시 만든다)
+    - 처음 조회할 때(또는 sync()를 직접 부를 때) 만든다
+    """
+
+    def __init__(self, store: RuleStore, path: Optional[str] = None) -> None:
+        self.store = store
+        self.path = path
+        self._lock = threading.Lock()
+        self._snapshot: Optional[RuleSnapshot] = None
+        self._structures: Dict[Hashable, RuleStructure] = {}
+        # 규정 원문 대신 원문 digest(16바이트)를 키로 둬 corpus 텍스트를 한 벌 더 들고 있지 않는다
+        self._by_content: Dict[bytes, Hashable] = {}
+        self._articles: Dict[str, List[Tuple[RuleStructure, List[ClauseNode], FrozenSet[str]]]] = {}
+
+    def is_stale(self) -> bool:
+        """
+        sync()가 필요한지 (아직 만들지 않았거나 규정 snapshot이 바뀜). 비동기 호출 쪽에서 스레드로 넘길지 판단하는 데 쓴다.
+        """
+        current = self._snapshot
+        return current is None or current.version < self.store.snapshot.version
+
+    def sync(self) -> None:
+        snapshot = self.store.snapshot
+        with self._lock:
+            current = self._snapshot
+            if current is not None and current.version >= snapshot.version:
+                return
+            if current is None:
+                self._build(snapshot)
+                return
+
+            # reload 이후: store가 기록한 변경분 키만 다시 파싱한다 (corpus 전체 / 저장 파일은 건드리지 않음)
+            changed = self.store.changes_since(current.version)
+            if changed is None:
+                # 변경 기록이 없으면(공유 snapshot 재작성 등) 두 snapshot을 비교한다
+                changed = {key for key in current.rules if key not in snapshot.rules}
+                for key, rule in snapshot.rules.items():
+                    old = current.rules.get(key)
+                    if old is not rule and old != rule:
+                        changed.add(key)
+
+            structures = dict(self._structures)
+            by_content = dict(self._by_content)
+            articles = dict(self._articles)
+            stale: Dict[int, RuleStructure] = {}
+            fresh: List[RuleStructure] = []
+            for key in changed:
+                old_rule = current.rules.get(key)
+                if old_rule is not None:
+                    digest = _content_key(old_rule.content)
+                    if by_content.get(digest) == key:
+                        del by_content[digest]
+                old_structure = structures.pop(key, None)
+                if old_structure is not None:
+                    stale[id(old_structure)] = old_structure
+                rule = snapshot.rules.get(key)
+                if rule is not None:
+                    by_content[_content_key(rule.content)] = key
+                    structures[key] = parse_rule(rule)
+                    fresh.append(structures[key])
+
+            # 바뀐 규정이 걸린 조 번호 목록만 새로 만든다
+            for structure in stale.values():
+                for number in _article_numbers(structure):
+                    entries = [entry for entry in articles.get(number, []) if entry[0] is not structure]
+                    if entries:
+                        articles[number] = entries
+                    else:
+                        articles.pop(number, None)
+            for number, entries in _article_map(fresh).items():
+                articles[number] = articles.get(number, []) + entries
+
+            self._structures = structures
+            self._by_content = by_content
+            self._articles = articles
+            self._snapshot = snapshot
+
+    def _build(self, snapshot: RuleSnapshot) -> None:
+        """
+        처음 한 번: 저장된 인덱스의 fingerprint가 같으면 불러오고, 없거나 다르면 전체를 파싱해 저장한다.
+        """
+        # 공유 snapshot에서는 규정 레코드를 디코딩하는 비용이 있으므로 corpus는 한 번만 훑는다
+        fingerprint = snapshot.fingerprint(_INDEX_VERSION) if self.path else None
+        loaded = self._load(fingerprint) if fingerprint else None
+        structures = loaded or {}
+        by_content: Dict[bytes, Hashable] = {}
+        for key, rule in snapshot.rules.items():
+            by_content[_content_key(rule.content)] = key
+            if loaded is None:
+                structures[key] = parse_rule(rule)
+        if loaded is None and fingerprint:
+            self._save(fingerprint, structures)
+
+        self._structures = structures
+        self._by_content = by_content
+        self._articles = _article_map(structures.values())
+        self._snapshot = snapshot
+
+    def structure_for_text(self, text: str) -> RuleStructure:
+        """
+        규정 원문이면 미리 계산한 구조를, 토큰 예산 때문에 잘린 텍스트 등 색인에 없는 텍스트면 즉석에서 파싱한 구조를 반환.
+        """
+        self.sync()
+        key = self._by_content.get(_content_key(text))
+        if key is not None and key in self._structures:
+            return self._structures[key]
+        return parse_rule(Rule(id=None, title="", content=text))
+
+    def lookup_article(self, number: str, title_terms: Iterable[str] = ()) -> List[Tuple[RuleStructure, List[ClauseNode]]]:
+        """
+        제{number}조를 가진 규정들. title_terms가 주어지면 제목 term이 겹치는 규정을 먼저 반환.
+        """
+        self.sync()
+        terms = set(title_terms)
+        found = [
+            (len(terms & title) if terms else 0, structure, nodes)
+            for structure, nodes, title in self._articles.get(number, [])
+        ]
+        found.sort(key=lambda x: -x[0])
+        if terms and found and found[0][0] > 0:
+            found = [f for f in found if f[0] > 0]
+        return [(structure, nodes) for _, structure, nodes in found]
+
+    def _load(self, fingerprint: str) -> Optional[Dict[Hashable, RuleStructure]]:
+        if not self.path:
+            return None
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("fingerprint") != fingerprint:
+            return None
+        return {
+            tuple(entry["key"]) if isinstance(entry["key"], list) else entry["key"]: RuleStructure.from_dict(entry)
+            for entry in data.get("rules", [])
+        }
+
+    def _save(self, fingerprint: str, structures: Dict[Hashable, RuleStructure]) -> None:
+        if not self.path:
+            return
+        # prefork worker들이 동시에 저장해도 서로의 임시 파일을 덮어쓰지 않도록 pid별 임시 파일에 쓴 뒤 교체
+        tmp_path = f"{self.path}.{os.getpid()}.tmp"
+        try:
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(
+                    {
+                        "fingerprint": fingerprint,
+                        "rules": [
+                            {"key": list(key) if isinstance(key, tuple) else key, **structure.to_dict()}
+                            for key, structure in structures.items()
+                        ],
+                    },
+                    f,
+                    ensure_ascii=False,
+                )
+            os.replace(tmp_path, self.path)
+        except OSError as exc:
+            # 읽기 전용 파일시스템 등: 저장만 건너뛰고 메모리의 구조로 계속 동작
+            logger.warning("조문 구조 인덱스 저장 실패 (%s): %s", self.path, exc)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def _content_key(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def _article_numbers(structure: RuleStructure) -> List[str]:
+    return list(dict.fromkeys(node.number for node in structure.nodes if node.kind == "article" and node.number))
+
+
+def _article_map(
+    structures: Iterable[RuleStructure],
+) -> Dict[str, List[Tuple[RuleStructure, List[ClauseNode], FrozenSet[str]]]]:
+    articles: Dict[str, List[Tuple[RuleStructure, List[ClauseNode], FrozenSet[str]]]] = {}
+    for structure in structures:
+        title = frozenset(tokenize(structure.title))
+        for number in _article_numbers(structure):
+            articles.setdefault(number, []).append((structure, structure.articles(number), title))
+    return articles
+
+
+__all__ = [
+    "ClauseNode",
+    "RuleStructure",
+    "ClauseIndex",
+    "parse_rule",
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="규정 조문 구조 인덱스 생성")
+    parser.add_argument("--data", required=True, help="규정 데이터 경로 (.json / .jsonl / shard 디렉토리)")
+    parser.add_argument("--output", required=True, help="저장할 조문 구조 인덱스(JSON) 경로")
+    args = parser.parse_args()
+
+    index = ClauseIndex(RuleStore(args.data), path=args.output)
+    index.sync()
+    nodes = sum(len(s.nodes) for s in index._structures.values())
+    print(f"규정 {len(index._structures)}건, 조문 노드 {nodes}개 → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
+
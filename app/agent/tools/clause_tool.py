@@ -1,24 +1,46 @@
 # app/agent/tools/clause_tool.py
-from typing import List, Dict, Any
+import asyncio
+import re
+from typing import List, Dict, Any, AsyncIterator, Optional, Tuple
 
-from app.config import client, MODEL_NAME
+from app.agent.llm import achat_completion, astream_chat_completion, chat_completion
 from .base import Tool
+from .clause_index import ClauseIndex, ClauseNode
+from .search_index import tokenize
+
+# 입력 texts가 없고 직접 조회도 아닐 때 돌려주는 안내 문구 (loop controller는 답변으로 보지 않는다)
+NO_TEXT_MESSAGE = "추출할 규정 텍스트가 없습니다."
+# "제3조 내용 알려줘"처럼 특정 조문을 그대로 보여 달라는 질문
+_ARTICLE_QUERY = re.compile(r"제\s*(\d+)\s*조")
+_DIRECT_LOOKUP = re.compile(r"내용|뭐|무엇|무슨|보여|원문|전문|뭔가요|뭐야")
+# 조문 관계 판단에 쓰지 않을 흔한 질의어 bigram
+_QUERY_STOP_TERMS = {"규정", "알려", "려줘", "내용", "뭐야", "무엇", "어떻", "떻게"}
 
 
 class ClauseTool(Tool):
     """
     규정에서 '어떤 조항이 어떤 내용을 말하는지'를 좀 더 구조화해서 뽑아주는 Tool.
+
+    clause_index가 있으면 미리 계산한 조문 구조(조/항/호, 조건, 예외, 수치 기준)로
+    "관련 조항 요약"과 "주의할 점"을 바로 만들고, LLM은 "사용자 질문과의 관계" 문장에만 사용한다.
+    "제3조 내용 알려줘" 같은 직접 조회는 LLM 없이 조문 원문을 반환한다.
     """
 
     name = "extract_clause"
     description = "규정 텍스트에서 핵심 조항과 요지를 구조적으로 정리하는 Tool"
-
-    def run(self, *, user_query: str, tool_input: Dict[str, Any]) -> str:
-        texts: List[str] = tool_input.get("texts") or []
-
-        if not texts:
-            return "추출할 규정 텍스트가 없습니다."
-
+    supports_streaming = True
+
+    def __init__(self, clause_index: Optional[ClauseIndex] = None, use_llm: bool = True, max_nodes: int = 8) -> None:
+        """
+        :param clause_index: 조문 구조 인덱스 (None이면 전체 원문을 LLM에 보내는 기존 방식)
+        :param use_llm: False면 "사용자 질문과의 관계"도 질의어 겹침으로만 정리해 LLM을 전혀 부르지 않는다
+        :param max_nodes: 요약에 포함할 최대 조문 노드 수
+        """
+        self.clause_index = clause_index
+        self.use_llm = use_llm
+        self.max_nodes = max_nodes
+
+    def _build_messages(self, user_query: str, texts: List[str]) -> List[Dict[str, str]]:
         joined = "\n\n".join(texts)
 
         prompt = f"""
@@ -45,14 +67,186 @@ class ClauseTool(Tool):
                     한국어로 간결하게 정리해 주세요.
                 """.strip()
 
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "너는 복잡한 규정에서 사용자에게 필요한 조항만 뽑아서 알려주는 조항 정리 전문가야."
-                },
-                {"role": "user", "content": prompt},
-            ],
-        )
-        return response.choices[0].message.content.strip()
+        return [
+            {
+                "role": "system",
+                "content": "너는 복잡한 규정에서 사용자에게 필요한 조항만 뽑아서 알려주는 조항 정리 전문가야."
+            },
+            {"role": "user", "content": prompt},
+        ]
+
+    def _build_relation_messages(self, user_query: str, nodes: List[Tuple[str, ClauseNode]]) -> List[Dict[str, str]]:
+        clauses = "\n".join(f"- {_node_label(title, node)}: {node.text}" for title, node in nodes)
+
+        prompt = f"""
+                    [사용자 질문]
+                    {user_query}
+
+                    [관련 조문]
+                    {clauses}
+
+                    위 조문들이 사용자 질문과 어떤 관련이 있는지 "- "로 시작하는 1~3줄로만 답하세요.
+                    조문 내용을 다시 요약하거나 다른 항목을 덧붙이지 마세요.
+                """.strip()
+
+        return [
+            {"role": "system", "content": "너는 규정 조문과 사용자 질문의 관계를 짧게 설명하는 조항 정리 전문가야."},
+            {"role": "user", "content": prompt},
+        ]
+
+    # 조문 구조 기반 처리
+
+    async def _async_sync(self) -> None:
+        # 전체 파싱 / reload 반영은 CPU 작업이라 이벤트 루프를 막지 않도록 스레드에서 수행
+        if self.clause_index is not None and self.clause_index.is_stale():
+            await asyncio.to_thread(self.clause_index.sync)
+
+    def _direct_lookup(self, user_query: str) -> Optional[str]:
+        """
+        "제N조 내용" 같은 직접 조회면 해당 조문 원문을 정리해 반환 (LLM 미사용). 해당하지 않으면 None.
+        """
+        match = _ARTICLE_QUERY.search(user_query)
+        if self.clause_index is None or match is None or not _DIRECT_LOOKUP.search(user_query):
+            return None
+
+        rest = user_query[: match.start()] + " " + user_query[match.end() :]
+        found = self.clause_index.lookup_article(match.group(1), title_terms=tokenize(rest))
+        if not found:
+            return None
+
+        lines = []
+        for structure, nodes in found[:3]:
+            lines.append(f"[{structure.title}]" if structure.title else "[규정]")
+            for node in nodes:
+                lines.append(f"- {node.label}: {node.text}" if node.kind != "article" else f"- {node.label}")
+        return "\n".join(lines)
+
+    def _select_nodes(self, user_query: str, texts: List[str]) -> List[Tuple[str, ClauseNode]]:
+        """
+        texts의 조문 노드 중 질문과 term이 많이 겹치는 노드를 max_nodes개까지 원문 순서대로 고른다.
+        """
+        query_terms = set(tokenize(user_query)) - _QUERY_STOP_TERMS
+        candidates: List[Tuple[int, int, str, ClauseNode]] = []
+        order = 0
+        for text in texts:
+            structure = self.clause_index.structure_for_text(text)
+            for node in structure.nodes:
+                order += 1
+                if node.kind == "article":
+                    continue
+                overlap = len(query_terms & set(tokenize(structure.title + " " + node.text))) if query_terms else 0
+                candidates.append((overlap, order, structure.title, node))
+
+        # 질문과 겹치는 노드가 하나라도 있으면 겹치지 않는 노드는 제외
+        if any(c[0] > 0 for c in candidates):
+            candidates = [c for c in candidates if c[0] > 0]
+        # 같은 점수면 예외 / 수치 기준이 있는 노드(주의할 점으로 쓸모 있는 노드)를 우선
+        chosen = sorted(
+            candidates, key=lambda c: (-c[0], not (c[3].exceptions or c[3].thresholds), c[1])
+        )[: self.max_nodes]
+        return [(title, node) for _, _, title, node in sorted(chosen, key=lambda c: c[1])]
+
+    def _summary_section(self, nodes: List[Tuple[str, ClauseNode]]) -> str:
+        lines = ["1. 관련 조항 요약"]
+        for title, node in nodes:
+            lines.append(f"- {_node_label(title, node)}: {node.text}")
+            if node.thresholds:
+                lines.append(f"  · 기준: {', '.join(node.thresholds)}")
+        return "\n".join(lines)
+
+    def _caution_section(self, nodes: List[Tuple[str, ClauseNode]]) -> str:
+        lines = ["3. 실제 적용 시 주의할 점"]
+        for title, node in nodes:
+            label = _node_label(title, node)
+            lines.extend(f"- (예외) {label}: {sentence}" for sentence in node.exceptions)
+            lines.extend(f"- (조건) {label}: {sentence}" for sentence in node.conditions)
+        if len(lines) == 1:
+            lines.append("- 별도로 명시된 예외나 조건은 없습니다.")
+        return "\n".join(lines)
+
+    def _local_relation(self, user_query: str, nodes: List[Tuple[str, ClauseNode]]) -> str:
+        query_terms = set(tokenize(user_query)) - _QUERY_STOP_TERMS
+        related = [
+            _node_label(title, node) for title, node in nodes if query_terms & set(tokenize(node.text))
+        ]
+        if not related:
+            return "- 질문과 직접 겹치는 조문은 없으며, 위 조항들이 가장 가까운 규정입니다."
+        return f"- 질문과 직접 관련된 조문: {', '.join(related)}"
+
+    def _structured_parts(self, user_query: str, texts: List[str]) -> Tuple[List[Tuple[str, ClauseNode]], str, str]:
+        nodes = self._select_nodes(user_query, texts)
+        return nodes, self._summary_section(nodes), self._caution_section(nodes)
+
+    # Tool 인터페이스
+
+    def run(self, *, user_query: str, tool_input: Dict[str, Any]) -> str:
+        texts: List[str] = tool_input.get("texts") or []
+
+        direct = self._direct_lookup(user_query)
+        if direct is not None:
+            return direct
+        if not texts:
+            return NO_TEXT_MESSAGE
+        if self.clause_index is None:
+            return chat_completion(self._build_messages(user_query, texts))
+
+        nodes, summary, caution = self._structured_parts(user_query, texts)
+        if self.use_llm and nodes:
+            relation = chat_completion(self._build_relation_messages(user_query, nodes))
+        else:
+            relation = self._local_relation(user_query, nodes)
+        return _join_sections(summary, relation, caution)
+
+    async def arun(self, *, user_query: str, tool_input: Dict[str, Any]) -> str:
+        texts: List[str] = tool_input.get("texts") or []
+
+        await self._async_sync()
+        direct = self._direct_lookup(user_query)
+        if direct is not None:
+            return direct
+        if not texts:
+            return NO_TEXT_MESSAGE
+        if self.clause_index is None:
+            return await achat_completion(self._build_messages(user_query, texts))
+
+        nodes, summary, caution = self._structured_parts(user_query, texts)
+        if self.use_llm and nodes:
+            relation = await achat_completion(self._build_relation_messages(user_query, nodes))
+        else:
+            relation = self._local_relation(user_query, nodes)
+        return _join_sections(summary, relation, caution)
+
+    async def astream(self, *, user_query: str, tool_input: Dict[str, Any]) -> AsyncIterator[str]:
+        texts: List[str] = tool_input.get("texts") or []
+
+        await self._async_sync()
+        direct = self._direct_lookup(user_query)
+        if direct is not None:
+            yield direct
+            return
+        if not texts:
+            yield NO_TEXT_MESSAGE
+            return
+        if self.clause_index is None:
+            async for delta in astream_chat_completion(self._build_messages(user_query, texts)):
+                yield delta
+            return
+
+        # 로컬에서 만든 구간은 바로 내보내고, LLM이 쓰는 "관계" 구간만 토큰 단위로 흘려보낸다.
+        nodes, summary, caution = self._structured_parts(user_query, texts)
+        yield summary + "\n\n2. 사용자 질문과의 관계\n"
+        if self.use_llm and nodes:
+            async for delta in astream_chat_completion(self._build_relation_messages(user_query, nodes)):
+                yield delta
+        else:
+            yield self._local_relation(user_query, nodes)
+        yield "\n\n" + caution
+
+
+def _node_label(title: str, node: ClauseNode) -> str:
+    parts = [part for part in (title, node.label) if part]
+    return " ".join(parts) if parts else "규정"
+
+
+def _join_sections(summary: str, relation: str, caution: str) -> str:
+    return f"{summary}\n\n2. 사용자 질문과의 관계\n{relation.strip()}\n\n{caution}"
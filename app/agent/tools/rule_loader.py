@@ -0,0 +1,225 @@
+# app/agent/tools/rule_loader.py
+from __future__ import annotations
+
+import json
+import os
+import re
+import sys
+from typing import Any, Dict, Iterator, List, Optional, TextIO
+
+_RULE_FILE_SUFFIXES = (".json", ".jsonl")
+_CHUNK_SIZE = 1 << 20  # 1 MiB
+# 규정 하나(JSON 배열 원소)의 최대 크기(문자 수). 넘으면 손상된 파일로 보고 중단
+_MAX_ITEM_SIZE = 64 << 20
+_JSON_WHITESPACE = " \t\r\n"
+# 숫자 리터럴에 올 수 있는 문자들 (청크 경계에서 잘린 숫자 판별용)
+_JSON_NUMBER_TAIL = re.compile(r"[0-9+\-.eE]*")
+
+
+class Rule:
+    """
+    메모리 효율적인 규정 레코드.
+
+    - __slots__로 규정마다 dict를 두지 않는다.
+    - title / category는 값 종류가 적으므로 sys.intern으로 같은 문자열을 공유한다.
+    - 그 외 필드는 extra에만 보관 (없으면 None)
+    """
+
+    __slots__ = ("id", "title", "category", "content", "extra")
+
+    def __init__(
+        self,
+        id: Any,
+        title: str,
+        content: str,
+        category: Optional[str] = None,
+        extra: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.id = id
+        self.title = sys.intern(title)
+        self.category = sys.intern(category) if category is not None else None
+        self.content = content
+        self.extra = extra or None
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Rule":
+        if not isinstance(data, dict):
+            raise ValueError("rules 데이터 형식이 올바르지 않습니다. (list[dict] 예상)")
+        extra = {k: v for k, v in data.items() if k not in ("id", "title", "content", "category")}
+        category = data.get("category")
+        return cls(
+            id=data.get("id"),
+            title=str(data.get("title", "")),
+            content=str(data.get("content", "")),
+            category=str(category) if category is not None else None,
+            extra=extra,
+        )
+
+    def to_dict(self) -> Dict[str, Any]:
+        """
+        API 응답/프롬프트용 dict. 원본 JSON과 같은 필드 구성을 유지한다.
+        """
+        data: Dict[str, Any] = {}
+        if self.id is not None:
+            data["id"] = self.id
+        data["title"] = self.title
+        if self.category is not None:
+            data["category"] = self.category
+        data["content"] = self.content
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    @property
+    def text(self) -> str:
+        """
+        검색 인덱스에 넣을 텍스트 (title + content).
+        """
+        return self.title + " " + self.content
+
+    def _astuple(self) -> tuple:
+        return (self.id, self.title, self.category, self.content, self.extra)
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Rule):
+            return NotImplemented
+        return self._astuple() == other._astuple()
+
+    def __repr__(self) -> str:
+        return f"Rule(id={self.id!r}, title={self.title!r})"
+
+
+def list_rule_files(path: str) -> List[str]:
+    """
+    path가 디렉토리면 그 안의 *.json / *.jsonl shard 파일들(이름순), 파일이면 [path].
+    """
+    if os.path.isdir(path):
+        return sorted(
+            os.path.join(path, name)
+            for name in os.listdir(path)
+            if name.endswith(_RULE_FILE_SUFFIXES) and os.path.isfile(os.path.join(path, name))
+        )
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"rules 데이터 파일을 찾을 수 없습니다: {path}")
+    return [path]
+
+
+def iter_rules(path: str) -> Iterator[Rule]:
+    """
+    단일 파일(.json / .jsonl) 또는 shard 디렉토리에서 규정을 하나씩 읽어온다.
+    """
+    for file_path in list_rule_files(path):
+        yield from iter_rule_file(file_path)
+
+
+def iter_rule_file(file_path: str) -> Iterator[Rule]:
+    """
+    - .jsonl: 한 줄에 규정 하나
+    - .json: 규정 리스트 하나. 전체를 json.load 하지 않고 청크 단위로 읽으면서 원소별로 파싱한다.
+    """
+    with open(file_path, "r", encoding="utf-8") as f:
+        if file_path.endswith(".jsonl"):
+            for line_no, line in enumerate(f, start=1):
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield Rule.from_dict(json.loads(line))
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"{file_path}:{line_no} JSON 파싱 실패: {e}") from e
+        else:
+            try:
+                for item in _iter_json_array(f):
+                    yield Rule.from_dict(item)
+            except ValueError as e:
+                raise ValueError(f"{file_path}: {e}") from e
+
+
+def _iter_json_array(
+    f: TextIO, chunk_size: int = _CHUNK_SIZE, max_item_size: int = _MAX_ITEM_SIZE
+) -> Iterator[Any]:
+    """
+    최상위 JSON 배열의 원소를 하나씩 파싱.
+    파일 전체 대신 현재 청크 + 파싱 중인 원소만 메모리에 올린다.
+    원소와 쉼표가 번갈아 나와야 하며 (빈 원소 / 끝 쉼표 거부), 원소 하나를 max_item_size 문자 넘게
+    읽어도 파싱되지 않으면 파일 끝까지 버퍼링하지 않고 위치(문자 offset)와 함께 ValueError.
+    """
+    decoder = json.JSONDecoder()
+    buf = ""
+    pos = 0
+    consumed = 0  # buf 앞에서 버린 문자 수 (오류 위치 계산용)
+    eof = False
+
+    def fill() -> bool:
+        nonlocal buf, pos, consumed, eof
+        if eof:
+            return False
+        chunk = f.read(chunk_size)
+        if not chunk:
+            eof = True
+            return False
+        consumed += pos
+        buf = buf[pos:] + chunk
+        pos = 0
+        return True
+
+    def skip_whitespace() -> None:
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in _JSON_WHITESPACE:
+                pos += 1
+            if pos < len(buf) or not fill():
+                return
+
+    def error(message: str) -> ValueError:
+        return ValueError(f"rules JSON 배열{message} (위치 {consumed + pos})")
+
+    skip_whitespace()
+    if pos >= len(buf) or buf[pos] != "[":
+        raise ValueError("rules 데이터 형식이 올바르지 않습니다. (list[dict] 예상)")
+    pos += 1
+
+    skip_whitespace()
+    if buf[pos:pos + 1] == "]":
+        return
+
+    while True:
+        # 원소 자리
+        skip_whitespace()
+        if pos >= len(buf):
+            raise error("이 닫히지 않았습니다.")
+        if buf[pos] in ",]":
+            raise error("에 빈 원소(또는 마지막 원소 뒤 쉼표)가 있습니다.")
+
+        while True:
+            try:
+                item, end = decoder.raw_decode(buf, pos)
+            except json.JSONDecodeError as exc:
+                # 원소가 청크 경계에 걸친 경우 → 더 읽어서 재시도 (원소 하나의 크기 상한까지만)
+                if len(buf) - pos > max_item_size:
+                    raise error(f": 원소가 {max_item_size}자를 넘도록 파싱되지 않습니다: {exc.msg}") from exc
+                if not fill():
+                    raise error(f": 원소를 파싱할 수 없습니다: {exc.msg}") from exc
+                continue
+            # 숫자 같은 스칼라는 청크 경계에서 잘려도 앞부분만으로 파싱이 성공하므로 ("-1.5e3" → "-1.5"),
+            # 뒤이은 숫자 문자들이 경계에 닿았으면 더 읽고 재시도
+            if (
+                not isinstance(item, (dict, list, str))
+                and _JSON_NUMBER_TAIL.match(buf, end).end() >= len(buf)
+                and fill()
+            ):
+                continue
+            break
+
+        pos = end
+        yield item
+
+        # 원소 뒤에는 쉼표 또는 배열 끝
+        skip_whitespace()
+        if pos >= len(buf):
+            raise error("이 닫히지 않았습니다.")
+        if buf[pos] == "]":
+            return
+        if buf[pos] != ",":
+            raise error(": 원소 사이에 쉼표가 없습니다.")
+        pos += 1
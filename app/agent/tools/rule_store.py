@@ -0,0 +1,422 @@
+# app/agent/tools/rule_store.py
+from __future__ import annotations
+
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, FrozenSet, Hashable, Iterable, Iterator, List, Mapping, Optional, Set, Tuple, Union
+
+from .rule_loader import Rule, iter_rule_file, list_rule_files
+from .search_index import InvertedIndex, OverlayIndex
+from .shared_snapshot import SharedIndex, SharedRuleMap, SharedSnapshotFile, snapshot_lock, write_snapshot
+from .vector_index import corpus_fingerprint
+
+FileSignature = Optional[Tuple[int, int, int]]
+
+# changes_since()로 돌려줄 수 있는 최근 reload 변경분 개수
+_CHANGE_LOG_SIZE = 64
+
+
+def rule_key(rule: Rule, source: str, position: int) -> Hashable:
+    """
+    규정의 식별 키. id가 없으면 (파일, 파일 내 위치)를 사용한다.
+    (증분 reload는 id 기준으로 변경분을 찾으므로 규정마다 id를 두는 것을 권장)
+    """
+    return rule.id if rule.id is not None else (os.path.basename(source), position)
+
+
+def _file_signature(path: str) -> FileSignature:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+
+class RuleOverlay(Mapping):
+    """
+    읽기 전용 base 규정 dict 위에 변경분(delta)과 삭제 표시(tombstones)만 얹은 매핑 (증분 reload용).
+    reload마다 전체 dict를 복사하지 않고, 변경분이 커지면 merge()로 평평한 dict로 합친다.
+    """
+
+    def __init__(self, base: Mapping[Hashable, Rule]) -> None:
+        self.base = base
+        self.delta: Dict[Hashable, Rule] = {}
+        self.tombstones: Set[Hashable] = set()
+        self._len = len(base)
+
+    def __getitem__(self, key: Hashable) -> Rule:
+        if key in self.delta:
+            return self.delta[key]
+        if key in self.tombstones:
+            raise KeyError(key)
+        return self.base[key]
+
+    def __contains__(self, key: object) -> bool:
+        return key in self.delta or (key in self.base and key not in self.tombstones)
+
+    def __iter__(self) -> Iterator[Hashable]:
+        for key in self.base:
+            if key not in self.tombstones and key not in self.delta:
+                yield key
+        yield from self.delta
+
+    def __len__(self) -> int:
+        return self._len
+
+    @property
+    def delta_size(self) -> int:
+        return len(self.delta) + len(self.tombstones)
+
+    def overlay(self) -> "RuleOverlay":
+        clone = RuleOverlay(self.base)
+        clone.delta = dict(self.delta)
+        clone.tombstones = set(self.tombstones)
+        clone._len = self._len
+        return clone
+
+    def set(self, key: Hashable, rule: Rule) -> None:
+        if key not in self:
+            self._len += 1
+        self.delta[key] = rule
+
+    def discard(self, key: Hashable) -> None:
+        if key not in self:
+            return
+        self._len -= 1
+        self.delta.pop(key, None)
+        if key in self.base:
+            self.tombstones.add(key)
+
+    def merge(self) -> Dict[Hashable, Rule]:
+        return dict(self.items())
+
+
+@dataclass(frozen=True)
+class RuleSnapshot:
+    """
+    특정 시점의 규정 corpus + 검색 인덱스.
+    한 번 만들어진 snapshot은 수정하지 않으므로, 요청은 시작할 때 잡은 snapshot으로
+    일관된 결과를 얻는다.
+    공유 snapshot 모드에서는 rules / index가 mmap 파일 위의 읽기 전용 객체(SharedRuleMap / SharedIndex)다.
+    """
+
+    version: int
+    rules: Mapping[Hashable, Rule]
+    index: Union[InvertedIndex, OverlayIndex, SharedIndex]
+
+    def fingerprint(self, name: str) -> str:
+        """
+        corpus_fingerprint(name, (규정 키, 텍스트) 목록). 공유 snapshot이면 파일에 기록된 digest를 써서 규정을 디코딩하지 않는다.
+        """
+        if isinstance(self.rules, SharedRuleMap):
+            return corpus_fingerprint(name, self.rules.corpus_digest)
+        return corpus_fingerprint(name, ((key, rule.text) for key, rule in self.rules.items()))
+
+
+class RuleStore:
+    """
+    규정 데이터(단일 .json / .jsonl 파일 또는 shard 디렉토리)를 읽어 RuleSnapshot을 관리하는 저장소.
+
+    - reload(): 바뀐 shard 파일만 다시 읽어 규정 id 기준으로 추가/수정/삭제분만 인덱스에 반영하고
+      새 snapshot으로 원자적으로 교체 (기존 snapshot을 읽는 요청은 그대로 진행).
+      변경분은 이전 snapshot 위의 overlay(RuleOverlay / OverlayIndex)로 얹고, overlay가
+      corpus의 overlay_merge_ratio를 넘으면 평평한 dict / 역색인으로 합친다.
+      같은 id가 여러 shard에 있으면 이름순 마지막 shard의 규정을 쓰고, 모든 shard에서 빠졌을 때만 삭제한다
+    - maybe_reload(): poll_interval마다 파일 mtime/inode/size를 확인해 바뀐 경우에만 reload
+    - changes_since(): 특정 버전 이후 추가/수정/삭제된 규정 키 (파생 인덱스가 corpus 전체를 다시 훑지 않도록)
+
+    snapshot_path를 주면 공유 snapshot 모드로 동작한다 (여러 worker 프로세스 배포용).
+    corpus와 역색인을 snapshot 파일 하나로 직렬화해 mmap으로 붙으므로 모든 worker가 같은 페이지를 공유하고,
+    규정 파일이 바뀌면 한 worker가 파일 잠금을 잡고 snapshot을 다시 쓴 뒤 나머지 worker는 새 파일에 다시 붙는다.
+    verify_sources=False면 미리 만든 snapshot을 원본 파일과 대조하지 않고 바로 붙는다
+    (snapshot이 없거나 reload(force=True)일 때만 다시 만든다).
+    """
+
+    def __init__(
+        self,
+        data_path: str,
+        poll_interval: Optional[float] = None,
+        snapshot_path: Optional[str] = None,
+        verify_sources: bool = True,
+        overlay_merge_ratio: float = 0.1,
+    ) -> None:
+        self.data_path = data_path
+        self.poll_interval = poll_interval
+        self.snapshot_path = snapshot_path
+        self.verify_sources = verify_sources
+        self.overlay_merge_ratio = overlay_merge_ratio
+        self._reload_lock = threading.Lock()
+        self._poll_lock = threading.Lock()
+        self._last_poll = time.monotonic()
+
+        # shard 파일별 시그니처 / 그 파일에서 읽은 규정 키
+        self._signatures: Dict[str, FileSignature] = {}
+        self._keys_by_source: Dict[str, List[Hashable]] = {}
+        # 규정 키 → 그 키를 가진 shard 경로 (여러 개면 이름순 튜플). 한 shard에서 빠져도 다른 shard에 남아 있으면 유지
+        self._owners: Dict[Hashable, Union[str, Tuple[str, ...]]] = {}
+        # 공유 snapshot 모드에서 현재 붙어 있는 snapshot 파일
+        self._shared: Optional[SharedSnapshotFile] = None
+        # 최근 reload의 (새 버전, 추가/수정/삭제된 규정 키)
+        self._changes: Deque[Tuple[int, FrozenSet[Hashable]]] = deque(maxlen=_CHANGE_LOG_SIZE)
+
+        if snapshot_path:
+            self._attach_shared(force=False)
+            return
+
+        rules: Dict[Hashable, Rule] = {}
+        for source in list_rule_files(data_path):
+            self._signatures[source] = _file_signature(source)
+            loaded = self._load_source(source)
+            self._keys_by_source[source] = list(loaded)
+            for key in loaded:
+                self._set_owners(key, self._owners_of(key) + (source,))
+            # id 중복 시 뒤에 나온 규정이 이전 규정을 대체
+            rules.update(loaded)
+
+        index = InvertedIndex.from_documents((key, rule.text) for key, rule in rules.items())
+        self._snapshot = RuleSnapshot(version=1, rules=rules, index=index)
+
+    @property
+    def snapshot(self) -> RuleSnapshot:
+        return self._snapshot
+
+    @property
+    def version(self) -> int:
+        return self._snapshot.version
+
+    def changes_since(self, version: int) -> Optional[Set[Hashable]]:
+        """
+        version 이후 현재 snapshot까지 추가/수정/삭제된 규정 키.
+        변경 기록이 그 버전까지 남아 있지 않으면(오래된 버전, 공유 snapshot 재작성 등) None.
+        """
+        if version >= self._snapshot.version:
+            return set()
+        entries = [(changed_version, keys) for changed_version, keys in list(self._changes) if changed_version > version]
+        if not entries or entries[0][0] != version + 1:
+            return None
+        keys: Set[Hashable] = set()
+        for _, changed in entries:
+            keys.update(changed)
+        return keys
+
+    @staticmethod
+    def _load_source(source: str) -> Dict[Hashable, Rule]:
+        return {rule_key(rule, source, position): rule for position, rule in enumerate(iter_rule_file(source))}
+
+    def _list_sources(self) -> List[str]:
+        try:
+            return list_rule_files(self.data_path)
+        except FileNotFoundError:
+            # 원본 없이 미리 만든 snapshot만 배포한 경우
+            if self.snapshot_path and not self.verify_sources:
+                return []
+            raise
+
+    def _changed_sources(self, sources: List[str]) -> List[str]:
+        return [source for source in sources if _file_signature(source) != self._signatures.get(source)]
+
+    def maybe_reload(self) -> Optional[Dict[str, Any]]:
+        """
+        poll_interval이 지났고 파일이 바뀌었으면 reload. reload 하지 않았으면 None.
+        """
+        if not self.poll_interval:
+            return None
+        # 여러 스레드가 동시에 확인해도 주기마다 한 번만 파일을 확인 / reload 한다
+        with self._poll_lock:
+            now = time.monotonic()
+            if now - self._last_poll < self.poll_interval:
+                return None
+            self._last_poll = now
+
+        sources = self._list_sources()
+        if set(sources) == set(self._signatures) and not self._changed_sources(sources) and not self._shared_replaced():
+            return None
+        return self.reload()
+
+    def reload(self, force: bool = False) -> Dict[str, Any]:
+        """
+        바뀐(force=True면 모든) shard 파일을 다시 읽어 변경분만 반영한 새 snapshot으로 교체하고 통계를 반환.
+        """
+        if self.snapshot_path:
+            with self._reload_lock:
+                return self._attach_shared(force=force)
+
+        with self._reload_lock:
+            started_at = time.perf_counter()
+            sources = list_rule_files(self.data_path)
+            changed = sources if force else self._changed_sources(sources)
+            dropped = [source for source in self._signatures if source not in sources]
+
+            old = self._snapshot
+            loaded_by_source = {source: self._load_source(source) for source in changed}
+
+            # 바뀐 / 없어진 shard에 있던 키와 새로 읽은 키의 소유 shard를 갱신한다
+            affected = set()
+            for source in changed + dropped:
+                affected.update(self._keys_by_source.get(source, ()))
+            for loaded in loaded_by_source.values():
+                affected.update(loaded)
+            previous = {key: self._owners_of(key) for key in affected}
+            for source in changed + dropped:
+                for key in self._keys_by_source.get(source, ()):
+                    self._set_owners(key, [owner for owner in self._owners_of(key) if owner != source])
+            for source, loaded in loaded_by_source.items():
+                for key in loaded:
+                    self._set_owners(key, self._owners_of(key) + (source,))
+
+            # 같은 키가 여러 shard에 있으면 이름순 마지막 shard의 규정 (최초 로드와 같은 규칙)
+            resolved: Dict[Hashable, Rule] = {}
+            unchanged_sources: Dict[str, Dict[Hashable, Rule]] = {}
+            removed: List[Hashable] = []
+            for key in affected:
+                owners = self._owners_of(key)
+                if not owners:
+                    if key in old.rules:
+                        removed.append(key)
+                    continue
+                winner = owners[-1]
+                if winner in loaded_by_source:
+                    rule = loaded_by_source[winner][key]
+                elif previous[key] and previous[key][-1] == winner:
+                    continue
+                else:
+                    # 다른 shard가 빠지면서 바뀌지 않은 shard의 규정이 대표가 된 경우 그 shard만 다시 읽는다
+                    if winner not in unchanged_sources:
+                        unchanged_sources[winner] = self._load_source(winner)
+                    rule = unchanged_sources[winner][key]
+                if key not in old.rules or old.rules[key] != rule:
+                    resolved[key] = rule
+
+            added = [key for key in resolved if key not in old.rules]
+            updated = [key for key in resolved if key in old.rules]
+            merged = False
+
+            if resolved or removed:
+                # 전체 dict / posting을 복사하지 않고 변경분만 overlay에 얹는다
+                rules = old.rules.overlay() if isinstance(old.rules, RuleOverlay) else RuleOverlay(old.rules)
+                index = old.index.overlay()
+
+                for key in removed + updated:
+                    index.remove_document(key, old.rules[key].text)
+                for key in removed:
+                    rules.discard(key)
+                for key in added + updated:
+                    rules.set(key, resolved[key])
+                    index.add_document(key, resolved[key].text)
+
+                # 변경분이 corpus의 일정 비율을 넘으면 평평한 dict / 역색인으로 합친다
+                if index.delta_size > self.overlay_merge_ratio * len(index):
+                    rules, index = rules.merge(), index.merge()
+                    merged = True
+
+                # 참조 교체 한 번으로 원자적 swap
+                self._snapshot = RuleSnapshot(version=old.version + 1, rules=rules, index=index)
+                self._changes.append((old.version + 1, frozenset(resolved).union(removed)))
+
+            for source, loaded in loaded_by_source.items():
+                self._signatures[source] = _file_signature(source)
+                self._keys_by_source[source] = list(loaded)
+            for source in dropped:
+                self._signatures.pop(source, None)
+                self._keys_by_source.pop(source, None)
+
+            return {
+                "version": self._snapshot.version,
+                "reloaded_files": len(changed),
+                "added": len(added),
+                "updated": len(updated),
+                "removed": len(removed),
+                "merged": merged,
+                "total": len(self._snapshot.rules),
+                "seconds": round(time.perf_counter() - started_at, 6),
+            }
+
+    def _owners_of(self, key: Hashable) -> Tuple[str, ...]:
+        owners = self._owners.get(key, ())
+        return (owners,) if isinstance(owners, str) else owners
+
+    def _set_owners(self, key: Hashable, owners: Iterable[str]) -> None:
+        # 대부분의 키는 shard 하나에만 있으므로 그때는 튜플 대신 경로 문자열 하나만 저장
+        owners = tuple(sorted(set(owners)))
+        if not owners:
+            self._owners.pop(key, None)
+        elif len(owners) == 1:
+            self._owners[key] = owners[0]
+        else:
+            self._owners[key] = owners
+
+    # 공유 snapshot 모드
+
+    def _shared_replaced(self) -> bool:
+        """
+        다른 worker가 snapshot 파일을 새로 써서(os.replace) 현재 붙어 있는 파일과 달라졌는지.
+        """
+        if not self.snapshot_path or self._shared is None:
+            return False
+        return _file_signature(self.snapshot_path) != self._shared.signature
+
+    def _attach_shared(self, force: bool) -> Dict[str, Any]:
+        """
+        snapshot 파일에 붙는다. 파일이 없거나, 기록된 규정 파일 시그니처가 지금 파일과 다르거나, force=True면
+        파일 잠금을 잡은 한 프로세스만 전체 규정을 읽어 snapshot을 다시 쓴다.
+        (잠금을 기다리는 동안 다른 worker가 이미 새로 썼다면 그 파일에 붙기만 한다)
+        """
+        started_at = time.perf_counter()
+        old = self._shared
+        rebuilt = False
+
+        with snapshot_lock(self.snapshot_path):
+            sources = {source: _file_signature(source) for source in self._list_sources()}
+            current = self._open_shared()
+            written_by_other = current is not None and old is not None and current.signature != old.signature
+            if current is None or (force and not written_by_other):
+                stale = True
+            elif self.verify_sources:
+                stale = _stored_sources(current) != sources
+            else:
+                stale = False
+            # 원본 없이 snapshot만 배포된 replica에서는 빈 corpus로 덮어쓰지 않는다.
+            if stale and current is not None and not sources and not self.verify_sources:
+                stale = False
+
+            if stale:
+                rules: Dict[Hashable, Rule] = {}
+                for source in sources:
+                    rules.update(self._load_source(source))
+                version = max(current.version if current else 0, old.version if old else 0) + 1
+                write_snapshot(
+                    self.snapshot_path,
+                    rules,
+                    version=version,
+                    sources={source: list(sig) if sig else None for source, sig in sources.items()},
+                )
+                current = SharedSnapshotFile(self.snapshot_path)
+                rebuilt = True
+
+        self._shared = current
+        self._signatures = dict(sources)
+        if old is None or current.signature != old.signature:
+            # snapshot 파일을 통째로 다시 쓰므로 규정 단위 변경분은 알 수 없다
+            self._changes.clear()
+            self._snapshot = RuleSnapshot(version=current.version, rules=SharedRuleMap(current), index=SharedIndex(current))
+
+        return {
+            "version": self._snapshot.version,
+            "reloaded_files": len(sources) if rebuilt else 0,
+            "rebuilt": rebuilt,
+            "total": len(self._snapshot.rules),
+            "seconds": round(time.perf_counter() - started_at, 6),
+        }
+
+    def _open_shared(self) -> Optional[SharedSnapshotFile]:
+        try:
+            return SharedSnapshotFile(self.snapshot_path)
+        except (OSError, ValueError):
+            return None
+
+
+def _stored_sources(snapshot: SharedSnapshotFile) -> Dict[str, FileSignature]:
+    return {source: tuple(sig) if sig else None for source, sig in snapshot.sources.items()}
@@ -0,0 +1,283 @@
+# app/agent/tools/search_cache.py
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import re
+import sys
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Dict, Hashable, Iterable, Iterator, List, Optional, Tuple
+
+from .search_index import tokenize
+
+"""
+SearchTool 검색 결과 캐시.
+
+- 키: (정규화한 검색어, top_k). keyword 모드는 BM25 점수가 질의 term 구성에만 의존하므로
+  term을 정렬한 문자열을 키로 써서 어순 / 조사 / 문장부호만 다른 질의도 같은 결과를 공유한다.
+- 값: 규정 키 목록 (규정 본문은 snapshot에서 꺼내므로 캐시 메모리는 작다)
+- corpus 버전(RuleSnapshot.version)이 바뀌면 모두 비운다 (reload 즉시 무효화)
+- 오프라인 작업(main)으로 접근 로그의 상위 질의 top-k를 미리 계산해 두면 시작할 때 고정(pinned) 항목으로 적재한다.
+  pinned 항목은 LRU로 밀려나지 않고, corpus가 바뀌면 새 snapshot 기준으로 다시 계산된다.
+"""
+
+_WHITESPACE = re.compile(r"\s+")
+# 항목당 대략적인 고정 비용(바이트): OrderedDict 노드 + 키 tuple + 리스트
+_ENTRY_OVERHEAD = 200
+_KEY_BYTES = 64
+
+CacheKey = Tuple[str, int]
+
+
+def normalize_search_query(query: str, by_terms: bool = True) -> str:
+    """
+    by_terms=True(keyword 모드): 토큰을 정렬해 이어 붙인 문자열. False: 소문자화 + 공백 정리.
+    """
+    if by_terms:
+        return " ".join(sorted(tokenize(query)))
+    return _WHITESPACE.sub(" ", query.strip().lower())
+
+
+def _entry_bytes(key: CacheKey, doc_keys: List[Hashable]) -> int:
+    return _ENTRY_OVERHEAD + len(key[0].encode("utf-8")) + _KEY_BYTES * len(doc_keys)
+
+
+def _decode_key(value: Any) -> Hashable:
+    return tuple(value) if isinstance(value, list) else value
+
+
+class SearchResultCache:
+    """
+    LRU 검색 결과 캐시 (항목 수 / 추정 메모리 상한, 스레드 안전).
+
+    :param max_entries: 최대 항목 수 (pinned 포함)
+    :param max_bytes: 추정 메모리 상한
+    """
+
+    def __init__(self, max_entries: int = 4096, max_bytes: int = 16 * 1024 * 1024, by_terms: bool = True) -> None:
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.by_terms = by_terms
+        self._entries: "OrderedDict[CacheKey, List[Hashable]]" = OrderedDict()
+        # pinned 질의 → 결과 (None이면 현재 snapshot 기준으로 아직 계산하지 않음)
+        self._pinned: Dict[CacheKey, Optional[List[Hashable]]] = {}
+        self._bytes = 0
+        self._version: Optional[int] = None
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.pinned_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def __len__(self) -> int:
+        return len(self._entries) + len(self._pinned)
+
+    def make_key(self, query: str, top_k: int) -> CacheKey:
+        return normalize_search_query(query, self.by_terms), top_k
+
+    def _sync_version(self, version: int) -> None:
+        # lock을 잡은 상태에서 호출
+        if self._version == version:
+            return
+        if self._version is not None:
+            self.invalidations += 1
+        self._entries.clear()
+        self._bytes = 0
+        # pinned 질의는 남기되 결과는 새 snapshot 기준으로 다시 계산하도록 비운다.
+        self._pinned = dict.fromkeys(self._pinned)
+        self._version = version
+
+    def get(self, version: int, key: CacheKey) -> Optional[List[Hashable]]:
+        with self._lock:
+            self._sync_version(version)
+            pinned = self._pinned.get(key)
+            if pinned is not None:
+                self.hits += 1
+                self.pinned_hits += 1
+                return pinned
+            doc_keys = self._entries.get(key)
+            if doc_keys is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return doc_keys
+
+    def set(self, version: int, key: CacheKey, doc_keys: List[Hashable]) -> None:
+        with self._lock:
+            self._sync_version(version)
+            if key in self._pinned:
+                self._pinned[key] = list(doc_keys)
+                return
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= _entry_bytes(key, old)
+            self._entries[key] = list(doc_keys)
+            self._bytes += _entry_bytes(key, doc_keys)
+            while self._entries and (
+                len(self._entries) + len(self._pinned) > self.max_entries or self._bytes > self.max_bytes
+            ):
+                evicted_key, evicted = self._entries.popitem(last=False)
+                self._bytes -= _entry_bytes(evicted_key, evicted)
+                self.evictions += 1
+
+    def pin(self, version: int, results: Dict[CacheKey, Optional[List[Hashable]]]) -> None:
+        """
+        미리 계산한 결과를 고정 항목으로 등록 (LRU로 밀려나지 않음). 결과가 None이면 처음 조회할 때 계산해 채운다.
+        """
+        with self._lock:
+            self._sync_version(version)
+            for key, doc_keys in results.items():
+                old = self._entries.pop(key, None)
+                if old is not None:
+                    self._bytes -= _entry_bytes(key, old)
+                self._pinned[key] = list(doc_keys) if doc_keys is not None else None
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._pinned.clear()
+            self._bytes = 0
+
+    def stats_dict(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "pinned_hits": self.pinned_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+            "size": len(self._entries),
+            "pinned": len(self._pinned),
+            "approx_bytes": self._bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "corpus_version": self._version,
+        }
+
+
+class SearchQueryLog:
+    """
+    검색어 로그 (JSONL, 한 줄에 {"query", "top_k", "ts"}). 오프라인 precompute 작업의 입력.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "a", encoding="utf-8", buffering=1)
+
+    def write(self, query: str, top_k: int) -> None:
+        line = json.dumps({"query": query, "top_k": top_k, "ts": round(time.time(), 3)}, ensure_ascii=False)
+        with self._lock:
+            self._file.write(line + "\n")
+
+
+def iter_logged_queries(paths: Iterable[str]) -> Iterator[Tuple[str, Optional[int]]]:
+    """
+    로그 파일에서 (검색어, top_k)를 읽는다.
+    - JSONL: {"query": ...} 또는 {"tool": "search", "tool_input": {"query": ...}} 형태 (Agent step 기록 포함)
+    - 그 외 줄은 한 줄 = 검색어 하나로 취급
+    """
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                if line.startswith("{"):
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    tool_input = record.get("tool_input") if record.get("tool") == "search" else None
+                    source = tool_input if isinstance(tool_input, dict) else record
+                    query = source.get("query")
+                    if isinstance(query, str) and query.strip():
+                        top_k = source.get("top_k")
+                        yield query, top_k if isinstance(top_k, int) else None
+                else:
+                    yield line, None
+
+
+def load_precomputed(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or not isinstance(data.get("entries"), list):
+        return None
+    return data
+
+
+def precomputed_results(data: Dict[str, Any]) -> Dict[CacheKey, List[Hashable]]:
+    return {
+        (entry["key"], int(entry["top_k"])): [_decode_key(k) for k in entry["results"]]
+        for entry in data["entries"]
+    }
+
+
+__all__ = [
+    "SearchResultCache",
+    "SearchQueryLog",
+    "normalize_search_query",
+    "iter_logged_queries",
+    "load_precomputed",
+    "precomputed_results",
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="자주 쓰는 검색어의 top-k 결과를 미리 계산")
+    parser.add_argument("--data", required=True, help="규정 데이터 경로 (.json / .jsonl / shard 디렉토리)")
+    parser.add_argument("--logs", required=True, nargs="+", help="검색어 로그 (SEARCH_QUERY_LOG_PATH JSONL / 질의 한 줄씩)")
+    parser.add_argument("--output", required=True, help="저장할 precompute 결과(JSON) 경로")
+    parser.add_argument("--top-n", type=int, default=1000, help="미리 계산할 상위 질의 수")
+    parser.add_argument("--top-k", type=int, default=3, help="로그에 top_k가 없을 때 사용할 값")
+    args = parser.parse_args()
+
+    from .rule_store import RuleStore
+
+    counts: Counter = Counter()
+    samples: Dict[CacheKey, str] = {}
+    for query, top_k in iter_logged_queries(args.logs):
+        key = (normalize_search_query(query), top_k or args.top_k)
+        if not key[0]:
+            continue
+        counts[key] += 1
+        samples.setdefault(key, query)
+
+    store = RuleStore(args.data)
+    snapshot = store.snapshot
+    entries = []
+    for (key, top_k), count in counts.most_common(args.top_n):
+        hits = snapshot.index.search(samples[(key, top_k)], top_k)
+        entries.append({"key": key, "top_k": top_k, "count": count, "results": [doc for _, doc in hits]})
+
+    data = {
+        "corpus": snapshot.fingerprint("search"),
+        "entries": entries,
+    }
+    tmp_path = f"{args.output}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(tmp_path, args.output)
+
+    total = sum(counts.values())
+    covered = sum(entry["count"] for entry in entries)
+    print(
+        f"질의 {total}건 중 상위 {len(entries)}개 (로그 대비 {covered / total if total else 0:.1%}) → {args.output}",
+        file=sys.stderr,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+# app/agent/tools/search_index.py
+from __future__ import annotations
+
+import heapq
+import math
+import re
+from collections import Counter
+from typing import Any, Dict, Hashable, Iterable, List, Optional, Set, Tuple
+
+# 한글 음절 / 영문·숫자 연속 구간
+_TOKEN_PATTERN = re.compile(r"[가-힣]+|[a-z0-9]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    규정 텍스트용 토크나이저.
+
+    - 영문/숫자: 소문자화 후 연속 구간을 하나의 토큰으로 사용
+    - 한글: 조사/어미가 붙어도 매칭되도록 문자 bigram으로 분해
+      (예: "연차휴가는" → "연차", "차휴", "휴가", "가는")
+    - 한 글자짜리 한글 구간은 그대로 토큰으로 사용
+    """
+    tokens: List[str] = []
+    for chunk in _TOKEN_PATTERN.findall(text.lower()):
+        if "가" <= chunk[0] <= "힣":
+            if len(chunk) == 1:
+                tokens.append(chunk)
+            else:
+                tokens.extend(chunk[i : i + 2] for i in range(len(chunk) - 1))
+        else:
+            tokens.append(chunk)
+    return tokens
+
+
+class InvertedIndex:
+    """
+    postings-list 기반 역색인 + BM25 랭킹.
+
+    - postings: term → {doc_key: term frequency}
+    - 검색 비용은 전체 문서 수가 아니라 질의어가 등장하는 posting 수에 비례한다.
+    - doc_key는 규정 id처럼 hashable한 값이면 무엇이든 사용 가능.
+    - copy()는 posting dict를 공유하는 복제본을 만들고, 복제본에서 수정되는 term의
+      posting만 그때 복사한다 (copy-on-write). 기존 인덱스를 읽는 요청은 영향을 받지 않는다.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75) -> None:
+        self.k1 = k1
+        self.b = b
+        self.postings: Dict[str, Dict[Hashable, int]] = {}
+        self.doc_lengths: Dict[Hashable, int] = {}
+        self._total_length = 0
+        # copy()로 만들어진 인덱스에서, 이 인덱스가 직접 소유한(복사한) posting의 term 집합.
+        # None이면 모든 posting을 소유한 상태.
+        self._owned_terms: Optional[Set[str]] = None
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    def __contains__(self, doc_key: Hashable) -> bool:
+        return doc_key in self.doc_lengths
+
+    @property
+    def avg_doc_length(self) -> float:
+        if not self.doc_lengths:
+            return 0.0
+        return self._total_length / len(self.doc_lengths)
+
+    def add_document(self, doc_key: Hashable, text: str) -> None:
+        if doc_key in self.doc_lengths:
+            raise ValueError(f"이미 색인된 문서입니다: {doc_key!r} (먼저 remove_document 필요)")
+
+        tokens = tokenize(text)
+        for term, tf in Counter(tokens).items():
+            self._writable_posting(term)[doc_key] = tf
+
+        self.doc_lengths[doc_key] = len(tokens)
+        self._total_length += len(tokens)
+
+    def remove_document(self, doc_key: Hashable, text: str) -> None:
+        """
+        문서를 색인에서 제거한다.
+        색인 당시의 text를 넘겨야 해당 term의 posting만 골라서 지울 수 있다.
+        """
+        if doc_key not in self.doc_lengths:
+            return
+
+        for term in set(tokenize(text)):
+            if term not in self.postings:
+                continue
+            posting = self._writable_posting(term)
+            posting.pop(doc_key, None)
+            if not posting:
+                del self.postings[term]
+
+        self._total_length -= self.doc_lengths.pop(doc_key)
+
+    def copy(self) -> "InvertedIndex":
+        """
+        posting dict를 공유하는 얕은 복제본.
+        이후 복제본에 add/remove 하면 건드린 term의 posting만 복사되므로
+        비용은 전체 corpus가 아니라 변경된 문서의 term 수에 비례한다.
+        (term → posting, doc_key → 길이 매핑 자체는 포인터 단위로 얕게 복사)
+        """
+        clone = InvertedIndex(k1=self.k1, b=self.b)
+        clone.postings = dict(self.postings)
+        clone.doc_lengths = dict(self.doc_lengths)
+        clone._total_length = self._total_length
+        clone._owned_terms = set()
+        return clone
+
+    def _writable_posting(self, term: str) -> Dict[Hashable, int]:
+        posting = self.postings.get(term)
+        if posting is None:
+            posting = self.postings[term] = {}
+            if self._owned_terms is not None:
+                self._owned_terms.add(term)
+        elif self._owned_terms is not None and term not in self._owned_terms:
+            posting = self.postings[term] = dict(posting)
+            self._owned_terms.add(term)
+        return posting
+
+    def search(self, query: str, top_k: int) -> List[Tuple[float, Hashable]]:
+        """
+        BM25 점수 기준 상위 top_k개의 (score, doc_key)를 반환.
+        """
+        if top_k <= 0 or not self.doc_lengths:
+            return []
+
+        n_docs = len(self.doc_lengths)
+        avg_len = self.avg_doc_length or 1.0
+        k1, b = self.k1, self.b
+
+        scores: Dict[Hashable, float] = {}
+        for term, qtf in Counter(tokenize(query)).items():
+            posting = self.postings.get(term)
+            if not posting:
+                continue
+
+            df = len(posting)
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_key, tf in posting.items():
+                norm = k1 * (1.0 - b + b * self.doc_lengths[doc_key] / avg_len)
+                scores[doc_key] = scores.get(doc_key, 0.0) + qtf * idf * tf * (k1 + 1.0) / (tf + norm)
+
+        return heapq.nlargest(top_k, ((score, key) for key, score in scores.items()), key=lambda x: x[0])
+
+    def overlay(self) -> "OverlayIndex":
+        """
+        이 인덱스를 수정하지 않는 base로 두고 변경분만 따로 담는 OverlayIndex (만드는 비용 O(1)).
+        """
+        return OverlayIndex(self)
+
+    @classmethod
+    def from_documents(cls, docs: Iterable[Tuple[Hashable, str]], **kwargs: Any) -> "InvertedIndex":
+        index = cls(**kwargs)
+        for doc_key, text in docs:
+            index.add_document(doc_key, text)
+        return index
+
+
+class OverlayIndex:
+    """
+    읽기 전용 base InvertedIndex 위에 변경분만 얹은 역색인 (증분 reload용).
+
+    - delta: 추가/수정된 문서만 담은 작은 InvertedIndex
+    - tombstones: base에서 삭제(또는 수정되어 delta로 옮겨진) 문서 키
+    - overlay(): delta / tombstones만 복사한 다음 버전 → reload 비용은 corpus가 아니라 변경분에 비례
+    - merge(): 변경분이 커지면 base와 합친 평평한 InvertedIndex로 정리 (변경되지 않은 term의 posting은 공유)
+    검색 점수(BM25)는 같은 문서 집합으로 만든 InvertedIndex와 같다.
+    """
+
+    def __init__(self, base: InvertedIndex) -> None:
+        self.base = base
+        self.k1 = base.k1
+        self.b = base.b
+        self.delta = InvertedIndex(k1=base.k1, b=base.b)
+        self.tombstones: Set[Hashable] = set()
+        self._total_length = base._total_length
+
+    def __len__(self) -> int:
+        return len(self.base) - len(self.tombstones) + len(self.delta)
+
+    def __contains__(self, doc_key: Hashable) -> bool:
+        return doc_key in self.delta or (doc_key in self.base and doc_key not in self.tombstones)
+
+    @property
+    def avg_doc_length(self) -> float:
+        n_docs = len(self)
+        if not n_docs:
+            return 0.0
+        return self._total_length / n_docs
+
+    @property
+    def delta_size(self) -> int:
+        return len(self.delta) + len(self.tombstones)
+
+    def add_document(self, doc_key: Hashable, text: str) -> None:
+        if doc_key in self:
+            raise ValueError(f"이미 색인된 문서입니다: {doc_key!r} (먼저 remove_document 필요)")
+        self.delta.add_document(doc_key, text)
+        self._total_length += self.delta.doc_lengths[doc_key]
+
+    def remove_document(self, doc_key: Hashable, text: str) -> None:
+        if doc_key in self.delta:
+            self._total_length -= self.delta.doc_lengths[doc_key]
+            self.delta.remove_document(doc_key, text)
+        elif doc_key in self.base and doc_key not in self.tombstones:
+            self._total_length -= self.base.doc_lengths[doc_key]
+            self.tombstones.add(doc_key)
+
+    def overlay(self) -> "OverlayIndex":
+        clone = OverlayIndex(self.base)
+        clone.delta = self.delta.copy()
+        clone.tombstones = set(self.tombstones)
+        clone._total_length = self._total_length
+        return clone
+
+    def merge(self) -> InvertedIndex:
+        merged = InvertedIndex(k1=self.k1, b=self.b)
+        tombstones = self.tombstones
+        for term, posting in self.base.postings.items():
+            if tombstones and not tombstones.isdisjoint(posting):
+                posting = {doc_key: tf for doc_key, tf in posting.items() if doc_key not in tombstones}
+                if not posting:
+                    continue
+            merged.postings[term] = posting
+        # base와 공유하는 posting은 merged에서 수정할 때 복사되도록 copy-on-write 상태로 둔다
+        merged._owned_terms = set()
+        for term, posting in self.delta.postings.items():
+            merged._writable_posting(term).update(posting)
+        if tombstones:
+            merged.doc_lengths = {k: n for k, n in self.base.doc_lengths.items() if k not in tombstones}
+        else:
+            merged.doc_lengths = dict(self.base.doc_lengths)
+        merged.doc_lengths.update(self.delta.doc_lengths)
+        merged._total_length = self._total_length
+        return merged
+
+    def search(self, query: str, top_k: int) -> List[Tuple[float, Hashable]]:
+        n_docs = len(self)
+        if top_k <= 0 or not n_docs:
+            return []
+
+        avg_len = self.avg_doc_length or 1.0
+        k1, b = self.k1, self.b
+        tombstones = self.tombstones
+        base_lengths, delta_lengths = self.base.doc_lengths, self.delta.doc_lengths
+
+        scores: Dict[Hashable, float] = {}
+        for term, qtf in Counter(tokenize(query)).items():
+            live = [
+                (doc_key, tf, base_lengths[doc_key])
+                for doc_key, tf in self.base.postings.get(term, {}).items()
+                if doc_key not in tombstones
+            ]
+            live.extend((doc_key, tf, delta_lengths[doc_key]) for doc_key, tf in self.delta.postings.get(term, {}).items())
+            if not live:
+                continue
+
+            df = len(live)
+            idf = math.log(1.0 + (n_docs - df + 0.5) / (df + 0.5))
+            for doc_key, tf, length in live:
+                norm = k1 * (1.0 - b + b * length / avg_len)
+                scores[doc_key] = scores.get(doc_key, 0.0) + qtf * idf * tf * (k1 + 1.0) / (tf + norm)
+
+        return heapq.nlargest(top_k, ((score, key) for key, score in scores.items()), key=lambda x: x[0])
@@ -1,56 +1,181 @@
 # app/agent/tools/search_tool.py
-import json
-import os
-from typing import List, Dict, Any
+import threading
+from typing import List, Dict, Any, Hashable, Optional, Tuple
 
 from .base import Tool
+from .rule_store import RuleSnapshot, RuleStore
+from .search_cache import SearchQueryLog, SearchResultCache, load_precomputed, precomputed_results
+from .vector_index import EmbeddingFn, VectorIndex, embedder_name, fuse_scores
+
+SEARCH_MODES = ("keyword", "vector", "hybrid")
 
 
 class SearchTool(Tool):
     """
-    규정(rule) 텍스트에 대해 간단한 키워드 기반 검색을 수행하는 Tool.
+    규정(rule) 텍스트에 대해 역색인 + BM25 기반 키워드 검색을 수행하는 Tool.
+    mode="vector" / "hybrid"면 임베딩 cosine 검색(및 BM25와의 점수 결합)을 사용한다.
     실제 서비스에서는 Qdrant, Elasticsearch 등으로 교체 가능한 위치.
     """
 
     name = "search"
     description = "규정 텍스트에서 키워드 기반으로 관련 조항을 검색하는 Tool"
 
-    def __init__(self, data_path: str, default_top_k: int = 3) -> None:
+    def __init__(
+        self,
+        data_path: str,
+        default_top_k: int = 3,
+        poll_interval: Optional[float] = None,
+        snapshot_path: Optional[str] = None,
+        snapshot_verify: bool = True,
+        mode: str = "keyword",
+        embedder: Optional[EmbeddingFn] = None,
+        vector_path: Optional[str] = None,
+        hybrid_alpha: float = 0.5,
+        ivf_lists: int = 0,
+        ivf_probe: int = 8,
+        cache: Optional[SearchResultCache] = None,
+        precomputed_path: Optional[str] = None,
+        query_log_path: Optional[str] = None,
+    ) -> None:
+        """
+        :param snapshot_path: 지정하면 여러 worker 프로세스가 mmap으로 공유하는 규정 snapshot 파일을 사용
+        :param snapshot_verify: False면 이미 있는 snapshot 파일을 원본 규정 파일과 대조하지 않고 바로 사용
+        :param mode: "keyword"(BM25) | "vector"(임베딩 cosine) | "hybrid"(두 점수 결합)
+        :param embedder: List[str] → (n, dim) 행렬을 반환하는 임베딩 함수 (vector / hybrid 모드에서 필수)
+        :param vector_path: 임베딩 행렬을 저장/memory-map 할 .npy 경로 (None이면 메모리에만 보관)
+        :param hybrid_alpha: hybrid 점수에서 vector 점수의 가중치 (0~1)
+        :param ivf_lists: 0보다 크면 IVF 근사 검색용 클러스터 수
+        :param cache: 검색 결과 캐시 (None이면 매번 다시 계산)
+        :param precomputed_path: 자주 쓰는 검색어의 미리 계산한 top-k 결과(JSON), keyword 모드에서 캐시에 고정 적재
+        :param query_log_path: 지정하면 검색어를 JSONL로 기록 (precompute 작업 입력)
+        """
+        if mode not in SEARCH_MODES:
+            raise ValueError(f"알 수 없는 검색 모드: {mode} (keyword | vector | hybrid)")
+        if mode != "keyword" and embedder is None:
+            raise ValueError(f"검색 모드 {mode}에는 embedder가 필요합니다.")
+
         self.data_path = data_path
         self.default_top_k = default_top_k
-        self.rules = self._load_rules()
-
-    def _load_rules(self) -> List[Dict[str, Any]]:
-        if not os.path.exists(self.data_path):
-            raise FileNotFoundError(f"rules 데이터 파일을 찾을 수 없습니다: {self.data_path}")
-
-        with open(self.data_path, "r", encoding="utf-8") as f:
-            data = json.load(f)
-
-        if not isinstance(data, list):
-            raise ValueError("rules 데이터 형식이 올바르지 않습니다. (list[dict] 예상)")
+        self.mode = mode
+        self.embedder = embedder
+        self.vector_path = vector_path
+        self.hybrid_alpha = hybrid_alpha
+        self.ivf_lists = ivf_lists
+        self.ivf_probe = ivf_probe
+        # 규정 corpus + 인덱스 snapshot 관리 (파일 변경 시 증분 reload)
+        self.store = RuleStore(
+            data_path, poll_interval=poll_interval, snapshot_path=snapshot_path, verify_sources=snapshot_verify
+        )
+
+        # 임베딩 인덱스와, 그 인덱스를 만든 snapshot
+        self._vector_lock = threading.Lock()
+        self._vectors: Optional[VectorIndex] = None
+        self._vector_snapshot: Optional[RuleSnapshot] = None
+        if mode != "keyword":
+            self._sync_vectors(self.store.snapshot)
+
+        self.cache = cache
+        self.query_log = SearchQueryLog(query_log_path) if query_log_path else None
+        if cache is not None and precomputed_path and mode == "keyword":
+            self._load_precomputed(precomputed_path)
+
+    @property
+    def rules(self) -> List[Dict[str, Any]]:
+        return [rule.to_dict() for rule in self.store.snapshot.rules.values()]
+
+    def reload(self) -> Dict[str, Any]:
+        """
+        규정 데이터를 모두 다시 읽어 변경분만 반영 (관리자 reload용).
+        """
+        stats = self.store.reload(force=True)
+        if self.mode != "keyword":
+            self._sync_vectors(self.store.snapshot)
+        return stats
 
-        return data
+    def _sync_vectors(self, snapshot: RuleSnapshot) -> VectorIndex:
+        """
+        snapshot에 맞는 임베딩 인덱스를 반환.
+        - 처음: vector_path의 .npy를 memory-map으로 열고, 없거나 corpus가 바뀌었으면 전체를 배치 임베딩해 저장
+        - reload 이후: 추가/수정된 규정만 다시 임베딩한 새 인덱스로 교체
+        """
+        with self._vector_lock:
+            current = self._vector_snapshot
+            if self._vectors is not None and current is not None and current.version >= snapshot.version:
+                return self._vectors
+
+            fingerprint = snapshot.fingerprint(embedder_name(self.embedder))
+
+            if self._vectors is None or current is None:
+                vectors = VectorIndex.load(self.vector_path, fingerprint) if self.vector_path else None
+                if vectors is None:
+                    docs = [(key, rule.text) for key, rule in snapshot.rules.items()]
+                    vectors = VectorIndex.build(docs, self.embedder, fingerprint)
+                    if self.vector_path:
+                        vectors.save(self.vector_path)
+            else:
+                docs = [(key, rule.text) for key, rule in snapshot.rules.items()]
+                changed = [
+                    key
+                    for key, rule in snapshot.rules.items()
+                    if current.rules.get(key) is not rule and current.rules.get(key) != rule
+                ]
+                vectors = self._vectors.updated(docs, changed, self.embedder, fingerprint)
+                if self.vector_path:
+                    vectors.save(self.vector_path)
+
+            if self.ivf_lists:
+                vectors.build_ivf(self.ivf_lists, n_probe=self.ivf_probe)
+
+            self._vectors = vectors
+            self._vector_snapshot = snapshot
+            return vectors
+
+    def _load_precomputed(self, path: str) -> None:
+        """
+        precompute 결과를 캐시에 고정 적재. corpus가 precompute 당시와 다르면 질의만 고정하고 결과는 첫 조회 때 계산.
+        """
+        data = load_precomputed(path)
+        if data is None:
+            return
+        snapshot = self.store.snapshot
+        results = precomputed_results(data)
+        fingerprint = snapshot.fingerprint("search")
+        if data.get("corpus") != fingerprint:
+            results = dict.fromkeys(results)
+        self.cache.pin(snapshot.version, results)
 
     def _search(self, *, query: str, top_k: int) -> List[Dict[str, Any]]:
         """
-        매우 단순한 키워드 매칭 기반 검색.
+        - keyword: 질의어가 등장하는 posting만 순회하는 BM25, heap으로 상위 top_k만 선택
+        - vector: 질의 임베딩과 전체(또는 IVF로 고른) 규정 임베딩의 cosine top-k
+        - hybrid: 두 방식의 후보를 넉넉히 뽑아 정규화 점수를 가중 합산
         """
-        query_lower = query.lower()
-        scored: List[tuple[int, Dict[str, Any]]] = []
-
-        for rule in self.rules:
-            title = str(rule.get("title", ""))
-            content = str(rule.get("content", ""))
-            text = (title + " " + content).lower()
-
-            score = sum(query_lower.count(token) for token in query_lower.split())
-            if score > 0:
-                scored.append((score, rule))
-
-        scored.sort(key=lambda x: x[0], reverse=True)
-        results = [item[1] for item in scored[:top_k]]
-        return results
+        # 요청 중간에 reload 되어도 같은 snapshot으로 일관되게 조회
+        snapshot = self.store.snapshot
+        cache_key = self.cache.make_key(query, top_k) if self.cache is not None else None
+        doc_keys = self.cache.get(snapshot.version, cache_key) if cache_key is not None else None
+
+        if doc_keys is None:
+            if self.mode == "keyword":
+                hits = snapshot.index.search(query, top_k)
+            else:
+                hits = self._dense_hits(snapshot, query, top_k)
+            doc_keys = [doc_key for _, doc_key in hits]
+            if cache_key is not None:
+                self.cache.set(snapshot.version, cache_key, doc_keys)
+        return [snapshot.rules[doc_key].to_dict() for doc_key in doc_keys if doc_key in snapshot.rules]
+
+    def _dense_hits(self, snapshot: RuleSnapshot, query: str, top_k: int) -> List[Tuple[float, Hashable]]:
+        vectors = self._sync_vectors(snapshot)
+        # 더 새로운 snapshot 기준 인덱스일 수 있으므로, 없는 규정이 섞여도 top_k를 채우도록 여유 있게 조회
+        candidates = top_k * 4 if self.mode == "hybrid" else top_k + 8
+        vector_hits = vectors.search(query, self.embedder, candidates)
+        if self.mode == "vector":
+            return [hit for hit in vector_hits if hit[1] in snapshot.rules][:top_k]
+
+        keyword_hits = snapshot.index.search(query, candidates)
+        vector_hits = [hit for hit in vector_hits if hit[1] in snapshot.rules]
+        return fuse_scores(keyword_hits, vector_hits, self.hybrid_alpha, top_k)
 
     def run(self, *, user_query: str, tool_input: Dict[str, Any]) -> List[Dict[str, Any]]:
         """
@@ -66,4 +191,7 @@ class SearchTool(Tool):
         if not query:
             return []
 
+        if self.query_log is not None:
+            self.query_log.write(query, top_k)
+        self.store.maybe_reload()
         return self._search(query=query, top_k=top_k)
@@ -0,0 +1,374 @@
+# app/agent/tools/shared_snapshot.py
+from __future__ import annotations
+
+import argparse
+import bisect
+import heapq
+import json
+import math
+import mmap
+import os
+import struct
+from collections import Counter
+from contextlib import contextmanager
+from typing import Any, Dict, Hashable, Iterator, List, Mapping, Optional, Sequence, Tuple
+
+from .rule_loader import Rule
+from .search_index import tokenize
+from .vector_index import corpus_digest
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - Windows: 파일 잠금 없이 동작 (단일 프로세스 권장)
+    fcntl = None  # type: ignore[assignment]
+
+"""
+여러 worker 프로세스가 함께 쓰는 읽기 전용 규정 snapshot 파일.
+
+규정 corpus와 BM25 역색인을 하나의 바이너리 파일로 직렬화하고, 각 worker는 mmap으로 붙는다.
+검색/조회는 mmap 위의 memoryview로 직접 수행하므로 worker마다 dict/문자열 객체를 만들지 않고,
+페이지는 OS page cache에서 모든 worker가 공유한다 (worker 수가 늘어도 프로세스당 RSS가 거의 일정).
+검색 결과의 규정 키는 doc_keys section에서 바로 읽고 (레코드 전체를 디코딩하지 않음),
+corpus fingerprint용 digest는 파일을 쓸 때 header에 기록해 worker가 corpus를 다시 훑지 않는다.
+
+파일 구조 (little endian):
+    MAGIC(8) | header 길이(uint32) | header(JSON) | 8바이트 정렬된 section들
+section:
+    doc_lengths     int32[n_docs]
+    rule_offsets    int64[n_docs + 1]   → rule_blob (문서별 {"key", "rule"} JSON)
+    doc_key_offsets int64[n_docs + 1]   → doc_key_blob (문서 순서의 key JSON 문자열)
+    key_offsets     int64[n_docs + 1]   → key_blob (정렬된 key JSON 문자열)
+    key_docs        int32[n_docs]       정렬된 key 순서 → 문서 번호
+    term_offsets    int64[n_terms + 1]  → term_blob (정렬된 term UTF-8)
+    posting_offsets int64[n_terms + 1]  → posting_docs / posting_tfs
+    posting_docs    int32[n_postings]
+    posting_tfs     int32[n_postings]
+"""
+
+MAGIC = b"RBSNAP02"
+_ALIGN = 8
+
+
+def _encode_key(key: Hashable) -> str:
+    value = list(key) if isinstance(key, tuple) else key
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"))
+
+
+def _decode_key(value: Any) -> Hashable:
+    return tuple(value) if isinstance(value, list) else value
+
+
+def write_snapshot(
+    path: str,
+    rules: Mapping[Hashable, Rule],
+    *,
+    version: int = 1,
+    sources: Optional[Dict[str, Any]] = None,
+    k1: float = 1.5,
+    b: float = 0.75,
+) -> None:
+    """
+    rules로 역색인을 만들어 snapshot 파일을 쓴다. 임시 파일에 쓴 뒤 os.replace로 교체하므로
+    이미 붙어 있는 worker는 기존 파일(inode)을 계속 읽고, 새로 여는 쪽만 새 파일을 본다.
+    """
+    keys = list(rules)
+    n_docs = len(keys)
+
+    doc_lengths: List[int] = []
+    postings: Dict[str, List[Tuple[int, int]]] = {}
+    rule_chunks: List[bytes] = []
+    for doc, key in enumerate(keys):
+        rule = rules[key]
+        tokens = tokenize(rule.text)
+        doc_lengths.append(len(tokens))
+        for term, tf in Counter(tokens).items():
+            postings.setdefault(term, []).append((doc, tf))
+        rule_chunks.append(
+            json.dumps({"key": json.loads(_encode_key(key)), "rule": rule.to_dict()}, ensure_ascii=False).encode("utf-8")
+        )
+
+    encoded_keys = [_encode_key(key).encode("utf-8") for key in keys]
+    key_order = sorted(range(n_docs), key=lambda i: encoded_keys[i])
+    terms = sorted(postings, key=lambda t: t.encode("utf-8"))
+    term_bytes = [t.encode("utf-8") for t in terms]
+
+    def offsets(chunks: Sequence[bytes]) -> List[int]:
+        result = [0]
+        for chunk in chunks:
+            result.append(result[-1] + len(chunk))
+        return result
+
+    posting_offsets = [0]
+    posting_docs: List[int] = []
+    posting_tfs: List[int] = []
+    for term in terms:
+        for doc, tf in postings[term]:
+            posting_docs.append(doc)
+            posting_tfs.append(tf)
+        posting_offsets.append(len(posting_docs))
+
+    sections: List[Tuple[str, bytes]] = [
+        ("doc_lengths", struct.pack(f"<{n_docs}i", *doc_lengths)),
+        ("rule_offsets", struct.pack(f"<{n_docs + 1}q", *offsets(rule_chunks))),
+        ("rule_blob", b"".join(rule_chunks)),
+        ("doc_key_offsets", struct.pack(f"<{n_docs + 1}q", *offsets(encoded_keys))),
+        ("doc_key_blob", b"".join(encoded_keys)),
+        ("key_offsets", struct.pack(f"<{n_docs + 1}q", *offsets([encoded_keys[i] for i in key_order]))),
+        ("key_blob", b"".join(encoded_keys[i] for i in key_order)),
+        ("key_docs", struct.pack(f"<{n_docs}i", *key_order)),
+        ("term_offsets", struct.pack(f"<{len(terms) + 1}q", *offsets(term_bytes))),
+        ("term_blob", b"".join(term_bytes)),
+        ("posting_offsets", struct.pack(f"<{len(terms) + 1}q", *posting_offsets)),
+        ("posting_docs", struct.pack(f"<{len(posting_docs)}i", *posting_docs)),
+        ("posting_tfs", struct.pack(f"<{len(posting_tfs)}i", *posting_tfs)),
+    ]
+
+    header: Dict[str, Any] = {
+        "version": version,
+        "n_docs": n_docs,
+        "n_terms": len(terms),
+        "total_length": sum(doc_lengths),
+        "corpus_digest": corpus_digest((key, rules[key].text) for key in keys),
+        "k1": k1,
+        "b": b,
+        "sources": sources or {},
+        "sections": {},
+    }
+    # section 위치는 header 길이에 따라 달라지므로, 길이가 수렴할 때까지 header를 다시 계산
+    header_bytes = b""
+    for _ in range(3):
+        position = _align(len(MAGIC) + 4 + len(header_bytes))
+        for name, data in sections:
+            header["sections"][name] = [position, len(data)]
+            position = _align(position + len(data))
+        new_header = json.dumps(header, ensure_ascii=False).encode("utf-8")
+        if len(new_header) == len(header_bytes):
+            break
+        header_bytes = new_header
+    header_bytes = json.dumps(header, ensure_ascii=False).encode("utf-8")
+
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(MAGIC)
+        f.write(struct.pack("<I", len(header_bytes)))
+        f.write(header_bytes)
+        for name, data in sections:
+            f.seek(header["sections"][name][0])
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(tmp_path, path)
+
+
+def _align(position: int) -> int:
+    return (position + _ALIGN - 1) // _ALIGN * _ALIGN
+
+
+class _Blob:
+    """
+    offsets(int64[n+1]) + blob으로 표현된 가변 길이 바이트열 배열 (mmap 위 zero-copy 조회).
+    """
+
+    def __init__(self, offsets: memoryview, blob: memoryview) -> None:
+        self.offsets = offsets
+        self.blob = blob
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i: int) -> bytes:
+        return bytes(self.blob[self.offsets[i] : self.offsets[i + 1]])
+
+
+class SharedSnapshotFile:
+    """
+    mmap으로 연 snapshot 파일. 모든 조회는 memoryview slice로 수행한다.
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        with open(path, "rb") as f:
+            st = os.fstat(f.fileno())
+            self.signature = (st.st_mtime_ns, st.st_ino, st.st_size)
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mmap[: len(MAGIC)] != MAGIC:
+            raise ValueError(f"규정 snapshot 파일 형식이 아닙니다: {path}")
+        (header_len,) = struct.unpack_from("<I", self._mmap, len(MAGIC))
+        start = len(MAGIC) + 4
+        self.header: Dict[str, Any] = json.loads(self._mmap[start : start + header_len].decode("utf-8"))
+
+        view = memoryview(self._mmap)
+        sections = self.header["sections"]
+
+        def section(name: str, fmt: Optional[str] = None) -> memoryview:
+            offset, length = sections[name]
+            raw = view[offset : offset + length]
+            return raw.cast(fmt) if fmt else raw
+
+        self.doc_lengths = section("doc_lengths", "i")
+        self.rule_blob = _Blob(section("rule_offsets", "q"), section("rule_blob"))
+        self.doc_key_blob = _Blob(section("doc_key_offsets", "q"), section("doc_key_blob"))
+        self.key_blob = _Blob(section("key_offsets", "q"), section("key_blob"))
+        self.key_docs = section("key_docs", "i")
+        self.term_blob = _Blob(section("term_offsets", "q"), section("term_blob"))
+        self.posting_offsets = section("posting_offsets", "q")
+        self.posting_docs = section("posting_docs", "i")
+        self.posting_tfs = section("posting_tfs", "i")
+
+    @property
+    def version(self) -> int:
+        return int(self.header["version"])
+
+    @property
+    def sources(self) -> Dict[str, Any]:
+        return self.header.get("sources") or {}
+
+    @property
+    def corpus_digest(self) -> str:
+        return self.header["corpus_digest"]
+
+    def doc_for_key(self, key: Hashable) -> Optional[int]:
+        encoded = _encode_key(key).encode("utf-8")
+        pos = bisect.bisect_left(self.key_blob, encoded)  # type: ignore[arg-type]
+        if pos < len(self.key_blob) and self.key_blob[pos] == encoded:
+            return self.key_docs[pos]
+        return None
+
+    def key(self, doc: int) -> Hashable:
+        return _decode_key(json.loads(self.doc_key_blob[doc].decode("utf-8")))
+
+    def record(self, doc: int) -> Tuple[Hashable, Rule]:
+        data = json.loads(self.rule_blob[doc].decode("utf-8"))
+        return _decode_key(data["key"]), Rule.from_dict(data["rule"])
+
+    def term_range(self, term: str) -> Optional[Tuple[int, int]]:
+        encoded = term.encode("utf-8")
+        pos = bisect.bisect_left(self.term_blob, encoded)  # type: ignore[arg-type]
+        if pos < len(self.term_blob) and self.term_blob[pos] == encoded:
+            return self.posting_offsets[pos], self.posting_offsets[pos + 1]
+        return None
+
+
+class SharedRuleMap(Mapping):
+    """
+    snapshot 파일 위의 읽기 전용 {규정 키: Rule} 매핑. 조회할 때마다 해당 레코드만 디코딩한다.
+    """
+
+    def __init__(self, snapshot: SharedSnapshotFile) -> None:
+        self._snapshot = snapshot
+
+    def __getitem__(self, key: Hashable) -> Rule:
+        doc = self._snapshot.doc_for_key(key)
+        if doc is None:
+            raise KeyError(key)
+        return self._snapshot.record(doc)[1]
+
+    def __contains__(self, key: object) -> bool:
+        try:
+            return self._snapshot.doc_for_key(key) is not None  # type: ignore[arg-type]
+        except TypeError:
+            return False
+
+    def __iter__(self) -> Iterator[Hashable]:
+        for doc in range(len(self)):
+            yield self._snapshot.key(doc)
+
+    def items(self) -> Iterator[Tuple[Hashable, Rule]]:  # type: ignore[override]
+        for doc in range(len(self)):
+            yield self._snapshot.record(doc)
+
+    def __len__(self) -> int:
+        return int(self._snapshot.header["n_docs"])
+
+    @property
+    def corpus_digest(self) -> str:
+        return self._snapshot.corpus_digest
+
+
+class SharedIndex:
+    """
+    snapshot 파일 위의 BM25 검색 (InvertedIndex.search와 같은 점수 / 반환 형식).
+    """
+
+    def __init__(self, snapshot: SharedSnapshotFile) -> None:
+        self._snapshot = snapshot
+        header = snapshot.header
+        self.k1 = float(header["k1"])
+        self.b = float(header["b"])
+        self._n_docs = int(header["n_docs"])
+        self._avg_len = (header["total_length"] / self._n_docs) if self._n_docs else 0.0
+
+    def __len__(self) -> int:
+        return self._n_docs
+
+    def search(self, query: str, top_k: int) -> List[Tuple[float, Hashable]]:
+        if top_k <= 0 or not self._n_docs:
+            return []
+
+        snapshot = self._snapshot
+        avg_len = self._avg_len or 1.0
+        k1, b = self.k1, self.b
+        doc_lengths = snapshot.doc_lengths
+
+        scores: Dict[int, float] = {}
+        for term, qtf in Counter(tokenize(query)).items():
+            span = snapshot.term_range(term)
+            if span is None:
+                continue
+            start, end = span
+            df = end - start
+            idf = math.log(1.0 + (self._n_docs - df + 0.5) / (df + 0.5))
+            docs = snapshot.posting_docs[start:end]
+            tfs = snapshot.posting_tfs[start:end]
+            for doc, tf in zip(docs, tfs):
+                norm = k1 * (1.0 - b + b * doc_lengths[doc] / avg_len)
+                scores[doc] = scores.get(doc, 0.0) + qtf * idf * tf * (k1 + 1.0) / (tf + norm)
+
+        top = heapq.nlargest(top_k, scores.items(), key=lambda x: x[1])
+        return [(score, snapshot.key(doc)) for doc, score in top]
+
+
+@contextmanager
+def snapshot_lock(path: str) -> Iterator[None]:
+    """
+    snapshot 파일을 다시 만들 때 여러 worker 중 한 프로세스만 작업하도록 잡는 파일 잠금.
+    """
+    if fcntl is None:
+        yield
+        return
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    with open(path + ".lock", "a") as lock_file:
+        fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file.fileno(), fcntl.LOCK_UN)
+
+
+__all__ = [
+    "write_snapshot",
+    "SharedSnapshotFile",
+    "SharedRuleMap",
+    "SharedIndex",
+    "snapshot_lock",
+]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="worker 공유용 규정 snapshot 파일 생성")
+    parser.add_argument("--data", required=True, help="규정 데이터 경로 (.json / .jsonl / shard 디렉토리)")
+    parser.add_argument("--output", required=True, help="저장할 snapshot 파일 경로")
+    args = parser.parse_args()
+
+    from .rule_store import RuleStore
+
+    store = RuleStore(args.data, snapshot_path=args.output)
+    print(f"규정 {len(store.snapshot.rules)}건 (version {store.version}) → {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,12 @@
 # app/agent/tools/summarize_tool.py
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncIterator
 
-from app.config import client, MODEL_NAME
+from app.agent.llm import achat_completion, astream_chat_completion, chat_completion
 from .base import Tool
 
+# 입력 texts가 없을 때 요약 대신 돌려주는 안내 문구 (loop controller는 답변으로 보지 않는다)
+NO_TEXT_MESSAGE = "summarize 할 텍스트가 없습니다."
+
 
 class SummarizeTool(Tool):
     """
@@ -12,13 +15,9 @@ class SummarizeTool(Tool):
 
     name = "summarize"
     description = "검색된 규정 텍스트들을 사용자 질문에 맞게 한국어로 요약하는 Tool"
+    supports_streaming = True
 
-    def run(self, *, user_query: str, tool_input: Dict[str, Any]) -> str:
-        texts: List[str] = tool_input.get("texts") or []
-
-        if not texts:
-            return "summarize 할 텍스트가 없습니다."
-
+    def _build_messages(self, user_query: str, texts: List[str]) -> List[Dict[str, str]]:
         joined = "\n\n".join(texts)
 
         prompt = f"""
@@ -39,14 +38,36 @@ class SummarizeTool(Tool):
                     - 한국어로 5~7문장 정도로 정리해 주세요.
                 """.strip()
 
-        response = client.chat.completions.create(
-            model=MODEL_NAME,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "너는 규정과 정책을 잘 설명해주는 한국어 규정 전문가야."
-                },
-                {"role": "user", "content": prompt},
-            ],
-        )
-        return response.choices[0].message.content.strip()
+        return [
+            {
+                "role": "system",
+                "content": "너는 규정과 정책을 잘 설명해주는 한국어 규정 전문가야."
+            },
+            {"role": "user", "content": prompt},
+        ]
+
+    def run(self, *, user_query: str, tool_input: Dict[str, Any]) -> str:
+        texts: List[str] = tool_input.get("texts") or []
+
+        if not texts:
+            return NO_TEXT_MESSAGE
+
+        return chat_completion(self._build_messages(user_query, texts))
+
+    async def arun(self, *, user_query: str, tool_input: Dict[str, Any]) -> str:
+        texts: List[str] = tool_input.get("texts") or []
+
+        if not texts:
+            return NO_TEXT_MESSAGE
+
+        return await achat_completion(self._build_messages(user_query, texts))
+
+    async def astream(self, *, user_query: str, tool_input: Dict[str, Any]) -> AsyncIterator[str]:
+        texts: List[str] = tool_input.get("texts") or []
+
+        if not texts:
+            yield NO_TEXT_MESSAGE
+            return
+
+        async for delta in astream_chat_completion(self._build_messages(user_query, texts)):
+            yield delta
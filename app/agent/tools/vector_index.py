@@ -0,0 +1,336 @@
+# app/agent/tools/vector_index.py
+from __future__ import annotations
+
+import hashlib
+import importlib
+import json
+import math
+import os
+import zlib
+from collections import Counter
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional, Sequence, Tuple, Union
+
+from .search_index import tokenize
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - numpy는 vector / hybrid 검색 모드에서만 필요
+    np = None  # type: ignore[assignment]
+
+"""
+dense vector 검색 인덱스 (선택 기능, numpy 필요).
+
+- 임베딩 함수는 List[str] → (n, dim) 행렬을 돌려주는 callable이면 무엇이든 사용 가능 (pluggable)
+- HashingEmbedder: 외부 모델 없이 동작하는 결정적 로컬 임베더 (feature hashing)
+- VectorIndex: L2 정규화된 임베딩 행렬에 대한 cosine top-k (행렬 곱 1회 + argpartition),
+  선택적으로 IVF(k-means 클러스터) 근사 검색
+- 임베딩 행렬은 .npy로 저장하고 시작 시 memory-map으로 읽는다 (keys / fingerprint는 .keys.json)
+"""
+
+EmbeddingFn = Callable[[List[str]], Any]
+
+_EMBED_BATCH_SIZE = 512
+
+
+def _require_numpy() -> None:
+    if np is None:
+        raise RuntimeError("vector / hybrid 검색 모드에는 numpy가 필요합니다. (pip install numpy)")
+
+
+class HashingEmbedder:
+    """
+    tokenize() 결과(한글 bigram / 영문 단어)를 feature hashing으로 dim차원에 사상하는 임베더.
+    같은 텍스트는 프로세스/머신과 무관하게 항상 같은 벡터가 된다. (crc32 사용, hash() 미사용)
+    """
+
+    def __init__(self, dim: int = 256) -> None:
+        _require_numpy()
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def __call__(self, texts: List[str]) -> Any:
+        matrix = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for term, tf in Counter(tokenize(text)).items():
+                h = zlib.crc32(term.encode("utf-8"))
+                # 하위 비트로 차원, 최상위 비트로 부호를 정해 충돌 시 서로 상쇄되도록 한다
+                sign = 1.0 if h & 0x80000000 else -1.0
+                matrix[row, h % self.dim] += sign * (1.0 + math.log(tf))
+        return matrix
+
+
+def load_embedder(spec: str, dim: int) -> EmbeddingFn:
+    """
+    설정 문자열로 임베딩 함수를 만든다.
+      - "hashing": HashingEmbedder(dim)
+      - "package.module:attr": attr가 callable(List[str]) → 행렬이면 그대로, 클래스면 인스턴스화해서 사용
+    """
+    if not spec or spec == "hashing":
+        return HashingEmbedder(dim)
+    module_name, _, attr = spec.partition(":")
+    if not attr:
+        raise ValueError(f"임베더 설정 형식이 올바르지 않습니다: {spec} (예: mypkg.embed:encode)")
+    target = getattr(importlib.import_module(module_name), attr)
+    return target() if isinstance(target, type) else target
+
+
+def embedder_name(embed: EmbeddingFn) -> str:
+    name = getattr(embed, "name", None)
+    if name:
+        return str(name)
+    return f"{getattr(embed, '__module__', '')}.{getattr(embed, '__qualname__', type(embed).__name__)}"
+
+
+def _normalize_rows(matrix: Any) -> Any:
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0.0] = 1.0
+    return matrix / norms
+
+
+def embed_texts(embed: EmbeddingFn, texts: Sequence[str], batch_size: int = _EMBED_BATCH_SIZE) -> Any:
+    """
+    batch_size 단위로 임베딩해서 L2 정규화된 float32 행렬 하나로 합친다.
+    """
+    _require_numpy()
+    batches = [
+        _normalize_rows(embed(list(texts[i : i + batch_size]))) for i in range(0, len(texts), batch_size)
+    ]
+    if not batches:
+        return np.zeros((0, 0), dtype=np.float32)
+    return np.vstack(batches)
+
+
+def corpus_digest(docs: Iterable[Tuple[Hashable, str]]) -> str:
+    """
+    (문서 키, 텍스트) 목록의 해시. 공유 snapshot 파일은 쓸 때 한 번 계산해 header에 기록해 둔다.
+    """
+    digest = hashlib.sha256()
+    for key, text in docs:
+        digest.update(repr(key).encode("utf-8"))
+        digest.update(b"\0")
+        digest.update(text.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def corpus_fingerprint(name: str, docs: Union[str, Iterable[Tuple[Hashable, str]]]) -> str:
+    """
+    임베더(또는 인덱스 종류) 이름 + corpus 해시. 저장된 행렬 / 인덱스를 재사용해도 되는지 판단하는 데 쓴다.
+    docs 대신 미리 계산한 corpus_digest() 값을 넘기면 corpus를 다시 훑지 않는다.
+    """
+    digest = docs if isinstance(docs, str) else corpus_digest(docs)
+    return hashlib.sha256(f"{name}\0{digest}".encode("utf-8")).hexdigest()
+
+
+def _encode_key(key: Hashable) -> Any:
+    return list(key) if isinstance(key, tuple) else key
+
+
+def _decode_key(value: Any) -> Hashable:
+    return tuple(value) if isinstance(value, list) else value
+
+
+class VectorIndex:
+    """
+    L2 정규화된 임베딩 행렬(행 = 문서)에 대한 cosine 유사도 top-k 검색.
+
+    - matrix는 np.ndarray 또는 np.memmap (읽기 전용이어도 됨)
+    - build_ivf(n_lists)를 호출하면 k-means 중심점 기준으로 문서를 나눠 두고,
+      검색 시 질의와 가까운 n_probe개 리스트의 문서만 점수를 계산한다 (근사 검색)
+    """
+
+    def __init__(self, keys: List[Hashable], matrix: Any, fingerprint: str = "") -> None:
+        _require_numpy()
+        self.keys = keys
+        self.matrix = matrix
+        self.fingerprint = fingerprint
+        self.positions: Dict[Hashable, int] = {key: i for i, key in enumerate(keys)}
+        self.centroids: Optional[Any] = None
+        self.lists: Optional[List[Any]] = None
+        self.n_probe = 1
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    @property
+    def dim(self) -> int:
+        return int(self.matrix.shape[1]) if len(self.keys) else 0
+
+    @classmethod
+    def build(cls, docs: Sequence[Tuple[Hashable, str]], embed: EmbeddingFn, fingerprint: str = "") -> "VectorIndex":
+        keys = [key for key, _ in docs]
+        return cls(keys, embed_texts(embed, [text for _, text in docs]), fingerprint)
+
+    def updated(
+        self, docs: Sequence[Tuple[Hashable, str]], changed: Iterable[Hashable], embed: EmbeddingFn, fingerprint: str
+    ) -> "VectorIndex":
+        """
+        새 corpus(docs)에 맞춘 새 인덱스. changed에 없는 기존 문서는 저장된 벡터를 그대로 쓰고
+        추가/수정된 문서만 다시 임베딩한다. (자기 자신은 수정하지 않음)
+        """
+        changed = set(changed)
+        reuse_rows: List[int] = []
+        reuse_at: List[int] = []
+        embed_at: List[int] = []
+        embed_text: List[str] = []
+        for i, (key, text) in enumerate(docs):
+            row = self.positions.get(key)
+            if row is not None and key not in changed:
+                reuse_rows.append(row)
+                reuse_at.append(i)
+            else:
+                embed_at.append(i)
+                embed_text.append(text)
+
+        dim = self.dim
+        fresh = embed_texts(embed, embed_text) if embed_text else None
+        if fresh is not None and fresh.size:
+            dim = fresh.shape[1]
+        matrix = np.zeros((len(docs), dim), dtype=np.float32)
+        if reuse_rows:
+            matrix[reuse_at] = self.matrix[reuse_rows]
+        if fresh is not None and fresh.size:
+            matrix[embed_at] = fresh
+        return VectorIndex([key for key, _ in docs], matrix, fingerprint)
+
+    def build_ivf(self, n_lists: int, n_probe: int = 8, iterations: int = 10, seed: int = 0) -> None:
+        """
+        k-means로 n_lists개 중심점을 학습하고 문서를 가장 가까운 중심점 리스트에 배정.
+        학습은 최대 n_lists * 64개 샘플로만 하고, 배정은 전체 문서에 대해 청크 단위로 한다.
+        """
+        n = len(self.keys)
+        if n_lists <= 1 or n <= n_lists:
+            self.centroids = None
+            self.lists = None
+            return
+
+        rng = np.random.default_rng(seed)
+        sample_size = min(n, n_lists * 64)
+        sample = np.asarray(self.matrix[np.sort(rng.choice(n, sample_size, replace=False))])
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+        for _ in range(iterations):
+            assign = np.argmax(sample @ centroids.T, axis=1)
+            for c in range(n_lists):
+                members = sample[assign == c]
+                if len(members):
+                    centroids[c] = members.mean(axis=0)
+            centroids = _normalize_rows(centroids)
+
+        assignments = np.empty(n, dtype=np.int32)
+        for start in range(0, n, 65536):
+            block = np.asarray(self.matrix[start : start + 65536])
+            assignments[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+
+        order = np.argsort(assignments, kind="stable")
+        bounds = np.searchsorted(assignments[order], np.arange(n_lists + 1))
+        self.centroids = centroids
+        self.lists = [order[bounds[c] : bounds[c + 1]] for c in range(n_lists)]
+        self.n_probe = max(1, min(n_probe, n_lists))
+
+    def search_vector(self, query_vec: Any, top_k: int) -> List[Tuple[float, Hashable]]:
+        if top_k <= 0 or not self.keys:
+            return []
+        query_vec = _normalize_rows(query_vec)[0]
+
+        if self.centroids is not None and self.lists is not None:
+            probe = np.argsort(-(self.centroids @ query_vec))[: self.n_probe]
+            # 정렬된 행 번호로 읽어야 memmap에서 순차 접근이 된다
+            rows = np.sort(np.concatenate([self.lists[c] for c in probe]))
+            if len(rows) == 0:
+                return []
+            scores = np.asarray(self.matrix[rows]) @ query_vec
+        else:
+            rows = None
+            scores = self.matrix @ query_vec
+
+        k = min(top_k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        if rows is not None:
+            return [(float(scores[i]), self.keys[int(rows[i])]) for i in top]
+        return [(float(scores[i]), self.keys[int(i)]) for i in top]
+
+    def search(self, query: str, embed: EmbeddingFn, top_k: int) -> List[Tuple[float, Hashable]]:
+        return self.search_vector(embed([query]), top_k)
+
+    def save(self, path: str) -> None:
+        """
+        행렬은 path(.npy), 키 목록과 fingerprint는 path + ".keys.json"에 저장.
+        임시 파일에 쓴 뒤 os.replace로 교체하므로 읽는 쪽이 반쯤 쓰인 파일을 보지 않는다.
+        """
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        tmp_matrix = path + ".tmp.npy"
+        np.save(tmp_matrix, np.asarray(self.matrix, dtype=np.float32))
+        tmp_keys = path + ".keys.json.tmp"
+        with open(tmp_keys, "w", encoding="utf-8") as f:
+            json.dump(
+                {"fingerprint": self.fingerprint, "keys": [_encode_key(k) for k in self.keys]},
+                f,
+                ensure_ascii=False,
+            )
+        os.replace(tmp_matrix, path)
+        os.replace(tmp_keys, path + ".keys.json")
+
+    @classmethod
+    def load(cls, path: str, fingerprint: Optional[str] = None) -> Optional["VectorIndex"]:
+        """
+        저장된 인덱스를 memory-map으로 연다. 파일이 없거나 fingerprint가 다르면 None.
+        """
+        _require_numpy()
+        try:
+            with open(path + ".keys.json", "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            matrix = np.load(path, mmap_mode="r")
+        except (OSError, ValueError):
+            return None
+        if fingerprint is not None and meta.get("fingerprint") != fingerprint:
+            return None
+        keys = [_decode_key(k) for k in meta.get("keys", [])]
+        if len(keys) != matrix.shape[0]:
+            return None
+        return cls(keys, matrix, meta.get("fingerprint", ""))
+
+
+def fuse_scores(
+    keyword_hits: List[Tuple[float, Hashable]],
+    vector_hits: List[Tuple[float, Hashable]],
+    alpha: float,
+    top_k: int,
+) -> List[Tuple[float, Hashable]]:
+    """
+    hybrid 점수 = alpha * (정규화된 vector 점수) + (1 - alpha) * (정규화된 BM25 점수).
+    각 점수는 후보 집합 안에서 최댓값으로 나눠 0~1로 맞추고, 한쪽 후보에만 있는 문서는 다른 쪽 점수를 0으로 본다.
+    """
+
+    def normalized(hits: List[Tuple[float, Hashable]]) -> Dict[Hashable, float]:
+        best = max((score for score, _ in hits), default=0.0)
+        if best <= 0.0:
+            return {}
+        return {key: max(score, 0.0) / best for score, key in hits}
+
+    keyword = normalized(keyword_hits)
+    vector = normalized(vector_hits)
+    fused = [
+        (alpha * vector.get(key, 0.0) + (1.0 - alpha) * keyword.get(key, 0.0), key)
+        for key in dict.fromkeys([k for _, k in keyword_hits] + [k for _, k in vector_hits])
+    ]
+    fused.sort(key=lambda x: x[0], reverse=True)
+    return [hit for hit in fused[:top_k] if hit[0] > 0.0]
+
+
+__all__ = [
+    "EmbeddingFn",
+    "HashingEmbedder",
+    "load_embedder",
+    "embedder_name",
+    "embed_texts",
+    "corpus_digest",
+    "corpus_fingerprint",
+    "VectorIndex",
+    "fuse_scores",
+]
@@ -0,0 +1,91 @@
+# app/agent/trace.py
+from __future__ import annotations
+
+import os
+import random
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Iterator, Optional
+
+from app.agent.wire import dumps
+from app.config import TRACE_RECORD_PATH, TRACE_SAMPLE_RATE
+
+"""
+Agent 트래픽 기록 (record / replay 부하 테스트용 JSONL trace).
+
+TRACE_RECORD_PATH를 지정하면 요청마다 아래 레코드를 한 줄씩 남긴다. 같은 요청의 레코드는 id로 묶인다.
+- {"type": "request", "id", "ts", "request": AgentRequest}
+- {"type": "llm", "id", "key", "model", "content", "seconds", "cached", "stream"}: Chat Completions 호출 (key는 completion_key)
+- {"type": "step", "id", "step": PlanStep}: 플래너 / 도구 실행 결과
+- {"type": "response", "id", "seconds", "cached", "stop_reason", "final_answer"}
+
+python -m bench.replay가 이 파일을 읽어 요청을 다시 보내고, 기록된 LLM 답변은 로컬 stub 서버에서 돌려준다.
+"""
+
+_current_trace: ContextVar[Optional[str]] = ContextVar("rulebase_current_trace", default=None)
+
+
+class TraceRecorder:
+    """
+    trace JSONL 파일 기록기 (스레드 안전, 줄 단위 flush).
+
+    :param sample_rate: 기록할 요청 비율 (0~1)
+    """
+
+    def __init__(self, path: str, sample_rate: float = 1.0) -> None:
+        self.path = path
+        self.sample_rate = sample_rate
+        self._lock = threading.Lock()
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._file = open(path, "ab", buffering=0)
+
+    def write(self, record_type: str, trace_id: str, **fields: Any) -> None:
+        line = dumps({"type": record_type, "id": trace_id, **fields}) + b"\n"
+        with self._lock:
+            self._file.write(line)
+
+    @contextmanager
+    def request(self, request: Any) -> Iterator[Optional[str]]:
+        """
+        요청 하나를 기록하는 범위. 샘플링에서 빠지면 None을 넘기고 아무것도 기록하지 않는다.
+        """
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            yield None
+            return
+        trace_id = uuid.uuid4().hex
+        self.write("request", trace_id, ts=round(time.time(), 3), request=request)
+        token = _current_trace.set(trace_id)
+        try:
+            yield trace_id
+        finally:
+            _current_trace.reset(token)
+
+
+trace_recorder: Optional[TraceRecorder] = (
+    TraceRecorder(TRACE_RECORD_PATH, sample_rate=TRACE_SAMPLE_RATE) if TRACE_RECORD_PATH else None
+)
+
+
+def current_trace_id() -> Optional[str]:
+    return _current_trace.get()
+
+
+def record(record_type: str, **fields: Any) -> None:
+    """
+    현재 요청이 기록 대상이면 레코드 한 줄 추가 (아니면 아무것도 하지 않음).
+    """
+    trace_id = _current_trace.get()
+    if trace_recorder is not None and trace_id is not None:
+        trace_recorder.write(record_type, trace_id, **fields)
+
+
+__all__ = [
+    "TraceRecorder",
+    "trace_recorder",
+    "current_trace_id",
+    "record",
+]
@@ -0,0 +1,156 @@
+# app/agent/wire.py
+from __future__ import annotations
+
+import gzip
+import json
+from typing import Any, Dict, List, Optional
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson이 없으면 표준 json으로 직렬화
+    orjson = None  # type: ignore[assignment]
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - brotli가 없으면 gzip만 협상
+    brotli = None  # type: ignore[assignment]
+
+"""
+/agent 응답 직렬화 (응답 축약 / 빠른 JSON 인코딩 / 압축 협상).
+
+verbosity
+- full: 기존 응답 그대로 (모든 step의 tool_input / output 포함)
+- compact: 검색 결과의 규정은 응답 최상위 rules에 한 번만 담고 step에서는 id로 참조,
+  summarize / extract_clause 입력 texts(이전 검색 결과에서 채운 규정 본문)는 rule_ids로 대체
+- steps: step은 tool / reason / 소요 시간 등만 남기고 tool_input / output은 뺀다
+- final: 최종 답변만 (steps 없음)
+
+full 이외에는 값이 None인 필드도 뺀다. 캐시 / single-flight에는 항상 full 응답을 저장하고
+내보낼 때만 축약하므로 verbosity가 다른 요청끼리도 캐시를 함께 쓴다.
+"""
+
+VERBOSITY_LEVELS = ("full", "compact", "steps", "final")
+
+# summarize / extract_clause (+ 검색 후처리 summarize): tool_input.texts가 직전 검색 결과에서 채워지는 도구
+_TEXT_STEP_TOOLS = {"summarize", "extract_clause", "summarize (post-processing)"}
+_PAYLOAD_FIELDS = ("tool_input", "output")
+
+
+def _rule_id(item: Any) -> Any:
+    return item.get("id") if isinstance(item, dict) else None
+
+
+def rule_ids(output: Any) -> Optional[List[Any]]:
+    """
+    step output이 규정 목록(검색 결과)이면 규정 id 목록, 아니면 None.
+    """
+    if not isinstance(output, list) or not output:
+        return None
+    ids = [_rule_id(item) for item in output]
+    return ids if all(rule_id is not None for rule_id in ids) else None
+
+
+def _drop_none(data: Dict[str, Any]) -> Dict[str, Any]:
+    return {k: v for k, v in data.items() if v is not None}
+
+
+def shape_step(step: Dict[str, Any], verbosity: str, last_rule_ids: Optional[List[Any]] = None) -> Dict[str, Any]:
+    """
+    PlanStep dict 하나를 verbosity에 맞게 줄인다 (compact에서 규정 본문은 호출 쪽이 모은다).
+    """
+    if verbosity == "full":
+        return step
+    if verbosity == "steps":
+        return _drop_none({k: v for k, v in step.items() if k not in _PAYLOAD_FIELDS})
+
+    shaped = _drop_none(dict(step))
+    ids = rule_ids(step.get("output"))
+    if ids is not None:
+        shaped["output"] = ids
+    tool_input = step.get("tool_input") or {}
+    if step.get("tool") in _TEXT_STEP_TOOLS and tool_input.get("texts") and last_rule_ids is not None:
+        shaped["tool_input"] = {k: v for k, v in tool_input.items() if k != "texts"}
+        shaped["tool_input"]["rule_ids"] = last_rule_ids
+    return shaped
+
+
+def shape_response(response: Dict[str, Any], verbosity: str) -> Dict[str, Any]:
+    """
+    AgentResponse dict(model_dump 결과)를 verbosity에 맞게 줄인다.
+    """
+    if verbosity == "full":
+        return response
+    if verbosity not in VERBOSITY_LEVELS:
+        raise ValueError(f"지원하지 않는 verbosity: {verbosity} (가능: {', '.join(VERBOSITY_LEVELS)})")
+
+    shaped = _drop_none({k: v for k, v in response.items() if k != "steps"})
+    if verbosity == "final":
+        return shaped
+
+    rules: Dict[Any, Dict[str, Any]] = {}
+    last_rule_ids: Optional[List[Any]] = None
+    steps = []
+    for step in response.get("steps") or []:
+        steps.append(shape_step(step, verbosity, last_rule_ids))
+        ids = rule_ids(step.get("output"))
+        if ids is not None:
+            last_rule_ids = ids
+            for rule_id, item in zip(ids, step["output"]):
+                rules.setdefault(rule_id, item)
+    shaped["steps"] = steps
+    if verbosity == "compact":
+        shaped["rules"] = list(rules.values())
+    return shaped
+
+
+def dumps(data: Any) -> bytes:
+    """
+    JSON 직렬화 (UTF-8 bytes). orjson이 있으면 사용하고, 없으면 공백 없는 표준 json.
+    """
+    if orjson is not None:
+        return orjson.dumps(data, default=str, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
+    return json.dumps(data, ensure_ascii=False, separators=(",", ":"), default=str).encode("utf-8")
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Accept-Encoding에서 사용할 압축 방식 선택 ("br" | "gzip" | None). q 값이 같으면 br 우선.
+    """
+    if not accept_encoding:
+        return None
+    supported = {"gzip": 1} if brotli is None else {"br": 2, "gzip": 1}
+    best: Optional[str] = None
+    best_rank = (0.0, 0)
+    for part in accept_encoding.split(","):
+        name, _, params = part.strip().partition(";")
+        name = name.strip().lower()
+        quality = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                quality = float(params[2:])
+            except ValueError:
+                quality = 0.0
+        candidates = supported if name == "*" else ({name: supported[name]} if name in supported else {})
+        for encoding, preference in candidates.items():
+            rank = (quality, preference)
+            if quality > 0 and rank > best_rank:
+                best, best_rank = encoding, rank
+    return best
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=4)
+    return gzip.compress(body, compresslevel=5)
+
+
+__all__ = [
+    "VERBOSITY_LEVELS",
+    "rule_ids",
+    "shape_step",
+    "shape_response",
+    "dumps",
+    "negotiate_encoding",
+    "compress",
+]
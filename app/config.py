@@ -1,22 +1,269 @@
 import os
-from typing import Final
+import threading
+from typing import TYPE_CHECKING, Any, Final, Optional
 
 from dotenv import load_dotenv
-from openai import OpenAI
+
+if TYPE_CHECKING:
+    from openai import AsyncOpenAI, OpenAI
 
 """
 OpenAI 클라이언트 및 기본 모델 설정 모듈.
 환경 변수에서 API 키와 모델 이름을 읽어온다.
+클라이언트는 처음 사용할 때 만든다 (API 키 없이도 import 가능, openai 패키지 import 비용도 첫 호출로 미룸).
 """
 
 load_dotenv()
 
 MODEL_NAME: Final[str] = os.getenv("OPENAI_MODEL", "gpt-5-mini")
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+# OpenAI 호환 서버(로컬 mock 서버 등)를 쓸 때만 지정. 비우면 OpenAI 기본 엔드포인트
+OPENAI_BASE_URL: Final[Optional[str]] = os.getenv("OPENAI_BASE_URL") or None
+
+# LLM 호출 게이트웨이 / HTTP 연결 풀
+# - LLM_TIMEOUT_SECONDS: 요청 하나의 timeout, LLM_MAX_RETRIES: 429 / 5xx / 연결 오류 재시도 횟수 (jitter 지수 backoff)
+# - LLM_MAX_CONCURRENCY: 동시에 보내는 LLM 요청 수 상한 (0이면 무제한)
+# - LLM_REQUESTS_PER_MINUTE / LLM_TOKENS_PER_MINUTE: 분당 요청 / (추정) 토큰 수 상한 (0이면 무제한)
+# - LLM_HEDGE_AFTER_MS: 이 시간 안에 응답이 없으면 같은 요청을 한 번 더 보냄 (0이면 끔)
+LLM_TIMEOUT_SECONDS: Final[float] = float(os.getenv("LLM_TIMEOUT_SECONDS", "30"))
+LLM_MAX_RETRIES: Final[int] = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_SECONDS: Final[float] = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS: Final[float] = float(os.getenv("LLM_RETRY_MAX_SECONDS", "8"))
+LLM_MAX_CONCURRENCY: Final[int] = int(os.getenv("LLM_MAX_CONCURRENCY", "64"))
+LLM_REQUESTS_PER_MINUTE: Final[float] = float(os.getenv("LLM_REQUESTS_PER_MINUTE", "0"))
+LLM_TOKENS_PER_MINUTE: Final[float] = float(os.getenv("LLM_TOKENS_PER_MINUTE", "0"))
+LLM_HEDGE_AFTER_MS: Final[float] = float(os.getenv("LLM_HEDGE_AFTER_MS", "0"))
+LLM_POOL_MAX_CONNECTIONS: Final[int] = int(os.getenv("LLM_POOL_MAX_CONNECTIONS", "100"))
+LLM_POOL_MAX_KEEPALIVE: Final[int] = int(os.getenv("LLM_POOL_MAX_KEEPALIVE", "20"))
+
+_client_lock = threading.Lock()
+_client: Optional["OpenAI"] = None
+_async_client: Optional["AsyncOpenAI"] = None
+
+
+def _require_api_key() -> str:
+    if not OPENAI_API_KEY:
+        raise RuntimeError("OPENAI_API_KEY 환경 변수가 설정되어 있지 않습니다.")
+    return OPENAI_API_KEY
+
+
+def _http_limits() -> Any:
+    import httpx
+
+    return httpx.Limits(max_connections=LLM_POOL_MAX_CONNECTIONS, max_keepalive_connections=LLM_POOL_MAX_KEEPALIVE)
+
+
+def get_client() -> "OpenAI":
+    """
+    동기 OpenAI 클라이언트 (처음 호출할 때 생성).
+    """
+    global _client
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                from openai import DefaultHttpxClient, OpenAI
+
+                # 재시도는 LLMGateway가 담당하므로 SDK 자체 재시도는 끈다.
+                _client = OpenAI(
+                    api_key=_require_api_key(),
+                    base_url=OPENAI_BASE_URL,
+                    timeout=LLM_TIMEOUT_SECONDS,
+                    max_retries=0,
+                    http_client=DefaultHttpxClient(limits=_http_limits()),
+                )
+    return _client
+
+
+def get_async_client() -> "AsyncOpenAI":
+    """
+    FastAPI 이벤트 루프를 막지 않기 위한 비동기 클라이언트 (처음 호출할 때 생성).
+    """
+    global _async_client
+    if _async_client is None:
+        with _client_lock:
+            if _async_client is None:
+                from openai import AsyncOpenAI, DefaultAsyncHttpxClient
+
+                _async_client = AsyncOpenAI(
+                    api_key=_require_api_key(),
+                    base_url=OPENAI_BASE_URL,
+                    timeout=LLM_TIMEOUT_SECONDS,
+                    max_retries=0,
+                    http_client=DefaultAsyncHttpxClient(limits=_http_limits()),
+                )
+    return _async_client
+
+
+def __getattr__(name: str) -> Any:
+    # 기존 `config.client` / `config.async_client` 접근 호환
+    if name == "client":
+        return get_client()
+    if name == "async_client":
+        return get_async_client()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def _optional_float(value: Optional[str]) -> Optional[float]:
+    if value is None or value.strip().lower() in ("", "none", "0"):
+        return None
+    return float(value)
+
+
+# 세션 메모리 설정
+# - MEMORY_BACKEND: "memory"(프로세스 내부) | "sqlite"(여러 worker가 공유)
+MEMORY_BACKEND: Final[str] = os.getenv("MEMORY_BACKEND", "memory")
+MEMORY_DB_PATH: Final[str] = os.getenv("MEMORY_DB_PATH", "memory.sqlite3")
+MEMORY_MAX_TURNS: Final[int] = int(os.getenv("MEMORY_MAX_TURNS", "5"))
+MEMORY_MAX_SESSIONS: Final[int] = int(os.getenv("MEMORY_MAX_SESSIONS", "10000"))
+MEMORY_TTL_SECONDS: Final[Optional[float]] = _optional_float(os.getenv("MEMORY_TTL_SECONDS", "3600"))
+
+# 응답 캐시 설정
+# - RESPONSE_CACHE_SIMILARITY: 0~1 사이 값을 주면 유사 질의(코사인 유사도)도 캐시 히트로 처리
+RESPONSE_CACHE_ENABLED: Final[bool] = os.getenv("RESPONSE_CACHE_ENABLED", "true").lower() == "true"
+RESPONSE_CACHE_SIZE: Final[int] = int(os.getenv("RESPONSE_CACHE_SIZE", "1024"))
+RESPONSE_CACHE_TTL_SECONDS: Final[Optional[float]] = _optional_float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "600"))
+RESPONSE_CACHE_SIMILARITY: Final[Optional[float]] = _optional_float(os.getenv("RESPONSE_CACHE_SIMILARITY"))
+
+# /agent 응답 형식
+# - RESPONSE_VERBOSITY: 요청에 verbosity가 없을 때 기본값 (full | compact | steps | final)
+# - RESPONSE_COMPRESSION: Accept-Encoding에 따라 gzip / br(brotli 설치 시) 압축, RESPONSE_COMPRESS_MIN_BYTES 미만은 압축 안 함
+RESPONSE_VERBOSITY: Final[str] = os.getenv("RESPONSE_VERBOSITY", "full")
+RESPONSE_COMPRESSION: Final[bool] = os.getenv("RESPONSE_COMPRESSION", "true").lower() == "true"
+RESPONSE_COMPRESS_MIN_BYTES: Final[int] = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "1024"))
+
+# 트래픽 기록 (python -m bench.replay 입력)
+# - TRACE_RECORD_PATH: 지정하면 요청 / step / LLM 응답을 JSONL trace로 기록, TRACE_SAMPLE_RATE: 기록할 요청 비율
+TRACE_RECORD_PATH: Final[str] = os.getenv("TRACE_RECORD_PATH", "")
+TRACE_SAMPLE_RATE: Final[float] = float(os.getenv("TRACE_SAMPLE_RATE", "1.0"))
+
+# LLM completion 캐시 설정
+# - LLM_CACHE_DB_PATH: 지정하면 SQLite 파일에도 저장해 재시작 후에도 재사용
+LLM_CACHE_ENABLED: Final[bool] = os.getenv("LLM_CACHE_ENABLED", "true").lower() == "true"
+LLM_CACHE_SIZE: Final[int] = int(os.getenv("LLM_CACHE_SIZE", "2048"))
+LLM_CACHE_DB_PATH: Final[str] = os.getenv("LLM_CACHE_DB_PATH", "")
+
+# 플래너 모드
+# - "llm": 매 step LLM 플래너 호출
+# - "rule": 규칙 기반 플래너 우선, 애매한 경우에만 LLM 호출
+PLANNER_MODE: Final[str] = os.getenv("PLANNER_MODE", "llm")
+# LLM 플래너 호출 시 JSON Schema 구조화 출력(response_format) 사용 여부
+PLANNER_STRUCTURED_OUTPUT: Final[bool] = os.getenv("PLANNER_STRUCTURED_OUTPUT", "true").lower() == "true"
+
+# Agent 루프 종료 조건
+# - AGENT_EARLY_STOP: 답변이 충분하거나(요약 완료 / 확실한 검색 결과) 같은 플랜이 반복되면 max_steps 전에 종료
+# - AGENT_SEARCH_CONFIDENCE: 검색 1위 규정의 검색어 포함 비율이 이 값 이상이면 바로 요약으로 마무리 (0이면 끔)
+# - AGENT_DEADLINE_SECONDS: 요청별 wall-clock 마감 시간(초), 0이면 무제한
+AGENT_EARLY_STOP: Final[bool] = os.getenv("AGENT_EARLY_STOP", "true").lower() == "true"
+AGENT_SEARCH_CONFIDENCE: Final[float] = float(os.getenv("AGENT_SEARCH_CONFIDENCE", "0.8"))
+AGENT_DEADLINE_SECONDS: Final[Optional[float]] = _optional_float(os.getenv("AGENT_DEADLINE_SECONDS", "60"))
+
+# 검색 모드
+# - SEARCH_MODE: "keyword"(BM25) | "vector"(임베딩 cosine) | "hybrid"(두 점수 결합), vector / hybrid는 numpy 필요
+# - SEARCH_EMBEDDER: "hashing"(로컬 결정적 임베더) 또는 "package.module:attr" 형태의 임베딩 함수
+# - SEARCH_VECTOR_PATH: 임베딩 행렬(.npy) 저장 경로 (비우면 <규정 데이터 경로>.embeddings.npy)
+# - SEARCH_IVF_LISTS: 0보다 크면 IVF 근사 검색 (클러스터 수), SEARCH_IVF_PROBE: 질의당 탐색할 클러스터 수
+SEARCH_MODE: Final[str] = os.getenv("SEARCH_MODE", "keyword")
+SEARCH_EMBEDDER: Final[str] = os.getenv("SEARCH_EMBEDDER", "hashing")
+SEARCH_EMBEDDING_DIM: Final[int] = int(os.getenv("SEARCH_EMBEDDING_DIM", "256"))
+SEARCH_VECTOR_PATH: Final[str] = os.getenv("SEARCH_VECTOR_PATH", "")
+SEARCH_HYBRID_ALPHA: Final[float] = float(os.getenv("SEARCH_HYBRID_ALPHA", "0.5"))
+SEARCH_IVF_LISTS: Final[int] = int(os.getenv("SEARCH_IVF_LISTS", "0"))
+SEARCH_IVF_PROBE: Final[int] = int(os.getenv("SEARCH_IVF_PROBE", "8"))
+
+# 검색 결과 캐시
+# - SEARCH_CACHE_SIZE: 캐시할 검색어 수 (0이면 끔), SEARCH_CACHE_MAX_BYTES: 추정 메모리 상한
+# - SEARCH_PRECOMPUTED_PATH: 자주 쓰는 검색어의 미리 계산한 top-k (python -m app.agent.tools.search_cache로 생성)
+# - SEARCH_QUERY_LOG_PATH: 지정하면 검색어를 JSONL로 기록 (precompute 입력)
+SEARCH_CACHE_SIZE: Final[int] = int(os.getenv("SEARCH_CACHE_SIZE", "4096"))
+SEARCH_CACHE_MAX_BYTES: Final[int] = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+SEARCH_PRECOMPUTED_PATH: Final[str] = os.getenv("SEARCH_PRECOMPUTED_PATH", "")
+SEARCH_QUERY_LOG_PATH: Final[str] = os.getenv("SEARCH_QUERY_LOG_PATH", "")
+
+# 조문 구조 인덱스 (extract_clause)
+# - CLAUSE_INDEX_ENABLED: 미리 계산한 조/항/호 구조로 조항 정리 (false면 전체 원문을 LLM에 전달)
+# - CLAUSE_INDEX_PATH: 구조 인덱스(JSON) 저장 경로 (비우면 파일로 저장하지 않고 시작할 때 메모리에서 계산)
+# - CLAUSE_USE_LLM: false면 "사용자 질문과의 관계"도 LLM 없이 정리
+CLAUSE_INDEX_ENABLED: Final[bool] = os.getenv("CLAUSE_INDEX_ENABLED", "true").lower() == "true"
+CLAUSE_INDEX_PATH: Final[str] = os.getenv("CLAUSE_INDEX_PATH", "")
+CLAUSE_USE_LLM: Final[bool] = os.getenv("CLAUSE_USE_LLM", "true").lower() == "true"
+
+# 규정 데이터 경로: .json / .jsonl 파일 또는 shard 파일 디렉토리 (비우면 app/data/rules_sample.json)
+RULES_DATA_PATH: Final[str] = os.getenv("RULES_DATA_PATH", "")
+# 규정 데이터 파일 변경 감지 주기(초). 0이면 자동 reload 하지 않음 (/admin/reload로만 반영)
+RULES_POLL_INTERVAL: Final[Optional[float]] = _optional_float(os.getenv("RULES_POLL_INTERVAL", "5"))
+# 여러 worker 프로세스가 mmap으로 공유할 규정 corpus + 역색인 snapshot 파일 경로 (비우면 프로세스마다 메모리에 적재)
+RULES_SNAPSHOT_PATH: Final[str] = os.getenv("RULES_SNAPSHOT_PATH", "")
+# false면 미리 만들어 둔 snapshot 파일을 규정 원본 파일과 대조하지 않고 바로 사용 (원본 없이 snapshot만 배포하는 replica용)
+RULES_SNAPSHOT_VERIFY: Final[bool] = os.getenv("RULES_SNAPSHOT_VERIFY", "true").lower() == "true"
 
-if not OPENAI_API_KEY:
-    raise RuntimeError("OPENAI_API_KEY 환경 변수가 설정되어 있지 않습니다.")
+# 시작 시 warm-up (FastAPI lifespan)
+# - APP_WARMUP=true: 서버 시작 시 도구 / 인덱스 / 플래너를 미리 만든다 (false면 첫 요청 때 생성)
+APP_WARMUP: Final[bool] = os.getenv("APP_WARMUP", "true").lower() == "true"
 
-client = OpenAI(api_key=OPENAI_API_KEY)
+# 프롬프트 컨텍스트 토큰 예산
+# - CONTEXT_TOKEN_BUDGET: summarize/extract_clause에 넣을 규정 텍스트 예산 (비우면 모델별 기본값)
+# - MEMORY_CONTEXT_TOKEN_BUDGET: 플래너 프롬프트에 넣을 대화 기록 예산
+CONTEXT_TOKEN_BUDGET: Final[Optional[int]] = (
+    int(os.environ["CONTEXT_TOKEN_BUDGET"]) if os.getenv("CONTEXT_TOKEN_BUDGET") else None
+)
+MEMORY_CONTEXT_TOKEN_BUDGET: Final[int] = int(os.getenv("MEMORY_CONTEXT_TOKEN_BUDGET", "1000"))
 
-__all__ = ["client", "MODEL_NAME"]
+__all__ = [
+    "get_client",
+    "get_async_client",
+    "MODEL_NAME",
+    "OPENAI_BASE_URL",
+    "LLM_TIMEOUT_SECONDS",
+    "LLM_MAX_RETRIES",
+    "LLM_RETRY_BASE_SECONDS",
+    "LLM_RETRY_MAX_SECONDS",
+    "LLM_MAX_CONCURRENCY",
+    "LLM_REQUESTS_PER_MINUTE",
+    "LLM_TOKENS_PER_MINUTE",
+    "LLM_HEDGE_AFTER_MS",
+    "LLM_POOL_MAX_CONNECTIONS",
+    "LLM_POOL_MAX_KEEPALIVE",
+    "MEMORY_BACKEND",
+    "MEMORY_DB_PATH",
+    "MEMORY_MAX_TURNS",
+    "MEMORY_MAX_SESSIONS",
+    "MEMORY_TTL_SECONDS",
+    "RESPONSE_CACHE_ENABLED",
+    "RESPONSE_CACHE_SIZE",
+    "RESPONSE_CACHE_TTL_SECONDS",
+    "RESPONSE_CACHE_SIMILARITY",
+    "RESPONSE_VERBOSITY",
+    "RESPONSE_COMPRESSION",
+    "RESPONSE_COMPRESS_MIN_BYTES",
+    "TRACE_RECORD_PATH",
+    "TRACE_SAMPLE_RATE",
+    "LLM_CACHE_ENABLED",
+    "LLM_CACHE_SIZE",
+    "LLM_CACHE_DB_PATH",
+    "PLANNER_MODE",
+    "PLANNER_STRUCTURED_OUTPUT",
+    "AGENT_EARLY_STOP",
+    "AGENT_SEARCH_CONFIDENCE",
+    "AGENT_DEADLINE_SECONDS",
+    "SEARCH_MODE",
+    "SEARCH_EMBEDDER",
+    "SEARCH_EMBEDDING_DIM",
+    "SEARCH_VECTOR_PATH",
+    "SEARCH_HYBRID_ALPHA",
+    "SEARCH_IVF_LISTS",
+    "SEARCH_IVF_PROBE",
+    "SEARCH_CACHE_SIZE",
+    "SEARCH_CACHE_MAX_BYTES",
+    "SEARCH_PRECOMPUTED_PATH",
+    "SEARCH_QUERY_LOG_PATH",
+    "CLAUSE_INDEX_ENABLED",
+    "CLAUSE_INDEX_PATH",
+    "CLAUSE_USE_LLM",
+    "RULES_DATA_PATH",
+    "RULES_POLL_INTERVAL",
+    "RULES_SNAPSHOT_PATH",
+    "RULES_SNAPSHOT_VERIFY",
+    "APP_WARMUP",
+    "CONTEXT_TOKEN_BUDGET",
+    "MEMORY_CONTEXT_TOKEN_BUDGET",
+]
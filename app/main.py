@@ -1,14 +1,166 @@
 # app/main.py
+import asyncio
+import logging
 import os
-from typing import List, Any, Dict
+import threading
+import time
+from contextlib import asynccontextmanager, nullcontext
+from typing import List, Any, AsyncIterator, Awaitable, Callable, Dict, Literal, Optional, Union
+
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import PlainTextResponse, Response, StreamingResponse
+from pydantic import BaseModel, Field
+
+from app.agent.cache import ResponseCache, normalize_query
+from app.agent.context import ContextBuilder, context_budget_for
+from app.agent.llm import completion_cache
+from app.agent.memory import MemoryBackend, build_memory_backend
+from app.agent.loop_control import DEGRADED_STOP_REASONS, LoopController
+from app.agent.metrics import AGENT_LOOP_STOPS, AGENT_REQUESTS, AGENT_STEPS_SKIPPED, StepMetrics, render_metrics, span, step_scope
+from app.agent.singleflight import SingleFlight
+from app.agent.planner import build_planner
+from app.agent.executor import TEXT_TOOLS, Executor
+from app.agent.tools import build_tool_registry, Tool
+from app.agent.trace import current_trace_id, record as record_trace, trace_recorder
+from app.agent.wire import compress, dumps, negotiate_encoding, rule_ids, shape_response, shape_step
+from app.config import (
+    AGENT_DEADLINE_SECONDS,
+    AGENT_EARLY_STOP,
+    AGENT_SEARCH_CONFIDENCE,
+    APP_WARMUP,
+    CLAUSE_INDEX_ENABLED,
+    CLAUSE_INDEX_PATH,
+    CLAUSE_USE_LLM,
+    CONTEXT_TOKEN_BUDGET,
+    MEMORY_CONTEXT_TOKEN_BUDGET,
+    MODEL_NAME,
+    MEMORY_BACKEND,
+    MEMORY_DB_PATH,
+    MEMORY_MAX_SESSIONS,
+    MEMORY_MAX_TURNS,
+    MEMORY_TTL_SECONDS,
+    PLANNER_MODE,
+    PLANNER_STRUCTURED_OUTPUT,
+    RULES_DATA_PATH,
+    RULES_POLL_INTERVAL,
+    RULES_SNAPSHOT_PATH,
+    RULES_SNAPSHOT_VERIFY,
+    RESPONSE_CACHE_ENABLED,
+    RESPONSE_CACHE_SIMILARITY,
+    RESPONSE_CACHE_SIZE,
+    RESPONSE_CACHE_TTL_SECONDS,
+    RESPONSE_COMPRESSION,
+    RESPONSE_COMPRESS_MIN_BYTES,
+    RESPONSE_VERBOSITY,
+    SEARCH_CACHE_MAX_BYTES,
+    SEARCH_CACHE_SIZE,
+    SEARCH_EMBEDDER,
+    SEARCH_EMBEDDING_DIM,
+    SEARCH_HYBRID_ALPHA,
+    SEARCH_IVF_LISTS,
+    SEARCH_IVF_PROBE,
+    SEARCH_MODE,
+    SEARCH_PRECOMPUTED_PATH,
+    SEARCH_QUERY_LOG_PATH,
+    SEARCH_VECTOR_PATH,
+)
 
-from fastapi import FastAPI, HTTPException
-from pydantic import BaseModel
 
-from app.agent.memory import ConversationMemory
-from app.agent.planner import Planner
-from app.agent.executor import Executor
-from app.agent.tools import build_tool_registry, Tool
+logger = logging.getLogger(__name__)
+
+# 도구 및 코어 컴포넌트 초기화
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # app 디렉토리
+DATA_PATH = RULES_DATA_PATH or os.path.join(BASE_DIR, "data", "rules_sample.json")
+
+
+class AgentRuntime:
+    """
+    Tool 레지스트리 + Planner + Executor.
+    규정 corpus 적재 / 인덱스 생성이 필요하므로 import 시점이 아니라 처음 필요할 때(또는 lifespan warm-up에서) 만든다.
+    """
+
+    def __init__(self) -> None:
+        self.tool_registry: Dict[str, Tool] = build_tool_registry(
+            data_path=DATA_PATH,
+            rules_poll_interval=RULES_POLL_INTERVAL,
+            rules_snapshot_path=RULES_SNAPSHOT_PATH or None,
+            rules_snapshot_verify=RULES_SNAPSHOT_VERIFY,
+            search_mode=SEARCH_MODE,
+            embedder=SEARCH_EMBEDDER,
+            embedding_dim=SEARCH_EMBEDDING_DIM,
+            vector_path=SEARCH_VECTOR_PATH or DATA_PATH.rstrip(os.sep) + ".embeddings.npy",
+            hybrid_alpha=SEARCH_HYBRID_ALPHA,
+            ivf_lists=SEARCH_IVF_LISTS,
+            ivf_probe=SEARCH_IVF_PROBE,
+            search_cache_size=SEARCH_CACHE_SIZE,
+            search_cache_max_bytes=SEARCH_CACHE_MAX_BYTES,
+            search_precomputed_path=SEARCH_PRECOMPUTED_PATH or None,
+            search_query_log_path=SEARCH_QUERY_LOG_PATH or None,
+            clause_index=CLAUSE_INDEX_ENABLED,
+            clause_index_path=CLAUSE_INDEX_PATH or None,
+            clause_use_llm=CLAUSE_USE_LLM,
+        )
+
+        # LLM 플래너에게 알려줄 tool 이름들 + pseudo-tool "final_answer"
+        self.tool_names = list(self.tool_registry.keys()) + ["final_answer"]
+
+        self.planner = build_planner(PLANNER_MODE, tool_names=self.tool_names, structured_output=PLANNER_STRUCTURED_OUTPUT)
+        self.executor = Executor(tool_registry=self.tool_registry)
+
+    def corpus_version(self) -> Optional[int]:
+        return getattr(getattr(self.tool_registry.get("search"), "store", None), "version", None)
+
+
+_runtime: Optional[AgentRuntime] = None
+_runtime_lock = threading.Lock()
+
+
+def get_runtime() -> AgentRuntime:
+    """
+    AgentRuntime을 (처음 한 번만) 만들어 반환. 동시에 여러 요청이 와도 한 번만 만든다.
+    """
+    global _runtime
+    if _runtime is None:
+        with _runtime_lock:
+            if _runtime is None:
+                _runtime = AgentRuntime()
+    return _runtime
+
+
+async def aget_runtime() -> AgentRuntime:
+    # 아직 없으면 이벤트 루프를 막지 않도록 스레드에서 만든다.
+    if _runtime is not None:
+        return _runtime
+    return await asyncio.to_thread(get_runtime)
+
+
+def warm_up() -> Dict[str, Any]:
+    """
+    도구 / 인덱스 / 플래너와 조문 구조 인덱스를 미리 만들어 첫 요청 지연을 없앤다. 단계별 소요 시간(초)을 반환.
+    """
+    started_at = time.perf_counter()
+    runtime = get_runtime()
+    built_at = time.perf_counter()
+
+    clause_tool = runtime.tool_registry.get("extract_clause")
+    clause_index = getattr(clause_tool, "clause_index", None)
+    if clause_index is not None:
+        clause_index.sync()
+
+    return {
+        "runtime_seconds": round(built_at - started_at, 6),
+        "clause_index_seconds": round(time.perf_counter() - built_at, 6),
+        "corpus_version": runtime.corpus_version(),
+    }
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    if APP_WARMUP:
+        stats = await asyncio.to_thread(warm_up)
+        logger.info("warm-up 완료: %s", stats)
+    yield
 
 
 # FastAPI 앱 생성
@@ -16,21 +168,33 @@ app = FastAPI(
     title="RulebaseAgent API",
     version="0.2.0",
     description="규정 기반 Tool-Using Agent 데모 API (리팩토링 버전)",
+    lifespan=lifespan,
 )
 
-# 도구 및 코어 컴포넌트 초기화
-
-BASE_DIR = os.path.dirname(os.path.abspath(__file__))  # app 디렉토리
-DATA_PATH = os.path.join(BASE_DIR, "data", "rules_sample.json")
+# 세션별 대화 메모리 (session_id → 최근 N턴)
+memory_backend: MemoryBackend = build_memory_backend(
+    MEMORY_BACKEND,
+    max_turns=MEMORY_MAX_TURNS,
+    max_sessions=MEMORY_MAX_SESSIONS,
+    ttl_seconds=MEMORY_TTL_SECONDS,
+    db_path=MEMORY_DB_PATH,
+)
 
-tool_registry: Dict[str, Tool] = build_tool_registry(data_path=DATA_PATH)
+# 반복 질의용 최종 응답 캐시 (규정 데이터 파일 / corpus 버전이 바뀌면 자동 무효화)
+response_cache = ResponseCache(
+    max_entries=RESPONSE_CACHE_SIZE,
+    ttl_seconds=RESPONSE_CACHE_TTL_SECONDS,
+    similarity_threshold=RESPONSE_CACHE_SIMILARITY,
+    watch_paths=[DATA_PATH],
+    version_fn=lambda: _runtime.corpus_version() if _runtime is not None else None,
+)
 
-# LLM 플래너에게 알려줄 tool 이름들 + pseudo-tool "final_answer"
-tool_names = list(tool_registry.keys()) + ["final_answer"]
+# 프롬프트에 넣을 규정 텍스트 / 대화 기록을 토큰 예산 안으로 줄이는 빌더
+context_builder = ContextBuilder(budget_tokens=CONTEXT_TOKEN_BUDGET or context_budget_for(MODEL_NAME))
+memory_context_builder = ContextBuilder(budget_tokens=MEMORY_CONTEXT_TOKEN_BUDGET)
 
-planner = Planner(tool_names=tool_names)
-executor = Executor(tool_registry=tool_registry)
-memory = ConversationMemory(max_turns=5)
+# 동시에 실행 중인 동일 요청(같은 질문 + 같은 컨텍스트)을 하나의 실행으로 합치는 레이어
+single_flight: "SingleFlight[AgentResponse]" = SingleFlight()
 
 
 # Request / Response 모델 정의
@@ -38,6 +202,16 @@ memory = ConversationMemory(max_turns=5)
 class AgentRequest(BaseModel):
     query: str
     max_steps: int = 3
+    # 대화 메모리를 구분하는 키 (클라이언트/사용자 단위)
+    session_id: str = "default"
+    # 응답 상세 수준: full | compact(규정은 id로 참조) | steps(payload 제외) | final(최종 답변만), 없으면 RESPONSE_VERBOSITY
+    verbosity: Optional[Literal["full", "compact", "steps", "final"]] = None
+
+
+class BatchAgentRequest(BaseModel):
+    requests: List[AgentRequest]
+    # 동시에 실행할 최대 Agent 수
+    concurrency: int = Field(default=8, ge=1, le=64)
 
 
 class PlanStep(BaseModel):
@@ -46,106 +220,560 @@ class PlanStep(BaseModel):
     output: Any
     reason: str
     is_final: bool
+    # 이 step의 플랜을 만든 경로: "rule" | "llm" (post-processing 등은 None)
+    planner: Optional[str] = None
+    # (선택) 이 step의 소요 시간(plan + 실행)과 LLM 토큰 사용량
+    duration_ms: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    # (병렬 플랜) 호출 id와 이 호출이 기다린 선행 호출 id들
+    call_id: Optional[str] = None
+    depends_on: Optional[List[str]] = None
 
 
 class AgentResponse(BaseModel):
     query: str
     steps: List[PlanStep]
     final_answer: str
+    # 응답 캐시에서 바로 반환된 경우 True
+    cached: bool = False
+    # 토큰 예산 적용으로 프롬프트에서 줄인 (추정) 토큰 수
+    context_tokens_saved: int = 0
+    # Agent 루프가 끝난 이유: final | answered | confident_match | repeated_plan | no_progress | deadline | max_steps
+    stop_reason: Optional[str] = None
 
 
-@app.post("/agent", response_model=AgentResponse)
-async def run_agent(request: AgentRequest) -> AgentResponse:
+# verbosity별 /agent 응답 형식 (OpenAPI 문서용, 실제 축약은 app.agent.wire.shape_response). full 이외에는 None 필드 생략
+class StepSummary(BaseModel):
     """
-    사용자의 query를 받아 Planner → Executor → Memory를 거치는 Agent 루프를 수행하고,
-    각 step과 최종 답변을 반환.
+    verbosity=steps의 step: tool_input / output을 뺀 PlanStep.
     """
-    try:
-        user_query = request.query
-        max_steps = request.max_steps
-
-        steps: List[PlanStep] = []
-
-        # multi-step loop
-        current_context = memory.get_context_str()
-        last_result: Any = None
-
-        for _ in range(max_steps):
-            # 1) Plan
-            plan = planner.plan(user_query=user_query, memory_context=current_context)
-
-            # 2) search → summarize / extract_clause 연결
-            if last_result is not None and isinstance(last_result, list):
-                if plan.get("tool") in ("summarize", "extract_clause"):
-                    texts = [item.get("content", "") for item in last_result]
-                    plan.setdefault("tool_input", {})
-                    plan["tool_input"].setdefault("texts", texts)
-
-            # 3) Execute
-            exec_result = executor.execute(plan=plan, user_query=user_query)
-
-            step = PlanStep(
-                tool=exec_result["tool"],
-                tool_input=exec_result["tool_input"],
-                output=exec_result["output"],
-                reason=exec_result["reason"],
-                is_final=exec_result["is_final"],
-            )
-            steps.append(step)
 
-            last_result = exec_result["output"]
+    tool: str
+    reason: str
+    is_final: bool
+    planner: Optional[str] = None
+    duration_ms: Optional[float] = None
+    prompt_tokens: Optional[int] = None
+    completion_tokens: Optional[int] = None
+    call_id: Optional[str] = None
+    depends_on: Optional[List[str]] = None
+
+
+class FinalAgentResponse(BaseModel):
+    """
+    verbosity=final: 최종 답변만 (steps 없음).
+    """
+
+    query: str
+    final_answer: str
+    cached: bool = False
+    context_tokens_saved: int = 0
+    stop_reason: Optional[str] = None
+
+
+class StepsAgentResponse(FinalAgentResponse):
+    """
+    verbosity=steps: step은 tool / reason / 소요 시간 등만.
+    """
+
+    steps: List[StepSummary]
+
+
+class CompactAgentResponse(FinalAgentResponse):
+    """
+    verbosity=compact: 검색된 규정은 rules에 한 번만 담고, step의 검색 결과(output)와
+    summarize / extract_clause 입력 texts는 규정 id 목록(tool_input.rule_ids)으로 대체.
+    """
+
+    steps: List[PlanStep]
+    rules: List[Dict[str, Any]]
+
+
+# Agent 실행 중 발생하는 이벤트(step / token)를 받는 콜백: emit(event, data)
+EventCallback = Callable[[str, Any], Awaitable[None]]
+
+
+async def _execute_agent(request: AgentRequest, emit: Optional[EventCallback] = None) -> AgentResponse:
+    """
+    세션 메모리 / 응답 캐시 / single-flight를 거쳐 Agent 루프를 실행한다.
+
+    emit을 주면 step이 끝날 때마다 ("step", PlanStep dict),
+    summarize/extract_clause 답변이 생성되는 동안 ("token", 문자열 조각) 이벤트를 보낸다.
+    """
+    # TRACE_RECORD_PATH가 있으면 요청 / step / LLM 응답을 trace로 기록 (bench.replay 입력)
+    trace = trace_recorder.request(request.model_dump()) if trace_recorder is not None else nullcontext()
+    with trace:
+        started_at = time.perf_counter()
+        try:
+            with span("request", name="agent"):
+                response = await _execute_agent_with_cache(request, emit)
+        except Exception as e:
+            AGENT_REQUESTS.inc(result="error")
+            record_trace("response", seconds=round(time.perf_counter() - started_at, 6), error=str(e))
+            raise
+        AGENT_REQUESTS.inc(result="cached" if response.cached else "computed")
+        record_trace(
+            "response",
+            seconds=round(time.perf_counter() - started_at, 6),
+            cached=response.cached,
+            stop_reason=response.stop_reason,
+            final_answer=response.final_answer,
+        )
+    return response
+
+
+async def _execute_agent_with_cache(request: AgentRequest, emit: Optional[EventCallback]) -> AgentResponse:
+    user_query = request.query
+    memory = await memory_backend.aload(request.session_id)
+    memory_context = memory.get_context_str()
+    started_at = time.perf_counter()
+
+    # 0) 응답 캐시 조회 (같은/유사한 질문 + 같은 컨텍스트면 LLM 호출 없이 반환)
+    if RESPONSE_CACHE_ENABLED:
+        cached = response_cache.get(user_query, memory_context)
+        if cached is not None:
+            await memory_backend.aadd_turn(request.session_id, user=user_query, agent=cached["final_answer"])
+            response = AgentResponse(**{**cached, "query": user_query, "cached": True})
+            if emit is not None:
+                for step in response.steps:
+                    await emit("step", step.model_dump())
+            return response
+
+    if emit is None:
+        # 같은 질문 + 같은 컨텍스트로 동시에 실행 중인 요청이 있으면 그 결과를 함께 기다린다.
+        flight_key = f"{response_cache.make_key(user_query, memory_context)}:{request.max_steps}"
+        response = await single_flight.do(
+            flight_key,
+            lambda: _run_agent_loop(user_query, request.max_steps, memory_context),
+        )
+        if response.query != user_query:
+            response = response.model_copy(update={"query": user_query})
+    else:
+        # 스트리밍은 이벤트가 요청마다 달라서 coalescing 하지 않는다.
+        response = await _run_agent_loop(user_query, request.max_steps, memory_context, emit=emit)
+
+    # 메모리에 저장
+    await memory_backend.aadd_turn(request.session_id, user=user_query, agent=response.final_answer)
+
+    # 마감 시간 / step 한도로 잘린 답변은 캐시하지 않는다 (TTL 동안 같은 질문이 계속 불완전한 답을 받지 않도록)
+    if RESPONSE_CACHE_ENABLED and response.stop_reason not in DEGRADED_STOP_REASONS:
+        response_cache.set(
+            user_query,
+            memory_context,
+            response.model_dump(),
+            compute_seconds=time.perf_counter() - started_at,
+        )
+    return response
 
-            # 4) 종료 조건
-            if exec_result["is_final"] or exec_result["tool"] == "final_answer":
+
+async def _run_agent_loop(
+    user_query: str,
+    max_steps: int,
+    memory_context: str,
+    emit: Optional[EventCallback] = None,
+) -> AgentResponse:
+    """
+    Planner → Executor를 반복하는 multi-step Agent 루프 본체.
+    """
+    runtime = await aget_runtime()
+    planner, executor = runtime.planner, runtime.executor
+    on_token: Optional[Callable[[str], Awaitable[None]]] = None
+    if emit is not None:
+        async def on_token(chunk: str) -> None:
+            await emit("token", chunk)
+
+    steps: List[PlanStep] = []
+    tokens_saved = 0
+
+    def budget_texts(texts: List[str]) -> List[str]:
+        nonlocal tokens_saved
+        budgeted, stats = context_builder.build(user_query, texts)
+        tokens_saved += stats.tokens_saved
+        return budgeted
+
+    # multi-step loop
+    current_context, memory_stats = memory_context_builder.build_memory(memory_context)
+    tokens_saved += memory_stats.tokens_saved
+    last_result: Any = None
+
+    def prepare_plan(plan: Dict[str, Any]) -> Dict[str, Any]:
+        # search → summarize / extract_clause 연결
+        if plan.get("tool") in TEXT_TOOLS:
+            tool_input = plan.get("tool_input") or {}
+            if not tool_input.get("texts") and isinstance(last_result, list):
+                tool_input["texts"] = [item.get("content", "") for item in last_result]
+            # 프롬프트에 들어갈 규정 텍스트는 토큰 예산 안으로 정리 (중복 제거 / 관련 문장 위주로 축약)
+            if tool_input.get("texts"):
+                tool_input["texts"] = budget_texts(list(tool_input["texts"]))
+            plan["tool_input"] = tool_input
+        return plan
+
+    async def record_step(step: PlanStep) -> None:
+        steps.append(step)
+        if current_trace_id() is not None:
+            record_trace("step", step=step.model_dump())
+        if emit is not None:
+            await emit("step", step.model_dump())
+
+    controller = LoopController(
+        max_steps,
+        deadline_seconds=AGENT_DEADLINE_SECONDS,
+        early_stop=AGENT_EARLY_STOP,
+        search_confidence=AGENT_SEARCH_CONFIDENCE,
+    )
+
+    while controller.should_continue():
+        with step_scope() as step_metrics:
+            # 1) Plan (마감 시간이 있으면 남은 시간 안에서만 기다린다)
+            try:
+                with span("planner", name=PLANNER_MODE):
+                    plan = await asyncio.wait_for(
+                        planner.aplan(
+                            user_query=user_query,
+                            memory_context=current_context,
+                            last_result=last_result,
+                        ),
+                        timeout=controller.remaining_seconds(),
+                    )
+            except asyncio.TimeoutError:
+                controller.stop("deadline")
                 break
 
-            # (원하면 여기서 current_context를 last_result 기반으로 업데이트하도록 확장 가능)
-            current_context = memory.get_context_str()
-
-        # 최종 답변 결정 로직
-        if isinstance(last_result, list):
-            # search 결과만 남아있는 경우 → 한 번 더 summarize 해서 마무리
-            texts = [item.get("content", "") for item in last_result]
-
-            summarize_tool = tool_registry.get("summarize")
-            if summarize_tool is not None:
-                summarized = summarize_tool.run(
-                    user_query=user_query,
-                    tool_input={"texts": texts},
-                )
+            # 같은 플랜 반복이면 실행하지 않고 종료
+            if not controller.check_plan(plan):
+                break
 
-                summary_step = PlanStep(
-                    tool="summarize (post-processing)",
-                    tool_input={"texts": texts},
-                    output=summarized,
-                    reason="search 결과를 바탕으로 최종 사용자 답변을 생성",
-                    is_final=True,
-                )
-                steps.append(summary_step)
-                final_answer = summarized
+            # 2) Execute (플래너와 같은 마감 시간 안에서. 넘기면 직전 결과로 마무리)
+            if plan.get("calls"):
+                # 서로 독립적인 호출은 동시에 실행하고, 합친 결과를 다음 단계로 넘긴다.
+                try:
+                    graph = await asyncio.wait_for(
+                        executor.aexecute_calls(plan=plan, user_query=user_query, prepare_plan=prepare_plan),
+                        timeout=controller.remaining_seconds(),
+                    )
+                except asyncio.TimeoutError:
+                    controller.stop("deadline")
+                    break
+                for result in graph["results"]:
+                    await record_step(
+                        PlanStep(
+                            tool=result["tool"],
+                            tool_input=result["tool_input"],
+                            output=result["output"],
+                            reason=result["reason"],
+                            is_final=result["is_final"],
+                            planner=result["planner"],
+                            call_id=result["call_id"],
+                            depends_on=result["depends_on"],
+                            **_step_metrics_fields(result["metrics"]),
+                        )
+                    )
+                last_result = graph["output"]
+                tool, is_final = plan.get("tool", "parallel"), graph["is_final"]
             else:
-                final_answer = str(last_result)
-        else:
-            final_answer = (
-                str(last_result) if last_result is not None else "답변을 생성하지 못했습니다."
-            )
+                try:
+                    exec_result = await asyncio.wait_for(
+                        executor.aexecute(plan=prepare_plan(plan), user_query=user_query, on_token=on_token),
+                        timeout=controller.remaining_seconds(),
+                    )
+                except asyncio.TimeoutError:
+                    controller.stop("deadline")
+                    break
+                await record_step(
+                    PlanStep(
+                        tool=exec_result["tool"],
+                        tool_input=exec_result["tool_input"],
+                        output=exec_result["output"],
+                        reason=exec_result["reason"],
+                        is_final=exec_result["is_final"],
+                        planner=exec_result["planner"],
+                        **_step_metrics_fields(step_metrics),
+                    )
+                )
+                last_result = exec_result["output"]
+                tool, is_final = exec_result["tool"], exec_result["is_final"]
 
-        # 메모리에 저장
-        memory.add_turn(user=user_query, agent=final_answer)
+            # 3) 종료 조건 (final / 충분한 답변 / 확실한 검색 결과 / 진전 없음)
+            if controller.check_result(plan, tool, last_result, is_final, user_query):
+                break
 
-        return AgentResponse(
-            query=user_query,
-            steps=steps,
-            final_answer=final_answer,
+            # (원하면 여기서 current_context를 last_result 기반으로 업데이트하도록 확장 가능)
+
+    stop_reason = controller.stop_reason or "max_steps"
+
+    # 최종 답변 결정 로직
+    summary_result: Optional[Dict[str, Any]] = None
+    if isinstance(last_result, list) and stop_reason != "deadline":
+        # search 결과만 남아있는 경우 → 한 번 더 summarize 해서 마무리 (남은 마감 시간 안에서)
+        texts = budget_texts([item.get("content", "") for item in last_result])
+
+        summarize_tool = runtime.tool_registry.get("summarize")
+        if summarize_tool is not None:
+            try:
+                with step_scope() as step_metrics, span("post_summarize", name="summarize"):
+                    summary_result = await asyncio.wait_for(
+                        executor.aexecute(
+                            plan={"tool": "summarize", "tool_input": {"texts": texts}},
+                            user_query=user_query,
+                            on_token=on_token,
+                        ),
+                        timeout=controller.remaining_seconds(),
+                    )
+            except asyncio.TimeoutError:
+                stop_reason = "deadline"
+
+    if isinstance(last_result, list) and stop_reason == "deadline":
+        # 마감 시간을 넘겼으면 LLM을 더 부르지 않고 검색된 규정 원문으로 답한다.
+        final_answer = "\n".join(item.get("content", "") for item in last_result) or "답변을 생성하지 못했습니다."
+    elif isinstance(last_result, list):
+        if summary_result is not None:
+            summarized = summary_result["output"]
+            if isinstance(summarized, dict) and "error" in summarized:
+                raise RuntimeError(summarized["error"])
+
+            summary_step = PlanStep(
+                tool="summarize (post-processing)",
+                tool_input={"texts": texts},
+                output=summarized,
+                reason="search 결과를 바탕으로 최종 사용자 답변을 생성",
+                is_final=True,
+                **_step_metrics_fields(step_metrics),
+            )
+            await record_step(summary_step)
+            final_answer = summarized
+        else:
+            final_answer = str(last_result)
+    else:
+        final_answer = (
+            str(last_result) if last_result is not None else "답변을 생성하지 못했습니다."
         )
 
+    AGENT_LOOP_STOPS.inc(reason=stop_reason)
+    # 조기 종료로 쓰지 않은 step 수 (step마다 플래너 호출 1회 이상)
+    AGENT_STEPS_SKIPPED.inc(max(0, max_steps - controller.steps))
+
+    return AgentResponse(
+        query=user_query,
+        steps=steps,
+        final_answer=final_answer,
+        context_tokens_saved=tokens_saved,
+        stop_reason=stop_reason,
+    )
+
+
+def _step_metrics_fields(metrics: StepMetrics) -> Dict[str, Any]:
+    return {
+        "duration_ms": metrics.duration_ms,
+        "prompt_tokens": metrics.prompt_tokens,
+        "completion_tokens": metrics.completion_tokens,
+    }
+
+
+def _verbosity(request: AgentRequest) -> str:
+    return request.verbosity or RESPONSE_VERBOSITY
+
+
+def _json_response(payload: Any, accept_encoding: Optional[str]) -> Response:
+    """
+    orjson(없으면 표준 json)으로 직렬화하고, 클라이언트가 허용하면 gzip / br로 압축한 JSON 응답.
+    """
+    body = dumps(payload)
+    headers = {"Vary": "Accept-Encoding"} if RESPONSE_COMPRESSION else {}
+    encoding = negotiate_encoding(accept_encoding) if RESPONSE_COMPRESSION else None
+    if encoding is not None and len(body) >= RESPONSE_COMPRESS_MIN_BYTES:
+        body = compress(body, encoding)
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/json", headers=headers)
+
+
+@app.post(
+    "/agent",
+    response_model=Union[AgentResponse, CompactAgentResponse, StepsAgentResponse, FinalAgentResponse],
+)
+async def run_agent(request: AgentRequest, http_request: Request) -> Response:
+    """
+    사용자의 query를 받아 Planner → Executor → Memory를 거치는 Agent 루프를 수행하고,
+    각 step과 최종 답변을 반환.
+
+    응답 형식은 verbosity에 따라 다르다: full → AgentResponse, compact → CompactAgentResponse,
+    steps → StepsAgentResponse, final → FinalAgentResponse.
+    """
+    try:
+        response = await _execute_agent(request)
+        payload = shape_response(response.model_dump(), _verbosity(request))
+        return _json_response(payload, http_request.headers.get("accept-encoding"))
+
     except Exception as e:
-        # 터미널에도 로깅
-        print("/agent 내부 에러 발생:", repr(e))
+        # 서버 로그에 traceback 기록
+        logger.exception("/agent 내부 에러 발생")
         # 클라이언트에도 에러 메시지 전달
         raise HTTPException(status_code=500, detail=str(e))
 
-# app/main.py 맨 아래 근처에 추가
+
+@app.post("/agent/stream")
+async def run_agent_stream(request: AgentRequest) -> StreamingResponse:
+    """
+    /agent의 스트리밍 버전 (NDJSON, 한 줄에 이벤트 하나).
+
+    - {"event": "step", "data": PlanStep}   : step이 끝날 때마다
+    - {"event": "token", "data": "..."}     : summarize/extract_clause 답변 토큰
+    - {"event": "final", "data": AgentResponse} : 마지막 한 번
+    - {"event": "error", "data": "..."}     : 실행 중 오류
+
+    verbosity가 final이면 step 이벤트를 보내지 않고, steps / compact면 step도 같은 형식으로 줄인다.
+    (compact의 규정 본문은 final 이벤트의 rules에 담긴다)
+    """
+    queue: "asyncio.Queue[Optional[Dict[str, Any]]]" = asyncio.Queue()
+    verbosity = _verbosity(request)
+    last_rule_ids: Optional[List[Any]] = None
+
+    async def emit(event: str, data: Any) -> None:
+        nonlocal last_rule_ids
+        if event == "step":
+            if verbosity == "final":
+                return
+            shaped = shape_step(data, verbosity, last_rule_ids)
+            last_rule_ids = rule_ids(data.get("output")) or last_rule_ids
+            data = shaped
+        await queue.put({"event": event, "data": data})
+
+    async def produce() -> None:
+        try:
+            response = await _execute_agent(request, emit=emit)
+            await emit("final", shape_response(response.model_dump(), verbosity))
+        except Exception as e:
+            logger.exception("/agent/stream 내부 에러 발생")
+            await emit("error", str(e))
+        finally:
+            await queue.put(None)
+
+    async def body() -> AsyncIterator[str]:
+        task = asyncio.create_task(produce())
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield dumps(item) + b"\n"
+        finally:
+            # 클라이언트가 연결을 끊으면 남은 Agent 실행도 중단
+            if not task.done():
+                task.cancel()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+@app.post("/agent/batch")
+async def run_agent_batch(batch: BatchAgentRequest) -> StreamingResponse:
+    """
+    여러 AgentRequest를 concurrency 개씩 동시에 실행하고, 끝나는 순서대로 NDJSON으로 반환.
+
+    - 배치 안의 중복 요청(같은 session_id + 같은 질문 + 같은 max_steps)은 한 번만 실행
+    - 같은 session_id의 항목은 세션 메모리 순서가 섞이지 않도록 배치 순서대로 하나씩 실행하고,
+      세션이 다른 항목끼리만 동시에 실행 (session_id를 생략한 항목은 모두 "default" 세션)
+    - 항목별 결과: {"index": i, "ok": true, "response": AgentResponse}
+                   {"index": i, "ok": false, "error": "..."}
+    - 한 항목이 실패해도 나머지 항목은 계속 실행된다.
+    """
+    groups: Dict[tuple, List[int]] = {}
+    for index, item in enumerate(batch.requests):
+        key = (item.session_id, normalize_query(item.query), item.max_steps)
+        groups.setdefault(key, []).append(index)
+
+    semaphore = asyncio.Semaphore(batch.concurrency)
+
+    async def run_group(indices: List[int], after: Optional[asyncio.Task]) -> tuple:
+        if after is not None:
+            # 같은 세션의 앞 항목이 끝난 뒤 실행 (성공 / 실패와 무관)
+            await asyncio.wait({after})
+        async with semaphore:
+            try:
+                response = await _execute_agent(batch.requests[indices[0]])
+                return indices, response, None
+            except asyncio.CancelledError:
+                # 함께 기다리던 작업이 취소된 경우에도 이 항목만 실패로 내보내고 배치는 계속한다
+                logger.warning("/agent/batch 항목 %s 취소됨", indices[0])
+                return indices, None, "요청이 취소되었습니다."
+            except Exception as e:
+                logger.exception("/agent/batch 항목 %s 에러 발생", indices[0])
+                return indices, None, str(e)
+
+    async def body() -> AsyncIterator[str]:
+        tasks: List[asyncio.Task] = []
+        session_tail: Dict[str, asyncio.Task] = {}
+        for (session_id, _, _), indices in groups.items():
+            task = asyncio.create_task(run_group(indices, session_tail.get(session_id)))
+            session_tail[session_id] = task
+            tasks.append(task)
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                indices, response, error = await next_done
+                for index in indices:
+                    if error is None:
+                        item = {
+                            "index": index,
+                            "ok": True,
+                            "response": shape_response(
+                                response.model_dump() | {"query": batch.requests[index].query},
+                                _verbosity(batch.requests[index]),
+                            ),
+                        }
+                    else:
+                        item = {"index": index, "ok": False, "error": error}
+                    yield dumps(item) + b"\n"
+        finally:
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    return StreamingResponse(body(), media_type="application/x-ndjson")
+
+
+def _search_cache_stats() -> Optional[Dict[str, Any]]:
+    # 아직 도구를 만들지 않았으면(lazy 초기화 전) None
+    search_tool = _runtime.tool_registry.get("search") if _runtime is not None else None
+    cache = getattr(search_tool, "cache", None)
+    return cache.stats_dict() if cache is not None else None
+
+
+@app.get("/cache/stats")
+async def cache_stats() -> Dict[str, Any]:
+    """
+    캐시 hit/miss 카운터.
+    - response: Agent 최종 응답 캐시 (+ 캐시 덕분에 절약한 누적 처리 시간)
+    - completion: LLM completion 캐시 (prompt 해시 기준)
+    - search: SearchTool 검색 결과 캐시 (도구 초기화 전이면 null)
+    - single_flight: 동시 동일 요청 coalescing 횟수
+    """
+    return {
+        "response": response_cache.stats_dict(),
+        "completion": completion_cache.stats_dict() if completion_cache is not None else None,
+        "search": _search_cache_stats(),
+        "single_flight": single_flight.stats_dict(),
+    }
+
+
+@app.post("/admin/reload")
+async def reload_rules() -> Dict[str, Any]:
+    """
+    규정 데이터 파일을 다시 읽어 추가/수정/삭제된 규정만 인덱스에 반영.
+    처리 중인 요청은 기존 snapshot으로 계속 진행된다.
+    """
+    search_tool = (await aget_runtime()).tool_registry.get("search")
+    if search_tool is None or not hasattr(search_tool, "reload"):
+        raise HTTPException(status_code=404, detail="reload 가능한 search tool이 없습니다.")
+    return await asyncio.to_thread(search_tool.reload)
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics() -> PlainTextResponse:
+    """
+    Prometheus text exposition format 메트릭.
+    (구간별 latency histogram, LLM 토큰 사용량, 요청/에러 카운터)
+    """
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
 
 @app.get("/ping")
 async def ping():
@@ -0,0 +1,137 @@
+# app/serve.py
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+from typing import Dict, List, Optional
+
+"""
+여러 worker 프로세스로 API를 띄우는 prefork 실행기.
+
+    python -m app.serve --workers 4 --port 8000
+
+부모 프로세스가 규정 snapshot 파일을 만들고 warm-up(도구 / 인덱스 초기화)을 마친 뒤 listen 소켓을 열고 fork 한다.
+worker는 부모가 적재한 모듈과 mmap된 snapshot 페이지를 copy-on-write로 물려받으므로
+worker마다 corpus를 다시 읽거나 인덱스를 만들지 않고, 프로세스당 RSS도 거의 늘지 않는다.
+worker가 비정상 종료하면 부모가 새로 fork 하고, SIGTERM / SIGINT를 받으면 모든 worker에 전달 후 종료한다.
+"""
+
+
+def _default_snapshot_path() -> str:
+    data_path = os.getenv("RULES_DATA_PATH") or os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "rules_sample.json")
+    return data_path.rstrip(os.sep) + ".snapshot.bin"
+
+
+def _bind(host: str, port: int, backlog: int) -> socket.socket:
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def _run_worker(sock: socket.socket, args: argparse.Namespace) -> None:
+    import uvicorn
+
+    from app.main import app
+
+    # 부모의 signal handler를 되돌리고 uvicorn이 graceful shutdown을 처리하게 한다.
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level=args.log_level, timeout_keep_alive=args.keep_alive)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def _spawn(sock: socket.socket, args: argparse.Namespace) -> int:
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            _run_worker(sock, args)
+        except BaseException:  # noqa: BLE001 - 어떤 예외든 worker 프로세스만 종료
+            import traceback
+
+            traceback.print_exc()
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve(args: argparse.Namespace) -> None:
+    if not hasattr(os, "fork"):
+        raise RuntimeError("prefork 실행은 fork를 지원하는 OS에서만 가능합니다. (uvicorn --workers 사용)")
+
+    # app.main import 전에 공유 snapshot 경로를 정해야 worker 모두가 같은 파일을 바라본다.
+    os.environ["RULES_SNAPSHOT_PATH"] = args.snapshot_path or os.getenv("RULES_SNAPSHOT_PATH") or _default_snapshot_path()
+
+    from app.main import warm_up
+
+    # 부모에서 한 번만 초기화(snapshot 생성 / 인덱스 적재 / 조문 구조 인덱스)하고 worker는 그대로 물려받는다.
+    warm_up()
+    # warm-up에서 만든 객체를 GC 추적 대상에서 빼 둔다. worker의 GC가 이 객체들을 훑으며
+    # 페이지를 건드려 copy-on-write 복사가 일어나는 것을 막는다.
+    gc.freeze()
+
+    sock = _bind(args.host, args.port, args.backlog)
+    print(
+        f"[serve] {args.host}:{args.port} workers={args.workers} snapshot={os.environ['RULES_SNAPSHOT_PATH']}",
+        file=sys.stderr,
+    )
+
+    workers: Dict[int, float] = {}
+    stopping = False
+
+    def handle_stop(signum: int, frame: Optional[object]) -> None:
+        nonlocal stopping
+        stopping = True
+        for pid in list(workers):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, handle_stop)
+    signal.signal(signal.SIGINT, handle_stop)
+
+    for _ in range(args.workers):
+        workers[_spawn(sock, args)] = time.monotonic()
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started_at = workers.pop(pid, None)
+        if started_at is None or stopping:
+            continue
+
+        print(f"[serve] worker {pid} 종료 (status={status}), 다시 시작", file=sys.stderr)
+        # 시작 직후 계속 죽는 경우 fork 폭주를 막는다.
+        if time.monotonic() - started_at < 1.0:
+            time.sleep(1.0)
+        workers[_spawn(sock, args)] = time.monotonic()
+
+    sock.close()
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="RulebaseAgent API prefork 실행기")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--snapshot-path", default=None, help="공유 규정 snapshot 파일 (기본: <규정 데이터 경로>.snapshot.bin)")
+    parser.add_argument("--backlog", type=int, default=2048)
+    parser.add_argument("--keep-alive", type=int, default=5, help="keep-alive 유지 시간(초)")
+    parser.add_argument("--log-level", default="info")
+    serve(parser.parse_args(argv))
+
+
+if __name__ == "__main__":
+    main()
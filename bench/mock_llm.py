@@ -0,0 +1,263 @@
+# bench/mock_llm.py
+"""
+벤치마크용 로컬 OpenAI 호환 mock 서버.
+
+POST /v1/chat/completions 요청에 대해
+- 플래너 프롬프트(system 메시지에 "플래너" 포함)에는 미리 정한 plan JSON을,
+- 그 외(summarize / extract_clause)에는 고정 요약 문장을
+설정한 latency 후에 돌려준다. stream=true면 SSE chunk로 나눠서 보낸다.
+error_rate를 주면 그 비율만큼 429 / 503 오류를 돌려준다 (재시도 / backoff 동작 확인용).
+
+사용 예:
+    python -m bench.mock_llm --port 8900 --latency-ms 300 --jitter-ms 50
+    OPENAI_BASE_URL=http://127.0.0.1:8900/v1 OPENAI_API_KEY=dummy uvicorn app.main:app
+"""
+from __future__ import annotations
+
+import argparse
+import itertools
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List, Optional, Tuple
+
+DEFAULT_PLANS: List[Dict[str, Any]] = [
+    {
+        "tool": "search",
+        "tool_input": {"query": "연차 사용 규정"},
+        "reason": "관련 규정을 먼저 검색한다.",
+        "is_final": False,
+    },
+    {
+        "tool": "summarize",
+        "tool_input": {},
+        "reason": "검색된 규정을 요약한다.",
+        "is_final": False,
+    },
+]
+DEFAULT_ANSWER = "정규직 직원은 연간 15일의 유급 연차휴가를 사용할 수 있으며, 연차는 팀장의 승인 하에 사용합니다."
+
+
+class MockLLMConfig:
+    def __init__(
+        self,
+        latency_ms: float = 200.0,
+        jitter_ms: float = 0.0,
+        plans: Optional[List[Dict[str, Any]]] = None,
+        answer: str = DEFAULT_ANSWER,
+        stream_chunk_chars: int = 4,
+        seed: Optional[int] = None,
+        error_rate: float = 0.0,
+    ) -> None:
+        self.latency_ms = latency_ms
+        self.error_rate = error_rate
+        self.jitter_ms = jitter_ms
+        self.plans = plans or DEFAULT_PLANS
+        self.answer = answer
+        self.stream_chunk_chars = stream_chunk_chars
+        self._plan_cycle = itertools.cycle(self.plans)
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+        self.requests = 0
+        self.errors = 0
+
+    def next_error(self) -> Optional[int]:
+        """
+        이번 요청에 돌려줄 오류 상태 코드 (없으면 None).
+        """
+        with self._lock:
+            if not self.error_rate or self._random.random() >= self.error_rate:
+                return None
+            self.errors += 1
+            return 429 if self.errors % 2 else 503
+
+    def next_plan(self) -> Dict[str, Any]:
+        with self._lock:
+            return next(self._plan_cycle)
+
+    def respond(self, body: Dict[str, Any]) -> Tuple[str, Optional[float]]:
+        """
+        요청 body에 대한 (답변 텍스트, latency_ms). latency_ms가 None이면 설정값(latency_ms ± jitter_ms)을 쓴다.
+        """
+        if _is_planner_request(body.get("messages") or []):
+            return json.dumps(self.next_plan(), ensure_ascii=False), None
+        return self.answer, None
+
+    def sleep(self, latency_ms: Optional[float] = None) -> None:
+        with self._lock:
+            self.requests += 1
+            jitter = self._random.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+        base = self.latency_ms if latency_ms is None else latency_ms
+        time.sleep(max(0.0, base + jitter) / 1000.0)
+
+
+def _is_planner_request(messages: List[Dict[str, Any]]) -> bool:
+    return any(m.get("role") == "system" and "플래너" in str(m.get("content", "")) for m in messages)
+
+
+def _usage(messages: List[Dict[str, Any]], content: str) -> Dict[str, int]:
+    prompt_tokens = sum(len(str(m.get("content", ""))) for m in messages) // 2
+    completion_tokens = max(1, len(content) // 2)
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+def make_handler(config: MockLLMConfig) -> type:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # 헤더와 본문을 따로 write 하므로 Nagle을 끄지 않으면 delayed ACK만큼 응답이 늦어진다.
+        disable_nagle_algorithm = True
+
+        def log_message(self, format: str, *args: Any) -> None:  # noqa: A002 - BaseHTTPRequestHandler 시그니처
+            return
+
+        def do_POST(self) -> None:  # noqa: N802
+            if not self.path.rstrip("/").endswith("/chat/completions"):
+                self._send_json(404, {"error": {"message": f"unknown path: {self.path}"}})
+                return
+
+            length = int(self.headers.get("Content-Length", "0"))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            messages = body.get("messages") or []
+            model = body.get("model", "mock")
+
+            status = config.next_error()
+            if status is not None:
+                config.sleep()
+                self._send_json(
+                    status,
+                    {"error": {"message": "mock error", "type": "rate_limit" if status == 429 else "server_error"}},
+                    headers={"Retry-After": "0"},
+                )
+                return
+
+            content, latency_ms = config.respond(body)
+            config.sleep(latency_ms)
+
+            if body.get("stream"):
+                self._send_stream(model, messages, content, body.get("stream_options") or {})
+            else:
+                self._send_json(
+                    200,
+                    {
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": model,
+                        "choices": [
+                            {
+                                "index": 0,
+                                "message": {"role": "assistant", "content": content},
+                                "finish_reason": "stop",
+                            }
+                        ],
+                        "usage": _usage(messages, content),
+                    },
+                )
+
+        def _send_json(self, status: int, payload: Dict[str, Any], headers: Optional[Dict[str, str]] = None) -> None:
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            for name, value in (headers or {}).items():
+                self.send_header(name, value)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def _send_stream(
+            self, model: str, messages: List[Dict[str, Any]], content: str, stream_options: Dict[str, Any]
+        ) -> None:
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+
+            def write_event(payload: Dict[str, Any]) -> None:
+                data = f"data: {json.dumps(payload, ensure_ascii=False)}\n\n".encode("utf-8")
+                self.wfile.write(f"{len(data):x}\r\n".encode("ascii") + data + b"\r\n")
+
+            base = {"id": "chatcmpl-mock", "object": "chat.completion.chunk", "created": int(time.time()), "model": model}
+            step = max(1, config.stream_chunk_chars)
+            for i in range(0, len(content), step):
+                write_event(
+                    {**base, "choices": [{"index": 0, "delta": {"content": content[i : i + step]}, "finish_reason": None}]}
+                )
+            write_event({**base, "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}]})
+            if stream_options.get("include_usage"):
+                write_event({**base, "choices": [], "usage": _usage(messages, content)})
+
+            done = b"data: [DONE]\n\n"
+            self.wfile.write(f"{len(done):x}\r\n".encode("ascii") + done + b"\r\n0\r\n\r\n")
+
+    return Handler
+
+
+class MockLLMServer:
+    """
+    백그라운드 스레드에서 도는 mock 서버. base_url을 OPENAI_BASE_URL로 넘겨 사용한다.
+    """
+
+    def __init__(self, config: MockLLMConfig, host: str = "127.0.0.1", port: int = 0) -> None:
+        self.config = config
+        self.httpd = ThreadingHTTPServer((host, port), make_handler(config))
+        self.httpd.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc: Any) -> None:
+        self.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="OpenAI 호환 mock LLM 서버")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8900)
+    parser.add_argument("--latency-ms", type=float, default=200.0)
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--plans", help="플래너 응답으로 순환할 plan JSON 리스트 파일")
+    parser.add_argument("--answer", default=DEFAULT_ANSWER, help="summarize / extract_clause 응답 문장")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="429 / 503 오류를 돌려줄 비율 (0~1)")
+    args = parser.parse_args()
+
+    plans = None
+    if args.plans:
+        with open(args.plans, "r", encoding="utf-8") as f:
+            plans = json.load(f)
+
+    config = MockLLMConfig(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, plans=plans, answer=args.answer, error_rate=args.error_rate
+    )
+    server = MockLLMServer(config, host=args.host, port=args.port)
+    print(f"mock LLM 서버 실행 중: {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
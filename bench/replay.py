@@ -0,0 +1,526 @@
+# bench/replay.py
+"""
+Agent 트래픽 기록(record) / 재생(replay) 부하 테스트.
+
+1) 기록: 서버를 TRACE_RECORD_PATH=trace.jsonl로 실행하면 요청 / step / LLM 응답이 JSONL trace로 남는다.
+   질의 목록으로 바로 만들 수도 있다 (--mock-llm이면 실제 API 대신 bench.mock_llm 사용):
+    python -m bench.replay record --queries queries.txt --output trace.jsonl
+
+2) 재생: trace의 요청을 다시 보내고, 기록된 LLM 답변은 로컬 stub 서버가 completion_key 기준으로 돌려준다.
+    python -m bench.replay run --trace trace.jsonl --mode pipeline --concurrency 8
+    python -m bench.replay run --trace trace.jsonl --mode asgi --rate 20 --output replay.json --baseline before.json
+    python -m bench.replay run --trace trace.jsonl --mode http --url http://127.0.0.1:8000 --stub-port 8900
+      (대상 서버는 OPENAI_BASE_URL=http://127.0.0.1:8900/v1로 실행)
+
+모드
+- pipeline: app.main의 Agent 실행(메모리 / 캐시 / Planner → Executor)을 HTTP 계층 없이 직접 호출
+- asgi: FastAPI 앱을 서버 없이 ASGI로 호출 (요청 검증 / 응답 직렬화 포함)
+- http: 실행 중인 서버에 HTTP 요청 (이 프로세스에서는 stub LLM만 띄운다)
+
+도착 간격: --rate R(초당 R건) 또는 --speed S(기록된 도착 간격을 S배 빠르게)면 open-loop로 보내고
+latency는 예정 도착 시각부터 잰다(밀린 대기 포함). 둘 다 없으면 concurrency만큼 연달아 보낸다.
+같은 session_id 요청은 기록된 순서대로 하나씩 실행한다 (대화 메모리가 같아야 LLM 프롬프트가 기록과 일치).
+
+보고서: 처리량, latency 백분위수, 구간별(stage) 시간(pipeline / asgi는 프로세스 내 메트릭, http는 /metrics 차이),
+도구별 step 시간, stub hit / miss(기록에 없는 프롬프트), 기록 대비 최종 답변 불일치 수.
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import http.client
+import json
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+from bench.mock_llm import MockLLMConfig, MockLLMServer
+from bench.run import _asgi_post, _latency_summary, percentile
+
+# OpenAI 요청 body에서 completion_key의 params가 아닌 필드
+_NON_PARAM_FIELDS = {"model", "messages", "stream", "stream_options"}
+_STAGE_LINE = re.compile(r'^rulebase_stage_duration_seconds_(sum|count)\{stage="([^"]*)",name="([^"]*)"\} (\S+)$')
+
+
+@dataclass
+class TracedRequest:
+    trace_id: str
+    ts: float
+    request: Dict[str, Any]
+    final_answer: Optional[str] = None
+    seconds: Optional[float] = None
+
+
+def load_trace(paths: Iterable[str]) -> Tuple[List[TracedRequest], Dict[str, Dict[str, Any]]]:
+    """
+    trace 파일들을 읽어 (도착 순 요청 목록, completion_key → {"content", "seconds"}) 반환.
+    """
+    requests: Dict[str, TracedRequest] = {}
+    answers: Dict[str, Dict[str, Any]] = {}
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    continue
+                kind, trace_id = record.get("type"), record.get("id")
+                if kind == "request":
+                    requests[trace_id] = TracedRequest(trace_id, float(record.get("ts") or 0.0), record["request"])
+                elif kind == "llm":
+                    # 캐시 hit 기록은 latency가 없으므로 실제 호출 기록의 시간을 우선한다.
+                    seconds = None if record.get("cached") else record.get("seconds")
+                    known = answers.get(record["key"])
+                    if known is None or (known["seconds"] is None and seconds is not None):
+                        answers[record["key"]] = {"content": record["content"], "seconds": seconds}
+                elif kind == "response" and trace_id in requests:
+                    requests[trace_id].final_answer = record.get("final_answer")
+                    requests[trace_id].seconds = record.get("seconds")
+    return sorted(requests.values(), key=lambda item: item.ts), answers
+
+
+class ReplayLLMConfig(MockLLMConfig):
+    """
+    기록된 LLM 답변을 돌려주는 stub 설정. 기록에 없는 프롬프트는 mock 기본 응답으로 대신한다.
+
+    :param latency_scale: 기록된 LLM 응답 시간에 곱할 배수 (0이면 지연 없음)
+    """
+
+    def __init__(self, answers: Dict[str, Dict[str, Any]], latency_scale: float = 1.0, **kwargs: Any) -> None:
+        super().__init__(**kwargs)
+        self.answers = answers
+        self.latency_scale = latency_scale
+        self.replayed = 0
+        self.missing = 0
+        self._counter_lock = threading.Lock()
+
+    def respond(self, body: Dict[str, Any]) -> Tuple[str, Optional[float]]:
+        from app.agent.llm import completion_key
+
+        params = {k: v for k, v in body.items() if k not in _NON_PARAM_FIELDS}
+        answer = self.answers.get(completion_key(body.get("model"), body.get("messages") or [], params))
+        with self._counter_lock:
+            if answer is None:
+                self.missing += 1
+            else:
+                self.replayed += 1
+        if answer is None:
+            return super().respond(body)
+        seconds = answer["seconds"]
+        return answer["content"], (seconds * 1000.0 * self.latency_scale) if seconds is not None else None
+
+
+def _configure_env(stub: Optional[MockLLMServer], keep_caches: bool) -> None:
+    """
+    app.config가 import 시점에 환경변수를 읽으므로, app 모듈을 import 하기 전에 호출해야 한다.
+    """
+    os.environ.setdefault("OPENAI_API_KEY", "replay-dummy-key")
+    # replay 중에는 다시 기록하지 않는다.
+    os.environ["TRACE_RECORD_PATH"] = ""
+    if stub is not None:
+        os.environ["OPENAI_BASE_URL"] = stub.base_url
+    if not keep_caches:
+        # 캐시 hit 여부가 실행 순서에 따라 달라지지 않도록 끈다
+        os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+        os.environ["LLM_CACHE_ENABLED"] = "false"
+
+
+# 요청 전송 (모드별)
+
+Sender = Callable[[Dict[str, Any]], Awaitable[Dict[str, Any]]]
+
+
+def _pipeline_sender() -> Sender:
+    from app.main import AgentRequest, _execute_agent
+
+    async def send(payload: Dict[str, Any]) -> Dict[str, Any]:
+        response = await _execute_agent(AgentRequest(**payload))
+        return response.model_dump()
+
+    return send
+
+
+def _asgi_sender() -> Sender:
+    from app.main import app
+
+    async def send(payload: Dict[str, Any]) -> Dict[str, Any]:
+        status, body = await _asgi_post(app, "/agent", payload)
+        if status != 200:
+            raise RuntimeError(f"HTTP {status}: {body[:200].decode('utf-8', 'replace')}")
+        return json.loads(body)
+
+    return send
+
+
+class _HttpClient:
+    """
+    스레드별 keep-alive 연결로 보내는 최소 HTTP 클라이언트 (표준 라이브러리만 사용).
+    """
+
+    def __init__(self, base_url: str) -> None:
+        parts = urlsplit(base_url)
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or (443 if parts.scheme == "https" else 80)
+        self.https = parts.scheme == "https"
+        self.prefix = parts.path.rstrip("/")
+        self._local = threading.local()
+
+    def _conn(self) -> http.client.HTTPConnection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            factory = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+            conn = self._local.conn = factory(self.host, self.port, timeout=300)
+        return conn
+
+    def request(self, method: str, path: str, body: Optional[bytes] = None) -> Tuple[int, bytes]:
+        headers = {"Content-Type": "application/json"} if body is not None else {}
+        for attempt in range(2):
+            conn = self._conn()
+            try:
+                conn.request(method, self.prefix + path, body=body, headers=headers)
+                response = conn.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, ConnectionError):
+                # 서버가 keep-alive 연결을 닫았으면 한 번만 새 연결로 다시 보낸다.
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+        raise AssertionError("unreachable")
+
+
+def _http_sender(client: _HttpClient) -> Sender:
+    async def send(payload: Dict[str, Any]) -> Dict[str, Any]:
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        status, data = await asyncio.to_thread(client.request, "POST", "/agent", body)
+        if status != 200:
+            raise RuntimeError(f"HTTP {status}: {data[:200].decode('utf-8', 'replace')}")
+        return json.loads(data)
+
+    return send
+
+
+# 구간별 시간
+
+StageTotals = Dict[Tuple[str, str], Tuple[int, float]]
+
+
+def _local_stages() -> StageTotals:
+    from app.agent.metrics import STAGE_DURATION
+
+    return STAGE_DURATION.series()
+
+
+def _remote_stages(client: _HttpClient) -> StageTotals:
+    status, body = client.request("GET", "/metrics")
+    if status != 200:
+        return {}
+    sums: Dict[Tuple[str, str], float] = {}
+    counts: Dict[Tuple[str, str], int] = {}
+    for line in body.decode("utf-8").splitlines():
+        match = _STAGE_LINE.match(line)
+        if match is None:
+            continue
+        kind, stage, name, value = match.groups()
+        if kind == "sum":
+            sums[(stage, name)] = float(value)
+        else:
+            counts[(stage, name)] = int(float(value))
+    return {key: (counts.get(key, 0), total) for key, total in sums.items()}
+
+
+def _stage_breakdown(before: StageTotals, after: StageTotals, requests: int) -> Dict[str, Dict[str, float]]:
+    breakdown: Dict[str, Dict[str, float]] = {}
+    for (stage, name), (count, total) in sorted(after.items()):
+        prev_count, prev_total = before.get((stage, name), (0, 0.0))
+        count, total = count - prev_count, total - prev_total
+        if count <= 0:
+            continue
+        breakdown[f"{stage}:{name}" if name else stage] = {
+            "count": count,
+            "mean_ms": round(total / count * 1000.0, 3),
+            "per_request_ms": round(total / requests * 1000.0, 3) if requests else 0.0,
+            "total_seconds": round(total, 3),
+        }
+    return breakdown
+
+
+def _tool_breakdown(responses: List[Dict[str, Any]]) -> Dict[str, Dict[str, float]]:
+    durations: Dict[str, List[float]] = {}
+    for response in responses:
+        for step in response.get("steps") or []:
+            if step.get("duration_ms") is not None:
+                durations.setdefault(step["tool"], []).append(step["duration_ms"])
+    return {
+        tool: {"count": len(values), **_latency_summary(values)}
+        for tool, values in sorted(durations.items())
+    }
+
+
+# 재생
+
+def _schedule(requests: List[TracedRequest], rate: float, speed: float) -> List[Optional[float]]:
+    """
+    요청별 출발 시각(시작 기준 초). closed-loop면 None.
+    """
+    if rate > 0:
+        return [i / rate for i in range(len(requests))]
+    if speed > 0 and requests:
+        start = requests[0].ts
+        return [max(0.0, (item.ts - start) / speed) for item in requests]
+    return [None] * len(requests)
+
+
+def _repeat(requests: List[TracedRequest], repeat: int) -> List[TracedRequest]:
+    """
+    trace를 repeat번 이어 붙인다. 회차마다 session_id를 바꿔 대화 메모리가 기록 당시와 같게 한다.
+    """
+    if repeat <= 1 or not requests:
+        return requests
+    span_seconds = requests[-1].ts - requests[0].ts
+    repeated = list(requests)
+    for n in range(1, repeat):
+        for item in requests:
+            request = dict(item.request)
+            request["session_id"] = f"{request.get('session_id', 'default')}#r{n}"
+            repeated.append(
+                TracedRequest(f"{item.trace_id}#r{n}", item.ts + n * span_seconds, request, item.final_answer, item.seconds)
+            )
+    return repeated
+
+
+async def replay(
+    requests: List[TracedRequest],
+    send: Sender,
+    *,
+    concurrency: int,
+    rate: float = 0.0,
+    speed: float = 0.0,
+) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    # session_id → 같은 세션의 직전 요청이 끝나면 set 되는 event
+    session_tail: Dict[str, asyncio.Event] = {}
+    latencies: List[float] = []
+    responses: List[Dict[str, Any]] = []
+    errors: List[str] = []
+    mismatches = 0
+    started_at = time.perf_counter()
+
+    async def one(item: TracedRequest, offset: Optional[float], previous: Optional[asyncio.Event], done: asyncio.Event) -> None:
+        nonlocal mismatches
+        try:
+            if offset is not None:
+                await asyncio.sleep(max(0.0, started_at + offset - time.perf_counter()))
+            scheduled_at = started_at + offset if offset is not None else None
+            if previous is not None:
+                await previous.wait()
+            async with semaphore:
+                t0 = scheduled_at if scheduled_at is not None else time.perf_counter()
+                try:
+                    response = await send(item.request)
+                except Exception as e:  # noqa: BLE001 - 실패한 요청도 보고서에 집계
+                    errors.append(f"{item.trace_id}: {e!r}")
+                    return
+                latencies.append((time.perf_counter() - t0) * 1000.0)
+            responses.append(response)
+            if item.final_answer is not None and response.get("final_answer") != item.final_answer:
+                mismatches += 1
+        finally:
+            done.set()
+
+    tasks = []
+    for item, offset in zip(requests, _schedule(requests, rate, speed)):
+        session_id = item.request.get("session_id", "default")
+        done = asyncio.Event()
+        tasks.append(asyncio.create_task(one(item, offset, session_tail.get(session_id), done)))
+        session_tail[session_id] = done
+    await asyncio.gather(*tasks)
+    wall = time.perf_counter() - started_at
+
+    recorded = [item.seconds * 1000.0 for item in requests if item.seconds is not None]
+    return {
+        "requests": len(requests),
+        "errors": len(errors),
+        "error_samples": errors[:5],
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else 0.0,
+        **_latency_summary(latencies),
+        "p90_ms": round(percentile(latencies, 90), 3),
+        "recorded_latency": _latency_summary(recorded) if recorded else None,
+        "answer_mismatches": mismatches,
+        "tools": _tool_breakdown(responses),
+    }
+
+
+def _compare(report: Dict[str, Any], baseline: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    baseline 보고서 대비 변화율(%).
+    """
+    delta: Dict[str, Any] = {}
+    for key in ("throughput_rps", "p50_ms", "p90_ms", "p99_ms", "mean_ms"):
+        before, after = baseline.get(key), report.get(key)
+        if before and after is not None:
+            delta[key] = round((after - before) / before * 100.0, 2)
+    stages = {}
+    for stage, values in report.get("stages", {}).items():
+        before = (baseline.get("stages") or {}).get(stage, {}).get("per_request_ms")
+        if before:
+            stages[stage] = round((values["per_request_ms"] - before) / before * 100.0, 2)
+    delta["stages_per_request_ms"] = stages
+    return delta
+
+
+def run(args: argparse.Namespace) -> Dict[str, Any]:
+    requests, answers = load_trace(args.trace)
+    requests = _repeat(requests, args.repeat)
+    if args.limit:
+        requests = requests[: args.limit]
+    if not requests:
+        raise SystemExit("trace에 request 레코드가 없습니다.")
+
+    stub_port = args.stub_port if args.stub_port is not None else (8900 if args.mode == "http" else 0)
+    stub = MockLLMServer(
+        ReplayLLMConfig(answers, latency_scale=args.llm_latency_scale, latency_ms=args.llm_latency_ms),
+        port=stub_port,
+    ).start()
+    _configure_env(stub if args.mode != "http" else None, args.keep_caches)
+    print(f"[replay] 요청 {len(requests)}건, 기록된 LLM 답변 {len(answers)}개, stub {stub.base_url}", file=sys.stderr)
+
+    try:
+        client: Optional[_HttpClient] = None
+        if args.mode == "http":
+            client = _HttpClient(args.url)
+            send = _http_sender(client)
+            read_stages: Callable[[], StageTotals] = lambda: _remote_stages(client)
+        else:
+            from app.main import warm_up
+
+            warm_up()
+            send = _pipeline_sender() if args.mode == "pipeline" else _asgi_sender()
+            read_stages = _local_stages
+
+        async def main() -> Dict[str, Any]:
+            if client is not None:
+                asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(max_workers=args.concurrency))
+            before = await asyncio.to_thread(read_stages)
+            result = await replay(requests, send, concurrency=args.concurrency, rate=args.rate, speed=args.speed)
+            after = await asyncio.to_thread(read_stages)
+            result["stages"] = _stage_breakdown(before, after, result["requests"] - result["errors"])
+            return result
+
+        result = asyncio.run(main())
+    finally:
+        stub.stop()
+
+    report = {
+        "trace": args.trace,
+        "mode": args.mode,
+        "concurrency": args.concurrency,
+        "rate": args.rate,
+        "speed": args.speed,
+        **result,
+        "llm_stub": {"replayed": stub.config.replayed, "missing": stub.config.missing},
+    }
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            report["delta_percent"] = _compare(report, json.load(f))
+    print(
+        f"[replay] {report['throughput_rps']} req/s, p50 {report['p50_ms']}ms, p99 {report['p99_ms']}ms, "
+        f"errors {report['errors']}, stub miss {stub.config.missing}, answer mismatch {report['answer_mismatches']}",
+        file=sys.stderr,
+    )
+    return report
+
+
+# 기록
+
+def _read_queries(path: str) -> List[Dict[str, Any]]:
+    """
+    질의 파일: JSONL(AgentRequest 필드) 또는 한 줄에 질의 하나.
+    """
+    requests = []
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            requests.append(json.loads(line) if line.startswith("{") else {"query": line})
+    return requests
+
+
+def record(args: argparse.Namespace) -> Dict[str, Any]:
+    server: Optional[MockLLMServer] = None
+    if args.mock_llm:
+        server = MockLLMServer(MockLLMConfig(latency_ms=args.llm_latency_ms)).start()
+        os.environ["OPENAI_BASE_URL"] = server.base_url
+        os.environ.setdefault("OPENAI_API_KEY", "replay-dummy-key")
+    os.environ["TRACE_RECORD_PATH"] = args.output
+
+    try:
+        from app.main import warm_up
+
+        warm_up()
+        send = _pipeline_sender()
+        requests = [
+            TracedRequest(str(i), float(i), request) for i, request in enumerate(_read_queries(args.queries))
+        ]
+        result = asyncio.run(replay(requests, send, concurrency=args.concurrency))
+    finally:
+        if server is not None:
+            server.stop()
+    print(f"[record] 요청 {result['requests']}건 (errors {result['errors']}) → {args.output}", file=sys.stderr)
+    return result
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Agent 트래픽 기록 / 재생 부하 테스트")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="trace 재생")
+    run_parser.add_argument("--trace", required=True, nargs="+", help="TRACE_RECORD_PATH로 기록한 JSONL trace (여러 개 가능)")
+    run_parser.add_argument("--mode", choices=("pipeline", "asgi", "http"), default="pipeline")
+    run_parser.add_argument("--url", default="http://127.0.0.1:8000", help="http 모드 대상 서버")
+    run_parser.add_argument("--concurrency", type=int, default=8)
+    run_parser.add_argument("--rate", type=float, default=0.0, help="초당 요청 수 (open-loop)")
+    run_parser.add_argument("--speed", type=float, default=0.0, help="기록된 도착 간격 재생 배속 (open-loop)")
+    run_parser.add_argument("--repeat", type=int, default=1, help="trace 반복 횟수")
+    run_parser.add_argument("--limit", type=int, default=0, help="앞에서부터 이 수만큼만 재생 (0이면 전부)")
+    run_parser.add_argument("--stub-port", type=int, default=None, help="stub LLM 포트 (기본: http 모드 8900, 그 외 임의)")
+    run_parser.add_argument("--llm-latency-scale", type=float, default=1.0, help="기록된 LLM 응답 시간 배수")
+    run_parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="응답 시간이 기록되지 않은 LLM 호출의 지연")
+    run_parser.add_argument("--keep-caches", action="store_true", help="응답 / LLM completion 캐시를 끄지 않음")
+    run_parser.add_argument("--baseline", help="비교할 이전 replay 보고서(JSON)")
+    run_parser.add_argument("--output", help="보고서 JSON 저장 경로 (없으면 stdout)")
+
+    record_parser = commands.add_parser("record", help="질의 목록을 실행해 trace 생성")
+    record_parser.add_argument("--queries", required=True, help="질의 파일 (JSONL AgentRequest 또는 한 줄에 질의 하나)")
+    record_parser.add_argument("--output", required=True, help="저장할 trace(JSONL) 경로")
+    record_parser.add_argument("--concurrency", type=int, default=1)
+    record_parser.add_argument("--mock-llm", action="store_true", help="실제 API 대신 bench.mock_llm 사용")
+    record_parser.add_argument("--llm-latency-ms", type=float, default=200.0, help="--mock-llm 응답 지연")
+
+    args = parser.parse_args(argv)
+    if args.command == "record":
+        record(args)
+        return
+
+    report = run(args)
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+
+
+if __name__ == "__main__":
+    main()
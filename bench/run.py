@@ -0,0 +1,365 @@
+# bench/run.py
+"""
+오프라인 벤치마크 실행기. 외부 네트워크 / 실제 OpenAI API 없이 재현 가능한 수치를 만든다.
+
+- search: 합성 규정 corpus(기본 1k / 10k / 100k / 1M건)에 대한 인덱스 빌드 시간, 메모리, 질의 p50/p99
+- agent: 로컬 mock LLM 서버(bench.mock_llm)를 붙인 /agent 엔드포인트의 동시성별 처리량과 p50/p99
+- memory: 세션당 대화 메모리(InMemoryBackend) 사용량
+
+사용 예:
+    python -m bench.run
+    python -m bench.run --search-sizes 1000,10000 --concurrency 1,8 --requests 40 --output bench_output.json
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import gc
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from bench.mock_llm import MockLLMConfig, MockLLMServer
+
+_TOPICS = ["연차", "휴가", "출장", "보안", "교육", "복리후생", "근무시간", "재택근무", "경비", "평가", "채용", "징계"]
+_VERBS = ["사용", "신청", "승인", "지급", "제한", "보고", "정산", "준수", "변경", "적용"]
+_SUBJECTS = ["정규직 직원", "계약직 직원", "팀장", "신규 입사자", "임원", "인사팀", "재무팀"]
+_CATEGORIES = ["인사", "보안", "재무", "총무", "교육"]
+
+_QUERIES = [
+    "연차는 어떻게 사용하나요?",
+    "출장 경비 정산 규정 알려줘",
+    "재택근무 신청 조건이 뭐야?",
+    "보안 교육은 언제 받아야 해?",
+    "신규 입사자 복리후생 지급 기준",
+    "징계 절차 보고 규정",
+    "근무시간 변경 승인은 누가 해?",
+    "평가 결과 적용 시점",
+]
+
+
+def percentile(values: Sequence[float], q: float) -> float:
+    """
+    nearest-rank 방식 백분위수 (q: 0~100).
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, min(len(ordered), int(round(q / 100.0 * len(ordered) + 0.5))))
+    return ordered[rank - 1]
+
+
+def _latency_summary(latencies_ms: Sequence[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": round(percentile(latencies_ms, 50), 3),
+        "p99_ms": round(percentile(latencies_ms, 99), 3),
+        "mean_ms": round(sum(latencies_ms) / len(latencies_ms), 3) if latencies_ms else 0.0,
+        "max_ms": round(max(latencies_ms), 3) if latencies_ms else 0.0,
+    }
+
+
+def _rss_bytes() -> Optional[int]:
+    """
+    현재 프로세스 RSS (Linux /proc 기준, 그 외 환경은 None).
+    """
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def synthetic_rules(n: int, seed: int = 0) -> List[Dict[str, Any]]:
+    """
+    재현 가능한 합성 규정 데이터 n건.
+    """
+    rng = random.Random(seed)
+    rules = []
+    for i in range(n):
+        topic = rng.choice(_TOPICS)
+        sentences = []
+        for _ in range(rng.randint(2, 4)):
+            sentences.append(
+                f"{rng.choice(_SUBJECTS)}은 {rng.choice(_TOPICS)} {rng.choice(_VERBS)} 시 "
+                f"{rng.randint(1, 30)}일 이내에 {rng.choice(_VERBS)}해야 한다."
+            )
+        rules.append(
+            {
+                "id": f"R{i:07d}",
+                "title": f"{topic} {rng.choice(_VERBS)} 규정 제{i % 50 + 1}조",
+                "category": rng.choice(_CATEGORIES),
+                "content": " ".join(sentences),
+            }
+        )
+    return rules
+
+
+# search 벤치마크
+
+def bench_search(sizes: Sequence[int], queries_per_size: int, top_k: int, seed: int) -> List[Dict[str, Any]]:
+    from app.agent.tools.rule_loader import Rule
+    from app.agent.tools.search_index import InvertedIndex
+
+    results = []
+    for size in sizes:
+        rules = [Rule.from_dict(d) for d in synthetic_rules(size, seed=seed)]
+        gc.collect()
+        rss_before = _rss_bytes()
+
+        started_at = time.perf_counter()
+        index = InvertedIndex.from_documents((rule.id, rule.text) for rule in rules)
+        build_seconds = time.perf_counter() - started_at
+        rss_after = _rss_bytes()
+
+        rng = random.Random(seed)
+        latencies = []
+        for _ in range(queries_per_size):
+            query = rng.choice(_QUERIES)
+            t0 = time.perf_counter()
+            index.search(query, top_k=top_k)
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+
+        entry: Dict[str, Any] = {
+            "documents": size,
+            "build_seconds": round(build_seconds, 4),
+            "queries": queries_per_size,
+            **_latency_summary(latencies),
+        }
+        if rss_before is not None and rss_after is not None:
+            entry["index_rss_mb"] = round((rss_after - rss_before) / (1 << 20), 2)
+        results.append(entry)
+        print(f"[search] {size:>9,}건: build {build_seconds:.2f}s, p50 {entry['p50_ms']}ms, p99 {entry['p99_ms']}ms",
+              file=sys.stderr)
+
+        del index, rules
+        gc.collect()
+    return results
+
+
+# 세션 메모리 벤치마크
+
+def bench_memory(sessions: int, turns_per_session: int, max_turns: int) -> Dict[str, Any]:
+    from app.agent.memory import InMemoryBackend
+
+    backend = InMemoryBackend(max_turns=max_turns, max_sessions=sessions, ttl_seconds=None)
+    gc.collect()
+    tracemalloc.start()
+    before, _ = tracemalloc.get_traced_memory()
+    for s in range(sessions):
+        session_id = f"session-{s}"
+        for t in range(turns_per_session):
+            backend.add_turn(session_id, f"질문 {t}: {_QUERIES[t % len(_QUERIES)]}", f"답변 {t}: " + "규정 요약 " * 20)
+    after, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "sessions": sessions,
+        "turns_per_session": turns_per_session,
+        "max_turns": max_turns,
+        "bytes_per_session": int((after - before) / sessions) if sessions else 0,
+    }
+
+
+# agent 엔드투엔드 벤치마크
+
+async def _asgi_post(app: Any, path: str, payload: Dict[str, Any]) -> Tuple[int, bytes]:
+    """
+    HTTP 서버 없이 ASGI 앱을 직접 호출 (서버 / 네트워크 오버헤드를 빼고 앱 처리 시간만 측정).
+    """
+    body = json.dumps(payload).encode("utf-8")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "POST",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode("ascii"),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json"), (b"content-length", str(len(body)).encode("ascii"))],
+        "client": ("127.0.0.1", 0),
+        "server": ("127.0.0.1", 80),
+    }
+    sent = False
+    status = 0
+    chunks: List[bytes] = []
+
+    async def receive() -> Dict[str, Any]:
+        nonlocal sent
+        if not sent:
+            sent = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        # 응답이 끝날 때까지 연결 유지
+        await asyncio.Event().wait()
+        return {"type": "http.disconnect"}
+
+    async def send(message: Dict[str, Any]) -> None:
+        nonlocal status
+        if message["type"] == "http.response.start":
+            status = message["status"]
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    await app(scope, receive, send)
+    return status, b"".join(chunks)
+
+
+async def _run_level(app: Any, concurrency: int, requests: int, max_steps: int) -> Dict[str, Any]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errors = 0
+
+    async def one(i: int) -> None:
+        nonlocal errors
+        payload = {
+            # 질의마다 번호를 붙여 응답 캐시 / single-flight에 합쳐지지 않게 한다
+            "query": f"{_QUERIES[i % len(_QUERIES)]} #{i}",
+            "max_steps": max_steps,
+            "session_id": f"bench-{concurrency}-{i}",
+        }
+        async with semaphore:
+            t0 = time.perf_counter()
+            status, _ = await _asgi_post(app, "/agent", payload)
+            latencies.append((time.perf_counter() - t0) * 1000.0)
+            if status != 200:
+                errors += 1
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - started_at
+
+    return {
+        "concurrency": concurrency,
+        "requests": requests,
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(requests / wall, 3) if wall else 0.0,
+        **_latency_summary(latencies),
+    }
+
+
+def bench_agent(
+    server: MockLLMServer,
+    concurrency_levels: Sequence[int],
+    requests: int,
+    max_steps: int,
+) -> Dict[str, Any]:
+    from app.main import app, warm_up
+
+    # 서버 시작 시 lifespan이 하는 warm-up (in-process ASGI 호출에서는 lifespan이 돌지 않음)
+    warm_up()
+
+    async def run_levels() -> List[Dict[str, Any]]:
+        # AsyncOpenAI 클라이언트의 연결 풀이 이벤트 루프에 묶이므로 모든 단계를 한 루프에서 실행
+        levels = []
+        for concurrency in concurrency_levels:
+            before = server.config.requests
+            result = await _run_level(app, concurrency, requests, max_steps)
+            result["llm_calls"] = server.config.requests - before
+            levels.append(result)
+            print(
+                f"[agent] concurrency {concurrency:>3}: {result['throughput_rps']} req/s, "
+                f"p50 {result['p50_ms']}ms, p99 {result['p99_ms']}ms, errors {result['errors']}",
+                file=sys.stderr,
+            )
+        return levels
+
+    levels = asyncio.run(run_levels())
+
+    return {
+        "mock_llm": {
+            "latency_ms": server.config.latency_ms,
+            "jitter_ms": server.config.jitter_ms,
+            "error_rate": server.config.error_rate,
+            "errors_returned": server.config.errors,
+        },
+        "planner_mode": os.environ.get("PLANNER_MODE"),
+        "max_steps": max_steps,
+        "levels": levels,
+    }
+
+
+def _configure_env(server: Optional[MockLLMServer], planner_mode: str) -> None:
+    """
+    app.config가 import 시점에 환경변수를 읽으므로, app 모듈을 import 하기 전에 호출해야 한다.
+    """
+    os.environ.setdefault("OPENAI_API_KEY", "bench-dummy-key")
+    if server is None:
+        return
+    os.environ["OPENAI_BASE_URL"] = server.base_url
+    os.environ["PLANNER_MODE"] = planner_mode
+    # 캐시가 켜져 있으면 LLM 호출 비용이 측정에서 빠지므로 끈다
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ["LLM_CACHE_ENABLED"] = "false"
+    os.environ["MEMORY_BACKEND"] = "memory"
+
+
+def _int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(",") if v.strip()]
+
+
+def main(argv: Optional[Sequence[str]] = None) -> Dict[str, Any]:
+    parser = argparse.ArgumentParser(description="RulebaseAgent 오프라인 벤치마크")
+    parser.add_argument("--search-sizes", type=_int_list, default=[1_000, 10_000, 100_000, 1_000_000])
+    parser.add_argument("--search-queries", type=int, default=200)
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--concurrency", type=_int_list, default=[1, 4, 16, 64])
+    parser.add_argument("--requests", type=int, default=64, help="동시성 단계별 /agent 요청 수")
+    parser.add_argument("--max-steps", type=int, default=3)
+    parser.add_argument("--llm-latency-ms", type=float, default=200.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=20.0)
+    parser.add_argument("--llm-error-rate", type=float, default=0.0, help="mock LLM이 429 / 503을 돌려줄 비율")
+    parser.add_argument("--planner", choices=["llm", "rule"], default="llm")
+    parser.add_argument("--memory-sessions", type=int, default=1_000)
+    parser.add_argument("--skip", default="", help="건너뛸 벤치마크 (쉼표 구분: search,agent,memory)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="결과 JSON 저장 경로 (없으면 stdout)")
+    args = parser.parse_args(argv)
+
+    skip = {s.strip() for s in args.skip.split(",") if s.strip()}
+    report: Dict[str, Any] = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+    }
+
+    server: Optional[MockLLMServer] = None
+    if "agent" not in skip:
+        server = MockLLMServer(
+            MockLLMConfig(
+                latency_ms=args.llm_latency_ms,
+                jitter_ms=args.llm_jitter_ms,
+                seed=args.seed,
+                error_rate=args.llm_error_rate,
+            )
+        ).start()
+    _configure_env(server, args.planner)
+
+    try:
+        if "search" not in skip:
+            report["search"] = bench_search(args.search_sizes, args.search_queries, args.top_k, args.seed)
+        if "memory" not in skip:
+            report["memory"] = bench_memory(args.memory_sessions, turns_per_session=10, max_turns=5)
+        if server is not None:
+            report["agent"] = bench_agent(server, args.concurrency, args.requests, args.max_steps)
+    finally:
+        if server is not None:
+            server.stop()
+
+    text = json.dumps(report, ensure_ascii=False, indent=2)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            f.write(text + "\n")
+    else:
+        print(text)
+    return report
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,28 @@
+# tests/conftest.py
+import os
+import sys
+import types
+
+import pytest
+
+# 저장소 루트에서 app 패키지를 import 할 수 있도록 경로 추가
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+@pytest.fixture
+def make_openai_error():
+    """
+    네트워크 없이 openai 예외를 만든다. (status 코드 / 메시지 / param / 응답 header만 채운 예외)
+    """
+
+    def make(cls, status_code=None, message="error", param=None, headers=None):
+        error_cls = type(cls.__name__, (cls,), {"__init__": Exception.__init__})
+        exc = error_cls(message)
+        exc.message = message
+        exc.param = param
+        if status_code is not None:
+            exc.status_code = status_code
+        exc.response = types.SimpleNamespace(headers=headers or {}, status_code=status_code)
+        return exc
+
+    return make
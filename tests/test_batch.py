@@ -0,0 +1,66 @@
+# tests/test_batch.py
+import asyncio
+import json
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import main
+
+
+@pytest.fixture
+def batch(monkeypatch):
+    """
+    _execute_agent를 대체해 /agent/batch를 호출하고 NDJSON 항목들을 index 순으로 반환. order에는 실행 순서를 기록한다.
+    """
+    order = []
+
+    async def fake_execute(request, emit=None):
+        order.append(request.query)
+        await asyncio.sleep(0.01)
+        if request.query == "취소":
+            raise asyncio.CancelledError()
+        if request.query == "에러":
+            raise RuntimeError("실패")
+        return main.AgentResponse(query=request.query, steps=[], final_answer=f"{request.query} 답변")
+
+    monkeypatch.setattr(main, "_execute_agent", fake_execute)
+    client = TestClient(main.app)
+
+    def run(requests, concurrency=8):
+        response = client.post("/agent/batch", json={"requests": requests, "concurrency": concurrency})
+        assert response.status_code == 200
+        items = [json.loads(line) for line in response.text.splitlines() if line]
+        return sorted(items, key=lambda item: item["index"])
+
+    return run, order
+
+
+def test_failed_or_cancelled_item_does_not_fail_batch(batch):
+    run, _ = batch
+    items = run(
+        [
+            {"query": "연차", "session_id": "a"},
+            {"query": "취소", "session_id": "b"},
+            {"query": "에러", "session_id": "c"},
+            {"query": "출장", "session_id": "d"},
+        ]
+    )
+    assert [item["ok"] for item in items] == [True, False, False, True]
+    assert items[0]["response"]["final_answer"] == "연차 답변"
+    assert items[2]["error"] == "실패"
+
+
+def test_same_session_items_run_in_order_and_duplicates_are_coalesced(batch):
+    run, order = batch
+    items = run(
+        [
+            {"query": "첫째", "session_id": "s"},
+            {"query": "다른 세션", "session_id": "t"},
+            {"query": "둘째", "session_id": "s"},
+            {"query": "첫째", "session_id": "s"},
+        ]
+    )
+    assert [item["ok"] for item in items] == [True] * 4
+    assert order.count("첫째") == 1
+    assert order.index("첫째") < order.index("둘째")
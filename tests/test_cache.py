@@ -0,0 +1,89 @@
+# tests/test_cache.py
+import os
+import time
+
+import pytest
+
+from app.agent.cache import ResponseCache, normalize_query
+
+
+@pytest.mark.parametrize(
+    "query, expected",
+    [("  연차휴가는   며칠?? ", "연차휴가는 며칠"), ("VPN 접속 방법!", "vpn 접속 방법"), ("출장비~", "출장비")],
+)
+def test_normalize_query(query, expected):
+    assert normalize_query(query) == expected
+
+
+def test_exact_hit_uses_normalized_query_and_context():
+    cache = ResponseCache()
+    cache.set("연차휴가는 며칠?", "ctx", {"answer": 15}, compute_seconds=2.0)
+    assert cache.get("  연차휴가는  며칠 ", "ctx") == {"answer": 15}
+    assert cache.get("연차휴가는 며칠?", "다른 ctx") is None
+    stats = cache.stats_dict()
+    assert (stats["hits"], stats["misses"], stats["saved_seconds"]) == (1, 1, 2.0)
+
+
+def test_similar_query_is_reused_only_within_same_context():
+    cache = ResponseCache(similarity_threshold=0.6)
+    cache.set("연차휴가 사용 기준 알려줘", "ctx", "연차 답변")
+    cache.set("출장비 정산 방법", "ctx", "출장 답변")
+
+    assert cache.get("연차휴가 사용 기준 알려줘요", "ctx") == "연차 답변"
+    assert cache.stats.similar_hits == 1
+    # 같은 질의라도 컨텍스트가 다르면 유사도 검색 범위 밖
+    assert cache.get("연차휴가 사용 기준 알려줘요", "다른 ctx") is None
+    assert cache.get("재택근무 신청", "ctx") is None
+
+
+def test_similarity_disabled_by_default():
+    cache = ResponseCache()
+    cache.set("연차휴가 사용 기준 알려줘", "", "연차 답변")
+    assert cache.get("연차휴가 사용 기준 알려줘요", "") is None
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    cache.set("a", "", 1)
+    cache.set("b", "", 2)
+    assert cache.get("a", "") == 1
+    cache.set("c", "", 3)
+    assert len(cache) == 2
+    assert cache.get("b", "") is None
+    assert cache.get("a", "") == 1 and cache.get("c", "") == 3
+    assert cache.stats.evictions == 1
+
+
+def test_ttl_expiration():
+    cache = ResponseCache(ttl_seconds=0.01, similarity_threshold=0.5)
+    cache.set("연차휴가", "", "답변")
+    time.sleep(0.02)
+    assert cache.get("연차휴가", "") is None
+    assert cache.stats.expirations == 1
+    assert len(cache) == 0
+
+
+def test_watch_paths_change_invalidates(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text("[]", encoding="utf-8")
+    cache = ResponseCache(watch_paths=[str(path)], check_interval=0)
+    cache.set("연차", "", "답변")
+    assert cache.get("연차", "") == "답변"
+
+    path.write_text('[{"id": 1}]', encoding="utf-8")
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+    assert cache.get("연차", "") is None
+    assert cache.stats.invalidations == 1
+
+
+def test_version_fn_change_invalidates():
+    version = [1]
+    cache = ResponseCache(version_fn=lambda: version[0])
+    cache.set("연차", "", "답변")
+    assert cache.get("연차", "") == "답변"
+    version[0] = 2
+    assert cache.get("연차", "") is None
+    cache.set("연차", "", "새 답변")
+    assert cache.get("연차", "") == "새 답변"
+    assert cache.stats.invalidations == 1
@@ -0,0 +1,190 @@
+# tests/test_clause_index.py
+import asyncio
+import json
+import logging
+
+import pytest
+
+from app.agent.tools import clause_index as clause_index_module
+from app.agent.tools.clause_index import ClauseIndex, _article_map, parse_rule
+from app.agent.tools.clause_tool import _ARTICLE_QUERY, NO_TEXT_MESSAGE, ClauseTool
+from app.agent.tools.rule_loader import Rule
+from app.agent.tools.rule_store import RuleStore
+
+LEAVE = {
+    "id": 1,
+    "title": "휴가 규정",
+    "content": (
+        "제1조(목적) 이 규정은 휴가에 관한 사항을 정한다. "
+        "제2조(연차) ① 직원은 연간 15일의 연차를 사용할 수 있다. ② 다만, 입사 1년 미만인 경우 월 1일씩 부여한다. "
+        "제3조(신청) 휴가는 다음 절차를 따른다. 1. 3일 전까지 신청 2. 팀장 승인"
+    ),
+}
+TRIP = {
+    "id": 2,
+    "title": "출장 규정",
+    "content": "제1조(목적) 이 규정은 출장에 관한 사항을 정한다. 제2조(출장비) 숙박비는 1박 10만원 이하로 지급한다.",
+}
+PLAIN = {"id": 3, "title": "보안 규정", "content": "외부 반출은 보안팀 검토 후 가능하다. 예외는 없다."}
+
+
+def _write(path, rules):
+    path.write_text(json.dumps(rules, ensure_ascii=False), encoding="utf-8")
+
+
+@pytest.fixture
+def store(tmp_path):
+    path = tmp_path / "rules.json"
+    _write(path, [LEAVE, TRIP, PLAIN])
+    return RuleStore(str(path))
+
+
+def test_parse_rule_splits_articles_clauses_and_items():
+    nodes = parse_rule(Rule.from_dict(LEAVE)).nodes
+    assert [(n.kind, n.number, n.label) for n in nodes] == [
+        ("article", "1", "제1조(목적)"),
+        ("sentence", None, "제1조"),
+        ("article", "2", "제2조(연차)"),
+        ("clause", "1", "제2조 제1항"),
+        ("clause", "2", "제2조 제2항"),
+        ("article", "3", "제3조(신청)"),
+        ("sentence", None, "제3조"),
+        ("item", "1", "제3조 1호"),
+        ("item", "2", "제3조 2호"),
+    ]
+    first_clause, second_clause = nodes[3], nodes[4]
+    assert first_clause.thresholds == ["연간 15일"]
+    assert second_clause.exceptions == ["다만, 입사 1년 미만인 경우 월 1일씩 부여한다."]
+    assert nodes[7].text == "3일 전까지 신청"
+
+
+def test_parse_rule_without_numbering_uses_sentences():
+    nodes = parse_rule(Rule.from_dict(PLAIN)).nodes
+    assert [n.kind for n in nodes] == ["sentence", "sentence"]
+    assert nodes[1].exceptions == ["예외는 없다."]
+
+
+def test_article_map_groups_nodes_by_article_number():
+    leave, trip = parse_rule(Rule.from_dict(LEAVE)), parse_rule(Rule.from_dict(TRIP))
+    articles = _article_map([leave, trip])
+    assert sorted(articles) == ["1", "2", "3"]
+    assert [structure.title for structure, _, _ in articles["2"]] == ["휴가 규정", "출장 규정"]
+    _, nodes, title_terms = articles["3"][0]
+    assert [n.label for n in nodes] == ["제3조(신청)", "제3조", "제3조 1호", "제3조 2호"]
+    assert title_terms == frozenset(["휴가", "규정"])
+
+
+@pytest.mark.parametrize(
+    "query, number",
+    [("제3조 내용 알려줘", "3"), ("휴가 규정 제 12 조 보여줘", "12"), ("제2조의 원문", "2"), ("3조 알려줘", None)],
+)
+def test_article_query_pattern(query, number):
+    match = _ARTICLE_QUERY.search(query)
+    assert (match.group(1) if match else None) == number
+
+
+def test_lookup_article_prefers_matching_title(store):
+    index = ClauseIndex(store)
+    assert [s.title for s, _ in index.lookup_article("2")] == ["휴가 규정", "출장 규정"]
+    assert [s.title for s, _ in index.lookup_article("2", title_terms=["출장"])] == ["출장 규정"]
+    assert index.lookup_article("9") == []
+
+
+def test_structure_for_text_uses_index_or_parses(store):
+    index = ClauseIndex(store)
+    leave = index.structure_for_text(LEAVE["content"])
+    assert leave is index.structure_for_text(LEAVE["content"])
+    assert leave.title == "휴가 규정"
+
+    truncated = index.structure_for_text(LEAVE["content"][:40])
+    assert truncated.title == "" and truncated.nodes[0].label == "제1조(목적)"
+
+
+def test_sync_reparses_only_changed_rules(store, tmp_path):
+    index = ClauseIndex(store)
+    index.sync()
+    leave_before = index.lookup_article("3")[0][0]
+    assert not index.is_stale()
+
+    changed_trip = dict(TRIP, content=TRIP["content"] + " 제3조(정산) 출장 후 5일 이내 정산한다.")
+    _write(tmp_path / "rules.json", [LEAVE, changed_trip, PLAIN])
+    store.reload(force=True)
+    assert index.is_stale()
+
+    found = index.lookup_article("3")
+    assert [s.title for s, _ in found] == ["휴가 규정", "출장 규정"]
+    # 바뀌지 않은 규정은 이전 구조를 그대로 재사용
+    assert found[0][0] is leave_before
+
+
+def test_sync_applies_only_store_delta(store, tmp_path, monkeypatch):
+    path = tmp_path / "clauses.json"
+    index = ClauseIndex(store, path=str(path))
+    index.sync()
+    saved = path.read_text(encoding="utf-8")
+
+    parsed = []
+    original = clause_index_module.parse_rule
+    monkeypatch.setattr(clause_index_module, "parse_rule", lambda rule: parsed.append(rule.title) or original(rule))
+    monkeypatch.setattr(type(store.snapshot), "fingerprint", lambda self, name: pytest.fail("reload 때 fingerprint를 다시 계산함"))
+
+    changed_leave = dict(LEAVE, content=LEAVE["content"].replace("15일", "20일"))
+    _write(tmp_path / "rules.json", [changed_leave, PLAIN])
+    store.reload(force=True)
+    assert store.changes_since(1) == {1, 2}
+
+    assert [s.title for s, _ in index.lookup_article("1")] == ["휴가 규정"]
+    assert parsed == ["휴가 규정"]
+    assert index.structure_for_text(changed_leave["content"]) is index.lookup_article("2")[0][0]
+    # 삭제된 규정의 원문은 더 이상 색인에 없다 (즉석 파싱)
+    assert index.structure_for_text(TRIP["content"]).title == ""
+    # reload 이후에는 저장 파일을 다시 쓰지 않는다
+    assert path.read_text(encoding="utf-8") == saved
+    assert not list(tmp_path.glob("*.tmp"))
+
+
+def test_sync_falls_back_to_snapshot_diff_without_change_log(store, tmp_path):
+    index = ClauseIndex(store)
+    index.sync()
+    _write(tmp_path / "rules.json", [LEAVE, PLAIN])
+    store.reload(force=True)
+    store._changes.clear()
+    assert store.changes_since(1) is None
+
+    assert [s.title for s, _ in index.lookup_article("1")] == ["휴가 규정"]
+
+
+def test_saved_index_is_reused_when_fingerprint_matches(store, tmp_path, monkeypatch):
+    path = tmp_path / "clauses.json"
+    ClauseIndex(store, path=str(path)).sync()
+    assert json.loads(path.read_text(encoding="utf-8"))["fingerprint"]
+
+    def fail(rule):
+        raise AssertionError("저장된 구조가 있으면 다시 파싱하지 않아야 합니다")
+
+    monkeypatch.setattr(clause_index_module, "parse_rule", fail)
+    loaded = ClauseIndex(store, path=str(path))
+    assert [s.title for s, _ in loaded.lookup_article("3")] == ["휴가 규정"]
+
+
+def test_save_failure_only_logs_warning(store, tmp_path, caplog):
+    blocker = tmp_path / "not_a_dir"
+    blocker.write_text("", encoding="utf-8")
+    index = ClauseIndex(store, path=str(blocker / "clauses.json"))
+    with caplog.at_level(logging.WARNING, logger="app.agent.tools.clause_index"):
+        index.sync()
+    assert "조문 구조 인덱스 저장 실패" in caplog.text
+    assert index.lookup_article("1")
+
+
+def test_clause_tool_direct_lookup_and_local_summary(store):
+    tool = ClauseTool(ClauseIndex(store), use_llm=False)
+    direct = asyncio.run(tool.arun(user_query="출장 규정 제2조 내용 알려줘", tool_input={}))
+    # 제목이 더 많이 겹치는 규정의 조문이 먼저
+    assert direct.splitlines()[:3] == ["[출장 규정]", "- 제2조(출장비)", "- 제2조: 숙박비는 1박 10만원 이하로 지급한다."]
+
+    # "알려"만으로는 직접 조회로 보지 않는다
+    assert tool.run(user_query="제2조 연차 기준 알려줘", tool_input={}) == NO_TEXT_MESSAGE
+    assert tool.run(user_query="연차 며칠이야?", tool_input={}) == NO_TEXT_MESSAGE
+    answer = tool.run(user_query="연차는 며칠 부여돼?", tool_input={"texts": [LEAVE["content"]]})
+    assert "제2조 제1항" in answer and "(예외)" in answer
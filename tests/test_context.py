@@ -0,0 +1,57 @@
+# tests/test_context.py
+from app.agent.context import DEFAULT_CONTEXT_BUDGET, ContextBuilder, context_budget_for, estimate_tokens
+
+LEAVE = "연차는 연간 15일 부여한다. 미사용 연차는 다음 해로 이월할 수 없다."
+TRIP = "출장비는 실비로 정산한다. 숙박비는 1박 10만원 이하로 지급한다."
+SECURITY = "외부 반출은 보안팀 검토 후 가능하다."
+
+
+def test_estimate_tokens_counts_hangul_per_syllable():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("연차휴가") == 4
+    assert estimate_tokens("abcdefgh") == 2
+    assert context_budget_for("gpt-4o") == 8000
+    assert context_budget_for("unknown-model") == DEFAULT_CONTEXT_BUDGET
+
+
+def test_build_removes_duplicate_and_contained_passages():
+    builder = ContextBuilder(budget_tokens=1000)
+    texts = [LEAVE, "  " + LEAVE.replace(" ", "  "), "연차는 연간 15일 부여한다.", TRIP]
+    result, stats = builder.build("연차", texts)
+    assert result == [LEAVE, TRIP]
+    assert stats.duplicate_passages == 2
+    assert stats.dropped_passages == stats.trimmed_passages == 0
+
+
+def test_build_fills_budget_by_relevance_and_keeps_original_order():
+    # 연차 규정 + 보안 규정까지만 들어가는 예산
+    budget = estimate_tokens(LEAVE) + estimate_tokens(SECURITY)
+    builder = ContextBuilder(budget_tokens=budget, max_passage_tokens=budget)
+    result, stats = builder.build("연차 이월 보안팀", [TRIP, SECURITY, LEAVE])
+    assert result == [SECURITY, LEAVE]
+    assert stats.dropped_passages == 1
+    assert stats.output_tokens <= budget
+    assert stats.tokens_saved == estimate_tokens(TRIP)
+
+
+def test_build_trims_long_passage_to_query_sentences():
+    long_rule = " ".join([TRIP, LEAVE, SECURITY])
+    limit = estimate_tokens("미사용 연차는 다음 해로 이월할 수 없다.") + 1
+    builder = ContextBuilder(budget_tokens=1000, max_passage_tokens=limit)
+    result, stats = builder.build("미사용 연차 이월", [long_rule])
+    assert result == ["미사용 연차는 다음 해로 이월할 수 없다."]
+    assert stats.trimmed_passages == 1
+    assert stats.output_tokens <= limit
+
+
+def test_build_memory_keeps_latest_complete_turns():
+    turns = "\n".join(f"사용자: 질문{i}\n에이전트: 답변{i}입니다" for i in range(5))
+    builder = ContextBuilder(budget_tokens=25)
+    result, stats = builder.build_memory(turns)
+    assert result.startswith("사용자:")
+    assert result.endswith("답변4입니다")
+    assert "질문0" not in result
+    assert stats.dropped_passages == 1 and stats.output_tokens <= 25
+
+    unchanged, stats = ContextBuilder(budget_tokens=1000).build_memory(turns)
+    assert unchanged == turns and stats.tokens_saved == 0
@@ -0,0 +1,94 @@
+# tests/test_executor.py
+import asyncio
+
+from app.agent.executor import Executor, merge_outputs, normalize_calls
+
+
+def test_normalize_calls_fills_ids_and_drops_invalid_items():
+    calls = normalize_calls(
+        [
+            {"tool": "search_rules", "tool_input": {"query": "연차"}},
+            "search_rules",
+            {"tool_input": {"query": "tool 없음"}},
+            {"id": "s2", "tool": "search_rules", "tool_input": "문자열 입력"},
+        ]
+    )
+    assert calls == [
+        {"id": "c1", "tool": "search_rules", "tool_input": {"query": "연차"}, "depends_on": []},
+        {"id": "s2", "tool": "search_rules", "tool_input": {}, "depends_on": []},
+    ]
+
+
+def test_normalize_calls_renames_duplicate_ids():
+    calls = normalize_calls([{"id": "a", "tool": "t"}, {"id": "a", "tool": "t"}])
+    assert [c["id"] for c in calls] == ["a", "c2"]
+
+
+def test_normalize_calls_keeps_only_backward_dependencies():
+    calls = normalize_calls(
+        [
+            {"id": "a", "tool": "search_rules", "depends_on": "b"},
+            {"id": "b", "tool": "search_rules", "depends_on": ["a", "b", "없는id"]},
+            {"id": "c", "tool": "summarize", "depends_on": ["a", "b"]},
+        ]
+    )
+    # 자기 자신 / 뒤에 나오는 호출 / 없는 id에 대한 의존은 버려서 순환이 생기지 않는다
+    assert [c["depends_on"] for c in calls] == [[], ["a"], ["a", "b"]]
+
+
+def test_normalize_calls_non_list():
+    assert normalize_calls(None) == []
+    assert normalize_calls({"tool": "search_rules"}) == []
+
+
+def test_merge_outputs_prefers_sink_texts_then_deduplicated_lists():
+    search_a = {"call_id": "a", "is_final": False, "output": [{"id": 1}, {"id": 2}]}
+    search_b = {"call_id": "b", "is_final": False, "output": [{"id": 2}, {"id": 3}]}
+    assert merge_outputs([search_a, search_b]) == [{"id": 1}, {"id": 2}, {"id": 3}]
+
+    summary = {"call_id": "s", "is_final": False, "depends_on": ["a"], "output": "요약"}
+    assert merge_outputs([search_a, summary]) == "요약"
+
+
+def test_normalize_calls_generated_ids_never_collide_with_explicit_ids():
+    calls = normalize_calls(
+        [
+            {"tool": "search_rules"},
+            {"id": "c2", "tool": "search_rules"},
+            {"id": "c2", "tool": "search_rules"},
+            {"id": "c1", "tool": "summarize", "depends_on": ["c1", "c2"]},
+        ]
+    )
+    ids = [c["id"] for c in calls]
+    assert len(set(ids)) == len(ids) == 4
+    assert ids[1] == "c2" and ids[3] == "c1"
+    # 첫 호출은 뒤에 나오는 명시적 id "c1"과 겹치지 않는 이름을 받는다
+    assert ids[0] != "c1"
+    assert calls[3]["depends_on"] == ["c2"]
+
+
+class _SearchTool:
+    name = "search"
+    supports_streaming = False
+
+    def run(self, *, user_query, tool_input):
+        return [{"id": 1, "content": "연차는 15일"}]
+
+    async def arun(self, *, user_query, tool_input):
+        return self.run(user_query=user_query, tool_input=tool_input)
+
+
+def test_unknown_tool_in_calls_is_a_failed_node_not_final():
+    executor = Executor({"search": _SearchTool()})
+    plan = {
+        "calls": [
+            {"id": "a", "tool": "search", "tool_input": {"query": "연차"}},
+            {"id": "b", "tool": "delete_all", "tool_input": {}},
+        ]
+    }
+    for graph in (asyncio.run(executor.aexecute_calls(plan, "연차")), executor.execute_calls(plan, "연차")):
+        assert not graph["is_final"]
+        failed = graph["results"][1]
+        assert (failed["call_id"], failed["is_final"]) == ("b", False)
+        assert failed["output"] == {"error": "알 수 없는 tool: delete_all"}
+        assert graph["output"] == [{"id": 1, "content": "연차는 15일"}]
@@ -0,0 +1,62 @@
+# tests/test_llm_cache.py
+import asyncio
+import threading
+
+from app.agent.llm import CompletionCache, completion_key
+
+
+def test_completion_key_depends_on_model_messages_and_params():
+    messages = [{"role": "user", "content": "연차"}]
+    key = completion_key("m", messages, {"temperature": 0})
+    assert key == completion_key("m", [dict(messages[0])], {"temperature": 0})
+    assert key != completion_key("m2", messages, {"temperature": 0})
+    assert key != completion_key("m", messages, {})
+
+
+def test_memory_lru():
+    cache = CompletionCache(max_entries=2)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    assert cache.get("a") == "1"
+    cache.set("c", "3")
+    assert cache.get("b") is None
+    assert cache.stats_dict()["hits"] == 1 and cache.stats_dict()["misses"] == 1
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    path = str(tmp_path / "llm_cache.sqlite3")
+    CompletionCache(db_path=path).set("k", "답변")
+    cache = CompletionCache(db_path=path)
+    assert cache.get("k") == "답변"
+    assert cache.stats_dict()["disk_hits"] == 1
+    # 디스크에서 읽은 값은 메모리에 올라간다
+    assert cache.get("k") == "답변"
+    assert cache.stats_dict()["disk_hits"] == 1
+
+
+def test_async_disk_access_runs_off_the_event_loop(tmp_path, monkeypatch):
+    cache = CompletionCache(db_path=str(tmp_path / "llm_cache.sqlite3"))
+    on_loop_thread = []
+    conn = CompletionCache._conn
+
+    def tracked_conn(self):
+        on_loop_thread.append(threading.current_thread() is threading.main_thread())
+        return conn(self)
+
+    monkeypatch.setattr(CompletionCache, "_conn", tracked_conn)
+
+    async def main():
+        await cache.aset("k", "답변")
+        cache._entries.clear()
+        first = await cache.aget("k")
+        # 메모리 hit은 SQLite를 건드리지 않는다
+        calls = len(on_loop_thread)
+        second = await cache.aget("k")
+        return first, second, calls
+
+    first, second, calls = asyncio.run(main())
+    assert first == second == "답변"
+    assert len(on_loop_thread) == calls
+    assert on_loop_thread and not any(on_loop_thread)
+    assert asyncio.run(cache.aget("없는 키")) is None
+    assert cache.stats_dict()["misses"] == 1
@@ -0,0 +1,150 @@
+# tests/test_llm_gateway.py
+import asyncio
+
+import openai
+import pytest
+
+from app.agent.llm_gateway import LLMGateway, TokenBucket, retry_reason
+
+
+def _gateway(**kwargs):
+    kwargs.setdefault("retry_base_seconds", 0.001)
+    kwargs.setdefault("retry_max_seconds", 0.01)
+    return LLMGateway(**kwargs)
+
+
+def test_retry_reason(make_openai_error):
+    assert retry_reason(make_openai_error(openai.RateLimitError, 429)) == "429"
+    assert retry_reason(make_openai_error(openai.InternalServerError, 503)) == "503"
+    assert retry_reason(make_openai_error(openai.APIConnectionError)) == "connection"
+    assert retry_reason(make_openai_error(openai.APITimeoutError)) == "timeout"
+    assert retry_reason(make_openai_error(openai.BadRequestError, 400)) is None
+    assert retry_reason(ValueError()) is None
+
+
+def test_backoff_follows_retry_after_with_cap(make_openai_error):
+    gateway = LLMGateway(retry_base_seconds=0.5, retry_max_seconds=8.0)
+    limited = make_openai_error(openai.RateLimitError, 429, headers={"retry-after": "3"})
+    assert gateway._backoff(0, limited) == 3.0
+    too_long = make_openai_error(openai.RateLimitError, 429, headers={"retry-after": "60"})
+    assert gateway._backoff(0, too_long) == 8.0
+    # jitter: cap/2 ~ cap
+    assert 2.0 <= gateway._backoff(3, ValueError()) <= 4.0
+
+
+def _flaky(errors, result="ok"):
+    calls = []
+
+    def create():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return result
+
+    return create, calls
+
+
+def test_call_retries_transient_errors(make_openai_error):
+    create, calls = _flaky([make_openai_error(openai.RateLimitError, 429), make_openai_error(openai.APIConnectionError)])
+    assert _gateway(max_retries=3).call(create, model="m") == "ok"
+    assert len(calls) == 3
+
+
+def test_call_gives_up_after_max_retries(make_openai_error):
+    create, calls = _flaky([make_openai_error(openai.InternalServerError, 500) for _ in range(5)])
+    with pytest.raises(openai.InternalServerError):
+        _gateway(max_retries=2).call(create, model="m")
+    assert len(calls) == 3
+
+
+def test_call_does_not_retry_bad_request(make_openai_error):
+    create, calls = _flaky([make_openai_error(openai.BadRequestError, 400)])
+    with pytest.raises(openai.BadRequestError):
+        _gateway().call(create, model="m")
+    assert len(calls) == 1
+
+
+def test_acall_retries(make_openai_error):
+    errors = [make_openai_error(openai.RateLimitError, 429)]
+    calls = []
+
+    async def create():
+        calls.append(1)
+        if errors:
+            raise errors.pop(0)
+        return "ok"
+
+    assert asyncio.run(_gateway().acall(create, model="m")) == "ok"
+    assert len(calls) == 2
+
+
+def test_token_bucket_reserve_and_refund():
+    bucket = TokenBucket(rate_per_second=10, capacity=10)
+    assert bucket.reserve(10) == 0.0
+    assert bucket.reserve(5) == pytest.approx(0.5, abs=0.05)
+    bucket.refund(5)
+    assert bucket.reserve(1) == pytest.approx(0.1, abs=0.05)
+
+
+class _Attempts:
+    """
+    호출 순서마다 (지연 초, 결과 또는 예외)를 정해 둔 create(). 취소된 시도를 기록한다.
+    """
+
+    def __init__(self, *plans):
+        self.plans = list(plans)
+        self.started = 0
+        self.cancelled = 0
+
+    async def __call__(self):
+        delay, outcome = self.plans[self.started]
+        self.started += 1
+        try:
+            await asyncio.sleep(delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return outcome
+
+
+def test_hedge_not_sent_when_primary_is_fast():
+    create = _Attempts((0.0, "primary"))
+    assert asyncio.run(_gateway(hedge_after=0.05).acall(create, model="m")) == "primary"
+    assert create.started == 1
+
+
+def test_hedge_wins_and_primary_is_cancelled():
+    create = _Attempts((1.0, "primary"), (0.0, "hedge"))
+    assert asyncio.run(_gateway(hedge_after=0.01).acall(create, model="m")) == "hedge"
+    assert create.started == 2 and create.cancelled == 1
+
+
+def test_hedge_falls_back_to_other_attempt_on_error():
+    create = _Attempts((0.05, "primary"), (0.0, ValueError("hedge failed")))
+    assert asyncio.run(_gateway(hedge_after=0.01).acall(create, model="m")) == "primary"
+
+
+def test_hedge_raises_when_both_attempts_fail():
+    create = _Attempts((0.02, ValueError("primary")), (0.0, ValueError("hedge")))
+    with pytest.raises(ValueError):
+        asyncio.run(_gateway(hedge_after=0.01).acall(create, model="m"))
+
+
+@pytest.mark.parametrize("cancel_after", [0.005, 0.05])
+def test_cancelling_caller_cancels_all_attempts(cancel_after):
+    # 첫 대기 중(hedge 전) / hedge를 보낸 뒤에 호출 쪽이 취소되는 경우
+    create = _Attempts((1.0, "primary"), (1.0, "hedge"))
+
+    async def main():
+        task = asyncio.create_task(_gateway(hedge_after=0.02).acall(create, model="m"))
+        await asyncio.sleep(cancel_after)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        await asyncio.sleep(0)
+        return [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+
+    assert asyncio.run(main()) == []
+    assert create.cancelled == create.started
@@ -0,0 +1,168 @@
+# tests/test_loop_control.py
+import asyncio
+import time
+import types
+
+import pytest
+
+from app import main
+from app.agent.cache import ResponseCache
+from app.agent.loop_control import STOP_REASONS, LoopController, search_coverage
+from app.agent.memory import InMemoryBackend
+from app.agent.tools.clause_tool import NO_TEXT_MESSAGE as NO_CLAUSE_TEXT
+from app.agent.tools.summarize_tool import NO_TEXT_MESSAGE as NO_SUMMARIZE_TEXT
+
+SEARCH_PLAN = {"tool": "search", "tool_input": {"query": "연차휴가"}, "planner": "llm"}
+RULE = {"id": 1, "title": "휴가 규정", "content": "연차휴가는 15일이다."}
+
+
+def test_max_steps():
+    controller = LoopController(max_steps=2)
+    for step in range(2):
+        assert controller.should_continue()
+        assert controller.check_plan({"tool": "search", "tool_input": {"query": str(step)}})
+    assert not controller.should_continue()
+    assert controller.stop_reason == "max_steps"
+
+
+def test_deadline():
+    controller = LoopController(max_steps=5, deadline_seconds=0.01)
+    assert controller.should_continue()
+    time.sleep(0.02)
+    assert controller.remaining_seconds() == 0.0
+    assert not controller.should_continue()
+    assert controller.stop_reason == "deadline"
+    assert LoopController(max_steps=5).remaining_seconds() is None
+
+
+def test_final():
+    controller = LoopController(max_steps=5)
+    assert controller.check_result({"tool": "final_answer"}, "final_answer", "답변", False, "q")
+    assert controller.stop_reason == "final"
+
+
+def test_answered_ignores_empty_and_no_text_outputs():
+    controller = LoopController(max_steps=5)
+    for output in ["", "  ", NO_SUMMARIZE_TEXT, NO_CLAUSE_TEXT, {"error": "실패"}]:
+        assert not controller.check_result({"tool": "summarize"}, "summarize", output, False, "q")
+    assert controller.stop_reason is None
+    assert controller.check_result({"tool": "extract_clause"}, "extract_clause", "제2조: ...", False, "q")
+    assert controller.stop_reason == "answered"
+
+
+def test_repeated_plan_ignores_filled_texts():
+    controller = LoopController(max_steps=5)
+    assert controller.check_plan({"tool": "summarize", "tool_input": {"texts": ["a"]}})
+    assert not controller.check_plan({"tool": "summarize", "tool_input": {"texts": ["b"]}})
+    assert controller.stop_reason == "repeated_plan"
+
+
+def test_no_progress():
+    controller = LoopController(max_steps=5, search_confidence=0)
+    assert not controller.check_result(SEARCH_PLAN, "search", [RULE], False, "연차휴가")
+    assert controller.check_result(SEARCH_PLAN, "search", [dict(RULE)], False, "연차휴가")
+    assert controller.stop_reason == "no_progress"
+
+
+def test_confident_match_only_for_llm_planner():
+    controller = LoopController(max_steps=5)
+    rule_based = dict(SEARCH_PLAN, planner="rule")
+    assert not controller.check_result(rule_based, "search", [RULE], False, "연차휴가")
+    controller = LoopController(max_steps=5)
+    assert controller.check_result(SEARCH_PLAN, "search", [RULE], False, "연차휴가")
+    assert controller.stop_reason == "confident_match"
+    assert search_coverage("연차휴가 출장비", RULE) == pytest.approx(3 / 5)
+
+
+def test_early_stop_disabled_keeps_only_final_deadline_and_max_steps():
+    controller = LoopController(max_steps=5, early_stop=False)
+    assert controller.check_plan({"tool": "summarize"})
+    assert controller.check_plan({"tool": "summarize"})
+    assert not controller.check_result({"tool": "summarize"}, "summarize", "답변", False, "q")
+    assert controller.check_result({"tool": "final_answer"}, "final_answer", "답변", False, "q")
+
+
+def test_stop_reasons_are_documented():
+    assert set(STOP_REASONS) == {
+        "final", "answered", "confident_match", "repeated_plan", "no_progress", "deadline", "max_steps"
+    }
+
+
+class _Planner:
+    async def aplan(self, user_query, memory_context, last_result=None):
+        return {"tool": "search", "tool_input": {"query": user_query}, "planner": "rule"}
+
+
+class _Executor:
+    """
+    search는 바로 결과를 돌려주고, delays에 지정한 tool은 그만큼 늦게 끝난다.
+    """
+
+    def __init__(self, delays):
+        self.delays = delays
+
+    async def aexecute(self, plan, user_query, on_token=None):
+        await asyncio.sleep(self.delays.get(plan["tool"], 0))
+        output = [RULE] if plan["tool"] == "search" else "요약 답변"
+        return {
+            "tool": plan["tool"],
+            "tool_input": plan.get("tool_input", {}),
+            "output": output,
+            "reason": "",
+            "is_final": False,
+            "planner": plan.get("planner"),
+        }
+
+
+@pytest.fixture
+def agent_loop(monkeypatch):
+    def run(delays, deadline):
+        runtime = types.SimpleNamespace(
+            planner=_Planner(), executor=_Executor(delays), tool_registry={"summarize": object()}
+        )
+        monkeypatch.setattr(main, "_runtime", runtime)
+        monkeypatch.setattr(main, "AGENT_DEADLINE_SECONDS", deadline)
+        return asyncio.run(main._run_agent_loop("연차휴가", 3, ""))
+
+    return run
+
+
+def test_agent_loop_post_summarize_within_deadline(agent_loop):
+    response = agent_loop({}, deadline=5)
+    assert response.stop_reason == "repeated_plan"
+    assert response.final_answer == "요약 답변"
+    assert response.steps[-1].tool == "summarize (post-processing)"
+
+
+def test_agent_loop_deadline_stops_slow_post_summarize(agent_loop):
+    started_at = time.perf_counter()
+    response = agent_loop({"summarize": 5}, deadline=0.1)
+    assert time.perf_counter() - started_at < 2
+    assert response.stop_reason == "deadline"
+    # LLM 요약 대신 검색된 규정 원문으로 답한다
+    assert response.final_answer == RULE["content"]
+
+
+def test_agent_loop_deadline_stops_slow_tool(agent_loop):
+    started_at = time.perf_counter()
+    response = agent_loop({"search": 5}, deadline=0.1)
+    assert time.perf_counter() - started_at < 2
+    assert response.stop_reason == "deadline"
+    assert response.steps == []
+
+
+@pytest.mark.parametrize("stop_reason, cached", [("deadline", False), ("max_steps", False), ("final", True)])
+def test_degraded_responses_are_not_cached(monkeypatch, stop_reason, cached):
+    cache = ResponseCache()
+    monkeypatch.setattr(main, "response_cache", cache)
+    monkeypatch.setattr(main, "RESPONSE_CACHE_ENABLED", True)
+    monkeypatch.setattr(main, "memory_backend", InMemoryBackend())
+
+    async def fake_loop(user_query, max_steps, memory_context, emit=None):
+        return main.AgentResponse(query=user_query, steps=[], final_answer="답변", stop_reason=stop_reason)
+
+    monkeypatch.setattr(main, "_run_agent_loop", fake_loop)
+    request = main.AgentRequest(query="연차휴가 며칠?", session_id=f"s-{stop_reason}")
+    response = asyncio.run(main._execute_agent_with_cache(request, None))
+    assert response.stop_reason == stop_reason
+    assert (cache.get("연차휴가 며칠?", "") is not None) is cached
@@ -0,0 +1,102 @@
+# tests/test_memory.py
+import asyncio
+import threading
+import time
+
+import pytest
+
+from app.agent.memory import ConversationMemory, InMemoryBackend, SQLiteMemoryBackend, build_memory_backend
+
+
+def test_conversation_memory_keeps_last_turns():
+    memory = ConversationMemory(max_turns=2)
+    for i in range(3):
+        memory.add_turn(user=f"질문{i}", agent=f"답변{i}")
+    assert memory.get_context_str() == "사용자: 질문1\n에이전트: 답변1\n사용자: 질문2\n에이전트: 답변2"
+    assert ConversationMemory().get_context_str() == ""
+
+
+def test_in_memory_backend_separates_sessions_and_evicts_lru():
+    backend = InMemoryBackend(max_turns=3, max_sessions=2, ttl_seconds=None)
+    backend.add_turn("a", user="q1", agent="a1")
+    backend.add_turn("b", user="q2", agent="a2")
+    backend.load("a")
+    backend.add_turn("c", user="q3", agent="a3")
+
+    assert len(backend) == 2
+    assert backend.load("a").turns() == [{"user": "q1", "agent": "a1"}]
+    # 가장 오래 사용되지 않은 b가 제거됨
+    assert backend.load("b").turns() == []
+
+
+def test_in_memory_backend_ttl():
+    backend = InMemoryBackend(ttl_seconds=0.01)
+    backend.add_turn("a", user="q", agent="a")
+    time.sleep(0.02)
+    assert backend.load("a").turns() == []
+
+
+def test_sqlite_backend_persists_across_instances(tmp_path):
+    path = str(tmp_path / "memory.sqlite3")
+    backend = SQLiteMemoryBackend(path, max_turns=2)
+    for i in range(3):
+        backend.add_turn("s", user=f"q{i}", agent=f"a{i}")
+
+    other = SQLiteMemoryBackend(path, max_turns=2)
+    assert [t["user"] for t in other.load("s").turns()] == ["q1", "q2"]
+    other.delete("s")
+    assert backend.load("s").turns() == []
+
+
+def test_sqlite_backend_cleanup(tmp_path):
+    backend = SQLiteMemoryBackend(str(tmp_path / "memory.sqlite3"), max_sessions=2, cleanup_interval=1000)
+    for session_id in ["a", "b", "c"]:
+        backend.add_turn(session_id, user="q", agent="a")
+        time.sleep(0.001)
+    backend.cleanup()
+    assert len(backend) == 2
+    assert backend.load("a").turns() == []
+
+
+def test_sqlite_backend_concurrent_writers_keep_all_turns(tmp_path):
+    path = str(tmp_path / "memory.sqlite3")
+    backend = SQLiteMemoryBackend(path, max_turns=100)
+
+    def write(worker):
+        for i in range(10):
+            backend.add_turn("s", user=f"{worker}-{i}", agent="a")
+
+    threads = [threading.Thread(target=write, args=(w,)) for w in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(backend.load("s").turns()) == 40
+
+
+def test_sqlite_async_methods_run_off_the_event_loop(tmp_path, monkeypatch):
+    backend = SQLiteMemoryBackend(str(tmp_path / "memory.sqlite3"))
+    loop_thread = []
+    original = SQLiteMemoryBackend.add_turn
+
+    def add_turn(self, session_id, user, agent):
+        loop_thread.append(threading.current_thread() is threading.main_thread())
+        original(self, session_id, user, agent)
+
+    monkeypatch.setattr(SQLiteMemoryBackend, "add_turn", add_turn)
+
+    async def main():
+        await backend.aadd_turn("s", user="q", agent="a")
+        return await backend.aload("s")
+
+    assert asyncio.run(main()).turns() == [{"user": "q", "agent": "a"}]
+    assert loop_thread == [False]
+
+
+def test_build_memory_backend(tmp_path):
+    assert isinstance(build_memory_backend("memory"), InMemoryBackend)
+    assert isinstance(build_memory_backend("sqlite", db_path=str(tmp_path / "m.sqlite3")), SQLiteMemoryBackend)
+    with pytest.raises(ValueError):
+        build_memory_backend("sqlite")
+    with pytest.raises(ValueError):
+        build_memory_backend("redis")
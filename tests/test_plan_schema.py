@@ -0,0 +1,49 @@
+# tests/test_plan_schema.py
+import pytest
+
+from app.agent.plan_schema import repair_json, validate_plan
+
+PLAN = {"tool": "search_rules", "tool_input": {"query": "연차"}, "reason": "검색", "is_final": False}
+
+
+def test_repair_json_valid_input_is_not_repaired():
+    assert repair_json('{"a": 1}') == ({"a": 1}, False)
+
+
+@pytest.mark.parametrize(
+    "raw",
+    [
+        '```json\n{"tool": "search_rules", "tool_input": {"query": "연차"}, "reason": "검색", "is_final": false}\n```',
+        '플랜입니다: {"tool": "search_rules", "tool_input": {"query": "연차"}, "reason": "검색", "is_final": false} 이상.',
+        '{"tool": "search_rules", "tool_input": {"query": "연차",}, "reason": "검색", "is_final": false,}',
+        "{'tool': 'search_rules', 'tool_input': {'query': '연차'}, 'reason': '검색', 'is_final': False}",
+        "{“tool”: “search_rules”, “tool_input”: {“query”: “연차”}, “reason”: “검색”, “is_final”: false}",
+    ],
+)
+def test_repair_json_fixes_common_breakage(raw):
+    assert repair_json(raw) == (PLAN, True)
+
+
+def test_repair_json_keeps_quotes_inside_strings():
+    parsed, repaired = repair_json("{'reason': '\"연차\" 검색', 'ok': True}")
+    assert repaired
+    assert parsed == {"reason": '"연차" 검색', "ok": True}
+
+
+@pytest.mark.parametrize("raw", ["", "플랜을 만들 수 없습니다", '{"tool": '])
+def test_repair_json_gives_up(raw):
+    assert repair_json(raw) == (None, True)
+
+
+def test_repair_json_non_string():
+    assert repair_json(None) == (None, False)
+
+
+def test_validate_plan_coerces_fields_and_reports_unknown_tools():
+    plan = {"tool": "search_rules", "tool_input": "x", "reason": None, "is_final": "True"}
+    assert validate_plan(plan, ["search_rules", "final_answer"]) == []
+    assert plan == {"tool": "search_rules", "tool_input": {}, "reason": "", "is_final": True}
+
+    assert validate_plan({"tool": "delete_all"}, ["search_rules"]) == ["알 수 없는 tool: delete_all"]
+    calls_plan = {"calls": [{"tool": "search_rules"}, {"tool": "shell"}]}
+    assert validate_plan(calls_plan, ["search_rules"]) == ["알 수 없는 tool: shell"]
@@ -0,0 +1,119 @@
+# tests/test_planner.py
+import json
+
+import openai
+import pytest
+
+from app.agent import planner as planner_module
+from app.agent.llm import is_response_format_unsupported
+from app.agent.planner import Planner, RuleBasedPlanner
+
+TOOLS = ["search", "summarize", "extract_clause", "final_answer"]
+PLAN = {"tool": "search", "tool_input": {"query": "연차"}, "reason": "검색", "is_final": False}
+
+
+def test_is_response_format_unsupported(make_openai_error):
+    def bad_request(message, param=None):
+        return make_openai_error(openai.BadRequestError, 400, message, param)
+
+    assert is_response_format_unsupported(bad_request("Invalid parameter", param="response_format"))
+    assert is_response_format_unsupported(bad_request("'json_schema' is not supported with this model."))
+    assert not is_response_format_unsupported(bad_request("maximum context length is 8192 tokens", param="messages"))
+    assert not is_response_format_unsupported(make_openai_error(openai.InternalServerError, 500, "response_format"))
+    assert not is_response_format_unsupported(ValueError("response_format"))
+
+
+@pytest.fixture
+def completions(monkeypatch):
+    """
+    planner의 chat_completion을 대체. errors에 넣은 예외를 차례로 던진 뒤 PLAN을 반환하고, 호출 인자를 기록한다.
+    """
+    calls = []
+    errors = []
+
+    def fake(messages, **kwargs):
+        calls.append(kwargs)
+        if errors:
+            raise errors.pop(0)
+        return json.dumps(PLAN)
+
+    monkeypatch.setattr(planner_module, "chat_completion", fake)
+    return calls, errors
+
+
+def test_planner_disables_structured_output_only_for_response_format_errors(completions, make_openai_error):
+    calls, errors = completions
+    planner = Planner(TOOLS)
+
+    # 다른 400 (예: 컨텍스트 길이 초과): 그 호출만 response_format 없이 재시도하고 이후 호출은 계속 사용
+    errors.append(make_openai_error(openai.BadRequestError, 400, "maximum context length", param="messages"))
+    assert planner.plan("연차", "")["tool"] == "search"
+    assert planner.structured_output
+    assert ["response_format" in c for c in calls] == [True, False]
+
+    errors.append(make_openai_error(openai.BadRequestError, 400, "unsupported", param="response_format"))
+    planner.plan("연차", "")
+    assert not planner.structured_output
+
+    calls.clear()
+    planner.plan("연차", "")
+    assert ["response_format" in c for c in calls] == [False]
+
+
+def test_planner_does_not_swallow_other_errors(completions, make_openai_error):
+    _, errors = completions
+    errors.append(make_openai_error(openai.InternalServerError, 500, "server error"))
+    planner = Planner(TOOLS)
+    with pytest.raises(openai.InternalServerError):
+        planner.plan("연차", "")
+    assert planner.structured_output
+
+
+class _FallbackPlanner:
+    def __init__(self):
+        self.calls = []
+
+    def plan(self, user_query, memory_context, last_result=None):
+        self.calls.append(user_query)
+        return dict(PLAN, planner="llm")
+
+
+def test_rule_based_planner_routing():
+    planner = RuleBasedPlanner(TOOLS)
+    rule = {"id": 1, "title": "휴가 규정", "content": "연차는 15일"}
+
+    assert planner.decide("연차 며칠이야?", None)["tool_input"] == {"query": "연차 며칠이야?"}
+    assert planner.decide("연차 며칠이야?", [rule])["tool"] == "summarize"
+    assert planner.decide("연차 사용 조건 알려줘", [rule])["tool"] == "extract_clause"
+    final = planner.decide("연차 며칠이야?", "15일입니다.")
+    assert (final["tool"], final["is_final"], final["tool_input"]) == ("final_answer", True, {"answer": "15일입니다."})
+    # 검색어를 특정하기 어려운 질문 / 검색 결과 없음 → LLM에게 맡긴다
+    assert planner.decide("어떤 규정들이 있어?", None) is None
+    assert planner.decide("연차 며칠이야?", []) is None
+
+
+@pytest.mark.parametrize(
+    "query, targets",
+    [
+        ("연차 규정과 재택근무 규정 비교해줘", ["연차 규정", "재택근무 규정"]),
+        ("연차이랑 반차 차이가 뭐야", ["연차", "반차"]),
+        ("출장비와 숙박비의 차이", ["출장비", "숙박비"]),
+        ("성과 평가 기준과 보상 기준 차이", ["성과 평가 기준", "보상 기준"]),
+        ("A규정 vs B규정 비교", ["A규정", "B규정"]),
+    ],
+)
+def test_rule_based_planner_compare_runs_parallel_searches(query, targets):
+    plan = RuleBasedPlanner(TOOLS).decide(query, None)
+    assert plan["tool"] == "parallel"
+    searches = [call["tool_input"]["query"] for call in plan["calls"] if call["tool"] == "search"]
+    assert searches == targets
+    assert plan["calls"][-1]["depends_on"] == ["search_a", "search_b"]
+
+
+def test_rule_based_planner_ambiguous_compare_falls_back_to_llm():
+    fallback = _FallbackPlanner()
+    planner = RuleBasedPlanner(TOOLS, fallback=fallback)
+    # "성과"의 "과"를 조사로 잘라 "성"만 검색하지 않는다
+    assert planner.decide("성과 평가 기준 비교", None) is None
+    assert planner.plan("성과 평가 기준 비교", "")["planner"] == "llm"
+    assert fallback.calls == ["성과 평가 기준 비교"]
@@ -0,0 +1,81 @@
+# tests/test_rule_loader.py
+import io
+import json
+
+import pytest
+
+from app.agent.tools.rule_loader import Rule, _iter_json_array, iter_rule_file
+
+
+def _parse(text, **kwargs):
+    return list(_iter_json_array(io.StringIO(text), **kwargs))
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 1 << 20])
+def test_iter_json_array_matches_json_loads(chunk_size):
+    data = [{"id": 1, "title": "연차", "content": "규정 [1], \"인용\""}, 12345, "문자열", [1, 2], None, -1.5e3, {}]
+    text = json.dumps(data, ensure_ascii=False, indent=2)
+    assert _parse(text, chunk_size=chunk_size) == data
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 5])
+def test_iter_json_array_numbers_split_across_chunks(chunk_size):
+    # 청크 경계에서 잘린 숫자도 앞부분만 파싱하지 않고 끝까지 읽어야 한다
+    text = "[-1.5e3, 12345, 0.25, 1E-2, 7, true, null]"
+    assert _parse(text, chunk_size=chunk_size) == json.loads(text)
+
+
+@pytest.mark.parametrize("text", ["[]", "  [ ]  ", "\n[\n]\n"])
+def test_iter_json_array_empty(text):
+    assert _parse(text, chunk_size=1) == []
+
+
+@pytest.mark.parametrize(
+    "text, message",
+    [
+        ('{"id": 1}', r"list\[dict\] 예상"),
+        ("", r"list\[dict\] 예상"),
+        ("[1 2]", "쉼표가 없습니다"),
+        ("[1,,2]", "빈 원소"),
+        ("[,1]", "빈 원소"),
+        ("[1,]", "빈 원소"),
+        ("[1, 2", "닫히지 않았습니다"),
+        ("[1,", "닫히지 않았습니다"),
+        ('[{"id": 1', "파싱할 수 없습니다"),
+    ],
+)
+@pytest.mark.parametrize("chunk_size", [1, 4, 1 << 20])
+def test_iter_json_array_rejects_malformed(text, message, chunk_size):
+    with pytest.raises(ValueError, match=message):
+        _parse(text, chunk_size=chunk_size)
+
+
+def test_iter_json_array_error_reports_position():
+    with pytest.raises(ValueError, match=r"위치 6\)"):
+        _parse("[1, 2 3]", chunk_size=2)
+
+
+def test_iter_json_array_bounds_item_buffer():
+    class Reader(io.StringIO):
+        read_chars = 0
+
+        def read(self, size=-1):
+            chunk = super().read(size)
+            Reader.read_chars += len(chunk)
+            return chunk
+
+    # 닫히지 않은 문자열: 상한이 없으면 파일 끝까지 버퍼링한다
+    f = Reader('[{"content": "' + "가" * 10000)
+    with pytest.raises(ValueError, match="100자를 넘도록"):
+        list(_iter_json_array(f, chunk_size=16, max_item_size=100))
+    assert Reader.read_chars < 200
+
+
+def test_iter_rule_file_prefixes_path(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text('[{"id": 1, "title": "t", "content": "c"},]', encoding="utf-8")
+    with pytest.raises(ValueError, match=str(path)):
+        list(iter_rule_file(str(path)))
+
+    path.write_text('[{"id": 1, "title": "t", "content": "c", "owner": "hr"}]', encoding="utf-8")
+    assert list(iter_rule_file(str(path))) == [Rule(id=1, title="t", content="c", extra={"owner": "hr"})]
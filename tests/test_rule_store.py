@@ -0,0 +1,113 @@
+# tests/test_rule_store.py
+import json
+import os
+import random
+
+import pytest
+
+from app.agent.tools.rule_store import RuleOverlay, RuleStore
+from app.agent.tools.search_index import OverlayIndex
+
+
+def _write(path, rules):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(rules, f, ensure_ascii=False)
+    # 같은 크기로 빠르게 다시 써도 변경으로 감지되도록 mtime을 앞으로 민다
+    stat = os.stat(path)
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+
+def _rule(rule_id, text):
+    return {"id": rule_id, "title": f"규정 {rule_id}", "content": text}
+
+
+def _assert_matches_fresh_load(store, data_path):
+    fresh = RuleStore(data_path)
+    assert dict(store.snapshot.rules.items()) == dict(fresh.snapshot.rules.items())
+    for query in ["연차", "출장비", "보안 교육", "재택"]:
+        got = {key: score for score, key in store.snapshot.index.search(query, top_k=1000)}
+        expected = {key: score for score, key in fresh.snapshot.index.search(query, top_k=1000)}
+        assert got == pytest.approx(expected)
+
+
+def test_reload_applies_only_changes_as_overlay(tmp_path):
+    path = tmp_path / "rules.json"
+    rules = [_rule(i, f"연차 출장비 규정 {i}") for i in range(100)]
+    _write(path, rules)
+    store = RuleStore(str(path), overlay_merge_ratio=0.5)
+
+    rules[3] = _rule(3, "재택 근무 규정")
+    del rules[10]
+    rules.append(_rule(200, "보안 교육 규정"))
+    _write(path, rules)
+    stats = store.reload()
+
+    assert (stats["added"], stats["updated"], stats["removed"], stats["merged"]) == (1, 1, 1, False)
+    assert store.version == 2
+    assert isinstance(store.snapshot.rules, RuleOverlay)
+    assert isinstance(store.snapshot.index, OverlayIndex)
+    _assert_matches_fresh_load(store, str(path))
+
+    # 변경이 없으면 snapshot을 바꾸지 않는다
+    assert store.reload()["version"] == 2
+
+
+def test_reload_merges_when_overlay_grows(tmp_path):
+    path = tmp_path / "rules.json"
+    rules = [_rule(i, f"연차 규정 {i}") for i in range(10)]
+    _write(path, rules)
+    store = RuleStore(str(path), overlay_merge_ratio=0.1)
+
+    _write(path, [_rule(i, f"출장비 규정 {i}") for i in range(10)])
+    assert store.reload()["merged"]
+    assert isinstance(store.snapshot.rules, dict)
+    _assert_matches_fresh_load(store, str(path))
+
+
+def test_same_id_in_multiple_shards_uses_last_shard(tmp_path):
+    shards = tmp_path / "rules"
+    shards.mkdir()
+    _write(shards / "a.json", [_rule(1, "연차 a"), _rule(2, "출장비 a")])
+    _write(shards / "b.json", [_rule(1, "연차 b")])
+    store = RuleStore(str(shards))
+    assert store.snapshot.rules[1].content == "연차 b"
+
+    # 이름순 앞 shard만 바뀌면 뒤 shard의 규정이 계속 대표
+    _write(shards / "a.json", [_rule(1, "연차 a2"), _rule(2, "출장비 a")])
+    store.reload()
+    assert store.snapshot.rules[1].content == "연차 b"
+
+    # 뒤 shard에서 빠지면 바뀌지 않은 앞 shard의 규정으로 돌아가고, 모든 shard에서 빠질 때만 삭제
+    _write(shards / "b.json", [])
+    store.reload()
+    assert store.snapshot.rules[1].content == "연차 a2"
+    os.remove(shards / "a.json")
+    store.reload()
+    assert 1 not in store.snapshot.rules and 2 not in store.snapshot.rules
+    _assert_matches_fresh_load(store, str(shards))
+
+
+@pytest.mark.parametrize("merge_ratio", [0.5, 100.0])
+def test_random_reloads_match_fresh_load(tmp_path, merge_ratio):
+    rng = random.Random(1)
+    words = ["연차", "출장비", "보안", "교육", "재택", "근무", "승인"]
+    shards = tmp_path / "rules"
+    shards.mkdir()
+    names = ["a.json", "b.json", "c.json"]
+    contents = {name: {} for name in names}
+    for name in names:
+        for rule_id in rng.sample(range(30), 10):
+            contents[name][rule_id] = " ".join(rng.choices(words, k=4))
+        _write(shards / name, [_rule(i, text) for i, text in contents[name].items()])
+    store = RuleStore(str(shards), overlay_merge_ratio=merge_ratio)
+
+    for _ in range(15):
+        name = rng.choice(names)
+        for rule_id in rng.sample(range(30), 4):
+            if rng.random() < 0.3:
+                contents[name].pop(rule_id, None)
+            else:
+                contents[name][rule_id] = " ".join(rng.choices(words, k=4))
+        _write(shards / name, [_rule(i, text) for i, text in contents[name].items()])
+        store.reload()
+        _assert_matches_fresh_load(store, str(shards))
@@ -0,0 +1,97 @@
+# tests/test_search_cache.py
+import json
+
+import pytest
+
+from app.agent.tools.search_cache import SearchResultCache, normalize_search_query
+from app.agent.tools.search_tool import SearchTool
+
+RULES = [
+    {"id": 1, "title": "연차휴가 규정", "content": "연차휴가는 1년에 15일 부여한다."},
+    {"id": 2, "title": "출장비 규정", "content": "국내 출장 시 교통비와 숙박비를 지급한다."},
+    {"id": 3, "title": "재택근무 규정", "content": "재택근무는 주 2회까지 가능하다."},
+]
+
+
+def test_keyword_key_ignores_word_order_and_punctuation():
+    assert normalize_search_query("연차 휴가!") == normalize_search_query("휴가 연차")
+    assert normalize_search_query("  Leave  Policy ", by_terms=False) == "leave policy"
+    cache = SearchResultCache()
+    assert cache.make_key("연차 휴가", 3) != cache.make_key("연차 휴가", 5)
+
+
+def test_lru_eviction_keeps_pinned_entries():
+    cache = SearchResultCache(max_entries=3)
+    cache.pin(1, {("pinned", 3): [9]})
+    cache.set(1, ("a", 3), [1])
+    cache.set(1, ("b", 3), [2])
+    cache.get(1, ("a", 3))
+    cache.set(1, ("c", 3), [3])
+
+    assert cache.get(1, ("b", 3)) is None
+    assert cache.get(1, ("a", 3)) == [1]
+    assert cache.get(1, ("pinned", 3)) == [9]
+    assert cache.evictions == 1 and cache.pinned_hits == 1
+
+
+def test_stale_pinned_entry_is_computed_on_first_lookup():
+    cache = SearchResultCache()
+    cache.pin(1, {("연차", 3): None})
+    # 결과가 없는 pinned 질의는 miss로 보고, 계산한 결과를 pinned 자리에 채운다
+    assert cache.get(1, ("연차", 3)) is None
+    cache.set(1, ("연차", 3), [1])
+    assert cache.get(1, ("연차", 3)) == [1]
+    assert cache.stats_dict()["pinned"] == 1 and cache.stats_dict()["size"] == 0
+
+
+def test_version_change_clears_entries_and_unfills_pinned():
+    cache = SearchResultCache()
+    cache.pin(1, {("연차", 3): [1]})
+    cache.set(1, ("출장", 3), [2])
+
+    assert cache.get(2, ("출장", 3)) is None
+    assert cache.get(2, ("연차", 3)) is None
+    assert cache.invalidations == 1
+    # 질의는 고정된 채로 남아 새 snapshot 결과로 다시 채워진다
+    cache.set(2, ("연차", 3), [1, 3])
+    assert cache.get(2, ("연차", 3)) == [1, 3]
+    assert len(cache) == 1
+
+
+@pytest.fixture
+def rules_path(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps(RULES, ensure_ascii=False), encoding="utf-8")
+    return path
+
+
+def _write_precomputed(path, corpus, results):
+    key = normalize_search_query("연차휴가")
+    path.write_text(
+        json.dumps({"corpus": corpus, "entries": [{"key": key, "top_k": 3, "count": 5, "results": results}]}),
+        encoding="utf-8",
+    )
+
+
+def test_search_tool_serves_precomputed_results_for_same_corpus(rules_path, tmp_path):
+    fingerprint = SearchTool(str(rules_path)).store.snapshot.fingerprint("search")
+    precomputed = tmp_path / "precomputed.json"
+    _write_precomputed(precomputed, fingerprint, [3])
+
+    cache = SearchResultCache()
+    tool = SearchTool(str(rules_path), cache=cache, precomputed_path=str(precomputed))
+    assert [rule["id"] for rule in tool.run(user_query="연차휴가", tool_input={})] == [3]
+    assert cache.pinned_hits == 1
+
+
+def test_search_tool_recomputes_precomputed_results_for_changed_corpus(rules_path, tmp_path):
+    precomputed = tmp_path / "precomputed.json"
+    _write_precomputed(precomputed, "other-corpus", [3])
+
+    cache = SearchResultCache()
+    tool = SearchTool(str(rules_path), cache=cache, precomputed_path=str(precomputed))
+    assert [rule["id"] for rule in tool.run(user_query="연차휴가", tool_input={})] == [1]
+    assert cache.misses == 1
+    # 다시 계산한 결과가 pinned 항목으로 남는다
+    assert [rule["id"] for rule in tool.run(user_query="연차휴가?", tool_input={})] == [1]
+    assert cache.pinned_hits == 1
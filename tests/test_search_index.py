@@ -0,0 +1,103 @@
+# tests/test_search_index.py
+import random
+
+import pytest
+
+from app.agent.tools.search_index import InvertedIndex, OverlayIndex, tokenize
+
+DOCS = [
+    (1, "연차휴가 규정 연차휴가는 1년에 15일 부여한다"),
+    (2, "출장비 규정 국내 출장 시 교통비와 숙박비를 지급한다"),
+    (3, "재택근무 규정 재택근무는 주 2회까지 가능하다"),
+    (4, "휴가 신청 절차 휴가는 3일 전까지 신청한다"),
+]
+
+
+def test_tokenize_korean_bigrams_and_ascii_words():
+    assert tokenize("연차휴가는 VPN 2회") == ["연차", "차휴", "휴가", "가는", "vpn", "2", "회"]
+
+
+def test_search_ranks_matching_document_first():
+    index = InvertedIndex.from_documents(DOCS)
+    hits = index.search("연차휴가 며칠", top_k=3)
+    assert hits[0][1] == 1
+    # 점수 내림차순, 질의어가 등장하지 않는 문서는 제외
+    assert [score for score, _ in hits] == sorted((score for score, _ in hits), reverse=True)
+    assert 2 not in [key for _, key in hits]
+
+
+def test_search_prefers_higher_term_frequency():
+    index = InvertedIndex.from_documents([("a", "출장 출장 출장 규정"), ("b", "출장 규정 안내 문서")])
+    assert [key for _, key in index.search("출장", top_k=2)] == ["a", "b"]
+
+
+def test_search_edge_cases():
+    index = InvertedIndex.from_documents(DOCS)
+    assert index.search("연차", top_k=0) == []
+    assert index.search("없는단어", top_k=5) == []
+    assert InvertedIndex().search("연차", top_k=5) == []
+
+
+def test_add_existing_document_raises():
+    index = InvertedIndex.from_documents(DOCS)
+    with pytest.raises(ValueError):
+        index.add_document(1, "중복")
+
+
+def test_copy_on_write_keeps_original_unchanged():
+    index = InvertedIndex.from_documents(DOCS)
+    before = index.search("휴가", top_k=4)
+    clone = index.copy()
+    clone.remove_document(1, DOCS[0][1])
+    clone.add_document(5, "휴가 휴가 휴가 특별휴가")
+
+    assert index.search("휴가", top_k=4) == before
+    assert 1 not in clone and 5 in clone
+    assert clone.search("휴가", top_k=1)[0][1] == 5
+
+
+def _fresh(docs):
+    return InvertedIndex.from_documents(sorted(docs.items(), key=lambda x: x[0]))
+
+
+def _assert_same_ranking(index, fresh, queries):
+    # 동점 문서의 순서는 색인 순서에 따라 다를 수 있으므로 문서별 점수로 비교
+    for query in queries:
+        got = {key: score for score, key in index.search(query, top_k=1000)}
+        expected = {key: score for score, key in fresh.search(query, top_k=1000)}
+        assert got == pytest.approx(expected)
+
+
+def test_overlay_index_matches_fresh_index():
+    rng = random.Random(0)
+    words = ["연차", "휴가", "출장", "재택", "근무", "보안", "교육", "신청", "승인", "지급"]
+    docs = {i: " ".join(rng.choices(words, k=6)) for i in range(50)}
+    index = InvertedIndex.from_documents(docs.items())
+    queries = ["연차휴가", "출장 지급", "보안 교육 신청", "재택근무"]
+
+    current = index.overlay()
+    for round_no in range(5):
+        current = current.overlay()
+        for key in rng.sample(sorted(docs), 8):
+            current.remove_document(key, docs[key])
+            if rng.random() < 0.5:
+                del docs[key]
+            else:
+                docs[key] = " ".join(rng.choices(words, k=6))
+                current.add_document(key, docs[key])
+        new_key = 100 + round_no
+        docs[new_key] = " ".join(rng.choices(words, k=6))
+        current.add_document(new_key, docs[new_key])
+
+        assert isinstance(current, OverlayIndex)
+        assert len(current) == len(docs)
+        _assert_same_ranking(current, _fresh(docs), queries)
+
+    merged = current.merge()
+    assert isinstance(merged, InvertedIndex)
+    assert len(merged) == len(docs)
+    _assert_same_ranking(merged, _fresh(docs), queries)
+    # merge 결과를 수정해도 base 인덱스의 posting은 그대로
+    before = index.search("휴가", top_k=10)
+    merged.add_document(999, "휴가 휴가")
+    assert index.search("휴가", top_k=10) == before
@@ -0,0 +1,84 @@
+# tests/test_shared_snapshot.py
+import json
+
+import pytest
+
+from app.agent.tools.rule_loader import Rule
+from app.agent.tools.rule_store import RuleSnapshot, RuleStore
+from app.agent.tools.search_index import InvertedIndex
+from app.agent.tools.shared_snapshot import SharedIndex, SharedRuleMap, SharedSnapshotFile, write_snapshot
+
+RULES = {
+    1: Rule(id=1, title="연차휴가 규정", content="연차휴가는 1년에 15일 부여한다. 미사용 연차는 이월할 수 없다.", category="인사"),
+    2: Rule(id=2, title="출장비 규정", content="국내 출장 시 교통비와 숙박비를 지급한다.", extra={"version": 3}),
+    "trip-2": Rule(id="trip-2", title="해외 출장 규정", content="해외 출장 숙박비는 실비로 정산한다."),
+    ("rules.json", 3): Rule(id=None, title="재택근무 규정", content="재택근무는 주 2회까지 가능하다. 휴가와 붙여 쓸 수 없다."),
+}
+QUERIES = ["연차휴가 며칠", "출장 숙박비", "재택근무 휴가", "없는단어", "규정"]
+
+
+@pytest.fixture
+def snapshot_file(tmp_path):
+    path = tmp_path / "rules.snap"
+    write_snapshot(str(path), RULES, version=7, sources={"rules.json": [1, 2, 3]})
+    return SharedSnapshotFile(str(path))
+
+
+def test_rule_map_round_trip(snapshot_file):
+    rules = SharedRuleMap(snapshot_file)
+    assert snapshot_file.version == 7
+    assert snapshot_file.sources == {"rules.json": [1, 2, 3]}
+    assert len(rules) == len(RULES)
+    assert list(rules) == list(RULES)
+    for key, rule in RULES.items():
+        assert key in rules
+        assert rules[key].to_dict() == rule.to_dict()
+    assert dict((key, rule.to_dict()) for key, rule in rules.items()) == {k: r.to_dict() for k, r in RULES.items()}
+    assert 99 not in rules and ["unhashable"] not in rules
+    with pytest.raises(KeyError):
+        rules["missing"]
+
+
+@pytest.mark.parametrize("query", QUERIES)
+@pytest.mark.parametrize("top_k", [1, 3, 10])
+def test_shared_index_scores_match_inverted_index(snapshot_file, query, top_k):
+    expected = InvertedIndex.from_documents((key, rule.text) for key, rule in RULES.items()).search(query, top_k)
+    actual = SharedIndex(snapshot_file).search(query, top_k)
+    assert {key: pytest.approx(score) for score, key in expected} == {key: score for score, key in actual}
+    assert [score for score, _ in actual] == sorted((score for score, _ in actual), reverse=True)
+
+
+def test_fingerprint_matches_in_memory_corpus(snapshot_file):
+    shared = RuleSnapshot(version=7, rules=SharedRuleMap(snapshot_file), index=SharedIndex(snapshot_file))
+    in_memory = RuleSnapshot(version=7, rules=RULES, index=InvertedIndex())
+    assert shared.fingerprint("search") == in_memory.fingerprint("search")
+
+
+def test_empty_snapshot(tmp_path):
+    path = tmp_path / "empty.snap"
+    write_snapshot(str(path), {})
+    snapshot = SharedSnapshotFile(str(path))
+    assert len(SharedRuleMap(snapshot)) == 0
+    assert SharedIndex(snapshot).search("연차", 3) == []
+
+
+def test_rejects_non_snapshot_file(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text("[]", encoding="utf-8")
+    with pytest.raises(ValueError):
+        SharedSnapshotFile(str(path))
+
+
+def test_store_in_shared_mode_rebuilds_after_source_change(tmp_path):
+    data = tmp_path / "rules.json"
+    data.write_text(json.dumps([r.to_dict() for r in list(RULES.values())[:2]], ensure_ascii=False), encoding="utf-8")
+    store = RuleStore(str(data), snapshot_path=str(tmp_path / "rules.snap"))
+    assert isinstance(store.snapshot.index, SharedIndex)
+    assert store.snapshot.index.search("연차휴가", 1)[0][1] == 1
+
+    data.write_text(json.dumps([RULES[2].to_dict()], ensure_ascii=False), encoding="utf-8")
+    stats = store.reload()
+    assert stats["rebuilt"] and stats["total"] == 1
+    assert store.snapshot.index.search("연차휴가", 1) == []
+    # 공유 snapshot을 다시 쓰면 규정 단위 변경분은 알 수 없다
+    assert store.changes_since(store.version - 1) is None
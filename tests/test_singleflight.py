@@ -0,0 +1,76 @@
+# tests/test_singleflight.py
+import asyncio
+
+import pytest
+
+from app.agent.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_execution():
+    flight = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "결과"
+
+    async def main():
+        return await asyncio.gather(*(flight.do("k", work) for _ in range(5)), flight.do("other", work))
+
+    assert asyncio.run(main()) == ["결과"] * 6
+    assert len(calls) == 2
+    assert flight.stats_dict() == {"executions": 2, "shared": 4, "in_flight": 0}
+
+
+def test_exception_is_shared_and_key_is_released():
+    flight = SingleFlight()
+
+    async def fail():
+        await asyncio.sleep(0.01)
+        raise ValueError("실패")
+
+    async def main():
+        results = await asyncio.gather(flight.do("k", fail), flight.do("k", fail), return_exceptions=True)
+        assert len(flight) == 0
+        return results
+
+    assert [type(r) for r in asyncio.run(main())] == [ValueError, ValueError]
+
+
+def test_cancelling_leader_does_not_cancel_followers():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.05)
+        return "결과"
+
+    async def main():
+        leader = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await follower
+
+    assert asyncio.run(main()) == "결과"
+
+
+def test_cancelling_follower_keeps_leader_running():
+    flight = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.03)
+        return "결과"
+
+    async def main():
+        leader = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flight.do("k", work))
+        await asyncio.sleep(0.01)
+        follower.cancel()
+        return await leader
+
+    assert asyncio.run(main()) == "결과"
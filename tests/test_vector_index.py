@@ -0,0 +1,93 @@
+# tests/test_vector_index.py
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from app.agent.tools.vector_index import (  # noqa: E402
+    HashingEmbedder,
+    VectorIndex,
+    corpus_digest,
+    corpus_fingerprint,
+    fuse_scores,
+    load_embedder,
+)
+
+DOCS = [
+    ("r1", "연차휴가 규정 연차휴가는 1년에 15일 부여한다"),
+    ("r2", "출장비 규정 국내 출장 시 교통비와 숙박비를 지급한다"),
+    ("r3", "재택근무 규정 재택근무는 주 2회까지 가능하다"),
+    ("r4", "보안 교육 규정 모든 직원은 연 1회 보안 교육을 이수한다"),
+]
+
+
+def test_hashing_embedder_is_deterministic():
+    embed = HashingEmbedder(dim=64)
+    a = embed(["연차휴가 신청", "출장비"])
+    assert a.shape == (2, 64) and a.dtype == np.float32
+    np.testing.assert_array_equal(a, HashingEmbedder(dim=64)(["연차휴가 신청", "출장비"]))
+    assert load_embedder("hashing", 64).name == "hashing-64"
+
+
+def test_vector_search_finds_related_rule():
+    embed = HashingEmbedder()
+    index = VectorIndex.build(DOCS, embed)
+    assert index.search("재택근무 가능 횟수", embed, top_k=1)[0][1] == "r3"
+    assert index.search("출장 숙박비", embed, top_k=1)[0][1] == "r2"
+    hits = index.search("연차휴가", embed, top_k=10)
+    assert len(hits) == len(DOCS)
+    assert [score for score, _ in hits] == sorted((score for score, _ in hits), reverse=True)
+
+
+def test_ivf_search_probing_all_lists_matches_exact_search():
+    embed = HashingEmbedder()
+    docs = [(i, f"{text} {i}") for i, (_, text) in enumerate(DOCS * 10)]
+    exact = VectorIndex.build(docs, embed)
+    approx = VectorIndex.build(docs, embed)
+    approx.build_ivf(n_lists=4, n_probe=4)
+    assert approx.lists is not None
+    for query in ["연차휴가", "보안 교육", "출장비 지급"]:
+        assert approx.search(query, embed, 5) == pytest.approx(exact.search(query, embed, 5))
+
+
+def test_updated_reembeds_only_changed_docs():
+    embedded = []
+
+    def embed(texts):
+        embedded.extend(texts)
+        return HashingEmbedder()(texts)
+
+    index = VectorIndex.build(DOCS, embed)
+    embedded.clear()
+    new_docs = [DOCS[0], ("r2", "출장비 규정 해외 출장 일비"), DOCS[2], ("r5", "복리후생 경조사 지원")]
+    updated = index.updated(new_docs, changed={"r2"}, embed=embed, fingerprint="v2")
+
+    assert embedded == ["출장비 규정 해외 출장 일비", "복리후생 경조사 지원"]
+    assert updated.keys == ["r1", "r2", "r3", "r5"]
+    np.testing.assert_array_equal(updated.matrix[0], index.matrix[0])
+    assert updated.search("해외 출장", embed, 1)[0][1] == "r2"
+
+
+def test_save_and_load_checks_fingerprint(tmp_path):
+    embed = HashingEmbedder()
+    fingerprint = corpus_fingerprint(embed.name, DOCS)
+    path = str(tmp_path / "rules.embeddings.npy")
+    VectorIndex.build(DOCS, embed, fingerprint).save(path)
+
+    loaded = VectorIndex.load(path, fingerprint)
+    assert loaded is not None and loaded.keys == [key for key, _ in DOCS]
+    assert loaded.search("보안 교육", embed, 1)[0][1] == "r4"
+    assert VectorIndex.load(path, corpus_fingerprint(embed.name, DOCS[:2])) is None
+    assert VectorIndex.load(str(tmp_path / "missing.npy")) is None
+
+
+def test_corpus_fingerprint_accepts_precomputed_digest():
+    assert corpus_fingerprint("hashing-256", DOCS) == corpus_fingerprint("hashing-256", corpus_digest(DOCS))
+    assert corpus_fingerprint("hashing-256", DOCS) != corpus_fingerprint("hashing-128", DOCS)
+
+
+def test_fuse_scores():
+    keyword = [(4.0, "a"), (2.0, "b")]
+    vector = [(0.9, "b"), (0.3, "c")]
+    fused = fuse_scores(keyword, vector, alpha=0.5, top_k=3)
+    assert [key for _, key in fused] == ["b", "a", "c"]
+    assert fused[0][0] == pytest.approx(0.75)
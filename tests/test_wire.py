@@ -0,0 +1,133 @@
+# tests/test_wire.py
+import gzip
+import json
+import types
+
+import pytest
+
+from app.agent import wire
+from app.agent.wire import compress, dumps, negotiate_encoding, shape_response
+
+RULE_A = {"id": 1, "title": "연차휴가 규정", "content": "연차휴가는 1년에 15일 부여한다."}
+RULE_B = {"id": 2, "title": "출장비 규정", "content": "숙박비는 1박 10만원 이하로 지급한다."}
+
+RESPONSE = {
+    "query": "연차 며칠?",
+    "steps": [
+        {
+            "tool": "search",
+            "tool_input": {"query": "연차"},
+            "reason": "검색",
+            "output": [RULE_A, RULE_B],
+            "is_final": False,
+            "planner": "rule",
+            "call_id": None,
+        },
+        {
+            "tool": "summarize",
+            "tool_input": {"texts": [RULE_A["content"], RULE_B["content"]]},
+            "reason": "요약",
+            "output": "연차는 15일입니다.",
+            "is_final": False,
+            "planner": "rule",
+            "call_id": None,
+        },
+        {
+            "tool": "search",
+            "tool_input": {"query": "연차 이월"},
+            "reason": "재검색",
+            "output": [RULE_A],
+            "is_final": False,
+            "planner": "llm",
+            "call_id": None,
+        },
+    ],
+    "final_answer": "연차는 15일입니다.",
+    "cached": False,
+    "context_tokens_saved": 0,
+    "stop_reason": "answered",
+}
+
+
+def test_full_is_returned_unchanged():
+    assert shape_response(RESPONSE, "full") is RESPONSE
+
+
+def test_final_keeps_only_answer_fields():
+    shaped = shape_response(RESPONSE, "final")
+    assert "steps" not in shaped
+    assert shaped["final_answer"] == RESPONSE["final_answer"]
+    assert shaped["stop_reason"] == "answered"
+
+
+def test_steps_drops_payloads_and_none_fields():
+    shaped = shape_response(RESPONSE, "steps")
+    assert [step["tool"] for step in shaped["steps"]] == ["search", "summarize", "search"]
+    for step in shaped["steps"]:
+        assert "tool_input" not in step and "output" not in step and "call_id" not in step
+
+
+def test_compact_references_rules_by_id_once():
+    shaped = shape_response(RESPONSE, "compact")
+    assert shaped["rules"] == [RULE_A, RULE_B]
+    search, summarize, research = shaped["steps"]
+    assert search["output"] == [1, 2]
+    assert summarize["tool_input"] == {"rule_ids": [1, 2]}
+    assert summarize["output"] == "연차는 15일입니다."
+    assert research["output"] == [1]
+    # 원본(캐시에 저장된 full 응답)은 바꾸지 않는다
+    assert RESPONSE["steps"][1]["tool_input"]["texts"] == [RULE_A["content"], RULE_B["content"]]
+
+
+def test_compact_keeps_texts_without_preceding_search():
+    response = dict(RESPONSE, steps=RESPONSE["steps"][1:2])
+    shaped = shape_response(response, "compact")
+    assert shaped["steps"][0]["tool_input"]["texts"] == [RULE_A["content"], RULE_B["content"]]
+    assert shaped["rules"] == []
+
+
+def test_unknown_verbosity_is_rejected():
+    with pytest.raises(ValueError):
+        shape_response(RESPONSE, "verbose")
+
+
+def test_dumps_round_trips_utf8():
+    assert json.loads(dumps(RESPONSE).decode("utf-8")) == RESPONSE
+
+
+@pytest.mark.parametrize(
+    "header, expected",
+    [
+        (None, None),
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("gzip, br", "br"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("br;q=0, gzip;q=0", None),
+        ("*", "br"),
+        ("gzip;q=0.8, *;q=0.9", "br"),
+        ("GZIP;q=abc, br;q=0.1", "br"),
+    ],
+)
+def test_negotiate_encoding_with_brotli(monkeypatch, header, expected):
+    monkeypatch.setattr(wire, "brotli", types.SimpleNamespace())
+    assert negotiate_encoding(header) == expected
+
+
+def test_negotiate_encoding_without_brotli_falls_back_to_gzip(monkeypatch):
+    monkeypatch.setattr(wire, "brotli", None)
+    assert negotiate_encoding("br") is None
+    assert negotiate_encoding("br, gzip;q=0.5") == "gzip"
+    assert negotiate_encoding("*") == "gzip"
+
+
+def test_compress_gzip_round_trip():
+    body = dumps(RESPONSE)
+    assert gzip.decompress(compress(body, "gzip")) == body
+
+
+def test_compress_brotli_round_trip():
+    brotli = pytest.importorskip("brotli")
+    body = dumps(RESPONSE)
+    assert brotli.decompress(compress(body, "br")) == body